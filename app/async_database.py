@@ -0,0 +1,602 @@
+"""
+Асинхронный модуль для работы с базой данных (asyncpg) для обработчиков бота
+"""
+import asyncio
+import logging
+import random
+from array import array
+from collections import Counter
+from typing import Optional, Dict
+
+import asyncpg
+
+from app.audit_log import ACTION_REVEAL
+from app.config import DB_CONFIG, DB_POOL_CONFIG
+from app import database
+from app.database import (
+    RANDOM_PROBE_ROUNDS, SEARCH_MAX_CANDIDATES, SEARCH_MAX_RANKED, SEARCH_STATEMENT_TIMEOUT, asyncpg_query,
+)
+from app.metrics import instrument_methods
+
+logger = logging.getLogger(__name__)
+
+# Ошибки, при которых запрос считается неудачным (сбой сервера, обрыв соединения, таймаут пула)
+DB_ERRORS = (asyncpg.PostgresError, asyncpg.InterfaceError, OSError, asyncio.TimeoutError)
+
+# Запросы определены в app.database; здесь — те же тексты с плейсхолдерами asyncpg
+RANDOM_PROBE_QUERY = asyncpg_query(database.RANDOM_PROBE_QUERY)
+UNLEARNED_BOUNDS_QUERY = asyncpg_query(database.UNLEARNED_BOUNDS_QUERY)
+NTH_UNLEARNED_QUERY = asyncpg_query(database.NTH_UNLEARNED_QUERY)
+TOPIC_RANDOM_PROBE_QUERY = asyncpg_query(database.TOPIC_RANDOM_PROBE_QUERY)
+TOPIC_UNLEARNED_BOUNDS_QUERY = asyncpg_query(database.TOPIC_UNLEARNED_BOUNDS_QUERY)
+TOPIC_NTH_UNLEARNED_QUERY = asyncpg_query(database.TOPIC_NTH_UNLEARNED_QUERY)
+SEARCH_QUERY = asyncpg_query(database.SEARCH_QUERY)
+SEARCH_TIMEOUT_QUERY = asyncpg_query(database.SEARCH_TIMEOUT_QUERY)
+TOTAL_QUESTIONS_QUERY = asyncpg_query(database.TOTAL_QUESTIONS_QUERY)
+LEARNED_COUNT_QUERY = asyncpg_query(database.LEARNED_COUNT_QUERY)
+QUESTION_BY_ID_QUERY = asyncpg_query(database.QUESTION_BY_ID_QUERY)
+MARK_LEARNED_QUERY = asyncpg_query(database.MARK_LEARNED_QUERY)
+INSERT_USER_LOG_QUERY = asyncpg_query(database.INSERT_USER_LOG_QUERY)
+
+TOPICS_QUERY = """
+    SELECT t.id, t.name, s.count
+    FROM topics t
+    CROSS JOIN LATERAL (
+        SELECT max(q.topic_seq) AS count FROM questions q WHERE q.topic_id = t.id
+    ) s
+    WHERE s.count IS NOT NULL
+    ORDER BY t.name
+"""
+
+# Статистика пользователя одним запросом: строка есть, даже если активности еще не было
+USER_STATS_QUERY = """
+    SELECT
+        COALESCE(s.learned, 0) AS learned,
+        COALESCE(s.current_streak, 0) AS current_streak,
+        COALESCE(s.longest_streak, 0) AS longest_streak,
+        s.last_active_day,
+        COALESCE(d.revealed, 0) AS revealed_today,
+        COALESCE(d.learned, 0) AS learned_today,
+        ARRAY(
+            SELECT ARRAY[topic_id, learned] FROM user_topic_stats
+            WHERE user_id = u.user_id AND learned > 0
+        ) AS topics
+    FROM (SELECT $1::bigint AS user_id) u
+    LEFT JOIN user_stats s ON s.user_id = u.user_id
+    LEFT JOIN user_daily_activity d ON d.user_id = u.user_id AND d.day = $2
+"""
+
+
+@instrument_methods(exclude=('connect', 'close', 'create_listener', 'pool_stats'))
+class AsyncDatabase:
+    """Асинхронный аналог Database с собственным пулом соединений asyncpg"""
+
+    def __init__(self, pool_config: Optional[Dict] = None):
+        self.config = DB_CONFIG
+        self.pool_config = pool_config if pool_config is not None else DB_POOL_CONFIG
+        self._pool = None
+        self._pool_lock = asyncio.Lock()
+
+    async def connect(self) -> asyncpg.Pool:
+        """Создает пул соединений (если еще не создан) и возвращает его"""
+        if self._pool is not None:
+            return self._pool
+
+        async with self._pool_lock:
+            if self._pool is None:
+                db_name = self.config.get('database')
+                db_user = self.config.get('user')
+
+                if not db_name:
+                    raise ValueError(f"ОШИБКА: database не установлен! config={self.config}")
+
+                if db_name == db_user:
+                    raise ValueError(
+                        f"ОШИБКА: database совпадает с user! Это неправильно! "
+                        f"database={db_name}, user={db_user}. "
+                        f"Проверьте переменные окружения POSTGRES_DB и POSTGRES_USER"
+                    )
+
+                self._pool = await asyncpg.create_pool(
+                    host=self.config.get('host'),
+                    port=self.config.get('port'),
+                    database=db_name,
+                    user=db_user,
+                    password=self.config.get('password'),
+                    ssl=False,
+                    min_size=self.pool_config['min_size'],
+                    max_size=self.pool_config['max_size'],
+                    max_inactive_connection_lifetime=self.pool_config['max_idle'],
+                    timeout=self.pool_config['timeout'],
+                )
+                logger.info(
+                    f"Создан асинхронный пул соединений с БД: "
+                    f"min_size={self.pool_config['min_size']}, max_size={self.pool_config['max_size']}"
+                )
+            return self._pool
+
+    async def close(self):
+        """Закрывает пул соединений"""
+        async with self._pool_lock:
+            if self._pool is not None:
+                await self._pool.close()
+                self._pool = None
+                logger.info("Асинхронный пул соединений с БД закрыт")
+
+    def pool_stats(self) -> Optional[Dict]:
+        """Заполненность пула: открытые, свободные и максимум соединений (None, если пул не создан)"""
+        pool = self._pool
+        if pool is None:
+            return None
+        return {'size': pool.get_size(), 'idle': pool.get_idle_size(), 'max_size': pool.get_max_size()}
+
+    async def get_random_question(self, user_id: int, topic_ids=None) -> Optional[Dict]:
+        """
+        Получает случайный вопрос, который еще не отмечен пользователем как выученный
+        (из тем topic_ids, если они заданы). Алгоритм тот же, что в Database.get_random_question.
+        """
+        topic_ids = sorted(set(topic_ids)) if topic_ids else None
+        try:
+            pool = await self.connect()
+            async with pool.acquire() as conn:
+                for probes in RANDOM_PROBE_ROUNDS:
+                    if topic_ids:
+                        result = await conn.fetchrow(TOPIC_RANDOM_PROBE_QUERY, topic_ids, probes, user_id)
+                    else:
+                        result = await conn.fetchrow(RANDOM_PROBE_QUERY, probes, user_id)
+                    if result:
+                        logger.debug(f"Найден вопрос: id={result['id']} для user_id={user_id}")
+                        return dict(result)
+
+                # Все попытки попали в выученные (или каталог пуст) — выбираем точно
+                if topic_ids:
+                    bounds = await conn.fetchrow(TOPIC_UNLEARNED_BOUNDS_QUERY, topic_ids, user_id)
+                else:
+                    bounds = await conn.fetchrow(UNLEARNED_BOUNDS_QUERY, user_id)
+                if bounds['total'] == 0:
+                    logger.debug(f"В базе нет вопросов (темы: {topic_ids or 'все'})")
+                    return None
+
+                unlearned_count = bounds['total'] - bounds['learned']
+                logger.debug(f"Найдено {unlearned_count} невыученных вопросов для user_id={user_id}")
+                if unlearned_count <= 0:
+                    logger.debug(f"Все вопросы выучены пользователем {user_id}")
+                    return None
+
+                position = random.randint(1, unlearned_count)
+                if topic_ids:
+                    result = await conn.fetchrow(TOPIC_NTH_UNLEARNED_QUERY, topic_ids, user_id, position, position)
+                else:
+                    result = await conn.fetchrow(NTH_UNLEARNED_QUERY, user_id, position, position)
+                if result:
+                    logger.debug(f"Найден вопрос: id={result['id']} (позиция {position} из {unlearned_count})")
+                    return dict(result)
+                logger.warning(f"Неожиданно не найден вопрос на позиции {position}, хотя unlearned_count={unlearned_count}")
+                return None
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при получении случайного вопроса: {e}")
+            return None
+
+    async def get_unlearned_question_ids(self, user_id: int) -> Optional[array]:
+        """Возвращает массив id всех невыученных пользователем вопросов (None при ошибке)"""
+        try:
+            pool = await self.connect()
+            rows = await pool.fetch(
+                """
+                SELECT q.id
+                FROM questions q
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM learned_questions l
+                    WHERE l.question_id = q.id AND l.user_id = $1
+                )
+                """,
+                user_id
+            )
+            return array('i', (row['id'] for row in rows))
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при загрузке невыученных вопросов: {e}")
+            return None
+
+    async def get_total_questions_count(self) -> int:
+        """Возвращает общее количество вопросов в базе"""
+        try:
+            pool = await self.connect()
+            return await pool.fetchval(TOTAL_QUESTIONS_QUERY)
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при получении количества вопросов: {e}")
+            return 0
+
+    async def get_topic_counts(self) -> Optional[Dict[str, int]]:
+        """Возвращает количество вопросов по темам (None, если получить не удалось)"""
+        try:
+            pool = await self.connect()
+            rows = await pool.fetch("SELECT topic, COUNT(*) AS count FROM questions GROUP BY topic")
+            return {row['topic']: row['count'] for row in rows}
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при получении количества вопросов по темам: {e}")
+            return None
+
+    async def get_topics(self) -> Optional[list]:
+        """
+        Возвращает темы, в которых есть вопросы: [{'id', 'name', 'count'}] по алфавиту
+        (None при ошибке). Количество — max(topic_seq) темы, без COUNT по questions.
+        """
+        try:
+            pool = await self.connect()
+            rows = await pool.fetch(TOPICS_QUERY)
+            return [dict(row) for row in rows]
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при получении списка тем: {e}")
+            return None
+
+    async def get_topic_preferences(self, user_id: int) -> Optional[list]:
+        """Возвращает id выбранных пользователем тем (пустой список — все темы, None при ошибке)"""
+        try:
+            pool = await self.connect()
+            rows = await pool.fetch(
+                "SELECT topic_id FROM user_topic_preferences WHERE user_id = $1 ORDER BY topic_id",
+                user_id
+            )
+            return [row['topic_id'] for row in rows]
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при получении тем пользователя: {e}")
+            return None
+
+    async def set_topic_preferences(self, user_id: int, topic_ids) -> bool:
+        """Заменяет выбранные пользователем темы (id, которых нет в справочнике, пропускаются)"""
+        topic_ids = sorted(set(topic_ids))
+        try:
+            pool = await self.connect()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(
+                        "DELETE FROM user_topic_preferences WHERE user_id = $1 AND topic_id <> ALL($2::int[])",
+                        user_id, topic_ids
+                    )
+                    await conn.execute(
+                        """
+                        INSERT INTO user_topic_preferences (user_id, topic_id)
+                        SELECT $1, id FROM topics WHERE id = ANY($2::int[])
+                        ON CONFLICT (user_id, topic_id) DO NOTHING
+                        """,
+                        user_id, topic_ids
+                    )
+            return True
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при сохранении тем пользователя: {e}")
+            return False
+
+    async def get_user_stats(self, user_id: int, today) -> Optional[Dict]:
+        """
+        Возвращает статистику пользователя из агрегатов (миграция 011): всего выучено, серии
+        дней, открыто ответов и выучено за день today и {topic_id: выучено} по темам.
+        None при ошибке.
+        """
+        try:
+            pool = await self.connect()
+            row = await pool.fetchrow(USER_STATS_QUERY, user_id, today)
+            stats = dict(row)
+            stats['topics'] = {topic_id: learned for topic_id, learned in stats['topics']}
+            return stats
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при получении статистики пользователя: {e}")
+            return None
+
+    async def get_learned_questions_count(self, user_id: int) -> int:
+        """Возвращает количество вопросов, отмеченных пользователем как выученные"""
+        try:
+            pool = await self.connect()
+            return await pool.fetchval(LEARNED_COUNT_QUERY, user_id)
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при получении количества выученных вопросов: {e}")
+            return 0
+
+    async def get_question_by_id(self, question_id: int) -> Optional[Dict]:
+        """Возвращает вопрос по id"""
+        try:
+            pool = await self.connect()
+            result = await pool.fetchrow(QUESTION_BY_ID_QUERY, question_id)
+            return dict(result) if result else None
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при получении вопроса по id: {e}")
+            return None
+
+    async def get_questions(self, limit: int) -> list:
+        """Возвращает до limit вопросов каталога (для прогрева кэша)"""
+        try:
+            pool = await self.connect()
+            rows = await pool.fetch(
+                "SELECT id, question, topic, answer FROM questions ORDER BY id LIMIT $1",
+                limit
+            )
+            return [dict(row) for row in rows]
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при загрузке вопросов каталога: {e}")
+            return []
+
+    async def search_question_ids(self, text: str, max_candidates: int = SEARCH_MAX_CANDIDATES,
+                                  max_ranked: int = SEARCH_MAX_RANKED,
+                                  statement_timeout: int = SEARCH_STATEMENT_TIMEOUT) -> Optional[list]:
+        """Полнотекстовый поиск id вопросов, как Database.search_question_ids"""
+        try:
+            pool = await self.connect()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    await conn.execute(SEARCH_TIMEOUT_QUERY, f"{statement_timeout}ms")
+                    rows = await conn.fetch(SEARCH_QUERY, text, max_ranked, text, max_candidates)
+            logger.debug(f"Поиск {text!r}: найдено {len(rows)}")
+            return [row['id'] for row in rows]
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при поиске вопросов: {e}")
+            return None
+
+    async def get_catalog_version(self) -> Optional[int]:
+        """Возвращает текущую версию каталога вопросов (None, если получить не удалось)"""
+        try:
+            pool = await self.connect()
+            return await pool.fetchval("SELECT version FROM catalog_version")
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при получении версии каталога: {e}")
+            return None
+
+    async def create_listener(self, channel: str, callback) -> asyncpg.Connection:
+        """
+        Открывает отдельное соединение (вне пула) и подписывает callback на LISTEN channel.
+        Соединение закрывает вызывающий код.
+        """
+        conn = await asyncpg.connect(
+            host=self.config.get('host'),
+            port=self.config.get('port'),
+            database=self.config.get('database'),
+            user=self.config.get('user'),
+            password=self.config.get('password'),
+            ssl=False,
+            timeout=self.pool_config['timeout'],
+        )
+        await conn.add_listener(channel, callback)
+        logger.info(f"Подписка на уведомления БД: channel={channel}")
+        return conn
+
+    async def mark_question_learned(self, user_id: int, username: Optional[str], question_id: int) -> Optional[bool]:
+        """Отмечает вопрос как выученный для пользователя. Возвращает True, если добавили новую запись (None при ошибке)."""
+        try:
+            pool = await self.connect()
+            status = await pool.execute(MARK_LEARNED_QUERY, user_id, username, question_id)
+            # Статус команды имеет вид "INSERT 0 <rows>"
+            inserted = status.split()[-1] != '0'
+            logger.debug(f"Отмечен выученный вопрос: user_id={user_id}, question_id={question_id}, inserted={inserted}")
+            return inserted
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при отметке вопроса как выученного: {e}")
+            return None
+
+    async def is_question_learned(self, user_id: int, question_id: int) -> Optional[bool]:
+        """Проверяет, отмечен ли вопрос выученным (None при ошибке)"""
+        try:
+            pool = await self.connect()
+            return await pool.fetchval(
+                "SELECT EXISTS (SELECT 1 FROM learned_questions WHERE user_id = $1 AND question_id = $2)",
+                user_id, question_id
+            )
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при проверке выученного вопроса: {e}")
+            return None
+
+    async def get_due_question_id(self, user_id: int, exclude_question_id: int = None) -> Optional[int]:
+        """
+        Возвращает id вопроса, срок повторения которого наступил раньше всех (None, если таких нет),
+        кроме exclude_question_id
+        """
+        try:
+            pool = await self.connect()
+            return await pool.fetchval(
+                """
+                SELECT question_id FROM review_schedule
+                WHERE user_id = $1 AND due_at <= now()
+                  AND question_id IS DISTINCT FROM $2
+                ORDER BY due_at
+                LIMIT 1
+                """,
+                user_id, exclude_question_id
+            )
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при выборе вопроса к повторению: {e}")
+            return None
+
+    async def update_review_state(self, user_id: int, question_id: int, update) -> Optional[Dict]:
+        """
+        Пересчитывает состояние карточки в расписании повторений.
+        update(state) получает текущее состояние (dict или None) и возвращает новое;
+        чтение и запись выполняются в одной транзакции под блокировкой строки.
+        """
+        try:
+            pool = await self.connect()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    row = await conn.fetchrow(
+                        """
+                        SELECT ease, interval_days, repetitions, lapses
+                        FROM review_schedule
+                        WHERE user_id = $1 AND question_id = $2
+                        FOR UPDATE
+                        """,
+                        user_id, question_id
+                    )
+                    state = update(dict(row) if row else None)
+                    await conn.execute(
+                        """
+                        INSERT INTO review_schedule
+                            (user_id, question_id, ease, interval_days, repetitions, lapses, due_at, last_reviewed_at)
+                        VALUES ($1, $2, $3, $4, $5, $6, $7, $8)
+                        ON CONFLICT (user_id, question_id) DO UPDATE SET
+                            ease = EXCLUDED.ease,
+                            interval_days = EXCLUDED.interval_days,
+                            repetitions = EXCLUDED.repetitions,
+                            lapses = EXCLUDED.lapses,
+                            due_at = EXCLUDED.due_at,
+                            last_reviewed_at = EXCLUDED.last_reviewed_at
+                        """,
+                        user_id, question_id, state['ease'], state['interval_days'],
+                        state['repetitions'], state['lapses'], state['due_at'], state['last_reviewed_at']
+                    )
+            logger.debug(f"Обновлено расписание повторений: user_id={user_id}, question_id={question_id}, "
+                         f"due_at={state['due_at']}")
+            return state
+        except asyncpg.ForeignKeyViolationError:
+            # Вопрос удалили из каталога между показом и ответом
+            logger.warning(f"Вопрос {question_id} не найден, расписание повторений не обновлено")
+            return None
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при обновлении расписания повторений: {e}")
+            return None
+
+    async def log_user_action(self, username: str, question_id: int, user_id: int = None, action: str = None):
+        """Логирует действие пользователя с вопросом в таблицу user_logs (имя — в справочник users)"""
+        try:
+            pool = await self.connect()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    if user_id is not None:
+                        await self._upsert_users(conn, {user_id: username})
+                    await conn.execute(
+                        INSERT_USER_LOG_QUERY, user_id, action, username if user_id is None else None, question_id
+                    )
+            logger.debug(f"Записан лог: user_id={user_id}, username={username}, question_id={question_id}")
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при записи лога: {e}")
+
+    async def insert_user_logs(self, events: list) -> bool:
+        """
+        Записывает пачку событий UserLogEvent в user_logs через COPY и в той же транзакции
+        обновляет имена в справочнике users, добавляет открытые ответы пачки в дневную
+        статистику пользователей и ставит их вопросы в расписание повторений
+        """
+        # Имя пишется в строку лога, только если пользователь неизвестен
+        records = [
+            (event.timestamp, event.user_id, event.action,
+             event.username if event.user_id is None else None, event.question_id)
+            for event in events
+        ]
+        try:
+            pool = await self.connect()
+            async with pool.acquire() as conn:
+                async with conn.transaction():
+                    try:
+                        async with conn.transaction():
+                            await conn.copy_records_to_table(
+                                'user_logs',
+                                records=records,
+                                columns=['timestamp', 'user_id', 'action', 'username', 'question_id'],
+                            )
+                    except asyncpg.ForeignKeyViolationError:
+                        # Вопрос удалили, пока событие ждало записи: пишем пачку без таких событий
+                        timestamps, user_ids, actions, usernames, question_ids = zip(*records)
+                        await conn.execute(
+                            """
+                            INSERT INTO user_logs (timestamp, user_id, action, username, question_id)
+                            SELECT e.timestamp, e.user_id, e.action, e.username, e.question_id
+                            FROM unnest($1::timestamp[], $2::bigint[], $3::user_action[], $4::text[], $5::int[])
+                                AS e(timestamp, user_id, action, username, question_id)
+                            WHERE EXISTS (SELECT 1 FROM questions q WHERE q.id = e.question_id)
+                            """,
+                            list(timestamps), list(user_ids), list(actions), list(usernames), list(question_ids)
+                        )
+                    await self._upsert_users(
+                        conn, {event.user_id: event.username for event in events if event.user_id is not None}
+                    )
+                    await self._record_reveals(conn, events)
+                    await self._schedule_reveals(conn, events)
+            logger.debug(f"Записано логов: {len(events)}")
+            return True
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при записи пачки логов ({len(events)} событий): {e}")
+            return False
+
+    async def ensure_user_logs_partitions(self, months_ahead: int) -> Optional[list]:
+        """
+        Создает недостающие месячные секции user_logs с текущего месяца (UTC) на months_ahead
+        месяцев вперед. Возвращает имена секций этих месяцев (None при ошибке)
+        """
+        try:
+            pool = await self.connect()
+            rows = await pool.fetch(
+                """
+                SELECT create_user_logs_partition(
+                    (date_trunc('month', now() AT TIME ZONE 'UTC') + make_interval(months => m))::date
+                ) AS name
+                FROM generate_series(0, $1::int) AS m
+                """,
+                months_ahead
+            )
+            return [row['name'] for row in rows]
+        except asyncpg.UndefinedFunctionError:
+            logger.warning("Функция create_user_logs_partition не найдена: примените миграцию 012")
+            return None
+        except DB_ERRORS as e:
+            logger.exception(f"Ошибка при создании секций user_logs: {e}")
+            return None
+
+    @staticmethod
+    async def _upsert_users(conn, usernames: dict):
+        """Добавляет пользователей {user_id: имя} в users; строка обновляется, только если имя изменилось"""
+        if not usernames:
+            return
+        # Одинаковый порядок блокировок строк у параллельных писателей
+        user_ids = sorted(usernames)
+        await conn.execute(
+            """
+            INSERT INTO users AS u (user_id, username)
+            SELECT e.user_id, e.username
+            FROM unnest($1::bigint[], $2::text[]) WITH ORDINALITY AS e(user_id, username, ord)
+            ORDER BY e.ord
+            ON CONFLICT (user_id) DO UPDATE SET username = EXCLUDED.username, updated_at = NOW()
+            WHERE u.username IS DISTINCT FROM EXCLUDED.username
+            """,
+            user_ids, [usernames[user_id] for user_id in user_ids]
+        )
+
+    @staticmethod
+    async def _schedule_reveals(conn, events: list):
+        """
+        Ставит вопросы открытых ответов в расписание повторений, если их там еще нет.
+        Вопросы, удаленные до записи пачки, пропускаются
+        """
+        reviews = {
+            (event.user_id, event.question_id): event.review_due_at
+            for event in events
+            if event.review_due_at is not None and event.user_id is not None
+        }
+        if not reviews:
+            return
+        keys = sorted(reviews)
+        await conn.execute(
+            """
+            INSERT INTO review_schedule (user_id, question_id, due_at)
+            SELECT r.user_id, r.question_id, r.due_at
+            FROM unnest($1::bigint[], $2::int[], $3::timestamptz[]) AS r(user_id, question_id, due_at)
+            WHERE EXISTS (SELECT 1 FROM questions q WHERE q.id = r.question_id)
+            ON CONFLICT (user_id, question_id) DO NOTHING
+            """,
+            [user_id for user_id, _ in keys], [question_id for _, question_id in keys], [reviews[key] for key in keys]
+        )
+
+    @staticmethod
+    async def _record_reveals(conn, events: list):
+        """Добавляет открытые ответы в user_daily_activity и серии user_stats (по строке на пользователя и день)"""
+        reveals = Counter(
+            (event.user_id, event.timestamp.date())
+            for event in events
+            if event.action == ACTION_REVEAL and event.user_id is not None
+        )
+        if not reveals:
+            return
+        # Одинаковый порядок блокировок строк у параллельных писателей
+        keys = sorted(reveals)
+        await conn.execute(
+            """
+            SELECT record_user_activity(a.user_id, a.day, a.revealed, 0)
+            FROM unnest($1::bigint[], $2::date[], $3::int[]) WITH ORDINALITY AS a(user_id, day, revealed, ord)
+            ORDER BY a.ord
+            """,
+            [user_id for user_id, _ in keys], [day for _, day in keys], [reveals[key] for key in keys]
+        )
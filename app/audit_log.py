@@ -0,0 +1,162 @@
+"""
+Буферизованная запись действий пользователей в user_logs (write-behind)
+"""
+import asyncio
+import logging
+import time
+from collections import deque, namedtuple
+from datetime import datetime, timezone
+
+from app.config import AUDIT_LOG_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Действия пользователя с вопросом — значения перечисления user_action в БД (миграция 013)
+ACTION_REVEAL = 'reveal'
+ACTION_LEARNED = 'learned'
+ACTION_REPEAT = 'repeat'
+
+# user_id и action пишутся в user_logs, username — в справочник users (миграция 013), а у событий
+# без user_id — в саму строку лога. Открытые ответы (ACTION_REVEAL) попадают и в статистику за день.
+# review_due_at — срок повтора, с которым вопрос ставится в расписание, если его там еще нет
+UserLogEvent = namedtuple(
+    'UserLogEvent', ['timestamp', 'username', 'question_id', 'user_id', 'action', 'review_due_at'],
+    defaults=(None, None, None)
+)
+
+
+class UserLogWriter:
+    """
+    Копит события в памяти и пишет их в user_logs пачками.
+
+    Пачка сбрасывается, когда в буфере набралось batch_size событий или прошло flush_interval
+    секунд. Если буфер заполнен (max_queue), новые события отбрасываются и учитываются в dropped.
+    Неудачно записанная пачка возвращается в начало буфера и пишется повторно; после max_retries
+    неудачных попыток подряд она отбрасывается (учитывается в dropped), чтобы не держать очередь.
+    Остановка дожидается текущей записи и сбрасывает остаток буфера.
+    Раз в partition_check_interval секунд фоновая задача создает месячные секции user_logs
+    на partitions_ahead месяцев вперед, чтобы логи не попадали в секцию по умолчанию.
+    """
+
+    def __init__(self, db, batch_size: int = None, flush_interval: float = None, max_queue: int = None,
+                 partitions_ahead: int = None, partition_check_interval: float = None, max_retries: int = None):
+        self._db = db
+        self.batch_size = batch_size if batch_size is not None else AUDIT_LOG_CONFIG['batch_size']
+        self.flush_interval = flush_interval if flush_interval is not None else AUDIT_LOG_CONFIG['flush_interval']
+        self.max_queue = max_queue if max_queue is not None else AUDIT_LOG_CONFIG['max_queue']
+        self.max_retries = max_retries if max_retries is not None else AUDIT_LOG_CONFIG['max_retries']
+        self.partitions_ahead = (partitions_ahead if partitions_ahead is not None
+                                 else AUDIT_LOG_CONFIG['partitions_ahead'])
+        self.partition_check_interval = (partition_check_interval if partition_check_interval is not None
+                                         else AUDIT_LOG_CONFIG['partition_check_interval'])
+
+        self._buffer = deque()
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+        self._stopping = False
+        self._retries = 0  # Неудачных попыток подряд записать пачку из начала буфера
+        self._partitions_checked_at = None
+
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    @property
+    def queue_depth(self) -> int:
+        """Количество событий, ожидающих записи"""
+        return len(self._buffer)
+
+    def stats(self) -> dict:
+        """Метрики писателя"""
+        return {
+            'queue_depth': self.queue_depth,
+            'written': self.written,
+            'dropped': self.dropped,
+            'failed_flushes': self.failed_flushes,
+        }
+
+    def log(self, username: str, question_id: int, user_id: int = None, action: str = None,
+            review_due_at: datetime = None) -> bool:
+        """Ставит событие в очередь без ожидания БД. Возвращает False, если событие отброшено"""
+        if len(self._buffer) >= self.max_queue:
+            self.dropped += 1
+            if self.dropped % 1000 == 1:
+                logger.warning(f"Буфер логов переполнен, событие отброшено (всего отброшено {self.dropped})")
+            return False
+
+        timestamp = datetime.now(timezone.utc).replace(tzinfo=None)
+        self._buffer.append(UserLogEvent(timestamp, username, question_id, user_id, action, review_due_at))
+        if len(self._buffer) >= self.batch_size:
+            self._wakeup.set()
+        return True
+
+    async def start(self):
+        """Запускает фоновую запись"""
+        if self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+            logger.info(
+                f"Запись логов пачками запущена: batch_size={self.batch_size}, "
+                f"flush_interval={self.flush_interval}s, max_queue={self.max_queue}"
+            )
+
+    async def stop(self):
+        """Останавливает фоновую запись и сбрасывает в БД все накопленные события"""
+        if self._task is not None:
+            # Задачу не отменяем: отмена посреди flush потеряла бы пачку, уже взятую из буфера
+            self._stopping = True
+            self._wakeup.set()
+            await self._task
+            self._task = None
+        await self.flush()
+        if self._buffer:
+            logger.error(f"При остановке не удалось записать {len(self._buffer)} событий в user_logs")
+        logger.info(f"Запись логов остановлена: {self.stats()}")
+
+    async def ensure_partitions(self):
+        """Создает недостающие секции user_logs на partitions_ahead месяцев вперед"""
+        self._partitions_checked_at = time.monotonic()
+        await self._db.ensure_user_logs_partitions(self.partitions_ahead)
+
+    def _partitions_check_due(self) -> bool:
+        if not self.partition_check_interval:
+            return False
+        return (self._partitions_checked_at is None
+                or time.monotonic() - self._partitions_checked_at >= self.partition_check_interval)
+
+    async def _run(self):
+        while not self._stopping:
+            if self._partitions_check_due():
+                await self.ensure_partitions()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            if not self._stopping:
+                await self.flush()
+
+    async def flush(self):
+        """Записывает накопленные события пачками по batch_size"""
+        async with self._flush_lock:
+            while self._buffer:
+                batch = [self._buffer.popleft() for _ in range(min(self.batch_size, len(self._buffer)))]
+                try:
+                    written = await self._db.insert_user_logs(batch)
+                except asyncio.CancelledError:
+                    self._buffer.extendleft(reversed(batch))
+                    raise
+                if not written:
+                    self.failed_flushes += 1
+                    self._retries += 1
+                    if self._retries >= self.max_retries:
+                        self._retries = 0
+                        self.dropped += len(batch)
+                        logger.error(f"Пачка из {len(batch)} событий не записана за {self.max_retries} попыток "
+                                     f"и отброшена (всего отброшено {self.dropped})")
+                    else:
+                        self._buffer.extendleft(reversed(batch))
+                    return
+                self._retries = 0
+                self.written += len(batch)
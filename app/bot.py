@@ -3,6 +3,8 @@
 Основной файл телеграм бота для работы с вопросами и ответами
 """
 import logging
+import time
+
 from telegram import Update
 from telegram.ext import (
     Application,
@@ -12,14 +14,37 @@ from telegram.ext import (
     filters,
     ContextTypes
 )
-from app.config import BOT_TOKEN
+from telegram.request import HTTPXRequest
+from app.config import BOT_TOKEN, BOT_MODE, BOT_API_BASE_URL, WEBHOOK_CONFIG, UPDATE_PROCESSOR_CONFIG
+from app.update_processor import PerUserUpdateProcessor
+from app.metrics import (
+    registry as metrics_registry,
+    instrument_handler,
+    ErrorLogCounter,
+    MetricsServer,
+    TELEGRAM_SECONDS,
+    TELEGRAM_REQUESTS,
+)
 from app.handlers import (
     start,
     show_answer_callback,
     mark_learned_callback,
     repeat_callback,
+    search_command,
+    search_page_callback,
+    search_open_callback,
+    topics_command,
+    topic_toggle_callback,
     handle_text_message,
-    error_handler
+    error_handler,
+    db,
+    question_cache,
+    catalog_stats,
+    catalog_watcher,
+    unlearned_cache,
+    log_writer,
+    topic_preferences,
+    prefetcher
 )
 
 # Настройка логирования
@@ -42,54 +67,206 @@ for logger_name in ['app', 'app.bot', 'app.handlers', 'app.database']:
     handler.setFormatter(logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s'))
     log.addHandler(handler)
 
+metrics_server = MetricsServer()
+error_log_counter = ErrorLogCounter()
 
-def main():
-    """Запуск бота"""
-    if not BOT_TOKEN:
-        logger.error("BOT_TOKEN не установлен! Создайте файл .env и добавьте BOT_TOKEN")
-        return
-    
-    # Проверяем конфигурацию БД перед запуском
-    from app.config import DB_CONFIG
-    logger.info(f"Конфигурация БД: host={DB_CONFIG.get('host')}, database={DB_CONFIG.get('database')}, user={DB_CONFIG.get('user')}")
-    
-    if not DB_CONFIG.get('database'):
-        logger.error("POSTGRES_DB не установлен! Проверьте файл .env")
-        return
-    
-    if DB_CONFIG.get('database') == DB_CONFIG.get('user'):
-        logger.error(f"ОШИБКА: database совпадает с user! database={DB_CONFIG.get('database')}, user={DB_CONFIG.get('user')}")
-        return
-    
+
+class InstrumentedHTTPXRequest(HTTPXRequest):
+    """HTTPXRequest, который замеряет запросы к Bot API и считает запросы в полете"""
+
+    def __init__(self, connection_pool_size: int = 1, **kwargs):
+        super().__init__(connection_pool_size=connection_pool_size, **kwargs)
+        self.connection_pool_size = connection_pool_size
+        self.in_flight = 0
+
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        # url вида .../bot<токен>/sendMessage: в метку попадает только метод API
+        api_method = url.rsplit('/', 1)[-1]
+        started = time.perf_counter()
+        status = 'error'
+        self.in_flight += 1
+        try:
+            code, payload = await super().do_request(url, method, *args, **kwargs)
+            status = str(code)
+            return code, payload
+        finally:
+            self.in_flight -= 1
+            TELEGRAM_SECONDS.observe(time.perf_counter() - started, api_method)
+            TELEGRAM_REQUESTS.inc(api_method, status)
+
+
+def register_gauges(application: Application):
+    """Показатели заполненности пулов и очередей, которые снимаются при запросе /metrics"""
+    def db_pool():
+        stats = db.pool_stats()
+        if stats is None:
+            return None
+        return {('busy',): stats['size'] - stats['idle'], ('idle',): stats['idle'], ('max',): stats['max_size']}
+
+    metrics_registry.gauge(
+        'bot_db_pool_connections', 'Соединения пула asyncpg: занятые, свободные и максимум', ('state',), db_pool
+    )
+
+    processor = application.update_processor
+    if isinstance(processor, PerUserUpdateProcessor):
+        metrics_registry.gauge(
+            'bot_updates', 'Обновления в обработке (active) и в ожидании слота (queued)', ('state',),
+            lambda: {('active',): processor.active, ('queued',): processor.pending - processor.active}
+        )
+        metrics_registry.gauge(
+            'bot_updates_concurrency_limit', 'Максимум обновлений, обрабатываемых одновременно',
+            callback=lambda: processor.concurrent_updates
+        )
+
+    request = application.bot.request
+    if isinstance(request, InstrumentedHTTPXRequest):
+        metrics_registry.gauge(
+            'bot_telegram_requests_in_flight', 'Запросы к Bot API, ожидающие ответа',
+            callback=lambda: request.in_flight
+        )
+        metrics_registry.gauge(
+            'bot_telegram_connection_pool_size', 'Размер пула HTTP-соединений с Bot API',
+            callback=lambda: request.connection_pool_size
+        )
+
+    metrics_registry.gauge(
+        'bot_audit_log_queue_depth', 'События user_logs, ожидающие записи', callback=lambda: log_writer.queue_depth
+    )
+
+
+async def post_init(application: Application):
+    """Открывает пул соединений с БД и загружает каталог в память до начала обработки обновлений"""
+    await db.connect()
+    await question_cache.warm_up()
+    await catalog_stats.refresh()
+    await topic_preferences.refresh()
+    await catalog_watcher.start()
+    await unlearned_cache.start()
+    await log_writer.start()
+    if metrics_registry.enabled:
+        register_gauges(application)
+        logging.getLogger().addHandler(error_log_counter)
+        await metrics_server.start()
+
+
+async def post_shutdown(application: Application):
+    """Освобождает ресурсы после остановки бота"""
+    await metrics_server.stop()
+    await prefetcher.stop()
+    await log_writer.stop()
+    await unlearned_cache.stop()
+    await catalog_watcher.stop()
+    await db.close()
+
+
+def build_application(base_url: str = None, concurrent_updates: int = None) -> Application:
+    """Создает приложение бота и регистрирует обработчики"""
     # Создаем приложение с увеличенным таймаутом для Telegram API
     # Увеличиваем таймаут, так как при использовании прокси запросы могут занимать больше времени
-    from telegram.request import HTTPXRequest
+    if concurrent_updates is None:
+        concurrent_updates = UPDATE_PROCESSOR_CONFIG['concurrent_updates']
     
-    request = HTTPXRequest(
-        connection_pool_size=8,
+    request_class = InstrumentedHTTPXRequest if metrics_registry.enabled else HTTPXRequest
+    request = request_class(
+        connection_pool_size=max(8, concurrent_updates),  # Каждому параллельному обработчику — соединение
         read_timeout=60.0,  # Таймаут чтения ответа (увеличен для прокси)
         write_timeout=60.0,  # Таймаут записи запроса (увеличен для прокси)
         connect_timeout=30.0,  # Таймаут подключения (увеличен для прокси)
         pool_timeout=30.0  # Таймаут получения соединения из пула
     )
     
-    application = Application.builder().token(BOT_TOKEN).request(request).build()
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .request(request)
+        .post_init(post_init)
+        .post_shutdown(post_shutdown)
+    )
+    if concurrent_updates > 1:
+        builder = builder.concurrent_updates(PerUserUpdateProcessor(concurrent_updates=concurrent_updates))
+    base_url = base_url or BOT_API_BASE_URL
+    if base_url:
+        builder = builder.base_url(f"{base_url.rstrip('/')}/bot")
+        logger.info(f"Используется Bot API: {base_url}")
+    application = builder.build()
     logger.info("Telegram бот настроен с увеличенными таймаутами: read=60s, write=60s, connect=30s, pool=30s")
     
     # Регистрируем обработчики команд
-    application.add_handler(CommandHandler("start", start))
+    application.add_handler(CommandHandler("start", instrument_handler(start)))
+    application.add_handler(CommandHandler("search", instrument_handler(search_command)))
+    application.add_handler(CommandHandler("topics", instrument_handler(topics_command)))
     
     # Регистрируем обработчик текстовых сообщений (для Reply Keyboard)
-    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text_message))
+    application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, instrument_handler(handle_text_message)))
     
     # Callback кнопки
-    application.add_handler(CallbackQueryHandler(show_answer_callback, pattern="^show_answer:\\d+$"))
-    application.add_handler(CallbackQueryHandler(mark_learned_callback, pattern="^learned:\\d+$"))
-    application.add_handler(CallbackQueryHandler(repeat_callback, pattern="^repeat:\\d+$"))
+    application.add_handler(CallbackQueryHandler(instrument_handler(show_answer_callback), pattern="^show_answer:\\d+$"))
+    application.add_handler(CallbackQueryHandler(instrument_handler(mark_learned_callback), pattern="^learned:\\d+$"))
+    application.add_handler(CallbackQueryHandler(instrument_handler(repeat_callback), pattern="^repeat:\\d+$"))
+    application.add_handler(CallbackQueryHandler(instrument_handler(search_page_callback), pattern="^search_page:\\d+$"))
+    application.add_handler(CallbackQueryHandler(instrument_handler(search_open_callback), pattern="^search_open:\\d+$"))
+    application.add_handler(CallbackQueryHandler(instrument_handler(topic_toggle_callback), pattern="^topic:\\d+$"))
     
     # Регистрируем обработчик ошибок
     application.add_error_handler(error_handler)
+    return application
+
+
+def run_webhook(application: Application):
+    """Запускает встроенный HTTP-сервер и регистрирует webhook в Telegram"""
+    url_path = WEBHOOK_CONFIG['url_path'].strip('/')
+    webhook_url = f"{WEBHOOK_CONFIG['url'].rstrip('/')}/{url_path}"
+    logger.info(
+        f"Бот запущен в режиме webhook: {WEBHOOK_CONFIG['listen']}:{WEBHOOK_CONFIG['port']}/{url_path}, "
+        f"url={webhook_url}"
+    )
+    application.run_webhook(
+        listen=WEBHOOK_CONFIG['listen'],
+        port=WEBHOOK_CONFIG['port'],
+        url_path=url_path,
+        webhook_url=webhook_url,
+        secret_token=WEBHOOK_CONFIG['secret_token'],
+        max_connections=WEBHOOK_CONFIG['max_connections'],
+        allowed_updates=Update.ALL_TYPES,
+    )
+
+
+def main():
+    """Запуск бота"""
+    if not BOT_TOKEN:
+        logger.error("BOT_TOKEN не установлен! Создайте файл .env и добавьте BOT_TOKEN")
+        return
+    
+    # Проверяем конфигурацию БД перед запуском
+    from app.config import DB_CONFIG
+    logger.info(f"Конфигурация БД: host={DB_CONFIG.get('host')}, database={DB_CONFIG.get('database')}, user={DB_CONFIG.get('user')}")
     
+    if not DB_CONFIG.get('database'):
+        logger.error("POSTGRES_DB не установлен! Проверьте файл .env")
+        return
+    
+    if DB_CONFIG.get('database') == DB_CONFIG.get('user'):
+        logger.error(f"ОШИБКА: database совпадает с user! database={DB_CONFIG.get('database')}, user={DB_CONFIG.get('user')}")
+        return
+
+    if BOT_MODE not in ('polling', 'webhook'):
+        logger.error(f"Неизвестный BOT_MODE={BOT_MODE}! Допустимые значения: polling, webhook")
+        return
+
+    if BOT_MODE == 'webhook':
+        if not WEBHOOK_CONFIG['url']:
+            logger.error("WEBHOOK_URL не установлен! Укажите публичный адрес бота для режима webhook")
+            return
+        if not WEBHOOK_CONFIG['secret_token']:
+            logger.error("WEBHOOK_SECRET_TOKEN не установлен! Без него webhook примет обновления от кого угодно")
+            return
+
+    application = build_application()
+
+    if BOT_MODE == 'webhook':
+        run_webhook(application)
+        return
+
     # Запускаем бота
     logger.info("Бот запущен...")
     application.run_polling(allowed_updates=Update.ALL_TYPES)
@@ -97,4 +274,3 @@ def main():
 
 if __name__ == '__main__':
     main()
-
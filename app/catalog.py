@@ -0,0 +1,206 @@
+"""
+Кэш каталога вопросов в памяти процесса бота и отслеживание изменений каталога в БД
+"""
+import asyncio
+import logging
+import sys
+from collections import OrderedDict
+from typing import Optional, Dict
+
+from app.config import CATALOG_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANNEL = 'catalog_changed'
+
+
+def _entry_size(question: Dict) -> int:
+    """Приблизительный объем памяти, занимаемый вопросом в кэше"""
+    return sys.getsizeof(question) + sum(sys.getsizeof(value) for value in question.values())
+
+
+class QuestionCache:
+    """
+    Read-through LRU-кэш вопросов по id.
+
+    Ограничен количеством записей и приблизительным объемом памяти; при превышении
+    вытесняются давно не использованные вопросы. Сбрасывается при изменении каталога.
+    """
+
+    def __init__(self, db, max_entries: int = None, max_bytes: int = None):
+        self._db = db
+        self.max_entries = max_entries if max_entries is not None else CATALOG_CACHE_CONFIG['max_entries']
+        self.max_bytes = max_bytes if max_bytes is not None else CATALOG_CACHE_CONFIG['max_bytes']
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def size_bytes(self) -> int:
+        """Приблизительный объем кэша в байтах"""
+        return self._bytes
+
+    def _put(self, question: Dict):
+        question_id = question['id']
+        if question_id in self._entries:
+            self._bytes -= _entry_size(self._entries.pop(question_id))
+
+        size = _entry_size(question)
+        if size > self.max_bytes:
+            return
+        self._entries[question_id] = question
+        self._bytes += size
+
+        while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self._bytes -= _entry_size(evicted)
+
+    async def get(self, question_id: int) -> Optional[Dict]:
+        """Возвращает вопрос из кэша, при промахе загружает его из БД"""
+        question = self._entries.get(question_id)
+        if question is not None:
+            self._entries.move_to_end(question_id)
+            self.hits += 1
+            return question
+
+        self.misses += 1
+        generation = self._generation
+        question = await self._db.get_question_by_id(question_id)
+        # Не кладем в кэш ответ, полученный до сброса кэша
+        if question is not None and generation == self._generation:
+            self._put(question)
+        return question
+
+    async def warm_up(self):
+        """Заполняет кэш вопросами каталога (не больше max_entries)"""
+        generation = self._generation
+        questions = await self._db.get_questions(self.max_entries)
+        if generation != self._generation:
+            return
+        for question in questions:
+            self._put(question)
+        logger.info(f"Кэш вопросов прогрет: {len(self._entries)} вопросов, ~{self._bytes // 1024} КБ")
+
+    def invalidate(self):
+        """Полностью очищает кэш"""
+        self._entries.clear()
+        self._bytes = 0
+        self._generation += 1
+
+    async def on_catalog_changed(self, version: int):
+        """Подписчик CatalogWatcher: сбрасывает устаревшие вопросы и прогревает кэш заново"""
+        logger.info(f"Каталог вопросов изменился (версия {version}), сбрасываем кэш вопросов")
+        self.invalidate()
+        await self.warm_up()
+
+
+class CatalogStats:
+    """
+    Статистика каталога в памяти: общее количество вопросов и количество по темам.
+    Загружается при старте и обновляется при изменении каталога, поэтому горячий путь
+    не делает COUNT(*) по таблице questions.
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self.total = None
+        self.by_topic = {}
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.total is not None
+
+    async def refresh(self):
+        """Перечитывает количество вопросов по темам из БД"""
+        topic_counts = await self._db.get_topic_counts()
+        if topic_counts is None:
+            return
+        self.by_topic = topic_counts
+        self.total = sum(topic_counts.values())
+        logger.info(f"Статистика каталога обновлена: {self.total} вопросов, {len(topic_counts)} тем")
+
+    async def on_catalog_changed(self, version: int):
+        """Подписчик CatalogWatcher"""
+        await self.refresh()
+
+
+class CatalogWatcher:
+    """
+    Следит за версией каталога вопросов (таблица catalog_version).
+
+    Получает NOTIFY catalog_changed через отдельное соединение и дополнительно
+    периодически сверяет версию, чтобы не пропустить изменения при обрыве соединения.
+    При изменении версии вызывает подписчиков.
+    """
+
+    def __init__(self, db, poll_interval: float = None):
+        self._db = db
+        self.poll_interval = poll_interval if poll_interval is not None else CATALOG_CACHE_CONFIG['poll_interval']
+        self.version = None
+        self._subscribers = []
+        self._listener = None
+        self._poll_task = None
+        self._pending = set()
+        self._check_lock = asyncio.Lock()
+
+    def subscribe(self, callback):
+        """Добавляет async-функцию callback(version), вызываемую при изменении каталога"""
+        self._subscribers.append(callback)
+
+    async def start(self):
+        """Запоминает текущую версию каталога, подписывается на уведомления и запускает опрос"""
+        self.version = await self._db.get_catalog_version()
+        await self._ensure_listener()
+        self._poll_task = asyncio.create_task(self._poll_loop())
+        logger.info(f"Отслеживание каталога запущено, версия {self.version}")
+
+    async def stop(self):
+        """Останавливает опрос и закрывает соединение для уведомлений"""
+        if self._poll_task is not None:
+            self._poll_task.cancel()
+            try:
+                await self._poll_task
+            except asyncio.CancelledError:
+                pass
+            self._poll_task = None
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+
+    async def _ensure_listener(self):
+        if self._listener is not None and not self._listener.is_closed():
+            return
+        try:
+            self._listener = await self._db.create_listener(CATALOG_CHANNEL, self._on_notification)
+        except Exception as e:
+            self._listener = None
+            logger.warning(f"Не удалось подписаться на {CATALOG_CHANNEL}, остается периодическая проверка: {e}")
+
+    def _on_notification(self, connection, pid, channel, payload):
+        task = asyncio.create_task(self.check())
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _poll_loop(self):
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            await self._ensure_listener()
+            await self.check()
+
+    async def check(self):
+        """Сверяет версию каталога и уведомляет подписчиков, если она изменилась"""
+        async with self._check_lock:
+            version = await self._db.get_catalog_version()
+            if version is None or version == self.version:
+                return
+            self.version = version
+            for callback in self._subscribers:
+                try:
+                    await callback(version)
+                except Exception as e:
+                    logger.exception(f"Ошибка при обработке изменения каталога: {e}")
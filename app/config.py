@@ -16,6 +16,12 @@ load_dotenv()
 # Токен бота (получить у @BotFather)
 BOT_TOKEN = os.getenv('BOT_TOKEN')
 
+# Режим получения обновлений: polling (по умолчанию) или webhook
+BOT_MODE = os.getenv('BOT_MODE', 'polling').lower()
+
+# Адрес Bot API (пусто — api.telegram.org); например, локальный Bot API сервер или заглушка в бенчмарках
+BOT_API_BASE_URL = os.getenv('BOT_API_BASE_URL', '')
+
 # Параметры подключения к БД
 # ВАЖНО: Используем POSTGRES_DB для имени базы данных, а не POSTGRES_USER!
 postgres_db = os.getenv('POSTGRES_DB')
@@ -45,6 +51,95 @@ DB_CONFIG = {
     'sslmode': 'disable'  # Отключаем SSL для подключения внутри Docker сети
 }
 
+# Параметры пула соединений с БД (время в секундах)
+DB_POOL_CONFIG = {
+    'min_size': int(os.getenv('DB_POOL_MIN_SIZE', '1')),
+    'max_size': int(os.getenv('DB_POOL_MAX_SIZE', '10')),
+    'timeout': float(os.getenv('DB_POOL_TIMEOUT', '30')),  # Ожидание свободного соединения
+    'max_idle': float(os.getenv('DB_POOL_MAX_IDLE', '300')),  # Закрываем лишние соединения после простоя
+    'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '3600')),  # Периодически пересоздаем соединения
+    'healthcheck_interval': float(os.getenv('DB_POOL_HEALTHCHECK_INTERVAL', '30')),  # SELECT 1 после простоя
+}
+
+# Кэш каталога вопросов в памяти бота
+CATALOG_CACHE_CONFIG = {
+    'max_entries': int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', '10000')),
+    'max_bytes': int(os.getenv('CATALOG_CACHE_MAX_BYTES', str(64 * 1024 * 1024))),
+    'poll_interval': float(os.getenv('CATALOG_POLL_INTERVAL', '60')),  # Сверка версии каталога, секунды
+}
+
+# Кэш невыученных вопросов пользователей
+UNLEARNED_CACHE_CONFIG = {
+    'enabled': os.getenv('UNLEARNED_CACHE_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+    'max_ids': int(os.getenv('UNLEARNED_CACHE_MAX_IDS', '5000000')),  # Суммарно по всем пользователям
+    'ttl': float(os.getenv('UNLEARNED_CACHE_TTL', '600')),  # Секунды
+    'listener_check_interval': float(os.getenv('UNLEARNED_CACHE_LISTENER_CHECK_INTERVAL', '10')),
+}
+
+# Буферизованная запись user_logs
+AUDIT_LOG_CONFIG = {
+    'batch_size': int(os.getenv('AUDIT_LOG_BATCH_SIZE', '500')),
+    'flush_interval': float(os.getenv('AUDIT_LOG_FLUSH_INTERVAL', '1')),  # Секунды
+    'max_queue': int(os.getenv('AUDIT_LOG_MAX_QUEUE', '50000')),
+    'max_retries': int(os.getenv('AUDIT_LOG_MAX_RETRIES', '10')),  # Попыток записи пачки, затем она отбрасывается
+    # Месячные секции user_logs (миграция 012): сколько месяцев вперед держать созданными
+    'partitions_ahead': int(os.getenv('AUDIT_LOG_PARTITIONS_AHEAD', '2')),
+    'partition_check_interval': float(os.getenv('AUDIT_LOG_PARTITION_CHECK_INTERVAL', '3600')),  # Секунды, 0 — не проверять
+}
+
+# Режим webhook: встроенный HTTP-сервер принимает обновления от Telegram
+WEBHOOK_CONFIG = {
+    'listen': os.getenv('WEBHOOK_LISTEN', '0.0.0.0'),
+    'port': int(os.getenv('WEBHOOK_PORT', '8443')),
+    'url_path': os.getenv('WEBHOOK_PATH', 'telegram'),
+    'url': os.getenv('WEBHOOK_URL', ''),  # Публичный адрес, например https://bot.example.com (без пути)
+    'secret_token': os.getenv('WEBHOOK_SECRET_TOKEN', ''),  # Проверяется в заголовке X-Telegram-Bot-Api-Secret-Token
+    'max_connections': int(os.getenv('WEBHOOK_MAX_CONNECTIONS', '40')),  # Одновременных соединений от Telegram
+}
+
+# Параллельная обработка обновлений (обновления одного пользователя обрабатываются по очереди)
+UPDATE_PROCESSOR_CONFIG = {
+    'concurrent_updates': int(os.getenv('CONCURRENT_UPDATES', '32')),  # 1 — последовательная обработка
+    'max_pending': int(os.getenv('CONCURRENT_UPDATES_MAX_PENDING', '1024')),  # Обновлений внутри процессора
+    'stats_interval': float(os.getenv('CONCURRENT_UPDATES_STATS_INTERVAL', '60')),  # Лог метрик, секунды; 0 — выкл
+}
+
+# Интервальные повторения (SM-2)
+SCHEDULER_CONFIG = {
+    'enabled': os.getenv('SPACED_REPETITION_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+    'relearn_interval': float(os.getenv('SPACED_REPETITION_RELEARN_INTERVAL', '600')),  # После "Повторю", секунды
+    'reveal_recheck_interval': float(os.getenv('SPACED_REPETITION_REVEAL_INTERVAL', '3600')),  # Ответ открыт без оценки
+}
+
+# Полнотекстовый поиск /search
+SEARCH_CONFIG = {
+    'page_size': int(os.getenv('SEARCH_PAGE_SIZE', '5')),  # Вопросов на странице результатов
+    'max_candidates': int(os.getenv('SEARCH_MAX_CANDIDATES', '200')),  # Сколько лучших вопросов можно пролистать
+    'max_ranked': int(os.getenv('SEARCH_MAX_RANKED', '1000')),  # Сколько найденных вопросов ранжировать
+    'statement_timeout': int(os.getenv('SEARCH_STATEMENT_TIMEOUT', '1000')),  # Миллисекунды на запрос поиска
+    'max_query_length': int(os.getenv('SEARCH_MAX_QUERY_LENGTH', '200')),  # Символов в запросе
+}
+
+# Выбор тем для случайных вопросов (/topics)
+TOPICS_CONFIG = {
+    'preferences_cache_size': int(os.getenv('TOPIC_PREFERENCES_CACHE_SIZE', '100000')),  # Пользователей в памяти
+    'preferences_ttl': float(os.getenv('TOPIC_PREFERENCES_TTL', '300')),  # Секунды; столько живет выбор с другой реплики
+}
+
+# Предвыборка следующего вопроса пользователя
+PREFETCH_CONFIG = {
+    'enabled': os.getenv('QUESTION_PREFETCH_ENABLED', 'true').lower() in ('1', 'true', 'yes'),
+    'ttl': float(os.getenv('QUESTION_PREFETCH_TTL', '120')),  # Секунды; старше — выбираем заново
+    'max_users': int(os.getenv('QUESTION_PREFETCH_MAX_USERS', '10000')),
+}
+
+# Метрики Prometheus (задержки обработчиков, запросов к БД и Telegram API) и эндпоинт /metrics
+METRICS_CONFIG = {
+    'enabled': os.getenv('METRICS_ENABLED', 'false').lower() in ('1', 'true', 'yes'),
+    'listen': os.getenv('METRICS_LISTEN', '0.0.0.0'),
+    'port': int(os.getenv('METRICS_PORT', '9108')),
+}
+
 # Дополнительная проверка после создания конфига
 print_flush(f"[CONFIG] DB_CONFIG создан: host={DB_CONFIG['host']}, database={DB_CONFIG['database']}, user={DB_CONFIG['user']}")
 
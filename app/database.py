@@ -2,98 +2,301 @@
 Модуль для работы с базой данных
 """
 import sys
+import threading
+from contextlib import contextmanager
 import psycopg2
 from psycopg2.extras import RealDictCursor
 from typing import Optional, Dict
-from app.config import DB_CONFIG
+from app.config import DB_CONFIG, DB_POOL_CONFIG
+from app.db_pool import ConnectionPool
+from app.metrics import instrument_methods
+import itertools
 import random
+import re
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Запросы модуля — единственное их определение: AsyncDatabase получает их через asyncpg_query.
+# Явные приведения типов (%s::int) нужны asyncpg, который выводит типы параметров на сервере
+_PLACEHOLDER = re.compile(r'%%|%s')
+
+
+def asyncpg_query(query: str) -> str:
+    """Переводит плейсхолдеры psycopg2 (%s) в нумерованные плейсхолдеры asyncpg ($1, $2, ...) по порядку"""
+    numbers = itertools.count(1)
+    return _PLACEHOLDER.sub(lambda match: '%' if match.group() == '%%' else f"${next(numbers)}", query)
+
+
+# Раунды проверки случайных seq: сначала немного попыток, затем много — каждый раунд одним запросом.
+# Если все попытки попали в выученные вопросы, выбираем вопрос точно.
+RANDOM_PROBE_ROUNDS = (16, 1024)
+
+# Случайные seq генерируются на стороне БД; берется первый по порядку попытки невыученный вопрос
+RANDOM_PROBE_QUERY = """
+    WITH bounds AS (
+        SELECT max(seq) AS total FROM questions
+    ),
+    probes AS (
+        SELECT attempt, 1 + floor(random() * bounds.total)::int AS seq
+        FROM bounds, generate_series(1, %s::int) AS attempt
+        WHERE bounds.total IS NOT NULL
+    )
+    SELECT q.id, q.question, q.topic, q.answer
+    FROM probes p
+    JOIN questions q ON q.seq = p.seq
+    WHERE NOT EXISTS (
+        SELECT 1 FROM learned_questions l
+        WHERE l.user_id = %s AND l.question_id = q.id
+    )
+    ORDER BY p.attempt
+    LIMIT 1
+"""
+
+UNLEARNED_BOUNDS_QUERY = """
+    SELECT
+        COALESCE(max(seq), 0) AS total,
+        (SELECT COUNT(*) FROM learned_questions WHERE user_id = %s) AS learned
+    FROM questions
+"""
+
+# n-й невыученный seq: для отсортированных выученных seq величина seq - rn (число невыученных
+# до него) не убывает, поэтому ответ равен n плюс число выученных с seq - rn < n
+NTH_UNLEARNED_QUERY = """
+    WITH learned AS (
+        SELECT q.seq, row_number() OVER (ORDER BY q.seq) AS rn
+        FROM learned_questions l
+        JOIN questions q ON q.id = l.question_id
+        WHERE l.user_id = %s
+    )
+    SELECT id, question, topic, answer
+    FROM questions
+    WHERE seq = %s::int + (SELECT COUNT(*) FROM learned WHERE seq - rn < %s::int)
+"""
+
+
+# Те же запросы для вопросов из выбранных тем. Темы выкладываются подряд в один виртуальный
+# ряд номеров: тема занимает отрезок (start, start + size], где size = max(topic_seq) —
+# число ее вопросов (номера внутри темы плотные, см. миграцию 010). Случайный номер ряда
+# переводится в (topic_id, topic_seq) и ищется по индексу, поэтому выбор равномерен по всем
+# вопросам выбранных тем и не зависит от размера каталога
+TOPIC_RANGES_CTE = """
+    sizes AS (
+        SELECT t.topic_id, (SELECT max(q.topic_seq) FROM questions q WHERE q.topic_id = t.topic_id) AS size
+        FROM (SELECT DISTINCT unnest(%s::int[]) AS topic_id) t
+    ),
+    ranges AS (
+        SELECT topic_id, size, sum(size) OVER (ORDER BY topic_id) - size AS start
+        FROM sizes
+        WHERE size IS NOT NULL
+    )
+"""
+
+TOPIC_RANDOM_PROBE_QUERY = """
+    WITH""" + TOPIC_RANGES_CTE + """,
+    probes AS (
+        SELECT attempt, floor(random() * bounds.total)::int AS position
+        FROM (SELECT sum(size) AS total FROM ranges) bounds, generate_series(1, %s::int) AS attempt
+        WHERE bounds.total IS NOT NULL
+    )
+    SELECT q.id, q.question, q.topic, q.answer
+    FROM probes p
+    JOIN ranges r ON p.position >= r.start AND p.position < r.start + r.size
+    JOIN questions q ON q.topic_id = r.topic_id AND q.topic_seq = p.position - r.start + 1
+    WHERE NOT EXISTS (
+        SELECT 1 FROM learned_questions l
+        WHERE l.user_id = %s AND l.question_id = q.id
+    )
+    ORDER BY p.attempt
+    LIMIT 1
+"""
+
+TOPIC_UNLEARNED_BOUNDS_QUERY = """
+    WITH""" + TOPIC_RANGES_CTE + """
+    SELECT
+        COALESCE((SELECT sum(size) FROM ranges), 0) AS total,
+        (
+            SELECT COUNT(*)
+            FROM learned_questions l
+            JOIN questions q ON q.id = l.question_id
+            JOIN ranges r ON r.topic_id = q.topic_id
+            WHERE l.user_id = %s
+        ) AS learned
+"""
+
+TOPIC_NTH_UNLEARNED_QUERY = """
+    WITH""" + TOPIC_RANGES_CTE + """,
+    learned AS (
+        SELECT r.start + q.topic_seq AS position, row_number() OVER (ORDER BY r.start + q.topic_seq) AS rn
+        FROM learned_questions l
+        JOIN questions q ON q.id = l.question_id
+        JOIN ranges r ON r.topic_id = q.topic_id
+        WHERE l.user_id = %s
+    ),
+    target AS (
+        SELECT %s::int + (SELECT COUNT(*) FROM learned WHERE position - rn < %s::int) AS position
+    )
+    SELECT q.id, q.question, q.topic, q.answer
+    FROM target
+    JOIN ranges r ON target.position > r.start AND target.position <= r.start + r.size
+    JOIN questions q ON q.topic_id = r.topic_id AND q.topic_seq = target.position - r.start
+"""
+
+
+# Полнотекстовый поиск (конфигурация russian понимает и английские слова, см. миграцию 009).
+# Ранжируются не больше max_ranked найденных вопросов, из них возвращаются id max_candidates
+# лучших. Если найдено не больше max_ranked, ранжирование точное; для слов, которые есть почти
+# в каждом вопросе, ранжируется первая по индексу выборка — время запроса не растет с каталогом.
+# tsquery подставляется в запрос, а не в CTE: по нему планировщик оценивает частоту слов
+# и для частых слов читает таблицу до LIMIT вместо построения битовой карты по всему индексу
+SEARCH_MAX_CANDIDATES = 200
+SEARCH_MAX_RANKED = 1000
+SEARCH_STATEMENT_TIMEOUT = 1000  # Миллисекунды; поиск, не уложившийся в срок, отменяется
+
+SEARCH_QUERY = """
+    SELECT m.id
+    FROM (
+        SELECT q.id, q.search_vector
+        FROM questions q
+        WHERE q.search_vector @@ websearch_to_tsquery('russian', %s)
+        LIMIT %s
+    ) m
+    ORDER BY ts_rank(m.search_vector, websearch_to_tsquery('russian', %s), 1) DESC, m.id
+    LIMIT %s
+"""
+
+# Ограничение времени действует до конца транзакции поиска
+SEARCH_TIMEOUT_QUERY = "SELECT set_config('statement_timeout', %s, true)"
+
+TOTAL_QUESTIONS_QUERY = "SELECT COUNT(*) FROM questions"
+
+LEARNED_COUNT_QUERY = "SELECT COUNT(*) FROM learned_questions WHERE user_id = %s"
+
+QUESTION_BY_ID_QUERY = "SELECT id, question, topic, answer FROM questions WHERE id = %s"
+
+MARK_LEARNED_QUERY = """
+    INSERT INTO learned_questions (user_id, username, question_id)
+    VALUES (%s, %s, %s)
+    ON CONFLICT (user_id, question_id) DO NOTHING
+"""
+
+# Имя пишется в строку лога, только если user_id неизвестен (миграция 013)
+INSERT_USER_LOG_QUERY = """
+    INSERT INTO user_logs (user_id, action, username, question_id)
+    VALUES (%s, %s, %s, %s)
+"""
+
+
+@instrument_methods(exclude=('get_connection', 'close'))
 class Database:
     """Класс для работы с базой данных"""
     
-    def __init__(self):
+    def __init__(self, pool_config: Optional[Dict] = None):
         self.config = DB_CONFIG
-    
+        self.pool_config = pool_config if pool_config is not None else DB_POOL_CONFIG
+        self._pool = None
+        self._pool_lock = threading.Lock()
+
+    def _get_pool(self) -> ConnectionPool:
+        """Лениво создает пул соединений при первом обращении к БД"""
+        if self._pool is not None:
+            return self._pool
+
+        with self._pool_lock:
+            if self._pool is None:
+                db_name = self.config.get('database')
+                db_user = self.config.get('user')
+                
+                logger.debug(f"Подключение к БД: host={self.config.get('host')}, database={db_name}, user={db_user}")
+                
+                if not db_name:
+                    raise ValueError(f"ОШИБКА: database не установлен! config={self.config}")
+                
+                if db_name == db_user:
+                    raise ValueError(
+                        f"ОШИБКА: database совпадает с user! Это неправильно! "
+                        f"database={db_name}, user={db_user}. "
+                        f"Проверьте переменные окружения POSTGRES_DB и POSTGRES_USER"
+                    )
+                
+                connection_params = self.config.copy()
+                logger.debug(f"Финальные параметры подключения: database={connection_params.get('database')}, user={connection_params.get('user')}")
+                self._pool = ConnectionPool(connection_params, **self.pool_config)
+                logger.info(
+                    f"Создан пул соединений с БД: min_size={self._pool.min_size}, max_size={self._pool.max_size}"
+                )
+            return self._pool
+
+    @contextmanager
     def get_connection(self):
-        """Создает и возвращает соединение с БД"""
-        db_name = self.config.get('database')
-        db_user = self.config.get('user')
-        
-        logger.debug(f"Подключение к БД: host={self.config.get('host')}, database={db_name}, user={db_user}")
-        
-        if not db_name:
-            raise ValueError(f"ОШИБКА: database не установлен! config={self.config}")
-        
-        if db_name == db_user:
-            raise ValueError(
-                f"ОШИБКА: database совпадает с user! Это неправильно! "
-                f"database={db_name}, user={db_user}. "
-                f"Проверьте переменные окружения POSTGRES_DB и POSTGRES_USER"
-            )
-        
-        connection_params = self.config.copy()
-        logger.debug(f"Финальные параметры подключения: database={connection_params.get('database')}, user={connection_params.get('user')}")
-        return psycopg2.connect(**connection_params)
-
-    def get_random_question(self, user_id: int) -> Optional[Dict]:
-        """Получает случайный вопрос, который еще не отмечен пользователем как выученный (оптимизированная версия)"""
+        """
+        Выдает соединение из пула на время блока with.
+        При выходе без ошибок транзакция фиксируется, при ошибке откатывается,
+        после чего соединение возвращается в пул.
+        """
+        with self._get_pool().connection() as conn:
+            with conn:
+                yield conn
+
+    def close(self):
+        """Закрывает все соединения пула"""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.closeall()
+                self._pool = None
+                logger.info("Пул соединений с БД закрыт")
+
+    def get_random_question(self, user_id: int, topic_ids=None) -> Optional[Dict]:
+        """
+        Получает случайный вопрос, который еще не отмечен пользователем как выученный.
+        Если заданы topic_ids, вопрос выбирается только из этих тем.
+
+        Выбирает случайные seq и отбрасывает выученные (выборка по уникальному индексу на попытку),
+        раундами из RANDOM_PROBE_ROUNDS попыток. Если все попытки попали в выученные, вопрос
+        выбирается точно по номеру среди невыученных. Оба способа дают равномерное распределение.
+        Для тем вместо seq используются номера topic_seq (см. TOPIC_RANGES_CTE).
+        """
+        topic_ids = sorted(set(topic_ids)) if topic_ids else None
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    # Считаем количество невыученных вопросов для пользователя
-                    cursor.execute(
-                        """
-                        SELECT COUNT(q.id)
-                        FROM questions q
-                        WHERE NOT EXISTS (
-                            SELECT 1 FROM learned_questions l
-                            WHERE l.question_id = q.id AND l.user_id = %s
-                        )
-                        """,
-                        (user_id,)
-                    )
-                    unlearned_count = cursor.fetchone()['count']
-                    
-                    logger.info(f"Найдено {unlearned_count} невыученных вопросов для user_id={user_id}")
-
-                    if unlearned_count == 0:
-                        # Проверяем, есть ли вообще вопросы в базе
-                        cursor.execute("SELECT COUNT(*) FROM questions")
-                        if cursor.fetchone()['count'] > 0:
-                            logger.info(f"Все вопросы выучены пользователем {user_id}")
+                    for probes in RANDOM_PROBE_ROUNDS:
+                        if topic_ids:
+                            cursor.execute(TOPIC_RANDOM_PROBE_QUERY, (topic_ids, probes, user_id))
                         else:
-                            logger.info(f"В базе нет вопросов")
+                            cursor.execute(RANDOM_PROBE_QUERY, (probes, user_id))
+                        result = cursor.fetchone()
+                        if result:
+                            logger.debug(f"Найден вопрос: id={result['id']} для user_id={user_id}")
+                            return result
+
+                    # Все попытки попали в выученные (или каталог пуст) — выбираем точно
+                    if topic_ids:
+                        cursor.execute(TOPIC_UNLEARNED_BOUNDS_QUERY, (topic_ids, user_id))
+                    else:
+                        cursor.execute(UNLEARNED_BOUNDS_QUERY, (user_id,))
+                    bounds = cursor.fetchone()
+                    if bounds['total'] == 0:
+                        logger.debug(f"В базе нет вопросов (темы: {topic_ids or 'все'})")
                         return None
-                    
-                    # Выбираем случайный offset
-                    random_offset = random.randint(0, unlearned_count - 1)
-                    
-                    # Получаем случайный невыученный вопрос
-                    cursor.execute(
-                        """
-                        SELECT q.id, q.question, q.topic, q.answer
-                        FROM questions q
-                        WHERE NOT EXISTS (
-                            SELECT 1 FROM learned_questions l
-                            WHERE l.question_id = q.id AND l.user_id = %s
-                        )
-                        ORDER BY q.id
-                        LIMIT 1 OFFSET %s
-                        """,
-                        (user_id, random_offset)
-                    )
-                    
+
+                    unlearned_count = bounds['total'] - bounds['learned']
+                    logger.debug(f"Найдено {unlearned_count} невыученных вопросов для user_id={user_id}")
+                    if unlearned_count <= 0:
+                        logger.debug(f"Все вопросы выучены пользователем {user_id}")
+                        return None
+
+                    position = random.randint(1, unlearned_count)
+                    if topic_ids:
+                        cursor.execute(TOPIC_NTH_UNLEARNED_QUERY, (topic_ids, user_id, position, position))
+                    else:
+                        cursor.execute(NTH_UNLEARNED_QUERY, (user_id, position, position))
                     result = cursor.fetchone()
-                    
                     if result:
-                        logger.info(f"Найден вопрос: id={result['id']} (offset={random_offset})")
+                        logger.debug(f"Найден вопрос: id={result['id']} (позиция {position} из {unlearned_count})")
                         return result
-                    else:
-                        logger.warning(f"Неожиданно не найдено вопросов с offset={random_offset}, хотя unlearned_count={unlearned_count}")
-                        return None
+                    logger.warning(f"Неожиданно не найден вопрос на позиции {position}, хотя unlearned_count={unlearned_count}")
+                    return None
 
         except psycopg2.Error as e:
             logger.exception(f"Ошибка при получении случайного вопроса: {e}")
@@ -104,7 +307,7 @@ class Database:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute("SELECT COUNT(*) FROM questions")
+                    cursor.execute(TOTAL_QUESTIONS_QUERY)
                     return cursor.fetchone()[0]
         except psycopg2.Error as e:
             logger.exception(f"Ошибка при получении количества вопросов: {e}")
@@ -115,10 +318,7 @@ class Database:
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(
-                        "SELECT COUNT(*) FROM learned_questions WHERE user_id = %s",
-                        (user_id,)
-                    )
+                    cursor.execute(LEARNED_COUNT_QUERY, (user_id,))
                     return cursor.fetchone()[0]
         except psycopg2.Error as e:
             logger.exception(f"Ошибка при получении количества выученных вопросов: {e}")
@@ -129,50 +329,66 @@ class Database:
         try:
             with self.get_connection() as conn:
                 with conn.cursor(cursor_factory=RealDictCursor) as cursor:
-                    cursor.execute(
-                        "SELECT id, question, topic, answer FROM questions WHERE id = %s",
-                        (question_id,)
-                    )
+                    cursor.execute(QUESTION_BY_ID_QUERY, (question_id,))
                     result = cursor.fetchone()
                     return result if result else None
         except psycopg2.Error as e:
             logger.exception(f"Ошибка при получении вопроса по id: {e}")
             return None
 
-    def mark_question_learned(self, user_id: int, username: Optional[str], question_id: int) -> bool:
-        """Отмечает вопрос как выученный для пользователя. Возвращает True, если добавили новую запись."""
+    def search_question_ids(self, text: str, max_candidates: int = SEARCH_MAX_CANDIDATES,
+                            max_ranked: int = SEARCH_MAX_RANKED,
+                            statement_timeout: int = SEARCH_STATEMENT_TIMEOUT) -> Optional[list]:
+        """
+        Ищет вопросы по словам из question и answer (синтаксис websearch: "фраза", OR, -слово).
+        Возвращает id не больше max_candidates вопросов по убыванию релевантности или None
+        при ошибке (в том числе если поиск не уложился в statement_timeout миллисекунд).
+        """
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
-                    cursor.execute(
-                        """
-                        INSERT INTO learned_questions (user_id, username, question_id)
-                        VALUES (%s, %s, %s)
-                        ON CONFLICT (user_id, question_id) DO NOTHING
-                        """,
-                        (user_id, username, question_id)
-                    )
+                    cursor.execute(SEARCH_TIMEOUT_QUERY, (f"{statement_timeout}ms",))
+                    cursor.execute(SEARCH_QUERY, (text, max_ranked, text, max_candidates))
+                    ids = [row[0] for row in cursor.fetchall()]
+            logger.debug(f"Поиск {text!r}: найдено {len(ids)}")
+            return ids
+        except psycopg2.Error as e:
+            logger.exception(f"Ошибка при поиске вопросов: {e}")
+            return None
+
+    def mark_question_learned(self, user_id: int, username: Optional[str], question_id: int) -> Optional[bool]:
+        """Отмечает вопрос как выученный для пользователя. Возвращает True, если добавили новую запись (None при ошибке)."""
+        try:
+            with self.get_connection() as conn:
+                with conn.cursor() as cursor:
+                    cursor.execute(MARK_LEARNED_QUERY, (user_id, username, question_id))
                     inserted = cursor.rowcount > 0
                     conn.commit()
-                    logger.info(f"Отмечен выученный вопрос: user_id={user_id}, question_id={question_id}, inserted={inserted}")
+                    logger.debug(f"Отмечен выученный вопрос: user_id={user_id}, question_id={question_id}, inserted={inserted}")
                     return inserted
         except psycopg2.Error as e:
             logger.exception(f"Ошибка при отметке вопроса как выученного: {e}")
-            return False
+            return None
 
-    def log_user_action(self, username: str, question_id: int):
-        """Логирует действие пользователя с вопросом в таблицу user_logs"""
+    def log_user_action(self, username: str, question_id: int, user_id: int = None, action: str = None):
+        """Логирует действие пользователя с вопросом в таблицу user_logs (имя — в справочник users)"""
         try:
             with self.get_connection() as conn:
                 with conn.cursor() as cursor:
+                    if user_id is not None:
+                        cursor.execute(
+                            """
+                            INSERT INTO users AS u (user_id, username)
+                            VALUES (%s, %s)
+                            ON CONFLICT (user_id) DO UPDATE SET username = EXCLUDED.username, updated_at = NOW()
+                            WHERE u.username IS DISTINCT FROM EXCLUDED.username
+                            """,
+                            (user_id, username)
+                        )
                     cursor.execute(
-                        """
-                        INSERT INTO user_logs (username, question_id)
-                        VALUES (%s, %s)
-                        """,
-                        (username, question_id)
+                        INSERT_USER_LOG_QUERY, (user_id, action, username if user_id is None else None, question_id)
                     )
                     conn.commit()
-                    logger.info(f"Записан лог: username={username}, question_id={question_id}")
+                    logger.debug(f"Записан лог: user_id={user_id}, username={username}, question_id={question_id}")
         except psycopg2.Error as e:
             logger.exception(f"Ошибка при записи лога: {e}")
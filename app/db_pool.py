@@ -0,0 +1,203 @@
+"""
+Пул долгоживущих соединений с PostgreSQL для синхронного слоя БД
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+logger = logging.getLogger(__name__)
+
+
+class PoolTimeoutError(psycopg2.OperationalError):
+    """Не удалось получить соединение из пула за отведенное время"""
+
+
+class _PooledConnection:
+    """Соединение вместе с метаданными, нужными пулу для проверок и ротации"""
+
+    __slots__ = ('conn', 'created_at', 'last_used_at')
+
+    def __init__(self, conn):
+        now = time.monotonic()
+        self.conn = conn
+        self.created_at = now
+        self.last_used_at = now
+
+
+class ConnectionPool:
+    """
+    Потокобезопасный пул соединений psycopg2.
+
+    - держит от min_size до max_size соединений;
+    - перед выдачей проверяет соединение, простоявшее дольше healthcheck_interval (SELECT 1);
+    - закрывает соединения, простоявшие дольше max_idle (сверх min_size) или прожившие дольше max_lifetime;
+    - выбрасывает сломанные соединения и открывает новые вместо них.
+    """
+
+    def __init__(self, connection_params: dict, min_size: int = 1, max_size: int = 10,
+                 timeout: float = 30.0, max_idle: float = 300.0, max_lifetime: float = 3600.0,
+                 healthcheck_interval: float = 30.0):
+        if min_size < 0 or max_size < 1 or min_size > max_size:
+            raise ValueError(f"Некорректные размеры пула: min_size={min_size}, max_size={max_size}")
+
+        self.connection_params = connection_params
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.healthcheck_interval = healthcheck_interval
+
+        self._idle = deque()
+        self._in_use = {}
+        self._opening = 0
+        self._closed = False
+        self._cond = threading.Condition(threading.Lock())
+
+        for _ in range(min_size):
+            self._idle.append(_PooledConnection(self._connect()))
+
+    @property
+    def size(self) -> int:
+        """Общее количество открытых соединений (свободных и выданных)"""
+        with self._cond:
+            return len(self._idle) + len(self._in_use) + self._opening
+
+    @property
+    def idle_count(self) -> int:
+        """Количество свободных соединений в пуле"""
+        with self._cond:
+            return len(self._idle)
+
+    def _connect(self):
+        logger.debug(f"Открываем новое соединение с БД: host={self.connection_params.get('host')}, "
+                     f"database={self.connection_params.get('database')}")
+        return psycopg2.connect(**self.connection_params)
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_expired(self, pooled: _PooledConnection, now: float) -> bool:
+        return self.max_lifetime > 0 and now - pooled.created_at > self.max_lifetime
+
+    def _is_alive(self, pooled: _PooledConnection, now: float) -> bool:
+        """Проверяет, что соединение живо. Долго простоявшие соединения проверяются запросом"""
+        if pooled.conn.closed != 0:
+            return False
+        if self.healthcheck_interval <= 0 or now - pooled.last_used_at < self.healthcheck_interval:
+            return True
+        try:
+            with pooled.conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            pooled.conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            logger.warning(f"Соединение из пула не прошло проверку, переподключаемся: {e}")
+            return False
+
+    def _recycle_idle(self, now: float):
+        """Закрывает лишние простаивающие соединения. Вызывается под блокировкой"""
+        if self.max_idle <= 0:
+            return
+        total = len(self._idle) + len(self._in_use) + self._opening
+        # Самые давно использованные соединения лежат в начале очереди
+        while self._idle and total > self.min_size and now - self._idle[0].last_used_at > self.max_idle:
+            self._close_quietly(self._idle.popleft().conn)
+            total -= 1
+
+    def getconn(self):
+        """Выдает соединение из пула, при необходимости открывая новое"""
+        deadline = time.monotonic() + self.timeout
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.InterfaceError("Пул соединений закрыт")
+
+                now = time.monotonic()
+                self._recycle_idle(now)
+
+                pooled = self._idle.pop() if self._idle else None
+                if pooled is None:
+                    if len(self._in_use) + self._opening < self.max_size:
+                        self._opening += 1
+                    else:
+                        remaining = deadline - now
+                        if remaining <= 0:
+                            raise PoolTimeoutError(
+                                f"Нет свободных соединений в пуле (max_size={self.max_size}) за {self.timeout} с"
+                            )
+                        self._cond.wait(remaining)
+                        continue
+
+            if pooled is not None:
+                # Проверку выполняем вне блокировки, чтобы не задерживать другие потоки
+                if self._is_expired(pooled, now) or not self._is_alive(pooled, now):
+                    self._close_quietly(pooled.conn)
+                    with self._cond:
+                        self._cond.notify()
+                    continue
+            else:
+                try:
+                    pooled = _PooledConnection(self._connect())
+                finally:
+                    with self._cond:
+                        self._opening -= 1
+                        if pooled is None:
+                            self._cond.notify()
+
+            with self._cond:
+                self._in_use[id(pooled.conn)] = pooled
+            return pooled.conn
+
+    def putconn(self, conn, close: bool = False):
+        """Возвращает соединение в пул. Сломанные или закрытые соединения выбрасываются"""
+        with self._cond:
+            pooled = self._in_use.pop(id(conn), None)
+            if pooled is None:
+                raise psycopg2.InterfaceError("Попытка вернуть соединение, не принадлежащее пулу")
+
+            if not close and not self._closed and conn.closed == 0:
+                try:
+                    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except psycopg2.Error:
+                    close = True
+            else:
+                close = True
+
+            if close:
+                self._close_quietly(conn)
+            else:
+                pooled.last_used_at = time.monotonic()
+                self._idle.append(pooled)
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Контекстный менеджер: выдает соединение и возвращает его в пул"""
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, close=broken)
+
+    def closeall(self):
+        """Закрывает все свободные соединения и запрещает выдачу новых"""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                self._close_quietly(self._idle.popleft().conn)
+            self._cond.notify_all()
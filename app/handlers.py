@@ -4,25 +4,50 @@
 import asyncio
 import logging
 import sys
+from datetime import datetime, timedelta, timezone
 from functools import wraps
+from html import escape
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, ReplyKeyboardMarkup, KeyboardButton
 from telegram.error import TimedOut as TelegramTimedOut, BadRequest
 from telegram.ext import ContextTypes
-from app.database import Database
+from app.async_database import AsyncDatabase
+from app.catalog import QuestionCache, CatalogStats, CatalogWatcher
+from app.audit_log import UserLogWriter, ACTION_REVEAL, ACTION_LEARNED, ACTION_REPEAT
+from app.unlearned_cache import UnlearnedCache
+from app.scheduler import ReviewScheduler, QUALITY_LEARNED, QUALITY_REPEAT
+from app.topics import TopicPreferences, ALL_TOPICS
+from app.prefetch import QuestionPrefetcher
+from app.config import SEARCH_CONFIG
 from app.messages import (
     WELCOME, NO_QUESTIONS, ALL_QUESTIONS_LEARNED, QUESTION_NOT_FOUND,
     INVALID_REQUEST, QUESTION_MARKED_LEARNED, QUESTION_ALREADY_MARKED_LEARNED,
     QUESTION_WILL_BE_REPEATED, USE_RANDOM_QUESTION_BUTTON, ERROR_MESSAGE,
-    ERROR_WITH_START, LEARNED_STATS
+    ERROR_WITH_START, LEARNED_STATS, USER_STATS, USER_STATS_TOPICS_HEADER, USER_STATS_TOPIC_LINE, SEARCH_USAGE, SEARCH_QUERY_TOO_LONG,
+    SEARCH_NO_RESULTS, SEARCH_RESULTS_HEADER, SEARCH_EXPIRED, TOPICS_HEADER,
+    TOPICS_ALL_SELECTED, TOPICS_EMPTY, TOPIC_QUESTIONS_LEARNED
 )
 
 logger = logging.getLogger(__name__)
 
-db = Database()
+db = AsyncDatabase()
+question_cache = QuestionCache(db)
+catalog_stats = CatalogStats(db)
+catalog_watcher = CatalogWatcher(db)
+catalog_watcher.subscribe(question_cache.on_catalog_changed)
+catalog_watcher.subscribe(catalog_stats.on_catalog_changed)
+unlearned_cache = UnlearnedCache(db, question_cache)
+catalog_watcher.subscribe(unlearned_cache.on_catalog_changed)
+log_writer = UserLogWriter(db)
+topic_preferences = TopicPreferences(db)
+catalog_watcher.subscribe(topic_preferences.on_catalog_changed)
+scheduler = ReviewScheduler(db, question_cache, unlearned_cache)
+prefetcher = QuestionPrefetcher(scheduler, db, unlearned_cache)
+catalog_watcher.subscribe(prefetcher.on_catalog_changed)
 
 # Reply Keyboard (рядом с полем ввода)
 reply_keyboard = [
-    [KeyboardButton("🎲 Случайный вопрос"), KeyboardButton("📊 Статистика")]
+    [KeyboardButton("🎲 Случайный вопрос"), KeyboardButton("📊 Статистика")],
+    [KeyboardButton("🗂 Темы")]
 ]
 reply_markup = ReplyKeyboardMarkup(reply_keyboard, resize_keyboard=True)
 
@@ -70,6 +95,15 @@ def _question_text(question: dict, with_answer: bool = False) -> str:
     return message
 
 
+async def _no_question_text(topic_ids=None) -> str:
+    """Текст, когда случайный вопрос не найден: каталог пуст или все вопросы (выбранных тем) выучены"""
+    if topic_ids:
+        return TOPIC_QUESTIONS_LEARNED
+    if not catalog_stats.is_loaded:
+        await catalog_stats.refresh()
+    return NO_QUESTIONS if catalog_stats.total == 0 else ALL_QUESTIONS_LEARNED
+
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик команды /start"""
     try:
@@ -81,22 +115,19 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def send_random_question(chat, user_id: int):
-    """Отправляет случайный невыученный вопрос в указанный чат"""
-    # Выполняем синхронные вызовы БД в отдельном потоке, чтобы не блокировать event loop
-    total_count = await asyncio.to_thread(db.get_total_questions_count)
-    if total_count == 0:
-        await chat.reply_text(NO_QUESTIONS, reply_markup=reply_markup)
-        return
-    
-    question = await asyncio.to_thread(db.get_random_question, user_id)
+    """Отправляет вопрос к повторению или случайный невыученный вопрос в указанный чат"""
+    topic_ids = await topic_preferences.get(user_id)
+    question = await prefetcher.next_question(user_id, topic_ids)
     if not question:
-        await chat.reply_text(ALL_QUESTIONS_LEARNED, reply_markup=reply_markup)
+        await chat.reply_text(await _no_question_text(topic_ids), reply_markup=reply_markup)
         return
 
     message = _question_text(question)
     keyboard = [[InlineKeyboardButton("👁 Показать ответ", callback_data=f"show_answer:{question['id']}")]]
     inline_markup = InlineKeyboardMarkup(keyboard)
     await chat.reply_text(message, parse_mode='HTML', reply_markup=inline_markup)
+    # Следующий вопрос выбирается в фоне, пока пользователь читает этот
+    prefetcher.schedule(user_id, topic_ids, question['id'])
 
 
 async def random_question_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -110,23 +141,18 @@ async def random_question_callback(update: Update, context: ContextTypes.DEFAULT
         await query.answer()
 
         user_id = query.from_user.id
-        # Выполняем синхронные вызовы БД в отдельном потоке
-        total_count = await asyncio.to_thread(db.get_total_questions_count)
-        
-        if total_count == 0:
-            await query.edit_message_text(NO_QUESTIONS)
-            return
-        
-        question = await asyncio.to_thread(db.get_random_question, user_id)
+        topic_ids = await topic_preferences.get(user_id)
+        question = await prefetcher.next_question(user_id, topic_ids)
 
         if not question:
-            await query.edit_message_text(ALL_QUESTIONS_LEARNED)
+            await query.edit_message_text(await _no_question_text(topic_ids))
             return
 
         message = _question_text(question)
         keyboard = [[InlineKeyboardButton("👁 Показать ответ", callback_data=f"show_answer:{question['id']}")]]
         inline_markup = InlineKeyboardMarkup(keyboard)
         await query.edit_message_text(message, parse_mode='HTML', reply_markup=inline_markup)
+        prefetcher.schedule(user_id, topic_ids, question['id'])
     except Exception as e:
         logger.exception(f"Ошибка в random_question_callback: {e}")
         if update.callback_query:
@@ -140,8 +166,7 @@ async def random_question_callback(update: Update, context: ContextTypes.DEFAULT
 async def show_answer_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, query, question_id: int):
     """Показывает ответ и предлагает отметить выученным/повторить"""
     try:
-        # Выполняем синхронные вызовы БД в отдельном потоке
-        question = await asyncio.to_thread(db.get_question_by_id, question_id)
+        question = await question_cache.get(question_id)
         if not question:
             try:
                 await query.edit_message_text(QUESTION_NOT_FOUND)
@@ -149,10 +174,10 @@ async def show_answer_callback(update: Update, context: ContextTypes.DEFAULT_TYP
                 pass
             return
 
-        # Логируем показ ответа (не блокируем основной поток)
+        # Логируем показ ответа и ставим вопрос в расписание (запись в БД выполняется в фоне пачками)
         user = query.from_user
         username = user.username or user.first_name or f"user_{user.id}"
-        await asyncio.to_thread(db.log_user_action, username, question_id)
+        log_writer.log(username, question_id, user.id, ACTION_REVEAL, review_due_at=scheduler.reveal_due_at())
 
         message = _question_text(question, with_answer=True)
         keyboard = [
@@ -177,8 +202,7 @@ async def show_answer_callback(update: Update, context: ContextTypes.DEFAULT_TYP
 async def mark_learned_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, query, question_id: int):
     """Отмечает вопрос как выученный"""
     try:
-        # Выполняем синхронные вызовы БД в отдельном потоке
-        question = await asyncio.to_thread(db.get_question_by_id, question_id)
+        question = await question_cache.get(question_id)
         if not question:
             try:
                 await query.edit_message_text(QUESTION_NOT_FOUND)
@@ -187,12 +211,19 @@ async def mark_learned_callback(update: Update, context: ContextTypes.DEFAULT_TY
             return
 
         user = query.from_user
-        inserted = await asyncio.to_thread(db.mark_question_learned, user.id, user.username, question_id)
+        inserted = await db.mark_question_learned(user.id, user.username, question_id)
+        if inserted is None:
+            # Отметка не сохранилась — вопрос остается в кэшах невыученных
+            await query.edit_message_text(ERROR_MESSAGE)
+            return
+        unlearned_cache.discard(user.id, question_id)
+        prefetcher.discard(user.id, question_id)
+        await scheduler.record_answer(user.id, question_id, QUALITY_LEARNED)
         status_text = QUESTION_MARKED_LEARNED if inserted else QUESTION_ALREADY_MARKED_LEARNED
 
-        # Логируем действие (не блокируем основной поток)
+        # Логируем действие (запись в БД выполняется в фоне пачками)
         username = user.username or user.first_name or f"user_{user.id}"
-        await asyncio.to_thread(db.log_user_action, username, question_id)
+        log_writer.log(username, question_id, user.id, ACTION_LEARNED)
 
         # Формируем сообщение с вопросом, ответом и статусом
         message = _question_text(question, with_answer=True)
@@ -212,10 +243,9 @@ async def mark_learned_callback(update: Update, context: ContextTypes.DEFAULT_TY
 
 @handle_callback_query
 async def repeat_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, query, question_id: int):
-    """Пользователь выбрал повторить — ничего не пишем в БД"""
+    """Пользователь выбрал повторить — вопрос ставится на скорое повторение"""
     try:
-        # Выполняем синхронные вызовы БД в отдельном потоке
-        question = await asyncio.to_thread(db.get_question_by_id, question_id)
+        question = await question_cache.get(question_id)
         if not question:
             try:
                 await query.edit_message_text(QUESTION_NOT_FOUND)
@@ -223,10 +253,11 @@ async def repeat_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, qu
                 pass
             return
 
-        # Логируем действие (не блокируем основной поток)
+        # Логируем действие (запись в БД выполняется в фоне пачками)
         user = query.from_user
         username = user.username or user.first_name or f"user_{user.id}"
-        await asyncio.to_thread(db.log_user_action, username, question_id)
+        log_writer.log(username, question_id, user.id, ACTION_REPEAT)
+        await scheduler.record_answer(user.id, question_id, QUALITY_REPEAT)
 
         # Формируем сообщение с вопросом, ответом и статусом
         message = _question_text(question, with_answer=True)
@@ -244,6 +275,211 @@ async def repeat_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, qu
         logger.exception(f"Ошибка в repeat_callback: {e}")
 
 
+def _shorten(text: str, limit: int = 120) -> str:
+    text = ' '.join(text.split())
+    return text if len(text) <= limit else text[:limit - 1].rstrip() + '…'
+
+
+async def _search_page(search: dict, page: int):
+    """
+    Текст и клавиатура страницы результатов поиска (клавиатура None, если показывать нечего).
+    search — {'query': текст запроса, 'ids': id найденных вопросов по убыванию релевантности};
+    вопросы страницы берутся из кэша каталога, поэтому перелистывание не повторяет поиск
+    """
+    page_size = SEARCH_CONFIG['page_size']
+    search_text, ids = search['query'], search['ids']
+    page_ids = ids[page * page_size:(page + 1) * page_size]
+    # Вопрос могли удалить после поиска
+    questions = [question for question in await asyncio.gather(*map(question_cache.get, page_ids)) if question]
+    if not questions:
+        return SEARCH_NO_RESULTS.format(query=escape(search_text)), None
+
+    first = page * page_size + 1
+    last = first + len(questions) - 1
+    # Листаются не больше max_candidates лучших вопросов — тогда точное число найденных неизвестно
+    total = f"{len(ids)}+" if len(ids) >= SEARCH_CONFIG['max_candidates'] else str(len(ids))
+    lines = [SEARCH_RESULTS_HEADER.format(query=escape(search_text), total=total, first=first, last=last)]
+    for number, question in enumerate(questions, first):
+        topic = f" <i>{escape(question['topic'])}</i>" if question.get('topic') else ""
+        lines.append(f"\n{number}. <b>#{question['id']}</b>{topic}\n{escape(_shorten(question['question']))}")
+
+    keyboard = [[
+        InlineKeyboardButton(f"#{question['id']}", callback_data=f"search_open:{question['id']}")
+        for question in questions
+    ]]
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("◀️ Назад", callback_data=f"search_page:{page - 1}"))
+    if (page + 1) * page_size < len(ids):
+        navigation.append(InlineKeyboardButton("Дальше ▶️", callback_data=f"search_page:{page + 1}"))
+    if navigation:
+        keyboard.append(navigation)
+    return '\n'.join(lines), InlineKeyboardMarkup(keyboard)
+
+
+async def search_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /search <текст>: первая страница найденных вопросов"""
+    try:
+        search_text = ' '.join(context.args or []).strip()
+        if not search_text:
+            await update.message.reply_text(SEARCH_USAGE, reply_markup=reply_markup)
+            return
+        if len(search_text) > SEARCH_CONFIG['max_query_length']:
+            await update.message.reply_text(
+                SEARCH_QUERY_TOO_LONG.format(max_length=SEARCH_CONFIG['max_query_length']),
+                reply_markup=reply_markup
+            )
+            return
+
+        ids = await db.search_question_ids(
+            search_text, SEARCH_CONFIG['max_candidates'], SEARCH_CONFIG['max_ranked'],
+            SEARCH_CONFIG['statement_timeout']
+        )
+        if ids is None:
+            await update.message.reply_text(ERROR_MESSAGE, reply_markup=reply_markup)
+            return
+
+        # Ранжирование выполняется один раз: кнопки перелистывания берут страницы из сохраненного списка
+        search = {'query': search_text, 'ids': ids}
+        context.user_data['search'] = search
+        message, markup = await _search_page(search, 0)
+        await update.message.reply_text(message, parse_mode='HTML', reply_markup=markup or reply_markup)
+    except TelegramTimedOut as timeout_error:
+        logger.error(f"Таймаут при отправке результатов поиска: {timeout_error}")
+    except Exception as e:
+        logger.exception(f"Ошибка в search_command: {e}")
+
+
+@handle_callback_query
+async def search_page_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, query, page: int):
+    """Перелистывает результаты последнего поиска пользователя"""
+    try:
+        search = context.user_data.get('search')
+        if not search:
+            await query.edit_message_text(SEARCH_EXPIRED)
+            return
+
+        message, markup = await _search_page(search, page)
+        await query.edit_message_text(message, parse_mode='HTML', reply_markup=markup)
+    except BadRequest as e:
+        # Повторное нажатие той же кнопки: сообщение не изменилось
+        if "not modified" in str(e).lower() or "too old" in str(e).lower() or "invalid" in str(e).lower():
+            logger.warning(f"Не удалось обновить результаты поиска, игнорируем: {e}")
+        else:
+            raise
+    except Exception as e:
+        logger.exception(f"Ошибка в search_page_callback: {e}")
+
+
+@handle_callback_query
+async def search_open_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, query, question_id: int):
+    """Отправляет найденный вопрос отдельным сообщением, список результатов остается"""
+    try:
+        question = await question_cache.get(question_id)
+        if not question:
+            await query.message.reply_text(QUESTION_NOT_FOUND)
+            return
+
+        message = _question_text(question)
+        keyboard = [[InlineKeyboardButton("👁 Показать ответ", callback_data=f"show_answer:{question['id']}")]]
+        inline_markup = InlineKeyboardMarkup(keyboard)
+        await query.message.reply_text(message, parse_mode='HTML', reply_markup=inline_markup)
+    except Exception as e:
+        logger.exception(f"Ошибка в search_open_callback: {e}")
+
+
+def _topics_page(topics: list, selected) -> tuple:
+    """Текст и клавиатура выбора тем: отмеченные темы помечены ✅, последняя кнопка сбрасывает выбор"""
+    selected = set(selected)
+    names = [topic['name'] for topic in topics if topic['id'] in selected]
+    text = TOPICS_HEADER.format(selected=escape(', '.join(names)) if names else TOPICS_ALL_SELECTED)
+    keyboard = [
+        [InlineKeyboardButton(
+            f"{'✅ ' if topic['id'] in selected else ''}{topic['name']} ({topic['count']})",
+            callback_data=f"topic:{topic['id']}"
+        )]
+        for topic in topics
+    ]
+    keyboard.append([InlineKeyboardButton(
+        f"{'✅ ' if not selected else ''}🌐 Все темы", callback_data=f"topic:{ALL_TOPICS}"
+    )])
+    return text, InlineKeyboardMarkup(keyboard)
+
+
+async def send_topics(chat, user_id: int):
+    """Отправляет клавиатуру выбора тем случайных вопросов"""
+    topics = await topic_preferences.get_topics()
+    if not topics:
+        await chat.reply_text(TOPICS_EMPTY, reply_markup=reply_markup)
+        return
+    text, markup = _topics_page(topics, await topic_preferences.get(user_id))
+    await chat.reply_text(text, parse_mode='HTML', reply_markup=markup)
+
+
+async def topics_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Обработчик команды /topics"""
+    try:
+        await send_topics(update.message, update.message.from_user.id)
+    except TelegramTimedOut as timeout_error:
+        logger.error(f"Таймаут при отправке списка тем: {timeout_error}")
+    except Exception as e:
+        logger.exception(f"Ошибка в topics_command: {e}")
+
+
+@handle_callback_query
+async def topic_toggle_callback(update: Update, context: ContextTypes.DEFAULT_TYPE, query, topic_id: int):
+    """Добавляет тему в выбор пользователя или убирает ее (topic:0 — все темы)"""
+    try:
+        selected = await topic_preferences.toggle(query.from_user.id, topic_id)
+        if selected is None:
+            await query.edit_message_text(ERROR_MESSAGE)
+            return
+        prefetcher.invalidate_user(query.from_user.id)
+
+        text, markup = _topics_page(await topic_preferences.get_topics(), selected)
+        await query.edit_message_text(text, parse_mode='HTML', reply_markup=markup)
+    except BadRequest as e:
+        # Повторное нажатие «Все темы»: сообщение не изменилось
+        if "not modified" in str(e).lower() or "too old" in str(e).lower() or "invalid" in str(e).lower():
+            logger.warning(f"Не удалось обновить выбор тем, игнорируем: {e}")
+        else:
+            raise
+    except Exception as e:
+        logger.exception(f"Ошибка в topic_toggle_callback: {e}")
+
+
+async def _stats_text(user_id: int) -> str:
+    """
+    Статистика пользователя из агрегатов: выучено всего и по темам, активность за сегодня и серия дней.
+    Количество вопросов в темах берется из списка тем в памяти
+    """
+    # Дни статистики считаются по UTC (миграция 011)
+    today = datetime.now(timezone.utc).date()
+    stats = await db.get_user_stats(user_id, today)
+    if stats is None:
+        return LEARNED_STATS.format(count=await db.get_learned_questions_count(user_id))
+
+    if not catalog_stats.is_loaded:
+        await catalog_stats.refresh()
+    # Серия прервана, если вчера и сегодня активности не было
+    last_active_day = stats['last_active_day']
+    streak = stats['current_streak'] if last_active_day and last_active_day >= today - timedelta(days=1) else 0
+    lines = [USER_STATS.format(
+        learned=stats['learned'], total=catalog_stats.total or 0,
+        revealed_today=stats['revealed_today'], learned_today=stats['learned_today'],
+        streak=streak, longest_streak=stats['longest_streak'],
+    )]
+
+    topics = await topic_preferences.get_topics()
+    if topics:
+        lines.append(USER_STATS_TOPICS_HEADER)
+        for topic in topics:
+            lines.append(USER_STATS_TOPIC_LINE.format(
+                name=escape(topic['name']), learned=stats['topics'].get(topic['id'], 0), total=topic['count']
+            ))
+    return '\n'.join(lines)
+
+
 async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Обработчик текстовых сообщений (для Reply Keyboard кнопок)"""
     text = update.message.text
@@ -254,11 +490,10 @@ async def handle_text_message(update: Update, context: ContextTypes.DEFAULT_TYPE
         return
     if text == "📊 Статистика":
         user_id = update.message.from_user.id
-        learned_count = await asyncio.to_thread(db.get_learned_questions_count, user_id)
-        await update.message.reply_text(
-            LEARNED_STATS.format(count=learned_count),
-            reply_markup=reply_markup
-        )
+        await update.message.reply_text(await _stats_text(user_id), parse_mode='HTML', reply_markup=reply_markup)
+        return
+    if text == "🗂 Темы":
+        await send_topics(update.message, update.message.from_user.id)
         return
 
     try:
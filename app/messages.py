@@ -2,7 +2,9 @@
 
 WELCOME = (
     "👋 Привет! Нажми \"🎲 Случайный вопрос\", чтобы тренироваться.\n"
-    "После показа ответа отметь, выучил ли вопрос."
+    "После показа ответа отметь, выучил ли вопрос.\n"
+    "Найти вопрос по словам: /search градиентный бустинг\n"
+    "Выбрать темы вопросов: /topics"
 )
 
 NO_QUESTIONS = (
@@ -29,6 +31,40 @@ USE_RANDOM_QUESTION_BUTTON = "Используй кнопку '🎲 Случай
 
 LEARNED_STATS = "📊 Выучено вопросов: {count}"
 
+USER_STATS = (
+    "📊 Выучено вопросов: {learned} из {total}\n"
+    "👁 Сегодня открыто ответов: {revealed_today}, выучено: {learned_today}\n"
+    "🔥 Дней подряд: {streak} (рекорд: {longest_streak})"
+)
+
+USER_STATS_TOPICS_HEADER = "\n<b>По темам:</b>"
+
+USER_STATS_TOPIC_LINE = "• {name}: {learned}/{total}"
+
+SEARCH_USAGE = (
+    "🔎 Напиши, что искать: /search градиентный бустинг\n"
+    "Фраза в кавычках ищется целиком, OR — любое из слов, -слово исключает вопросы с ним."
+)
+
+SEARCH_QUERY_TOO_LONG = "❌ Слишком длинный запрос, максимум {max_length} символов"
+
+SEARCH_NO_RESULTS = "🔎 По запросу «{query}» ничего не найдено"
+
+SEARCH_RESULTS_HEADER = "🔎 «{query}»: найдено {total}, показаны {first}–{last}"
+
+SEARCH_EXPIRED = "❌ Поиск устарел, повтори команду /search"
+
+TOPICS_HEADER = (
+    "🗂 Выбери темы случайных вопросов. Нажатие на тему добавляет или убирает ее.\n"
+    "Сейчас: {selected}"
+)
+
+TOPICS_ALL_SELECTED = "все темы"
+
+TOPICS_EMPTY = "🗂 В каталоге пока нет вопросов с темами"
+
+TOPIC_QUESTIONS_LEARNED = "🎉 В выбранных темах все вопросы выучены! Выбери другие темы: /topics"
+
 ERROR_MESSAGE = "❌ Произошла ошибка. Попробуйте позже."
 
 ERROR_WITH_START = "❌ Произошла ошибка: {error}\n\nПопробуйте позже или используйте /start"
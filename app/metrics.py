@@ -0,0 +1,352 @@
+"""
+Метрики бота в текстовом формате Prometheus и HTTP-эндпоинт /metrics.
+
+Гистограммы задержек обработчиков, методов слоя БД и запросов к Telegram Bot API, счетчики
+ошибок и показатели заполненности пулов (снимаются в момент запроса /metrics).
+Выключенные метрики (METRICS_ENABLED=false) ничего не стоят: декораторы возвращают
+функции без изменений, а сервер и счетчик ошибок лога не запускаются.
+"""
+import abc
+import asyncio
+import bisect
+import functools
+import inspect
+import logging
+import time
+from typing import Callable, Dict, Optional
+
+from app.config import METRICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Границы корзин гистограмм задержек, секунды
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra: str = None) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+class _Metric(abc.ABC):
+    """Общая часть метрик: имя, описание и проверка меток; строки значений задает подкласс"""
+
+    kind = None
+
+    def __init__(self, registry, name: str, help_text: str, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+
+    def _check_labels(self, labels: tuple):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"Метрика {self.name} ожидает метки {self.labelnames}, получено {labels}")
+
+    @abc.abstractmethod
+    def _samples(self):
+        """Строки значений метрики в текстовом формате Prometheus"""
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """Монотонно растущий счетчик"""
+
+    kind = 'counter'
+
+    def __init__(self, registry, name: str, help_text: str, labelnames=()):
+        super().__init__(registry, name, help_text, labelnames)
+        self._values = {}
+
+    def inc(self, *labels, amount: float = 1.0):
+        self._check_labels(labels)
+        self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def value(self, *labels) -> float:
+        return self._values.get(labels, 0.0)
+
+    def _samples(self):
+        for labels, value in sorted(self._values.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class _HistogramValue:
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self, buckets: int):
+        self.counts = [0] * buckets
+        self.sum = 0.0
+        self.count = 0
+
+
+class Histogram(_Metric):
+    """Распределение значений по корзинам (le — «не больше»)"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(registry, name, help_text, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}
+
+    def observe(self, value: float, *labels):
+        entry = self._values.get(labels)
+        if entry is None:
+            self._check_labels(labels)
+            entry = self._values[labels] = _HistogramValue(len(self.buckets) + 1)
+        entry.counts[bisect.bisect_left(self.buckets, value)] += 1
+        entry.sum += value
+        entry.count += 1
+
+    def count(self, *labels) -> int:
+        entry = self._values.get(labels)
+        return entry.count if entry is not None else 0
+
+    def _samples(self):
+        for labels, entry in sorted(self._values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), entry.counts):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                yield f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}"
+            label_text = _format_labels(self.labelnames, labels)
+            yield f"{self.name}_sum{label_text} {_format_value(entry.sum)}"
+            yield f"{self.name}_count{label_text} {entry.count}"
+
+
+class Gauge(_Metric):
+    """
+    Текущее значение. Если задан callback, значения снимаются при каждом запросе /metrics:
+    callback возвращает число (метрика без меток) или словарь {кортеж меток: значение}
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, registry, name: str, help_text: str, labelnames=(), callback: Callable = None):
+        super().__init__(registry, name, help_text, labelnames)
+        self.callback = callback
+        self._values = {}
+
+    def set(self, value: float, *labels):
+        self._check_labels(labels)
+        self._values[labels] = value
+
+    def _collect(self) -> Dict[tuple, float]:
+        if self.callback is None:
+            return self._values
+        values = self.callback()
+        if values is None:
+            return {}
+        if not isinstance(values, dict):
+            return {(): values}
+        return values
+
+    def _samples(self):
+        for labels, value in sorted(self._collect().items()):
+            yield f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+
+
+class MetricsRegistry:
+    """Набор метрик процесса; повторная регистрация метрики с тем же именем заменяет ее"""
+
+    def __init__(self, enabled: bool = None):
+        self.enabled = enabled if enabled is not None else METRICS_CONFIG['enabled']
+        self._metrics = {}
+
+    def _register(self, metric: _Metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, help_text: str, labelnames=()) -> Counter:
+        return self._register(Counter(self, name, help_text, labelnames))
+
+    def histogram(self, name: str, help_text: str, labelnames=(), buckets=DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(self, name, help_text, labelnames, buckets))
+
+    def gauge(self, name: str, help_text: str, labelnames=(), callback: Callable = None) -> Gauge:
+        return self._register(Gauge(self, name, help_text, labelnames, callback))
+
+    def get(self, name: str) -> Optional[_Metric]:
+        return self._metrics.get(name)
+
+    def render(self) -> str:
+        """Все метрики в текстовом формате Prometheus"""
+        blocks = []
+        for metric in list(self._metrics.values()):
+            try:
+                blocks.append(metric.render())
+            except Exception as e:
+                logger.exception(f"Не удалось собрать метрику {metric.name}: {e}")
+        return '\n'.join(blocks) + '\n'
+
+
+registry = MetricsRegistry()
+
+HANDLER_SECONDS = registry.histogram(
+    'bot_handler_duration_seconds', 'Время обработки обновления обработчиком', ('handler',)
+)
+HANDLER_ERRORS = registry.counter(
+    'bot_handler_errors_total', 'Исключения, вышедшие из обработчиков', ('handler',)
+)
+DB_SECONDS = registry.histogram(
+    'bot_db_query_duration_seconds', 'Время выполнения метода слоя БД', ('method',)
+)
+DB_METHOD_ERRORS = registry.counter(
+    'bot_db_errors_total', 'Исключения, вышедшие из методов слоя БД', ('method',)
+)
+TELEGRAM_SECONDS = registry.histogram(
+    'bot_telegram_request_duration_seconds', 'Время запроса к Telegram Bot API', ('method',)
+)
+TELEGRAM_REQUESTS = registry.counter(
+    'bot_telegram_requests_total', 'Запросы к Telegram Bot API по HTTP-статусу (error — без ответа)',
+    ('method', 'status')
+)
+LOG_ERRORS = registry.counter(
+    'bot_log_errors_total', 'Записи лога уровня ERROR и выше (в том числе перехваченные ошибки БД)', ('logger',)
+)
+
+
+def timed(histogram: Histogram, label: str, errors: Counter = None):
+    """
+    Декоратор: время выполнения функции (обычной или async) в histogram с меткой label,
+    вышедшие исключения — в errors. При выключенных метриках возвращает функцию как есть
+    """
+    def decorator(func):
+        if not histogram.registry.enabled:
+            return func
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                except Exception:
+                    if errors is not None:
+                        errors.inc(label)
+                    raise
+                finally:
+                    histogram.observe(time.perf_counter() - started, label)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                if errors is not None:
+                    errors.inc(label)
+                raise
+            finally:
+                histogram.observe(time.perf_counter() - started, label)
+        return wrapper
+    return decorator
+
+
+def instrument_methods(histogram: Histogram = DB_SECONDS, errors: Counter = DB_METHOD_ERRORS, exclude=()):
+    """Декоратор класса: замеряет все публичные методы класса, кроме exclude (метка — имя метода)"""
+    def decorator(cls):
+        if not histogram.registry.enabled:
+            return cls
+        for name, attribute in list(vars(cls).items()):
+            if name.startswith('_') or name in exclude or not inspect.isfunction(attribute):
+                continue
+            setattr(cls, name, timed(histogram, name, errors)(attribute))
+        return cls
+    return decorator
+
+
+def instrument_handler(callback):
+    """Оборачивает обработчик обновлений: гистограмма по имени функции и счетчик исключений"""
+    return timed(HANDLER_SECONDS, callback.__name__, HANDLER_ERRORS)(callback)
+
+
+class ErrorLogCounter(logging.Handler):
+    """Считает записи лога уровня ERROR и выше: обработчики и слой БД перехватывают ошибки и логируют их"""
+
+    def __init__(self, counter: Counter = LOG_ERRORS):
+        super().__init__(level=logging.ERROR)
+        self._counter = counter
+
+    def emit(self, record: logging.LogRecord):
+        self._counter.inc(record.name)
+
+
+class MetricsServer:
+    """Минимальный HTTP-сервер: GET /metrics отдает метрики реестра, остальное — 404"""
+
+    def __init__(self, metrics_registry: MetricsRegistry = None, listen: str = None, port: int = None,
+                 read_timeout: float = 5.0):
+        self._registry = metrics_registry if metrics_registry is not None else registry
+        self.listen = listen if listen is not None else METRICS_CONFIG['listen']
+        self.port = port if port is not None else METRICS_CONFIG['port']
+        self.read_timeout = read_timeout
+        self._server = None
+
+    @property
+    def sockets(self) -> list:
+        return self._server.sockets if self._server is not None else []
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, self.listen, self.port)
+        logger.info(f"Метрики доступны на http://{self.listen}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), self.read_timeout)
+            while True:
+                header = await asyncio.wait_for(reader.readline(), self.read_timeout)
+                if header in (b'\r\n', b'\n', b''):
+                    break
+
+            parts = request_line.decode('latin-1').split()
+            http_method = parts[0] if parts else ''
+            path = parts[1].split('?', 1)[0] if len(parts) > 1 else ''
+            if http_method in ('GET', 'HEAD') and path == '/metrics':
+                status, body = '200 OK', self._registry.render().encode('utf-8')
+            elif http_method in ('GET', 'HEAD'):
+                status, body = '404 Not Found', b'Not Found\n'
+            else:
+                status, body = '405 Method Not Allowed', b'Method Not Allowed\n'
+
+            head = (
+                f"HTTP/1.1 {status}\r\n"
+                f"Content-Type: {CONTENT_TYPE}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n"
+            )
+            writer.write(head.encode('latin-1') + (body if http_method != 'HEAD' else b''))
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError):
+            pass
+        except Exception as e:
+            logger.exception(f"Ошибка при отдаче метрик: {e}")
+        finally:
+            writer.close()
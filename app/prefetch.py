@@ -0,0 +1,152 @@
+"""
+Предвыборка следующего вопроса пользователя, чтобы кнопка «Случайный вопрос» отвечала без запросов к БД
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Dict
+
+from app.config import PREFETCH_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class _Prefetched:
+    """Выбранный заранее вопрос (или задача, которая его выбирает)"""
+
+    __slots__ = ('topic_ids', 'task', 'question', 'loaded_at')
+
+    def __init__(self, topic_ids: tuple):
+        self.topic_ids = topic_ids
+        self.task = None
+        self.question = None
+        self.loaded_at = None
+
+
+class QuestionPrefetcher:
+    """
+    После отправки вопроса в фоне выбирает следующий вопрос пользователя, и нажатие кнопки
+    показывает его сразу.
+
+    Выбранный вопрос отбрасывается, если пользователь сменил темы, вопрос отметили выученным
+    (на этой реплике — discard, на других — через NOTIFY learned_changed кэша невыученных
+    вопросов), изменился каталог или прошло больше ttl секунд. Пока подписка на learned_changed
+    не активна, перед показом вопрос проверяется одним запросом по learned_questions.
+    """
+
+    def __init__(self, scheduler, db, learned_feed=None, enabled: bool = None,
+                 ttl: float = None, max_users: int = None):
+        self._scheduler = scheduler
+        self._db = db
+        self._learned_feed = learned_feed
+        self.enabled = enabled if enabled is not None else PREFETCH_CONFIG['enabled']
+        self.ttl = ttl if ttl is not None else PREFETCH_CONFIG['ttl']
+        self.max_users = max_users if max_users is not None else PREFETCH_CONFIG['max_users']
+        self._entries = OrderedDict()
+        if learned_feed is not None:
+            learned_feed.subscribe(self.on_learned)
+
+        self.hits = 0
+        self.misses = 0
+        self.rechecks = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        """Метрики предвыборки"""
+        return {'users': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'rechecks': self.rechecks}
+
+    def schedule(self, user_id: int, topic_ids, shown_question_id: int):
+        """Запускает в фоне выбор следующего вопроса; shown_question_id — вопрос, который сейчас на экране"""
+        if not self.enabled:
+            return
+        self.invalidate_user(user_id)
+        entry = _Prefetched(tuple(topic_ids or ()))
+        entry.task = asyncio.create_task(self._load(user_id, entry, shown_question_id))
+        self._entries[user_id] = entry
+        while len(self._entries) > self.max_users:
+            _, evicted = self._entries.popitem(last=False)
+            evicted.task.cancel()
+
+    async def _load(self, user_id: int, entry: _Prefetched, shown_question_id: int) -> Optional[Dict]:
+        try:
+            question = await self._scheduler.next_question(user_id, entry.topic_ids, shown_question_id)
+        except Exception as e:
+            logger.exception(f"Ошибка предвыборки вопроса для user_id={user_id}: {e}")
+            return None
+        # Тот же вопрос, что на экране, случайно выпал снова — при нажатии выберем заново
+        if question is not None and question['id'] != shown_question_id:
+            entry.question = question
+            entry.loaded_at = time.monotonic()
+        return entry.question
+
+    async def _take(self, user_id: int, topic_ids: tuple) -> Optional[Dict]:
+        entry = self._entries.pop(user_id, None)
+        if entry is None or entry.topic_ids != topic_ids:
+            if entry is not None:
+                entry.task.cancel()
+            return None
+        if not entry.task.done():
+            # Предвыборка еще идет: дожидаемся ее, а не выбираем второй раз параллельно
+            await asyncio.wait((entry.task,))
+        if entry.task.cancelled():
+            return None
+        question = entry.question
+        if question is None or time.monotonic() - entry.loaded_at > self.ttl:
+            return None
+
+        if self._learned_feed is None or not self._learned_feed.is_active:
+            # Без уведомлений об изменениях вопрос могли отметить выученным на другой реплике
+            self.rechecks += 1
+            if await self._db.is_question_learned(user_id, question['id']) is not False:
+                return None
+        return question
+
+    async def next_question(self, user_id: int, topic_ids=None) -> Optional[Dict]:
+        """Возвращает выбранный заранее вопрос, если он еще актуален, иначе выбирает вопрос сразу"""
+        topic_ids = tuple(topic_ids or ())
+        question = await self._take(user_id, topic_ids)
+        if question is not None:
+            self.hits += 1
+            return question
+        self.misses += 1
+        return await self._scheduler.next_question(user_id, topic_ids)
+
+    def discard(self, user_id: int, question_id: int):
+        """Вопрос отмечен выученным: отбрасывает предвыборку с ним (или еще не завершенную)"""
+        entry = self._entries.get(user_id)
+        if entry is None:
+            return
+        if not entry.task.done() or (entry.question is not None and entry.question['id'] == question_id):
+            self.invalidate_user(user_id)
+
+    def on_learned(self, user_id: Optional[int], question_id: Optional[int]):
+        """Подписчик кэша невыученных вопросов; (None, None) — изменения могли быть пропущены"""
+        if user_id is None:
+            self.invalidate()
+        else:
+            self.discard(user_id, question_id)
+
+    def invalidate_user(self, user_id: int):
+        """Отбрасывает предвыборку пользователя (например, после смены тем)"""
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            entry.task.cancel()
+
+    def invalidate(self):
+        """Отбрасывает все предвыборки"""
+        for user_id in list(self._entries):
+            self.invalidate_user(user_id)
+
+    async def on_catalog_changed(self, version: int):
+        """Подписчик CatalogWatcher: выбранные вопросы могли быть удалены или изменены"""
+        self.invalidate()
+
+    async def stop(self):
+        """Отменяет незавершенные предвыборки"""
+        tasks = [entry.task for entry in self._entries.values()]
+        self.invalidate()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(f"Предвыборка вопросов остановлена: {self.stats()}")
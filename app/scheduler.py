@@ -0,0 +1,115 @@
+"""
+Интервальные повторения (SM-2): выбор следующей карточки и обновление расписания по ответам
+"""
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict
+
+from app.config import SCHEDULER_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Оценки SM-2 (0..5) для кнопок бота
+QUALITY_LEARNED = 5  # "✅ Запомнил"
+QUALITY_REPEAT = 1  # "🔁 Повторю"
+
+MIN_EASE = 1.3
+DEFAULT_EASE = 2.5
+
+
+def sm2_step(state: Optional[Dict], quality: int, now: datetime, relearn_interval: timedelta) -> Dict:
+    """
+    Возвращает новое состояние карточки после ответа с оценкой quality.
+    state — текущее состояние (ease, interval_days, repetitions, lapses) или None для новой карточки.
+    """
+    ease = state['ease'] if state else DEFAULT_EASE
+    interval_days = state['interval_days'] if state else 0.0
+    repetitions = state['repetitions'] if state else 0
+    lapses = state['lapses'] if state else 0
+
+    if quality < 3:
+        # Не вспомнил: начинаем цепочку повторений заново и показываем карточку скоро
+        repetitions = 0
+        lapses += 1
+        interval_days = 0.0
+        due_at = now + relearn_interval
+    else:
+        repetitions += 1
+        if repetitions == 1:
+            interval_days = 1.0
+        elif repetitions == 2:
+            interval_days = 6.0
+        else:
+            interval_days = interval_days * ease
+        due_at = now + timedelta(days=interval_days)
+
+    ease = max(MIN_EASE, ease + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02))
+
+    return {
+        'ease': ease,
+        'interval_days': interval_days,
+        'repetitions': repetitions,
+        'lapses': lapses,
+        'due_at': due_at,
+        'last_reviewed_at': now,
+    }
+
+
+class ReviewScheduler:
+    """
+    Выбирает следующую карточку пользователя и ведет расписание повторений.
+
+    Сначала показывается карточка, срок повторения которой наступил (один поиск по индексу
+    (user_id, due_at)), иначе — новый случайный невыученный вопрос.
+    """
+
+    def __init__(self, db, question_cache, question_picker, enabled: bool = None,
+                 relearn_interval: float = None, reveal_recheck_interval: float = None):
+        self._db = db
+        self._question_cache = question_cache
+        self._question_picker = question_picker
+        self.enabled = enabled if enabled is not None else SCHEDULER_CONFIG['enabled']
+        self.relearn_interval = timedelta(seconds=(
+            relearn_interval if relearn_interval is not None else SCHEDULER_CONFIG['relearn_interval']
+        ))
+        self.reveal_recheck_interval = timedelta(seconds=(
+            reveal_recheck_interval if reveal_recheck_interval is not None
+            else SCHEDULER_CONFIG['reveal_recheck_interval']
+        ))
+
+    async def next_question(self, user_id: int, topic_ids=None, exclude_question_id: int = None) -> Optional[Dict]:
+        """
+        Возвращает карточку к повторению или новый случайный невыученный вопрос
+        (из тем topic_ids, если они заданы). Карточки к повторению показываются из всех тем:
+        выбор тем ограничивает только новые вопросы и не сбивает расписание.
+        exclude_question_id — карточка, которая сейчас на экране (при предвыборке следующего
+        вопроса она еще не оценена и все еще числится к повторению).
+        """
+        if self.enabled:
+            question_id = await self._db.get_due_question_id(user_id, exclude_question_id)
+            if question_id is not None:
+                question = await self._question_cache.get(question_id)
+                if question is not None:
+                    return question
+        return await self._question_picker.get_random_question(user_id, topic_ids)
+
+    def reveal_due_at(self) -> Optional[datetime]:
+        """
+        Срок повтора карточки, ответ на которую открыт сейчас: если карточки еще нет в расписании,
+        она ставится на повтор через reveal_recheck_interval — на случай, если пользователь не нажмет
+        ни одну из кнопок. Запись идет пачкой вместе с логом открытия ответа (UserLogWriter).
+        None, если расписание выключено
+        """
+        if not self.enabled:
+            return None
+        return datetime.now(timezone.utc) + self.reveal_recheck_interval
+
+    async def record_answer(self, user_id: int, question_id: int, quality: int):
+        """Обновляет расписание карточки по оценке пользователя"""
+        if not self.enabled:
+            return
+        now = datetime.now(timezone.utc)
+        await self._db.update_review_state(
+            user_id, question_id,
+            lambda state: sm2_step(state, quality, now, self.relearn_interval)
+        )
@@ -0,0 +1,92 @@
+"""
+Темы каталога и выбранные пользователями темы для случайных вопросов
+"""
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from app.config import TOPICS_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# callback_data кнопки «Все темы»: id тем начинаются с 1
+ALL_TOPICS = 0
+
+
+class TopicPreferences:
+    """
+    Список тем каталога и выбранные пользователями темы.
+
+    Список тем (id, название, количество вопросов) загружается при старте и обновляется
+    при изменении каталога. Выбор пользователя хранится в user_topic_preferences и кэшируется
+    в памяти (LRU по количеству пользователей и TTL — изменения с других реплик подхватываются
+    не позже чем через ttl секунд). Пустой выбор означает «все темы».
+    """
+
+    def __init__(self, db, max_users: int = None, ttl: float = None):
+        self._db = db
+        self.max_users = max_users if max_users is not None else TOPICS_CONFIG['preferences_cache_size']
+        self.ttl = ttl if ttl is not None else TOPICS_CONFIG['preferences_ttl']
+        self.topics = None
+        self._entries = OrderedDict()
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.topics is not None
+
+    async def refresh(self):
+        """Перечитывает список тем из БД"""
+        topics = await self._db.get_topics()
+        if topics is None:
+            return
+        self.topics = topics
+        logger.info(f"Список тем обновлен: {len(topics)} тем")
+
+    async def on_catalog_changed(self, version: int):
+        """Подписчик CatalogWatcher: темы и количество вопросов в них могли измениться"""
+        await self.refresh()
+
+    async def get_topics(self) -> list:
+        """Возвращает темы каталога, загружая их при первом обращении"""
+        if not self.is_loaded:
+            await self.refresh()
+        return self.topics or []
+
+    def _store(self, user_id: int, topic_ids: Tuple[int, ...]):
+        self._entries[user_id] = (topic_ids, time.monotonic())
+        self._entries.move_to_end(user_id)
+        while len(self._entries) > self.max_users:
+            self._entries.popitem(last=False)
+
+    async def get(self, user_id: int) -> Tuple[int, ...]:
+        """Возвращает id выбранных пользователем тем (пустой кортеж — все темы)"""
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() - entry[1] <= self.ttl:
+            self._entries.move_to_end(user_id)
+            return entry[0]
+
+        topic_ids = await self._db.get_topic_preferences(user_id)
+        if topic_ids is None:
+            # Не удалось прочитать выбор — показываем вопросы из всех тем, но не кэшируем
+            return ()
+        topic_ids = tuple(topic_ids)
+        self._store(user_id, topic_ids)
+        return topic_ids
+
+    async def toggle(self, user_id: int, topic_id: int) -> Optional[Tuple[int, ...]]:
+        """
+        Добавляет тему в выбор пользователя или убирает ее; ALL_TOPICS сбрасывает выбор.
+        Возвращает новый выбор или None, если сохранить его не удалось.
+        """
+        if topic_id == ALL_TOPICS:
+            topic_ids = ()
+        else:
+            current = set(await self.get(user_id))
+            current.symmetric_difference_update((topic_id,))
+            topic_ids = tuple(sorted(current))
+
+        if not await self._db.set_topic_preferences(user_id, topic_ids):
+            return None
+        self._store(user_id, topic_ids)
+        return topic_ids
@@ -0,0 +1,248 @@
+"""
+Кэш невыученных вопросов пользователей для выдачи случайного вопроса без запроса к БД
+"""
+import asyncio
+import logging
+import random
+import time
+from array import array
+from collections import OrderedDict
+from typing import Optional, Dict
+
+from app.config import UNLEARNED_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+LEARNED_CHANNEL = 'learned_changed'
+
+
+class _UserEntry:
+    """
+    Невыученные id вопросов пользователя в компактном массиве.
+    Индекс id -> позиция строится при первом удалении: записи, из которых только выбирают
+    случайный вопрос, остаются компактными, а каждое следующее удаление выполняется за O(1).
+    """
+
+    __slots__ = ('ids', 'positions', 'loaded_at')
+
+    def __init__(self, ids: array):
+        self.ids = ids
+        self.positions = None
+        self.loaded_at = time.monotonic()
+
+    def discard(self, question_id: int):
+        """Удаляет id перестановкой с последним элементом (порядок для случайного выбора не важен)"""
+        if self.positions is None:
+            self.positions = {value: index for index, value in enumerate(self.ids)}
+        index = self.positions.pop(question_id, None)
+        if index is None:
+            return
+        last = self.ids.pop()
+        if index < len(self.ids):
+            self.ids[index] = last
+            self.positions[last] = index
+
+
+class UnlearnedCache:
+    """
+    Для активных пользователей держит в памяти массив id невыученных вопросов.
+
+    Массив загружается из БД при первом запросе пользователя, после чего случайный вопрос
+    выбирается без обращения к БД (данные вопроса берутся из кэша каталога).
+    Записи вытесняются по LRU при превышении лимита на суммарное количество id и по TTL.
+    Изменения learned_questions с других реплик приходят через NOTIFY learned_changed;
+    пока подписка не активна, кэш не используется и вопросы выбираются запросом к БД.
+    """
+
+    def __init__(self, db, question_cache, enabled: bool = None, max_ids: int = None,
+                 ttl: float = None, listener_check_interval: float = None):
+        self._db = db
+        self._question_cache = question_cache
+        self.enabled = enabled if enabled is not None else UNLEARNED_CACHE_CONFIG['enabled']
+        self.max_ids = max_ids if max_ids is not None else UNLEARNED_CACHE_CONFIG['max_ids']
+        self.ttl = ttl if ttl is not None else UNLEARNED_CACHE_CONFIG['ttl']
+        self.listener_check_interval = (
+            listener_check_interval if listener_check_interval is not None
+            else UNLEARNED_CACHE_CONFIG['listener_check_interval']
+        )
+
+        self._entries = OrderedDict()
+        self._total_ids = 0
+        # Пользователи, чьи записи сейчас загружаются: True, если во время загрузки пришло изменение
+        self._loading = {}
+        self._listener = None
+        self._listener_task = None
+        self._subscribers = []
+
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def is_active(self) -> bool:
+        """Кэш используется, только если включен и подписан на изменения learned_questions"""
+        return self.enabled and self._listener is not None and not self._listener.is_closed()
+
+    @property
+    def total_ids(self) -> int:
+        """Суммарное количество id во всех записях"""
+        return self._total_ids
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def subscribe(self, callback):
+        """
+        Добавляет функцию callback(user_id, question_id), вызываемую, когда вопрос отмечен
+        выученным на любой реплике; callback(None, None) — сбросить все (TRUNCATE)
+        """
+        self._subscribers.append(callback)
+
+    def _notify_learned(self, user_id: Optional[int], question_id: Optional[int]):
+        for callback in self._subscribers:
+            try:
+                callback(user_id, question_id)
+            except Exception as e:
+                logger.exception(f"Ошибка в подписчике {LEARNED_CHANNEL}: {e}")
+
+    async def start(self):
+        """Подписывается на изменения learned_questions и следит за подпиской"""
+        if not self.enabled:
+            return
+        await self._ensure_listener()
+        self._listener_task = asyncio.create_task(self._listener_loop())
+
+    async def stop(self):
+        """Останавливает слежение и закрывает соединение подписки"""
+        if self._listener_task is not None:
+            self._listener_task.cancel()
+            try:
+                await self._listener_task
+            except asyncio.CancelledError:
+                pass
+            self._listener_task = None
+        if self._listener is not None:
+            await self._listener.close()
+            self._listener = None
+        self.invalidate()
+
+    async def _ensure_listener(self):
+        if self._listener is not None and not self._listener.is_closed():
+            return
+        # Пока подписки не было, могли пропустить изменения — начинаем с пустого кэша
+        self.invalidate()
+        self._notify_learned(None, None)
+        try:
+            self._listener = await self._db.create_listener(LEARNED_CHANNEL, self._on_notification)
+        except Exception as e:
+            self._listener = None
+            logger.warning(f"Не удалось подписаться на {LEARNED_CHANNEL}, кэш невыученных вопросов отключен: {e}")
+
+    async def _listener_loop(self):
+        while True:
+            await asyncio.sleep(self.listener_check_interval)
+            await self._ensure_listener()
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            operation, *rest = payload.split(':')
+            if operation == 'T':
+                self.invalidate()
+                self._notify_learned(None, None)
+                return
+            user_id, question_id = int(rest[0]), int(rest[1])
+        except (ValueError, IndexError):
+            logger.warning(f"Некорректное уведомление {channel}: {payload!r}")
+            return
+        if operation == 'I':
+            self.discard(user_id, question_id)
+            self._notify_learned(user_id, question_id)
+        else:
+            self.evict(user_id)
+
+    def _mark_changed(self, user_id: int):
+        if user_id in self._loading:
+            self._loading[user_id] = True
+
+    def discard(self, user_id: int, question_id: int):
+        """Убирает вопрос из невыученных пользователя (вопрос отмечен выученным)"""
+        self._mark_changed(user_id)
+        entry = self._entries.get(user_id)
+        if entry is not None:
+            before = len(entry.ids)
+            entry.discard(question_id)
+            self._total_ids -= before - len(entry.ids)
+
+    def evict(self, user_id: int):
+        """Удаляет запись пользователя; при следующем запросе она загрузится заново"""
+        self._mark_changed(user_id)
+        entry = self._entries.pop(user_id, None)
+        if entry is not None:
+            self._total_ids -= len(entry.ids)
+
+    def invalidate(self):
+        """Удаляет все записи"""
+        for user_id in list(self._entries):
+            self.evict(user_id)
+        for user_id in self._loading:
+            self._loading[user_id] = True
+
+    async def on_catalog_changed(self, version: int):
+        """Подписчик CatalogWatcher: набор вопросов изменился, все записи устарели"""
+        self.invalidate()
+
+    def _store(self, user_id: int, ids: array):
+        if len(ids) > self.max_ids:
+            return
+        self._entries[user_id] = _UserEntry(ids)
+        self._total_ids += len(ids)
+        while self._total_ids > self.max_ids:
+            _, evicted = self._entries.popitem(last=False)
+            self._total_ids -= len(evicted.ids)
+
+    async def _get_entry(self, user_id: int) -> Optional[_UserEntry]:
+        entry = self._entries.get(user_id)
+        if entry is not None and time.monotonic() - entry.loaded_at <= self.ttl:
+            self._entries.move_to_end(user_id)
+            self.hits += 1
+            return entry
+        if entry is not None:
+            self.evict(user_id)
+
+        if user_id in self._loading:
+            return None
+
+        self.misses += 1
+        self._loading[user_id] = False
+        try:
+            ids = await self._db.get_unlearned_question_ids(user_id)
+        finally:
+            changed = self._loading.pop(user_id)
+        # Загрузка, во время которой пришло изменение, может быть устаревшей — не кэшируем
+        if ids is None or changed or not self.is_active:
+            return None
+        self._store(user_id, ids)
+        return self._entries.get(user_id)
+
+    async def get_random_question(self, user_id: int, topic_ids=None) -> Optional[Dict]:
+        """
+        Возвращает случайный невыученный вопрос пользователя (None, если все выучены).
+        Вопрос из выбранных тем выбирается запросом к БД по индексу (topic_id, topic_seq):
+        кэш хранит невыученные вопросы всего каталога без тем.
+        """
+        if topic_ids:
+            return await self._db.get_random_question(user_id, topic_ids)
+        if not self.is_active:
+            return await self._db.get_random_question(user_id)
+
+        entry = await self._get_entry(user_id)
+        if entry is None:
+            return await self._db.get_random_question(user_id)
+
+        while entry.ids:
+            question_id = entry.ids[random.randrange(len(entry.ids))]
+            question = await self._question_cache.get(question_id)
+            if question is not None:
+                return question
+            # Вопрос удален из каталога, а уведомление об этом еще не обработано
+            self.discard(user_id, question_id)
+        return None
@@ -0,0 +1,145 @@
+"""
+Параллельная обработка обновлений с сохранением порядка для каждого пользователя
+"""
+import asyncio
+import logging
+import time
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from app.config import UPDATE_PROCESSOR_CONFIG
+
+logger = logging.getLogger(__name__)
+
+
+class _KeyLock:
+    """Блокировка ключа (пользователя/чата) со счетчиком ожидающих обновлений"""
+
+    __slots__ = ('lock', 'users')
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.users = 0
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обрабатывает обновления разных пользователей параллельно (не более concurrent_updates
+    одновременно), а обновления одного пользователя или чата — строго по очереди.
+
+    Application создает задачу на каждое обновление в порядке получения. Задача сначала
+    занимает блокировку своего пользователя (asyncio.Lock отдает ее в порядке очереди),
+    затем — слот обработки. Поэтому обновления, ожидающие своего пользователя,
+    не занимают слоты и не задерживают остальных. Всего внутри процессора находится
+    не более max_pending обновлений, остальные ждут в Application.
+    """
+
+    def __init__(self, concurrent_updates: int = None, max_pending: int = None, stats_interval: float = None):
+        concurrent_updates = (
+            concurrent_updates if concurrent_updates is not None else UPDATE_PROCESSOR_CONFIG['concurrent_updates']
+        )
+        max_pending = max_pending if max_pending is not None else UPDATE_PROCESSOR_CONFIG['max_pending']
+        super().__init__(max_concurrent_updates=max(max_pending, concurrent_updates))
+        self.concurrent_updates = concurrent_updates
+        self.max_pending = max(max_pending, concurrent_updates)
+        self.stats_interval = stats_interval if stats_interval is not None else UPDATE_PROCESSOR_CONFIG['stats_interval']
+
+        self._slots = asyncio.Semaphore(concurrent_updates)
+        self._locks = {}
+        self._stats_task = None
+
+        self.active = 0
+        self.pending = 0
+        self.processed = 0
+        self.saturated = 0
+        self.max_pending_seen = 0
+        self.wait_time_total = 0.0
+        self.max_wait = 0.0
+
+    @staticmethod
+    def update_key(update: object):
+        """Ключ упорядочивания: пользователь, иначе чат; None — обновление без порядка"""
+        if isinstance(update, Update):
+            if update.effective_user is not None:
+                return 'user', update.effective_user.id
+            if update.effective_chat is not None:
+                return 'chat', update.effective_chat.id
+        return None
+
+    def stats(self) -> dict:
+        """Метрики обработки и обратного давления"""
+        return {
+            'active': self.active,
+            'queued': self.pending - self.active,
+            'pending': self.pending,
+            'max_pending_seen': self.max_pending_seen,
+            'saturated': self.saturated,
+            'processed': self.processed,
+            'avg_wait_ms': round(self.wait_time_total / self.processed * 1000, 3) if self.processed else 0.0,
+            'max_wait_ms': round(self.max_wait * 1000, 3),
+        }
+
+    async def do_process_update(self, update: object, coroutine):
+        started = time.monotonic()
+        self.pending += 1
+        self.max_pending_seen = max(self.max_pending_seen, self.pending)
+        if self.pending >= self.max_pending:
+            self.saturated += 1
+
+        key = self.update_key(update)
+        key_lock = None
+        locked = False
+        if key is not None:
+            key_lock = self._locks.get(key)
+            if key_lock is None:
+                key_lock = self._locks[key] = _KeyLock()
+            key_lock.users += 1
+        try:
+            if key_lock is not None:
+                await key_lock.lock.acquire()
+                locked = True
+            async with self._slots:
+                wait = time.monotonic() - started
+                self.wait_time_total += wait
+                self.max_wait = max(self.max_wait, wait)
+                self.active += 1
+                try:
+                    await coroutine
+                finally:
+                    self.active -= 1
+                    self.processed += 1
+        finally:
+            self.pending -= 1
+            if key_lock is not None:
+                if locked:
+                    key_lock.lock.release()
+                key_lock.users -= 1
+                if key_lock.users == 0:
+                    del self._locks[key]
+
+    async def initialize(self):
+        logger.info(
+            f"Параллельная обработка обновлений: concurrent_updates={self.concurrent_updates}, "
+            f"max_pending={self.max_pending}"
+        )
+        if self.stats_interval > 0:
+            self._stats_task = asyncio.create_task(self._stats_loop())
+
+    async def shutdown(self):
+        if self._stats_task is not None:
+            self._stats_task.cancel()
+            try:
+                await self._stats_task
+            except asyncio.CancelledError:
+                pass
+            self._stats_task = None
+
+    async def _stats_loop(self):
+        while True:
+            await asyncio.sleep(self.stats_interval)
+            stats = self.stats()
+            if stats['queued'] > 0 or stats['saturated'] > 0:
+                logger.warning(f"Очередь обработки обновлений: {stats}")
+            else:
+                logger.info(f"Обработка обновлений: {stats}")
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Заполнение user_logs.user_id у логов, записанных до миграции 013
+
+Старые строки обрабатываются пачками по диапазонам id: каждая пачка — отдельная короткая
+транзакция, поэтому построчные блокировки не копятся, а бот продолжает писать логи.
+user_id определяется функцией legacy_log_user_id: по единственному пользователю с таким
+именем в users или по запасному имени user_<id>. Строки, для которых пользователя
+определить нельзя, остаются с пустым user_id.
+
+Затем на секциях, где его еще нет, строится индекс (user_id, timestamp) через
+CREATE INDEX CONCURRENTLY, и индексы присоединяются к idx_user_logs_user_id_timestamp.
+
+    python backfill_user_logs.py                         # заполнить и построить индексы
+    python backfill_user_logs.py --batch-size 5000 --pause 0.2
+    python backfill_user_logs.py --skip-index            # только заполнить user_id
+
+Повторный запуск безопасен: заполненные строки и построенные индексы пропускаются.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения из .env файла
+load_dotenv()
+
+# Параметры подключения к БД из переменных окружения
+DB_CONFIG = {
+    'host': os.getenv('POSTGRES_HOST', 'localhost'),
+    'port': int(os.getenv('POSTGRES_PORT', '5432')),
+    'database': os.getenv('POSTGRES_DB'),
+    'user': os.getenv('POSTGRES_USER'),
+    'password': os.getenv('POSTGRES_PASSWORD'),
+    'sslmode': 'disable'
+}
+
+PARENT_INDEX = 'idx_user_logs_user_id_timestamp'
+PROGRESS_EVERY = 50  # Пачек между сообщениями о ходе заполнения
+
+
+def id_batches(min_id: int, max_id: int, batch_size: int):
+    """Полуоткрытые диапазоны [начало, конец) id, покрывающие min_id..max_id"""
+    for start in range(min_id, max_id + 1, batch_size):
+        yield start, min(start + batch_size, max_id + 1)
+
+
+def partition_index_name(partition: str) -> str:
+    """Имя индекса (user_id, timestamp) секции"""
+    return f"{partition}_user_id_timestamp_idx"
+
+
+def backfill(conn, batch_size: int, pause: float) -> int:
+    """Заполняет user_id старых строк пачками, возвращает количество заполненных строк"""
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT min(id), max(id) FROM user_logs")
+        min_id, max_id = cursor.fetchone()
+    if min_id is None:
+        print("user_logs пуста, заполнять нечего")
+        return 0
+
+    batches = (max_id - min_id) // batch_size + 1
+    print(f"Заполнение user_id: id {min_id}..{max_id}, пачек: {batches}")
+    updated = 0
+    started = time.perf_counter()
+    for number, (start, end) in enumerate(id_batches(min_id, max_id, batch_size), start=1):
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                UPDATE user_logs
+                SET user_id = legacy_log_user_id(username)
+                WHERE id >= %s AND id < %s
+                  AND user_id IS NULL AND username IS NOT NULL
+                  AND legacy_log_user_id(username) IS NOT NULL
+                """,
+                (start, end)
+            )
+            updated += cursor.rowcount
+        conn.commit()
+        if number % PROGRESS_EVERY == 0 or number == batches:
+            print(f"  пачка {number}/{batches}: заполнено {updated} строк, {time.perf_counter() - started:.1f} s")
+        if pause:
+            time.sleep(pause)
+    return updated
+
+
+def partitions_without_index(conn) -> list:
+    """Секции user_logs, к которым еще не присоединен индекс секции"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'user_logs'::regclass
+              AND NOT EXISTS (
+                  SELECT 1
+                  FROM pg_inherits ii
+                  JOIN pg_index x ON x.indexrelid = ii.inhrelid
+                  WHERE ii.inhparent = %s::regclass AND x.indrelid = c.oid
+              )
+            ORDER BY c.relname
+            """,
+            (PARENT_INDEX,)
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def build_indexes(conn) -> list:
+    """
+    Строит индексы секций без блокировки записи и присоединяет их к индексу родителя.
+    Соединение должно быть в autocommit: CONCURRENTLY не работает внутри транзакции
+    """
+    built = []
+    for partition in partitions_without_index(conn):
+        index = partition_index_name(partition)
+        with conn.cursor() as cursor:
+            # Прерванный CREATE INDEX CONCURRENTLY оставляет невалидный индекс
+            cursor.execute(
+                "SELECT NOT indisvalid FROM pg_index WHERE indexrelid = to_regclass(%s)", (index,)
+            )
+            row = cursor.fetchone()
+            if row and row[0]:
+                cursor.execute(f'DROP INDEX CONCURRENTLY "{index}"')
+            print(f"  индекс {index}")
+            cursor.execute(
+                f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{index}" '
+                f'ON "{partition}" (user_id, timestamp) WHERE user_id IS NOT NULL'
+            )
+            cursor.execute(f'ALTER INDEX {PARENT_INDEX} ATTACH PARTITION "{index}"')
+        built.append(index)
+    return built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--batch-size', type=int, default=10000, help='диапазон id в одной транзакции (по умолчанию 10000)')
+    parser.add_argument('--pause', type=float, default=0.0, help='пауза между пачками, секунд')
+    parser.add_argument('--skip-index', action='store_true', help='не строить индексы секций')
+    args = parser.parse_args()
+
+    if args.batch_size < 1:
+        parser.error('--batch-size должен быть положительным')
+
+    print(f"Подключение к БД: host={DB_CONFIG['host']}, database={DB_CONFIG['database']}, user={DB_CONFIG['user']}")
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except psycopg2.Error as e:
+        print(f"Ошибка подключения к БД: {e}")
+        sys.exit(1)
+
+    try:
+        updated = backfill(conn, args.batch_size, args.pause)
+        print(f"Заполнено user_id: {updated} строк")
+
+        if not args.skip_index:
+            conn.autocommit = True
+            built = build_indexes(conn)
+            print(f"Построено индексов секций: {len(built)}")
+    except psycopg2.Error as e:
+        if not conn.autocommit:
+            conn.rollback()
+        print(f"Ошибка заполнения user_logs: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк классификации вопросов по темам на синтетическом корпусе: эталонная проверка каждого
+ключевого слова подстрокой (benchmarks.classify_reference) против одного скомпилированного
+регулярного выражения.
+
+    python -m benchmarks.bench_classify_topics --questions 1000000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.classify_reference import classify_question_naive
+from classify_topics import TOPICS, SPECIAL_RULES, classify_question, keyword_topic
+
+FILLER = (
+    "как почему зачем что такое объясните расскажите отличие между модель модели данных признаков "
+    "обучения выборки при использовании можно ли нужно если когда какой какие лучше хуже задача "
+    "пример метод подход работает выбрать python"
+).split()
+
+
+def synthetic_corpus(size: int, seed: int = 0) -> list:
+    """Вопросы из 8–25 слов: в основном служебные слова и 0–3 ключевых слова"""
+    rng = random.Random(seed)
+    keywords = [keyword for words in TOPICS.values() for keyword in words] + list(SPECIAL_RULES)
+    corpus = []
+    for _ in range(size):
+        words = [rng.choice(FILLER) for _ in range(rng.randint(8, 25))]
+        for _ in range(rng.choice((0, 0, 1, 1, 2, 3))):
+            words.insert(rng.randrange(len(words) + 1), rng.choice(keywords))
+        text = ' '.join(words)
+        corpus.append(text[0].upper() + text[1:] + '?')
+    return corpus
+
+
+def run(name: str, classify, corpus: list) -> list:
+    started = time.perf_counter()
+    topics = [classify(text) for text in corpus]
+    elapsed = time.perf_counter() - started
+    print(f"{name:<12} {len(corpus)} вопросов за {elapsed:.2f} s — {len(corpus) / elapsed:,.0f} вопросов/s")
+    return topics
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=1_000_000)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = synthetic_corpus(args.questions, args.seed)
+    naive = run('naive', classify_question_naive, corpus)
+    compiled = run('compiled', classify_question, corpus)
+    mismatches = sum(1 for a, b in zip(naive, compiled) if a != b)
+    print(f"Расхождений: {mismatches}")
+    # Тема остальных определена общими правилами или взята по умолчанию
+    print(f"Вопросов с темой по ключевым словам: {sum(1 for text in corpus if keyword_topic(text) is not None)}")
+
+
+if __name__ == '__main__':
+    main()
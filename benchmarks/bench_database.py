@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Микробенчмарк методов Database (синхронный слой БД) на синтетических каталогах разного размера.
+
+Для каждого размера каталога создается отдельная временная БД: вопросы и выученные вопросы
+пользователей с перекосом — доля выученных у k-го пользователя убывает как 1/k^--user-skew
+(несколько «тяжелых» пользователей и много легких), а популярные вопросы (меньшие id) выучены
+чаще остальных (вес ~ id^-(--question-skew)). Замеряются get_random_question,
+get_question_by_id, mark_question_learned, get_learned_questions_count и log_user_action;
+для каждого случая сохраняются планы выполненных запросов EXPLAIN (ANALYZE, BUFFERS)
+(запросы на запись выполняются в откатываемой транзакции).
+
+    python -m benchmarks.bench_database --sizes 1000,10000,100000,1000000 --output before.json
+
+Сравнение двух прогонов (например, до и после изменения схемы или индексов):
+
+    python -m benchmarks.bench_database --compare before.json after.json
+"""
+import argparse
+import json
+import random
+import time
+
+import psycopg2
+from psycopg2 import extensions
+
+from benchmarks.common import temporary_database, measure, summarize, format_summary
+from benchmarks.bench_random_question import seed_catalog
+from app.database import Database
+
+
+class StatementRecorder:
+    """Запоминает SQL-запросы, выполненные через соединения с connection_factory()"""
+
+    def __init__(self):
+        self.enabled = False
+        self.statements = []
+        self._cursor_classes = {}
+
+    def _cursor_class(self, base):
+        cursor_class = self._cursor_classes.get(base)
+        if cursor_class is None:
+            recorder = self
+
+            class RecordingCursor(base):
+                def execute(self, query, vars=None):
+                    if recorder.enabled:
+                        recorder.statements.append(self.mogrify(query, vars).decode('utf-8'))
+                    return super().execute(query, vars)
+
+            cursor_class = self._cursor_classes[base] = RecordingCursor
+        return cursor_class
+
+    def connection_factory(self):
+        recorder = self
+
+        class RecordingConnection(extensions.connection):
+            def cursor(self, *args, **kwargs):
+                kwargs['cursor_factory'] = recorder._cursor_class(kwargs.get('cursor_factory') or extensions.cursor)
+                return super().cursor(*args, **kwargs)
+
+        return RecordingConnection
+
+    def record(self, func, *args, **kwargs) -> list:
+        """Вызывает func и возвращает выполненные в нем запросы"""
+        self.statements = []
+        self.enabled = True
+        try:
+            func(*args, **kwargs)
+        finally:
+            self.enabled = False
+        return self.statements
+
+
+def explain(config: dict, statements: list) -> list:
+    """EXPLAIN (ANALYZE, BUFFERS) каждого запроса в транзакции, которая затем откатывается"""
+    plans = []
+    conn = psycopg2.connect(**config)
+    try:
+        for statement in statements:
+            with conn.cursor() as cursor:
+                cursor.execute(f"EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) {statement}")
+                result = cursor.fetchone()[0][0]
+            conn.rollback()
+            plan = result['Plan']
+            plans.append({
+                'sql': ' '.join(statement.split()),
+                'planning_ms': result.get('Planning Time'),
+                'execution_ms': result.get('Execution Time'),
+                'shared_hit_blocks': plan.get('Shared Hit Blocks'),
+                'shared_read_blocks': plan.get('Shared Read Blocks'),
+                'plan': plan,
+            })
+    finally:
+        conn.close()
+    return plans
+
+
+def seed_learned(config: dict, questions: int, users: int, top_fraction: float,
+                 user_skew: float, question_skew: float) -> list:
+    """
+    Выученные вопросы users пользователей. Возвращает [(user_id, доля выученных)] по убыванию доли.
+    Вероятность выучить вопрос g у пользователя с долей f: f * (1 - a) * (g / N)^-a (не больше 1),
+    в среднем по каталогу это примерно f
+    """
+    profile = [(1000 + rank, top_fraction / rank ** user_skew) for rank in range(1, users + 1)]
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            # Агрегаты статистики (миграция 011) при генерации не нужны — см. seed_catalog
+            cursor.execute("ALTER TABLE learned_questions DISABLE TRIGGER trg_learned_questions_stats")
+            for user_id, fraction in profile:
+                cursor.execute(
+                    """
+                    INSERT INTO learned_questions (user_id, question_id)
+                    SELECT %(user_id)s, g FROM generate_series(1, %(questions)s) AS g
+                    WHERE random() < least(1.0, %(fraction)s * (1 - %(skew)s) * (g::float / %(questions)s) ^ (-%(skew)s))
+                    """,
+                    {'user_id': user_id, 'questions': questions, 'fraction': fraction, 'skew': question_skew}
+                )
+            cursor.execute("ALTER TABLE learned_questions ENABLE TRIGGER trg_learned_questions_stats")
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE learned_questions")
+            cursor.execute(
+                "SELECT user_id, COUNT(*) FROM learned_questions GROUP BY user_id"
+            )
+            learned = dict(cursor.fetchall())
+    finally:
+        conn.close()
+    return [(user_id, learned.get(user_id, 0) / questions) for user_id, _ in profile]
+
+
+def cases(db: Database, questions: int, profile: list) -> list:
+    """Замеряемые случаи: (название, метод, функция без аргументов)"""
+    heavy, median, light = profile[0][0], profile[len(profile) // 2][0], profile[-1][0]
+    new_user = 10_000_000
+    return [
+        ('get_random_question heavy', 'get_random_question', lambda: db.get_random_question(heavy)),
+        ('get_random_question median', 'get_random_question', lambda: db.get_random_question(median)),
+        ('get_random_question light', 'get_random_question', lambda: db.get_random_question(light)),
+        ('get_question_by_id', 'get_question_by_id',
+         lambda: db.get_question_by_id(random.randint(1, questions))),
+        ('get_learned_questions_count heavy', 'get_learned_questions_count',
+         lambda: db.get_learned_questions_count(heavy)),
+        ('get_learned_questions_count light', 'get_learned_questions_count',
+         lambda: db.get_learned_questions_count(light)),
+        ('mark_question_learned', 'mark_question_learned',
+         lambda: db.mark_question_learned(new_user, 'bench', random.randint(1, questions))),
+        ('log_user_action', 'log_user_action',
+         lambda: db.log_user_action('bench', random.randint(1, questions), heavy, 'reveal')),
+    ]
+
+
+def run_size(args, questions: int) -> dict:
+    with temporary_database('bench_db') as config:
+        print(f"Генерация каталога: {questions} вопросов, {args.users} пользователей")
+        started = time.perf_counter()
+        seed_catalog(config, questions, [])
+        profile = seed_learned(config, questions, args.users, args.top_fraction, args.user_skew, args.question_skew)
+        print(f"Сгенерировано за {time.perf_counter() - started:.1f} s; выучено: "
+              f"{profile[0][1]:.1%} (heavy), {profile[len(profile) // 2][1]:.1%} (median), "
+              f"{profile[-1][1]:.1%} (light)")
+
+        recorder = StatementRecorder()
+        db = Database(pool_config={'min_size': 1, 'max_size': 1, 'timeout': 30,
+                                   'max_idle': 0, 'max_lifetime': 0, 'healthcheck_interval': 0})
+        db.config = {**config, 'connection_factory': recorder.connection_factory()}
+        results = []
+        try:
+            for name, method, func in cases(db, questions, profile):
+                measure(func, args.warmup)
+                summary = summarize(measure(func, args.repeat))
+                print(format_summary(name, summary))
+                plans = [] if args.no_explain else explain(config, recorder.record(func))
+                results.append({'name': name, 'method': method, **summary, 'plans': plans})
+        finally:
+            db.close()
+
+        conn = psycopg2.connect(**config)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SHOW server_version")
+                server_version = cursor.fetchone()[0]
+        finally:
+            conn.close()
+
+    return {
+        'questions': questions,
+        'server_version': server_version,
+        'learned_fractions': {'heavy': profile[0][1], 'median': profile[len(profile) // 2][1],
+                              'light': profile[-1][1]},
+        'cases': results,
+    }
+
+
+def compare(before_path: str, after_path: str):
+    """Печатает изменение p50/p95 по случаям, которые есть в обоих прогонах"""
+    def load(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return {(size['questions'], case['name']): case for size in data['sizes'] for case in size['cases']}
+
+    before, after = load(before_path), load(after_path)
+    print(f"{'случай':<48} {'p50 до':>10} {'p50 после':>10} {'Δ':>8} {'p95 до':>10} {'p95 после':>10} {'Δ':>8}")
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        cells = []
+        for metric in ('p50_ms', 'p95_ms'):
+            change = (new[metric] / old[metric] - 1) if old[metric] else 0.0
+            cells.append(f"{old[metric]:>10.3f} {new[metric]:>10.3f} {change:>+8.0%}")
+        print(f"{f'{key[0]} {key[1]}':<48} {' '.join(cells)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='1000,10000,100000,1000000', help='Размеры каталога через запятую')
+    parser.add_argument('--users', type=int, default=100, help='Пользователей с выученными вопросами')
+    parser.add_argument('--top-fraction', type=float, default=0.9, help='Доля выученных у самого активного')
+    parser.add_argument('--user-skew', type=float, default=1.0, help='Перекос долей выученных между пользователями')
+    parser.add_argument('--question-skew', type=float, default=0.5,
+                        help='Перекос популярности вопросов (0 — равномерно, меньше 1)')
+    parser.add_argument('--repeat', type=int, default=200, help='Замеров каждого случая')
+    parser.add_argument('--warmup', type=int, default=20, help='Прогревочных вызовов перед замером')
+    parser.add_argument('--no-explain', action='store_true', help='Не сохранять планы запросов')
+    parser.add_argument('--seed', type=int, default=None, help='seed генератора случайных чисел Python')
+    parser.add_argument('--output', help='Сохранить результаты в JSON')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='Сравнить два JSON-прогона')
+    args = parser.parse_args()
+
+    if args.compare:
+        compare(*args.compare)
+        return
+    if not 0 <= args.question_skew < 1:
+        parser.error('--question-skew должен быть в [0, 1)')
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    sizes = [int(size) for size in args.sizes.split(',') if size.strip()]
+    results = [run_size(args, size) for size in sizes]
+
+    if args.output:
+        options = {key: value for key, value in vars(args).items() if key not in ('output', 'compare')}
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'options': options, 'sizes': results}, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
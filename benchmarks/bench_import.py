@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк импорта вопросов на синтетической выгрузке: прежний полный upsert через
+execute_values (все записи в памяти) против --bulk (COPY во временную таблицу и слияние
+одним запросом) и инкрементального импорта по хешам.
+Каждый режим запускается в отдельном процессе на своей временной БД: первая загрузка
+в пустую таблицу, затем повторная загрузка того же файла. Пиковая память — ru_maxrss процесса.
+
+    python -m benchmarks.bench_import --rows 5000000
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import resource
+import tempfile
+import time
+
+from benchmarks.common import temporary_database
+
+MODES = ('full', 'bulk', 'incremental')
+
+WORDS = (
+    "модель данные признак выборка обучение градиент регрессия дерево ансамбль метрика "
+    "переобучение регуляризация нейросеть слой функция потерь оптимизатор кросс-валидация"
+).split()
+
+
+def write_dump(path: str, rows: int, seed: int = 0):
+    """Пишет JSONL-выгрузку из rows вопросов, не держа ее в памяти"""
+    rng = random.Random(seed)
+    with open(path, 'w', encoding='utf-8') as f:
+        for question_id in range(1, rows + 1):
+            item = {
+                'id': question_id,
+                'question': ' '.join(rng.choice(WORDS) for _ in range(12)) + '?',
+                'topic': rng.choice(WORDS),
+                'answer': ' '.join(rng.choice(WORDS) for _ in range(40)),
+            }
+            f.write(json.dumps(item, ensure_ascii=False))
+            f.write('\n')
+
+
+def run_import(mode: str, config: dict, path: str) -> dict:
+    """Выполняется в дочернем процессе: импорт в выбранном режиме, время и пиковая память"""
+    import import_data
+
+    import_data.DB_CONFIG = config
+    started = time.perf_counter()
+    if mode == 'full':
+        import_data.import_data(path)
+    elif mode == 'bulk':
+        import_data.bulk_import(path)
+    else:
+        import_data.incremental_import(path)
+    return {
+        'seconds': time.perf_counter() - started,
+        'max_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def measure_in_process(mode: str, config: dict, path: str) -> dict:
+    context = multiprocessing.get_context('spawn')
+    with context.Pool(1) as pool:
+        return pool.apply(run_import, (mode, config, path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=5_000_000)
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=list(MODES))
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'dump.jsonl')
+        started = time.perf_counter()
+        write_dump(path, args.rows, args.seed)
+        size_mb = os.path.getsize(path) / (1 << 20)
+        print(f"Выгрузка: {args.rows} вопросов, {size_mb:.0f} MB, подготовлена за {time.perf_counter() - started:.1f} s")
+
+        for mode in args.modes:
+            with temporary_database('bench_import') as config:
+                for run in ('загрузка', 'повтор'):
+                    result = measure_in_process(mode, config, path)
+                    print(
+                        f"{mode:<12} {run:<9} {result['seconds']:>8.1f} s  "
+                        f"{args.rows / result['seconds']:>10,.0f} строк/s  "
+                        f"пик памяти {result['max_rss_mb']:>7.0f} MB"
+                    )
+
+
+if __name__ == '__main__':
+    main()
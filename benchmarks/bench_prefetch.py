@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Задержка кнопки «Случайный вопрос» от нажатия до отправки ответа (вызова reply_text)
+без предвыборки и с предвыборкой следующего вопроса (QuestionPrefetcher).
+Используются обработчики бота (handlers.send_random_question) на временной БД; пользователи
+нажимают кнопку параллельно, между нажатиями читают вопрос и отмечают его выученным или
+«повторю». Отправка в Telegram имитируется задержкой --send-latency и в замер не входит.
+
+    python -m benchmarks.bench_prefetch --questions 1000000 --users 20 --taps 50
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+
+import psycopg2
+
+from benchmarks.common import temporary_database, summarize, format_summary
+from benchmarks.bench_random_question import seed_catalog
+from app.scheduler import QUALITY_LEARNED, QUALITY_REPEAT
+
+
+class FakeChat:
+    """Чат, в котором замеряется момент отправки ответа"""
+
+    def __init__(self, send_latency: float):
+        self.send_latency = send_latency
+        self.replied_at = None
+        self.question_id = None
+
+    async def reply_text(self, text, reply_markup=None, **kwargs):
+        self.replied_at = time.perf_counter()
+        keyboard = getattr(reply_markup, 'inline_keyboard', None)
+        self.question_id = int(keyboard[0][0].callback_data.split(':')[1]) if keyboard else None
+        await asyncio.sleep(self.send_latency)
+
+
+def add_due_cards(config: dict, user_ids: list, per_user: int):
+    """Ставит пользователям карточки к повторению, как после предыдущих сессий"""
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO review_schedule (user_id, question_id, due_at)
+                SELECT u, q.id, now() - interval '1 minute' * q.id
+                FROM unnest(%s::bigint[]) AS u
+                CROSS JOIN LATERAL (
+                    SELECT id FROM questions ORDER BY random() LIMIT %s
+                ) q
+                ON CONFLICT DO NOTHING
+                """,
+                (user_ids, per_user)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def answer(handlers, user_id: int, question_id: int):
+    """Как обработчики «Запомнил» и «Повторю»: половина вопросов отмечается выученными"""
+    if random.random() < 0.5:
+        await handlers.db.mark_question_learned(user_id, None, question_id)
+        handlers.unlearned_cache.discard(user_id, question_id)
+        handlers.prefetcher.discard(user_id, question_id)
+        await handlers.scheduler.record_answer(user_id, question_id, QUALITY_LEARNED)
+    else:
+        await handlers.scheduler.record_answer(user_id, question_id, QUALITY_REPEAT)
+
+
+async def user_session(handlers, user_id: int, taps: int, think_time: float, send_latency: float) -> list:
+    samples = []
+    chat = FakeChat(send_latency)
+    for _ in range(taps):
+        started = time.perf_counter()
+        await handlers.send_random_question(chat, user_id)
+        samples.append(chat.replied_at - started)
+        await asyncio.sleep(think_time * random.uniform(0.5, 1.5))
+        if chat.question_id is not None:
+            await answer(handlers, user_id, chat.question_id)
+    return samples
+
+
+async def run(config: dict, user_ids: list, args, prefetch: bool, unlearned_cache: bool) -> dict:
+    from app import handlers
+
+    handlers.db.config = config
+    handlers.prefetcher.enabled = prefetch
+    handlers.unlearned_cache.enabled = unlearned_cache
+    await handlers.db.connect()
+    await handlers.question_cache.warm_up()
+    await handlers.catalog_stats.refresh()
+    await handlers.topic_preferences.refresh()
+    await handlers.unlearned_cache.start()
+    try:
+        sessions = [
+            user_session(handlers, user_id, args.taps, args.think_time, args.send_latency / 1000)
+            for user_id in user_ids
+        ]
+        samples = [sample for session in await asyncio.gather(*sessions) for sample in session]
+        return {**summarize(samples), **handlers.prefetcher.stats()}
+    finally:
+        await handlers.prefetcher.stop()
+        await handlers.unlearned_cache.stop()
+        await handlers.db.close()
+        handlers.prefetcher.hits = handlers.prefetcher.misses = handlers.prefetcher.rechecks = 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=1_000_000, help='Размер каталога')
+    parser.add_argument('--learned', type=float, default=0.5, help='Доля выученных вопросов у пользователей')
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--taps', type=int, default=50, help='Нажатий на пользователя')
+    parser.add_argument('--due-cards', type=int, default=10, help='Карточек к повторению на пользователя')
+    parser.add_argument('--think-time', type=float, default=0.2, help='Секунд между нажатиями')
+    parser.add_argument('--send-latency', type=float, default=50, help='Отправка ответа в Telegram, мс')
+    parser.add_argument('--output', help='Сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    results = []
+    with temporary_database('bench_prefetch') as config:
+        print(f"Генерация каталога: {args.questions} вопросов, {args.users} пользователей")
+        users = seed_catalog(config, args.questions, [args.learned])
+        # Все пользователи с одинаковой долей выученных: копируем выученные первого
+        base_user = users[args.learned]
+        user_ids = [base_user + index for index in range(args.users)]
+        conn = psycopg2.connect(**config)
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("ALTER TABLE learned_questions DISABLE TRIGGER trg_learned_questions_stats")
+                cursor.execute(
+                    """
+                    INSERT INTO learned_questions (user_id, question_id)
+                    SELECT u, question_id FROM learned_questions, unnest(%s::bigint[]) AS u
+                    WHERE user_id = %s
+                    """,
+                    (user_ids[1:], base_user)
+                )
+                cursor.execute("ALTER TABLE learned_questions ENABLE TRIGGER trg_learned_questions_stats")
+            conn.commit()
+            conn.autocommit = True
+            with conn.cursor() as cursor:
+                cursor.execute("VACUUM ANALYZE learned_questions")
+        finally:
+            conn.close()
+        add_due_cards(config, user_ids, args.due_cards)
+
+        for unlearned_cache in (False, True):
+            for prefetch in (False, True):
+                name = (f"{'с предвыборкой' if prefetch else 'без предвыборки'}, "
+                        f"кэш невыученных {'вкл' if unlearned_cache else 'выкл'}")
+                summary = asyncio.run(run(config, user_ids, args, prefetch, unlearned_cache))
+                print(format_summary(name, summary) +
+                      f"  попаданий {summary['hits']}, промахов {summary['misses']}, проверок {summary['rechecks']}")
+                results.append({'prefetch': prefetch, 'unlearned_cache': unlearned_cache, **summary})
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'questions': args.questions, 'users': args.users, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
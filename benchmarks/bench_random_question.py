@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк выбора случайного невыученного вопроса: прежний запрос COUNT + OFFSET
+против выбора по плотному seq (Database.get_random_question), а также выбор из одной
+и трех тем из десяти: COUNT + OFFSET с фильтром по тексту темы против topic_seq.
+
+Запуск (нужен доступный PostgreSQL, параметры берутся из .env / окружения):
+    python -m benchmarks.bench_random_question --questions 1000000
+"""
+import argparse
+import json
+import random
+
+import psycopg2
+from psycopg2.extras import RealDictCursor
+
+from benchmarks.common import temporary_database, measure, summarize, format_summary
+from app.database import Database
+
+
+def seed_catalog(config: dict, questions: int, learned_fractions: list) -> dict:
+    """Заполняет каталог и выученные вопросы. Возвращает user_id для каждой доли выученных"""
+    users = {}
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            # Триггеры назначают seq и topic_seq построчно; для генерации быстрее проставить
+            # номера напрямую: вопрос g попадает в тему g %% 10 под номером (g - 1) / 10 + 1
+            cursor.execute("INSERT INTO topics (name) SELECT 'Тема ' || t FROM generate_series(0, 9) AS t")
+            cursor.execute("ALTER TABLE questions DISABLE TRIGGER trg_questions_assign_seq")
+            cursor.execute("ALTER TABLE questions DISABLE TRIGGER trg_questions_assign_topic")
+            cursor.execute(
+                """
+                INSERT INTO questions (id, question, topic, answer, seq, topic_id, topic_seq)
+                SELECT g, 'Вопрос ' || g, t.name, 'Ответ ' || g, g, t.id, (g - 1) / 10 + 1
+                FROM generate_series(1, %s) AS g
+                JOIN topics t ON t.name = 'Тема ' || (g %% 10)
+                """,
+                (questions,)
+            )
+            cursor.execute("ALTER TABLE questions ENABLE TRIGGER trg_questions_assign_seq")
+            cursor.execute("ALTER TABLE questions ENABLE TRIGGER trg_questions_assign_topic")
+
+            # Агрегаты статистики (миграция 011) бенчмарку не нужны, а построчный триггер
+            # на сотнях тысяч строк одного пользователя в одной транзакции очень медленный
+            cursor.execute("ALTER TABLE learned_questions DISABLE TRIGGER trg_learned_questions_stats")
+            for index, fraction in enumerate(learned_fractions):
+                user_id = 1000 + index
+                users[fraction] = user_id
+                cursor.execute(
+                    """
+                    INSERT INTO learned_questions (user_id, question_id)
+                    SELECT %s, g FROM generate_series(1, %s) AS g
+                    WHERE random() < %s
+                    """,
+                    (user_id, questions, fraction)
+                )
+            cursor.execute("ALTER TABLE learned_questions ENABLE TRIGGER trg_learned_questions_stats")
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE questions")
+            cursor.execute("VACUUM ANALYZE learned_questions")
+    finally:
+        conn.close()
+    return users
+
+
+def topic_ids_by_name(config: dict, names: list) -> list:
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT id FROM topics WHERE name = ANY(%s) ORDER BY id", (names,))
+            return [row[0] for row in cursor.fetchall()]
+    finally:
+        conn.close()
+
+
+def legacy_random_question(cursor, user_id: int, topics: list = None):
+    """Прежняя реализация: COUNT невыученных и выборка со случайным OFFSET (с фильтром по тексту темы)"""
+    topic_filter = "AND q.topic = ANY(%(topics)s)" if topics else ""
+    params = {'user_id': user_id, 'topics': topics}
+    cursor.execute(
+        f"""
+        SELECT COUNT(q.id)
+        FROM questions q
+        WHERE NOT EXISTS (
+            SELECT 1 FROM learned_questions l
+            WHERE l.question_id = q.id AND l.user_id = %(user_id)s
+        ) {topic_filter}
+        """,
+        params
+    )
+    unlearned_count = cursor.fetchone()['count']
+    if unlearned_count == 0:
+        return None
+    cursor.execute(
+        f"""
+        SELECT q.id, q.question, q.topic, q.answer
+        FROM questions q
+        WHERE NOT EXISTS (
+            SELECT 1 FROM learned_questions l
+            WHERE l.question_id = q.id AND l.user_id = %(user_id)s
+        ) {topic_filter}
+        ORDER BY q.id
+        LIMIT 1 OFFSET %(offset)s
+        """,
+        {**params, 'offset': random.randint(0, unlearned_count - 1)}
+    )
+    return cursor.fetchone()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=1_000_000, help='Размер каталога')
+    parser.add_argument('--learned', default='0,0.5,0.9,0.99',
+                        help='Доли выученных вопросов у тестовых пользователей, через запятую')
+    parser.add_argument('--repeat', type=int, default=200, help='Повторов для нового запроса')
+    parser.add_argument('--legacy-repeat', type=int, default=10, help='Повторов для прежнего запроса')
+    parser.add_argument('--output', help='Сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    fractions = [float(value) for value in args.learned.split(',')]
+    results = []
+
+    with temporary_database('bench_random') as config:
+        print(f"Генерация каталога: {args.questions} вопросов, доли выученных {fractions}")
+        users = seed_catalog(config, args.questions, fractions)
+        topic_sets = {
+            '1 тема': ['Тема 1'],
+            '3 темы': ['Тема 1', 'Тема 2', 'Тема 3'],
+        }
+
+        db = Database(pool_config={'min_size': 1, 'max_size': 1, 'timeout': 30,
+                                   'max_idle': 0, 'max_lifetime': 0, 'healthcheck_interval': 0})
+        db.config = config
+
+        legacy_conn = psycopg2.connect(**config)
+        legacy_conn.autocommit = True
+        try:
+            with legacy_conn.cursor(cursor_factory=RealDictCursor) as cursor:
+                for fraction, user_id in users.items():
+                    legacy = summarize(measure(legacy_random_question, args.legacy_repeat, cursor, user_id))
+                    current = summarize(measure(db.get_random_question, args.repeat, user_id))
+                    print(format_summary(f"COUNT+OFFSET, выучено {fraction:.0%}", legacy))
+                    print(format_summary(f"seq-выбор, выучено {fraction:.0%}", current))
+                    results.append({'learned_fraction': fraction, 'legacy': legacy, 'seq': current})
+
+                    for label, names in topic_sets.items():
+                        topic_ids = topic_ids_by_name(config, names)
+                        legacy = summarize(measure(legacy_random_question, args.legacy_repeat, cursor, user_id, names))
+                        current = summarize(measure(db.get_random_question, args.repeat, user_id, topic_ids))
+                        print(format_summary(f"COUNT+OFFSET по теме, {label}, выучено {fraction:.0%}", legacy))
+                        print(format_summary(f"topic_seq-выбор, {label}, выучено {fraction:.0%}", current))
+                        results.append({'learned_fraction': fraction, 'topics': names,
+                                        'legacy': legacy, 'topic_seq': current})
+        finally:
+            legacy_conn.close()
+            db.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'questions': args.questions, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Бенчмарк полнотекстового поиска (Database.search_question_ids) на синтетическом каталоге.
+Слова вопросов выбираются из словаря с распределением, близким к закону Ципфа: реальные
+термины встречаются часто, синтетические «термин<N>» — редко. Замеряются частые, редкие,
+составные и английские запросы. Страницы результатов бот листает по сохраненному списку id
+без запросов к поиску, поэтому замеряется только сам поиск.
+
+    python -m benchmarks.bench_search --questions 1000000
+"""
+import argparse
+import json
+
+import psycopg2
+
+from benchmarks.common import temporary_database, measure, summarize, format_summary
+from app.database import Database, SEARCH_MAX_RANKED
+
+TERMS = (
+    "модель модели данных признак признаки выборка обучение обучения градиентный градиентного бустинг "
+    "бустинга регрессия логистическая линейная дерево деревья решений случайный лес ансамбль метрика "
+    "точность полнота переобучение регуляризация нейросеть нейронная сеть слой слои функция потерь "
+    "оптимизатор кросс-валидация кластеризация кластер центроид трансформер внимание эмбеддинг "
+    "токенизация свертка сверточная рекуррентная пулинг нормализация дропаут батч эпоха скорость "
+    "gradient boosting regression tree forest ensemble attention transformer embedding dropout "
+    "batch normalization learning rate optimizer loss function overfitting regularization xgboost "
+    "catboost lightgbm pandas numpy sql python bias variance precision recall roc auc"
+).split()
+
+RARE_TERMS = 20000
+
+QUERIES = (
+    'модель',
+    'градиентный бустинг',
+    'gradient boosting',
+    '"случайный лес"',
+    'регуляризация -переобучение',
+    'термин15000',
+    'термин123 OR термин4567',
+    'квазар',
+)
+
+
+def seed_catalog(config: dict, questions: int):
+    """Заполняет каталог вопросами из 10 слов и ответами из 40 слов"""
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            # Номер слова k: первые номера — термины из TERMS, остальные — «термин<N>».
+            # Слагаемые с i и seed привязывают подзапрос к строке, иначе он вычислился бы один раз
+            cursor.execute(
+                """
+                CREATE FUNCTION pg_temp.random_text(words int, seed int, terms text[], size int) RETURNS text AS $$
+                    SELECT string_agg(CASE WHEN k <= cardinality(terms) THEN terms[k]
+                                           ELSE 'термин' || (k - cardinality(terms)) END, ' ')
+                    FROM (
+                        SELECT 1 + floor(size * random() ^ 3)::int + 0 * i + 0 * seed AS k
+                        FROM generate_series(1, words) AS i
+                    ) w
+                $$ LANGUAGE sql VOLATILE
+                """
+            )
+            # Триггер назначает seq построчно; для генерации быстрее проставить seq = id напрямую
+            cursor.execute("ALTER TABLE questions DISABLE TRIGGER trg_questions_assign_seq")
+            cursor.execute(
+                """
+                INSERT INTO questions (id, question, topic, answer, seq)
+                SELECT
+                    g,
+                    pg_temp.random_text(10, g, %(terms)s, %(size)s) || '?',
+                    'Тема ' || (g %% 10),
+                    pg_temp.random_text(40, g, %(terms)s, %(size)s),
+                    g
+                FROM generate_series(1, %(questions)s) AS g
+                """,
+                {'terms': TERMS, 'size': len(TERMS) + RARE_TERMS, 'questions': questions}
+            )
+            cursor.execute("ALTER TABLE questions ENABLE TRIGGER trg_questions_assign_seq")
+        conn.commit()
+        conn.autocommit = True
+        with conn.cursor() as cursor:
+            cursor.execute("VACUUM ANALYZE questions")
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--questions', type=int, default=1_000_000, help='Размер каталога')
+    parser.add_argument('--repeat', type=int, default=200, help='Повторов каждого запроса')
+    parser.add_argument('--max-ranked', type=int, default=SEARCH_MAX_RANKED, help='Сколько найденных вопросов ранжировать')
+    parser.add_argument('--output', help='Сохранить результаты в JSON')
+    args = parser.parse_args()
+
+    results = []
+    with temporary_database('bench_search') as config:
+        print(f"Генерация каталога: {args.questions} вопросов")
+        seed_catalog(config, args.questions)
+
+        db = Database(pool_config={'min_size': 1, 'max_size': 1, 'timeout': 30,
+                                   'max_idle': 0, 'max_lifetime': 0, 'healthcheck_interval': 0})
+        db.config = config
+        try:
+            for query in QUERIES:
+                found = len(db.search_question_ids(query, max_ranked=args.max_ranked))
+                summary = summarize(measure(db.search_question_ids, args.repeat, query, max_ranked=args.max_ranked))
+                print(format_summary(f"{query} ({found})", summary))
+                results.append({'query': query, 'found': found, **summary})
+        finally:
+            db.close()
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'questions': args.questions, 'max_ranked': args.max_ranked, 'results': results}, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест обработки обновлений: последовательная обработка (как Application по умолчанию)
+против PerUserUpdateProcessor. Обработчик имитирует запрос к БД и вызов Bot API задержками,
+поэтому БД и Telegram не нужны. Проверяется и порядок обработки обновлений каждого пользователя.
+
+    python -m benchmarks.bench_update_processor --updates 2000 --users 200 --latency 5
+
+Сквозной прогон через webhook, БД и заглушку Bot API:
+    python -m benchmarks.webhook_replay --api-delay 20 --concurrent-updates 1
+    python -m benchmarks.webhook_replay --api-delay 20 --concurrent-updates 32
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from telegram import Update, User, Message, Chat
+
+from benchmarks.common import summarize, format_summary
+from app.update_processor import PerUserUpdateProcessor
+
+
+def make_updates(count: int, users: int) -> list:
+    updates = []
+    for update_id in range(1, count + 1):
+        user_id = random.randrange(users) + 1
+        user = User(id=user_id, is_bot=False, first_name=f"User {user_id}")
+        chat = Chat(id=user_id, type='private')
+        message = Message(message_id=update_id, date=None, chat=chat, from_user=user, text='🎲 Случайный вопрос')
+        updates.append(Update(update_id=update_id, message=message))
+    return updates
+
+
+async def run(updates: list, latency: float, concurrent_updates: int) -> dict:
+    """Прогоняет обновления и возвращает пропускную способность, задержки и нарушения порядка"""
+    last_seen = {}
+    violations = 0
+    samples = []
+    received_at = {}
+
+    async def handle(update: Update):
+        nonlocal violations
+        user_id = update.effective_user.id
+        if last_seen.get(user_id, 0) > update.update_id:
+            violations += 1
+        last_seen[user_id] = update.update_id
+        await asyncio.sleep(latency * random.uniform(0.5, 1.5))  # Запрос к БД
+        await asyncio.sleep(latency * random.uniform(0.5, 1.5))  # Ответ через Bot API
+        samples.append(time.perf_counter() - received_at[update.update_id])
+
+    started = time.perf_counter()
+    for update in updates:
+        received_at[update.update_id] = started
+
+    processor = None
+    if concurrent_updates > 1:
+        processor = PerUserUpdateProcessor(concurrent_updates=concurrent_updates, stats_interval=0)
+        # Как Application: задача на каждое обновление в порядке получения
+        await asyncio.gather(*(processor.process_update(update, handle(update)) for update in updates))
+    else:
+        for update in updates:
+            await handle(update)
+    elapsed = time.perf_counter() - started
+
+    return {
+        'throughput': len(updates) / elapsed,
+        'latency': summarize(samples),
+        'violations': violations,
+        'stats': processor.stats() if processor else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--updates', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=200)
+    parser.add_argument('--latency', type=float, default=5.0, help='средняя задержка одного вызова, мс')
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1, 8, 32, 128])
+    args = parser.parse_args()
+
+    updates = make_updates(args.updates, args.users)
+    for concurrent_updates in args.concurrency:
+        result = asyncio.run(run(updates, args.latency / 1000, concurrent_updates))
+        print(format_summary(f"concurrent_updates={concurrent_updates}", result['latency']))
+        print(f"    {result['throughput']:.1f} updates/s, нарушений порядка: {result['violations']}")
+        if result['stats']:
+            print(f"    {result['stats']}")
+
+
+if __name__ == '__main__':
+    main()
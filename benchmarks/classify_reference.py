@@ -0,0 +1,36 @@
+"""
+Эталонная классификация вопросов по темам: проверка каждого ключевого слова подстрокой, как
+до перехода на одно скомпилированное регулярное выражение. С ней сравнивают classify_topics
+тесты (результаты должны совпадать) и bench_classify_topics (скорость).
+"""
+from classify_topics import TOPICS, SPECIAL_RULES, FALLBACK_RULES, DEFAULT_TOPIC
+
+
+def topic_scores_naive(question_text):
+    """Эталонный подсчет совпадений: проверка каждого ключевого слова подстрокой"""
+    question_lower = question_text.lower()
+    scores = {}
+    for topic, keywords in TOPICS.items():
+        score = sum(1 for keyword in keywords if keyword.lower() in question_lower)
+        if score > 0:
+            scores[topic] = score
+    return scores
+
+
+def classify_question_naive(question_text):
+    """Эталонная реализация classify_question на проверках подстрокой"""
+    question_lower = question_text.lower()
+
+    for key, topic in SPECIAL_RULES.items():
+        if key in question_lower:
+            return topic
+
+    scores = topic_scores_naive(question_text)
+
+    if not scores:
+        for words, topic in FALLBACK_RULES:
+            if any(word in question_lower for word in words):
+                return topic
+        return DEFAULT_TOPIC
+
+    return max(scores.items(), key=lambda x: x[1])[0]
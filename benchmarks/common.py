@@ -0,0 +1,113 @@
+"""
+Общие утилиты бенчмарков: временная база данных с примененными миграциями и статистика замеров
+"""
+import os
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import psycopg2
+from dotenv import load_dotenv
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+MIGRATIONS_DIR = ROOT_DIR / 'migrations'
+
+load_dotenv(ROOT_DIR / '.env')
+
+# app.config требует токен бота при импорте; бенчмаркам он не нужен
+os.environ.setdefault('BOT_TOKEN', 'benchmark')
+
+
+def server_config() -> dict:
+    """Параметры подключения к серверу PostgreSQL из переменных окружения"""
+    return {
+        'host': os.getenv('POSTGRES_HOST', 'localhost'),
+        'port': int(os.getenv('POSTGRES_PORT', '5432')),
+        'database': os.getenv('POSTGRES_DB'),
+        'user': os.getenv('POSTGRES_USER'),
+        'password': os.getenv('POSTGRES_PASSWORD'),
+        'sslmode': 'disable'
+    }
+
+
+def apply_migrations(config: dict, first: int = None, last: int = None):
+    """Применяет SQL-миграции по порядку к указанной базе (только с номерами от first до last, если заданы)"""
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            for migration_file in sorted(MIGRATIONS_DIR.glob('*.sql')):
+                number = int(migration_file.name.split('_', 1)[0])
+                if (first is not None and number < first) or (last is not None and number > last):
+                    continue
+                cursor.execute(migration_file.read_text(encoding='utf-8'))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+@contextmanager
+def temporary_database(prefix: str = 'bench'):
+    """
+    Создает одноразовую базу данных на сервере из окружения, применяет к ней миграции
+    и удаляет ее после выхода из блока. Возвращает параметры подключения к ней.
+    """
+    base_config = server_config()
+    name = f"{prefix}_{uuid.uuid4().hex[:8]}"
+
+    admin = psycopg2.connect(**{**base_config, 'database': 'postgres'})
+    admin.autocommit = True
+    try:
+        with admin.cursor() as cursor:
+            cursor.execute(f'CREATE DATABASE "{name}"')
+        config = {**base_config, 'database': name}
+        print(f"Создана временная БД {name}")
+        try:
+            apply_migrations(config)
+            yield config
+        finally:
+            with admin.cursor() as cursor:
+                cursor.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+            print(f"Временная БД {name} удалена")
+    finally:
+        admin.close()
+
+
+def measure(func, repeat: int, *args, **kwargs) -> list:
+    """Вызывает func repeat раз и возвращает длительности вызовов в секундах"""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func(*args, **kwargs)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def percentile(sorted_samples: list, fraction: float) -> float:
+    """Перцентиль по отсортированной выборке (ближайший ранг)"""
+    if not sorted_samples:
+        return 0.0
+    index = min(len(sorted_samples) - 1, max(0, round(fraction * len(sorted_samples)) - 1))
+    return sorted_samples[index]
+
+
+def summarize(samples: list) -> dict:
+    """Сводка по замерам в миллисекундах"""
+    ordered = sorted(samples)
+    return {
+        'count': len(ordered),
+        'mean_ms': round(statistics.fmean(ordered) * 1000, 3) if ordered else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+def format_summary(name: str, summary: dict) -> str:
+    """Строка отчета для вывода в консоль"""
+    return (
+        f"{name:<40} n={summary['count']:<6} mean={summary['mean_ms']:>9.3f} ms  "
+        f"p50={summary['p50_ms']:>9.3f} ms  p95={summary['p95_ms']:>9.3f} ms  p99={summary['p99_ms']:>9.3f} ms"
+    )
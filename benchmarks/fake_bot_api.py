@@ -0,0 +1,160 @@
+"""
+Заглушка Telegram Bot API для бенчмарков: отвечает на вызовы методов бота без обращения к Telegram
+и отдает боту обновления, поставленные в очередь через push_update (getUpdates, long polling)
+"""
+import itertools
+import json
+import threading
+import time
+from collections import Counter, deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs
+
+BOT_USER = {'id': 1, 'is_bot': True, 'first_name': 'Benchmark', 'username': 'benchmark_bot'}
+
+
+def _message_result(params: dict) -> dict:
+    chat_id = params.get('chat_id') or 0
+    return {
+        'message_id': int(params.get('message_id') or 1),
+        'date': int(time.time()),
+        'chat': {'id': int(chat_id), 'type': 'private'},
+        'text': params.get('text', ''),
+    }
+
+
+RESULTS = {
+    'getMe': lambda params: BOT_USER,
+    'sendMessage': _message_result,
+    'editMessageText': _message_result,
+}
+
+
+class FakeBotAPI:
+    """
+    HTTP-сервер, имитирующий Bot API: на любой метод отвечает {"ok": true, ...}.
+    delay — искусственная задержка ответа в секундах (сеть до Telegram).
+
+    getUpdates отдает обновления, добавленные push_update, и ждет новых до timeout запроса.
+    Подписчики (subscribe) получают каждый вызов метода: callback(method, params, result)
+    вызывается в потоке сервера до отправки ответа боту.
+    """
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, delay: float = 0.0):
+        self.delay = delay
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._updates = deque()
+        self._updates_ready = threading.Condition()
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._subscribers = []
+        self._closed = False
+        self._server = ThreadingHTTPServer((host, port), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def total_calls(self) -> int:
+        with self._lock:
+            return sum(self.calls.values())
+
+    def subscribe(self, callback):
+        """Добавляет функцию callback(method, params, result), вызываемую на каждый вызов Bot API"""
+        self._subscribers.append(callback)
+
+    def push_update(self, update: dict) -> int:
+        """Ставит обновление в очередь getUpdates, проставляя update_id. Возвращает update_id"""
+        with self._updates_ready:
+            update['update_id'] = next(self._update_ids)
+            self._updates.append(update)
+            self._updates_ready.notify_all()
+        return update['update_id']
+
+    def _get_updates(self, params: dict) -> list:
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        deadline = time.monotonic() + float(params.get('timeout') or 0)
+        with self._updates_ready:
+            # offset подтверждает полученные ботом обновления
+            while self._updates and self._updates[0]['update_id'] < offset:
+                self._updates.popleft()
+            while not self._updates and not self._closed:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return []
+                self._updates_ready.wait(remaining)
+            return list(itertools.islice(self._updates, limit))
+
+    def _make_handler(self):
+        api = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # Keep-alive: бот не открывает новое соединение на каждый вызов. Заголовки и тело
+            # пишутся отдельно, поэтому без TCP_NODELAY ответ ждал бы отложенного ACK
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_POST(self):
+                method = self.path.rstrip('/').rsplit('/', 1)[-1]
+                body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+                params = _parse_params(self.headers.get('Content-Type', ''), body)
+                with api._lock:
+                    api.calls[method] += 1
+                if api.delay:
+                    time.sleep(api.delay)
+                if method == 'getUpdates':
+                    result = api._get_updates(params)
+                else:
+                    if method == 'sendMessage':
+                        params = {**params, 'message_id': next(api._message_ids)}
+                    result = RESULTS.get(method, lambda params: True)(params)
+                for callback in api._subscribers:
+                    callback(method, params, result)
+                payload = json.dumps({'ok': True, 'result': result}).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(payload)))
+                self.end_headers()
+                try:
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # Бот закрыл соединение, не дождавшись ответа (остановка во время getUpdates)
+                    self.close_connection = True
+
+            do_GET = do_POST
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        with self._updates_ready:
+            self._closed = True
+            self._updates_ready.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def _parse_params(content_type: str, body: bytes) -> dict:
+    """Параметры вызова: JSON или application/x-www-form-urlencoded (multipart не разбираем)"""
+    if not body:
+        return {}
+    if content_type.startswith('application/json'):
+        try:
+            return json.loads(body)
+        except ValueError:
+            return {}
+    if content_type.startswith('application/x-www-form-urlencoded'):
+        return {key: values[0] for key, values in parse_qs(body.decode('utf-8')).items()}
+    return {}
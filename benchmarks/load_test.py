@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+"""
+Сквозной нагрузочный прогон бота: настоящее Application из app.bot с обработчиками app.handlers
+в режиме long polling, заглушка Bot API (benchmarks.fake_bot_api) и временная БД с миграциями.
+
+Виртуальные пользователи параллельно повторяют цикл «🎲 Случайный вопрос» → «👁 Показать ответ» →
+«✅ Запомнил» или «🔁 Повторю». Обновления отдаются боту через getUpdates заглушки, задержка шага —
+от постановки обновления в очередь до ответа бота (sendMessage / editMessageText в этот чат).
+Печатает пропускную способность и p50/p95/p99 по каждому шагу.
+
+    python -m benchmarks.load_test --users 50 --duration 60 --questions 100000
+    python -m benchmarks.load_test --users 20 --loops 50 --output load.json
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import defaultdict
+
+from benchmarks.common import temporary_database, summarize, format_summary
+from benchmarks.bench_random_question import seed_catalog
+from benchmarks.fake_bot_api import FakeBotAPI
+
+RANDOM_QUESTION_TEXT = "🎲 Случайный вопрос"
+FLOWS = ('random', 'show_answer', 'learned', 'repeat')
+REPLY_METHODS = ('sendMessage', 'editMessageText')
+
+
+class Inbox:
+    """Ответы бота по чатам: заглушка Bot API кладет их сюда из своих потоков"""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queues = defaultdict(asyncio.Queue)
+
+    def queue(self, chat_id: int) -> asyncio.Queue:
+        return self._queues[chat_id]
+
+    def on_call(self, method: str, params: dict, result):
+        if method not in REPLY_METHODS:
+            return
+        replied_at = time.perf_counter()
+        chat_id = int(params.get('chat_id') or 0)
+        self._loop.call_soon_threadsafe(self._queues[chat_id].put_nowait, (replied_at, method, params, result))
+
+
+def _callback_data(params: dict) -> list:
+    markup = params.get('reply_markup')
+    if isinstance(markup, str):
+        markup = json.loads(markup)
+    if not markup:
+        return []
+    return [button.get('callback_data') for row in markup.get('inline_keyboard', []) for button in row]
+
+
+class VirtualUser:
+    """Пользователь Telegram: отправляет обновления через заглушку и ждет ответа бота в своем чате"""
+
+    def __init__(self, user_id: int, api: FakeBotAPI, inbox: Inbox, timeout: float):
+        self.user_id = user_id
+        self.user = {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}'}
+        self.chat = {'id': user_id, 'type': 'private'}
+        self._api = api
+        self._inbox = inbox.queue(user_id)
+        self._timeout = timeout
+
+    async def _send(self, update: dict):
+        """Отправляет обновление и возвращает (задержка, параметры ответа, результат) или None по таймауту"""
+        while not self._inbox.empty():
+            self._inbox.get_nowait()
+        started = time.perf_counter()
+        self._api.push_update(update)
+        try:
+            replied_at, _, params, result = await asyncio.wait_for(self._inbox.get(), self._timeout)
+        except asyncio.TimeoutError:
+            return None
+        return replied_at - started, params, result
+
+    async def tap_random(self):
+        return await self._send({
+            'message': {
+                'message_id': random.randint(1, 2 ** 31), 'date': int(time.time()),
+                'chat': self.chat, 'from': self.user, 'text': RANDOM_QUESTION_TEXT,
+            },
+        })
+
+    async def press(self, message: dict, data: str):
+        return await self._send({
+            'callback_query': {
+                'id': str(random.getrandbits(48)), 'from': self.user, 'chat_instance': str(self.user_id),
+                'data': data, 'message': message,
+            },
+        })
+
+
+async def user_loop(user: VirtualUser, args, deadline: float, samples: dict, errors: dict):
+    """Цикл одного пользователя до deadline или args.loops повторений"""
+    loops = 0
+    while time.perf_counter() < deadline and (not args.loops or loops < args.loops):
+        loops += 1
+        reply = await user.tap_random()
+        if reply is None:
+            errors['random'] += 1
+            continue
+        latency, params, result = reply
+        samples['random'].append(latency)
+        show = [data for data in _callback_data(params) if data.startswith('show_answer:')]
+        if not show:
+            # Вопросы закончились (все выучены) — пользователь уходит
+            return
+        await asyncio.sleep(args.think_time / 1000)
+
+        message = {'message_id': result['message_id'], 'date': int(time.time()), 'chat': user.chat, 'text': '?'}
+        reply = await user.press(message, show[0])
+        if reply is None:
+            errors['show_answer'] += 1
+            continue
+        latency, params, _ = reply
+        samples['show_answer'].append(latency)
+        answers = _callback_data(params)
+        await asyncio.sleep(args.think_time / 1000)
+
+        flow = 'learned' if random.random() < args.learned_ratio else 'repeat'
+        data = next((item for item in answers if item.startswith(f"{flow}:")), None)
+        if data is None:
+            errors[flow] += 1
+            continue
+        reply = await user.press(message, data)
+        if reply is None:
+            errors[flow] += 1
+            continue
+        samples[flow].append(reply[0])
+        await asyncio.sleep(args.think_time / 1000)
+
+
+async def run(args, config: dict) -> dict:
+    """Поднимает бота в этом процессе, прогоняет пользователей и возвращает сводку"""
+    from telegram import Update
+    from app import bot, handlers
+
+    # Лог каждого HTTP-запроса и каждого обновления заметно замедляет прогон
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+    logging.getLogger('app').setLevel(logging.WARNING)
+
+    inbox = Inbox(asyncio.get_running_loop())
+    fake_api = FakeBotAPI(delay=args.api_delay / 1000)
+    fake_api.subscribe(inbox.on_call)
+    fake_api.start()
+    handlers.db.config = config
+
+    application = bot.build_application(base_url=fake_api.base_url, concurrent_updates=args.concurrent_updates)
+    await application.initialize()
+    await bot.post_init(application)
+    await application.updater.start_polling(poll_interval=0.0, timeout=10, allowed_updates=Update.ALL_TYPES)
+    await application.start()
+
+    samples = {flow: [] for flow in FLOWS}
+    errors = {flow: 0 for flow in FLOWS}
+    try:
+        users = [VirtualUser(100_000 + index, fake_api, inbox, args.timeout) for index in range(args.users)]
+        started = time.perf_counter()
+        deadline = started + args.duration if args.duration else float('inf')
+        await asyncio.gather(*(user_loop(user, args, deadline, samples, errors) for user in users))
+        elapsed = time.perf_counter() - started
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await bot.post_shutdown(application)
+        await application.shutdown()
+        fake_api.stop()
+
+    flows = {}
+    for flow in FLOWS:
+        flows[flow] = {**summarize(samples[flow]), 'errors': errors[flow],
+                       'per_second': round(len(samples[flow]) / elapsed, 2) if elapsed else 0.0}
+    total = sum(len(flow_samples) for flow_samples in samples.values())
+    return {
+        'elapsed_s': round(elapsed, 3),
+        'steps': total,
+        'steps_per_second': round(total / elapsed, 2) if elapsed else 0.0,
+        'flows': flows,
+        'api_calls': dict(fake_api.calls),
+    }
+
+
+def report(summary: dict):
+    for flow, stats in summary['flows'].items():
+        print(format_summary(flow, stats) + f"  {stats['per_second']:>8.1f}/s  таймаутов {stats['errors']}")
+    print(f"Всего шагов: {summary['steps']} за {summary['elapsed_s']:.1f} s, "
+          f"{summary['steps_per_second']:.1f} шагов/s")
+    print(f"Вызовов Bot API: {summary['api_calls']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=20, help='одновременных пользователей')
+    parser.add_argument('--duration', type=float, default=30.0, help='длительность прогона, с (0 — без ограничения)')
+    parser.add_argument('--loops', type=int, default=0, help='циклов на пользователя (0 — до конца --duration)')
+    parser.add_argument('--questions', type=int, default=10_000, help='размер каталога')
+    parser.add_argument('--learned-ratio', type=float, default=0.5, help='доля ответов «Запомнил»')
+    parser.add_argument('--think-time', type=float, default=0.0, help='пауза пользователя между шагами, мс')
+    parser.add_argument('--api-delay', type=float, default=0.0, help='задержка ответа заглушки Bot API, мс')
+    parser.add_argument('--concurrent-updates', type=int, default=None,
+                        help='параллельная обработка обновлений (по умолчанию CONCURRENT_UPDATES)')
+    parser.add_argument('--timeout', type=float, default=30.0, help='ожидание ответа бота на шаг, с')
+    parser.add_argument('--seed', type=int, default=None, help='seed генератора случайных чисел')
+    parser.add_argument('--output', help='сохранить результаты в JSON')
+    args = parser.parse_args()
+    if not args.duration and not args.loops:
+        parser.error('нужно задать --duration или --loops')
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    with temporary_database('load') as config:
+        print(f"Генерация каталога: {args.questions} вопросов")
+        seed_catalog(config, args.questions, [])
+        summary = asyncio.run(run(args, config))
+
+    report(summary)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'args': vars(args), **summary}, f, ensure_ascii=False, indent=2)
+        print(f"Результаты сохранены в {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный прогон режима webhook: отправляет записанные или сгенерированные Update JSON
+на webhook бота и измеряет пропускную способность без Telegram.
+
+По умолчанию бот запускается в этом же процессе: временная БД с примененными миграциями,
+заглушка Bot API (benchmarks.fake_bot_api) и встроенный webhook-сервер бота.
+    python -m benchmarks.webhook_replay --updates 5000 --users 200 --concurrency 50
+
+Прогон против уже запущенного бота (BOT_MODE=webhook) — измеряется только прием обновлений:
+    python -m benchmarks.webhook_replay --url http://127.0.0.1:8443/telegram --secret <WEBHOOK_SECRET_TOKEN>
+
+Файл записанных обновлений (--file) — JSONL, по одному объекту Update на строку.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+
+import httpx
+import psycopg2
+
+from benchmarks.common import temporary_database, summarize, format_summary
+from benchmarks.fake_bot_api import FakeBotAPI
+
+RANDOM_QUESTION_TEXT = "🎲 Случайный вопрос"
+
+
+def synthetic_updates(count: int, users: int, questions: int) -> list:
+    """Генерирует смесь нажатий «Случайный вопрос» и «Показать ответ» от users пользователей"""
+    updates = []
+    for update_id in range(1, count + 1):
+        user_id = 10_000 + random.randrange(users)
+        user = {'id': user_id, 'is_bot': False, 'first_name': f'User {user_id}'}
+        chat = {'id': user_id, 'type': 'private'}
+        if update_id % 2:
+            updates.append({
+                'update_id': update_id,
+                'message': {
+                    'message_id': update_id, 'date': int(time.time()),
+                    'chat': chat, 'from': user, 'text': RANDOM_QUESTION_TEXT,
+                },
+            })
+        else:
+            updates.append({
+                'update_id': update_id,
+                'callback_query': {
+                    'id': str(update_id), 'from': user, 'chat_instance': str(user_id),
+                    'data': f"show_answer:{random.randint(1, questions)}",
+                    'message': {'message_id': update_id, 'date': int(time.time()), 'chat': chat, 'text': '?'},
+                },
+            })
+    return updates
+
+
+def load_updates(path: str) -> list:
+    """Читает записанные обновления из JSONL"""
+    with open(path, 'r', encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+async def post_updates(url: str, secret: str, updates: list, concurrency: int) -> tuple:
+    """Отправляет обновления с ограничением параллелизма. Возвращает (длительности, число ошибок)"""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples = []
+    errors = 0
+    headers = {'X-Telegram-Bot-Api-Secret-Token': secret} if secret else {}
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(limits=limits, timeout=30.0) as client:
+        async def send(update):
+            nonlocal errors
+            async with semaphore:
+                started = time.perf_counter()
+                try:
+                    response = await client.post(url, json=update, headers=headers)
+                    if response.status_code != 200:
+                        errors += 1
+                except httpx.HTTPError:
+                    errors += 1
+                samples.append(time.perf_counter() - started)
+
+        await asyncio.gather(*(send(update) for update in updates))
+    return samples, errors
+
+
+def report(updates: list, samples: list, errors: int, elapsed: float, processed_elapsed: float = None):
+    print(format_summary('webhook POST', summarize(samples)))
+    print(f"Отправлено: {len(updates)}, ошибок: {errors}, прием: {len(updates) / elapsed:.1f} updates/s")
+    if processed_elapsed is not None:
+        print(f"Обработано ботом: {len(updates) / processed_elapsed:.1f} updates/s ({processed_elapsed:.2f} s)")
+
+
+def seed_questions(config: dict, questions: int):
+    conn = psycopg2.connect(**config)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(
+                """
+                INSERT INTO questions (id, question, topic, answer)
+                SELECT g, 'Вопрос ' || g, 'Тема ' || (g %% 10), 'Ответ ' || g
+                FROM generate_series(1, %s) AS g
+                """,
+                (questions,)
+            )
+        conn.commit()
+    finally:
+        conn.close()
+
+
+async def replay_in_process(args, updates: list, config: dict):
+    """Поднимает бота с webhook-сервером в этом процессе и прогоняет через него обновления"""
+    from telegram import Update
+    from telegram.ext import TypeHandler
+    from app import bot, handlers
+
+    # Лог каждого HTTP-запроса заметно замедляет прогон
+    logging.getLogger('httpx').setLevel(logging.WARNING)
+
+    fake_api = FakeBotAPI(delay=args.api_delay / 1000)
+    fake_api.start()
+    handlers.db.config = config
+
+    application = bot.build_application(base_url=fake_api.base_url, concurrent_updates=args.concurrent_updates)
+
+    processed = 0
+    done = asyncio.Event()
+
+    async def count_processed(update, context):
+        nonlocal processed
+        processed += 1
+        if processed >= len(updates):
+            done.set()
+
+    # Группа 1 выполняется после основных обработчиков — значит, обновление обработано
+    application.add_handler(TypeHandler(Update, count_processed), group=1)
+
+    secret = 'replay-secret'
+    url_path = 'telegram'
+    await application.initialize()
+    await bot.post_init(application)
+    await application.updater.start_webhook(
+        listen='127.0.0.1', port=args.port, url_path=url_path, secret_token=secret,
+        webhook_url=f"http://127.0.0.1:{args.port}/{url_path}",
+    )
+    await application.start()
+    try:
+        started = time.perf_counter()
+        samples, errors = await post_updates(
+            f"http://127.0.0.1:{args.port}/{url_path}", secret, updates, args.concurrency
+        )
+        elapsed = time.perf_counter() - started
+        await asyncio.wait_for(done.wait(), timeout=args.timeout)
+        processed_elapsed = time.perf_counter() - started
+    finally:
+        await application.updater.stop()
+        await application.stop()
+        await bot.post_shutdown(application)
+        await application.shutdown()
+        fake_api.stop()
+
+    report(updates, samples, errors, elapsed, processed_elapsed)
+    print(f"Вызовов Bot API: {dict(fake_api.calls)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='webhook запущенного бота; без него бот поднимается в этом процессе')
+    parser.add_argument('--secret', default='', help='WEBHOOK_SECRET_TOKEN запущенного бота')
+    parser.add_argument('--file', help='JSONL с записанными Update')
+    parser.add_argument('--updates', type=int, default=2000, help='количество сгенерированных обновлений')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--questions', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=20, help='одновременных HTTP-запросов')
+    parser.add_argument('--port', type=int, default=8787, help='порт webhook-сервера при запуске в процессе')
+    parser.add_argument('--api-delay', type=float, default=0.0, help='задержка ответа заглушки Bot API, мс')
+    parser.add_argument('--concurrent-updates', type=int, default=None,
+                        help='параллельная обработка обновлений (по умолчанию CONCURRENT_UPDATES)')
+    parser.add_argument('--timeout', type=float, default=300.0, help='ожидание обработки всех обновлений, с')
+    args = parser.parse_args()
+
+    updates = load_updates(args.file) if args.file else synthetic_updates(args.updates, args.users, args.questions)
+
+    if args.url:
+        started = time.perf_counter()
+        samples, errors = asyncio.run(post_updates(args.url, args.secret, updates, args.concurrency))
+        report(updates, samples, errors, time.perf_counter() - started)
+        return
+
+    with temporary_database('webhook') as config:
+        seed_questions(config, args.questions)
+        asyncio.run(replay_in_process(args, updates, config))
+
+
+if __name__ == '__main__':
+    main()
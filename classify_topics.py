@@ -1,4 +1,11 @@
-import json
+import argparse
+import multiprocessing
+import os
+import re
+import time
+from collections import Counter, deque
+
+from data_io import FORMATS, READERS, ItemWriter, detect_format, iter_items
 
 # Определение тем
 TOPICS = {
@@ -71,154 +78,410 @@ TOPICS = {
     ]
 }
 
-def classify_question(question_text):
-    """Классифицирует вопрос по теме на основе ключевых слов"""
-    question_lower = question_text.lower()
-    
-    # Специальные правила для конкретных вопросов
-    special_rules = {
-        "бизнес-ценность": "Специальные задачи",
-        "приоритизируете задачи": "Специальные задачи",
-        "взаимодействуете с другими командами": "Специальные задачи",
-        "подготовка данных": "Обработка и подготовка данных",
-        "этапы подготовки": "Обработка и подготовка данных",
-        "основные этапы подготовки": "Обработка и подготовка данных",
-        "нейронные сети вместо": "Глубокое обучение",
-        "использовать нейронные сети": "Глубокое обучение",
-        "регуляризации": "Регуляризация и переобучение",
-        "про регуляризации": "Регуляризация и переобучение",
-        "распределенной среде": "Инфраструктура и инструменты",
-        "распределенная среда": "Инфраструктура и инструменты",
-        "работа с данными в распределенной": "Инфраструктура и инструменты",
-        "минимизации с ограничениями": "Оптимизация и обучение",
-        "решать задачу минимизации": "Оптимизация и обучение",
-        "градиентный спуск": "Оптимизация и обучение",
-        "минимизации с ограничениями": "Оптимизация и обучение",
-        "выбрали гиперпараметры": "Оптимизация и обучение",
-        "утечкой данных": "Обработка и подготовка данных",
-        "data leakage": "Обработка и подготовка данных",
-        "обрабатывать новую информацию": "Оптимизация и обучение",
-        "дообучения модели": "Оптимизация и обучение",
-        "важность признаков": "Обработка и подготовка данных",
-        "отбора признаков": "Обработка и подготовка данных",
-        "высокой размерностью": "Статистика и математика",
-        "размерность данных": "Статистика и математика",
-        "уменьшить размерность": "Статистика и математика",
-        "тренда или сезонности": "Специальные задачи",
-        "временные ряды": "Специальные задачи",
-        "кластеризация": "Специальные задачи",
-        "k-средних": "Специальные задачи",
-        "dbscan": "Специальные задачи",
-        "выбросы": "Обработка и подготовка данных",
-        "аномалия": "Обработка и подготовка данных",
-        "выборочная дисперсия": "Статистика и математика",
-        "выбрать правильный алгоритм": "Регрессия и классификация",
-        "supervised и unsupervised": "Регрессия и классификация",
-        "выбрать порог": "Метрики и валидация",
-        "порог отправки": "Метрики и валидация",
-        "метрики счастья": "Специальные задачи",
-        "рекомендации": "Специальные задачи",
-        "компьютерное зрение": "Специальные задачи",
-        "3д": "Специальные задачи",
-        "облако точек": "Специальные задачи",
-        "треугольник": "Специальные задачи",
-        "картинок": "Специальные задачи",
-        "изображений": "Специальные задачи",
-        "классификатор картинок": "Глубокое обучение",
-        "классифаера картинок": "Глубокое обучение",
-        "выкачивал датасет картинок": "Инфраструктура и инструменты",
-        "распараллелить": "Инфраструктура и инструменты",
-        "батч 2048": "Оптимизация и обучение",
-        "мини-батчей": "Оптимизация и обучение",
-        "обработка на основе мини-батчей": "Оптимизация и обучение",
-        "полином": "Регрессия и классификация",
-        "параболой": "Регрессия и классификация",
-        "аналитическим методом": "Оптимизация и обучение",
-        "мало данных": "Метрики и валидация",
-        "ограниченным доступом к данным": "Обработка и подготовка данных",
-        "метаданными": "Инфраструктура и инструменты",
-        "версии данных": "Инфраструктура и инструменты",
-        "интерпретации сложных моделей": "Метрики и валидация",
-        "калибровки": "Метрики и валидация",
-        "калибровка": "Метрики и валидация",
-        "евклидова и косинусная": "Статистика и математика",
-        "меры расстояния": "Статистика и математика",
-        "разворота списка": "Инфраструктура и инструменты",
-        "полином с большими степенями": "Регуляризация и переобучение",
-        "может выдать на тесте предикт": "Регрессия и классификация",
-        "таргет имел значения": "Регрессия и классификация",
-        "значения таргета больше 0": "Регрессия и классификация",
-        "может предсказать отрицательное": "Регрессия и классификация",
-        "глубина деревьев": "Ансамбли и деревья",
-        "что будет если сделать bagging": "Ансамбли и деревья",
-        "bias, variance": "Метрики и валидация",
-        "что уменьшается а что растет": "Метрики и валидация",
-        "больше склонно к переобучению": "Регуляризация и переобучение",
-        "склонно к переобучению": "Регуляризация и переобучение",
-        "град бустинг или случайный лес": "Ансамбли и деревья",
-        "где градиент в град бустинге": "Ансамбли и деревья",
-        "целевая переменная у n дерева": "Ансамбли и деревья",
-        "подмножество фичей выбираем": "Ансамбли и деревья",
-        "вершинах дерева": "Ансамбли и деревья",
-        "реализации град бустингов": "Ансамбли и деревья",
-        "особенности и отличия": "Ансамбли и деревья",
-        "почему в проде используют": "MLOps и продакшен",
-        "в проде используют": "MLOps и продакшен",
-        "микросервисов": "Инфраструктура и инструменты",
-        "монолита и микросервисов": "Инфраструктура и инструменты",
-        "взаимодействия микросервисов": "Инфраструктура и инструменты",
-        "спроектировать сервис": "Специальные задачи",
-        "рекомендации мест": "Специальные задачи",
-        "классического cv": "Метрики и валидация",
-        "методы классического cv": "Метрики и валидация",
-        "разметку и построение модели": "Регрессия и классификация",
-        "разметку и построение": "Регрессия и классификация",
-        "классификации запросов": "Регрессия и классификация",
-        "описать как будем размечать": "Регрессия и классификация",
-    }
-    
+# Специальные правила для конкретных вопросов: срабатывает первое по порядку найденное
+SPECIAL_RULES = {
+    "бизнес-ценность": "Специальные задачи",
+    "приоритизируете задачи": "Специальные задачи",
+    "взаимодействуете с другими командами": "Специальные задачи",
+    "подготовка данных": "Обработка и подготовка данных",
+    "этапы подготовки": "Обработка и подготовка данных",
+    "основные этапы подготовки": "Обработка и подготовка данных",
+    "нейронные сети вместо": "Глубокое обучение",
+    "использовать нейронные сети": "Глубокое обучение",
+    "регуляризации": "Регуляризация и переобучение",
+    "про регуляризации": "Регуляризация и переобучение",
+    "распределенной среде": "Инфраструктура и инструменты",
+    "распределенная среда": "Инфраструктура и инструменты",
+    "работа с данными в распределенной": "Инфраструктура и инструменты",
+    "минимизации с ограничениями": "Оптимизация и обучение",
+    "решать задачу минимизации": "Оптимизация и обучение",
+    "градиентный спуск": "Оптимизация и обучение",
+    "минимизации с ограничениями": "Оптимизация и обучение",
+    "выбрали гиперпараметры": "Оптимизация и обучение",
+    "утечкой данных": "Обработка и подготовка данных",
+    "data leakage": "Обработка и подготовка данных",
+    "обрабатывать новую информацию": "Оптимизация и обучение",
+    "дообучения модели": "Оптимизация и обучение",
+    "важность признаков": "Обработка и подготовка данных",
+    "отбора признаков": "Обработка и подготовка данных",
+    "высокой размерностью": "Статистика и математика",
+    "размерность данных": "Статистика и математика",
+    "уменьшить размерность": "Статистика и математика",
+    "тренда или сезонности": "Специальные задачи",
+    "временные ряды": "Специальные задачи",
+    "кластеризация": "Специальные задачи",
+    "k-средних": "Специальные задачи",
+    "dbscan": "Специальные задачи",
+    "выбросы": "Обработка и подготовка данных",
+    "аномалия": "Обработка и подготовка данных",
+    "выборочная дисперсия": "Статистика и математика",
+    "выбрать правильный алгоритм": "Регрессия и классификация",
+    "supervised и unsupervised": "Регрессия и классификация",
+    "выбрать порог": "Метрики и валидация",
+    "порог отправки": "Метрики и валидация",
+    "метрики счастья": "Специальные задачи",
+    "рекомендации": "Специальные задачи",
+    "компьютерное зрение": "Специальные задачи",
+    "3д": "Специальные задачи",
+    "облако точек": "Специальные задачи",
+    "треугольник": "Специальные задачи",
+    "картинок": "Специальные задачи",
+    "изображений": "Специальные задачи",
+    "классификатор картинок": "Глубокое обучение",
+    "классифаера картинок": "Глубокое обучение",
+    "выкачивал датасет картинок": "Инфраструктура и инструменты",
+    "распараллелить": "Инфраструктура и инструменты",
+    "батч 2048": "Оптимизация и обучение",
+    "мини-батчей": "Оптимизация и обучение",
+    "обработка на основе мини-батчей": "Оптимизация и обучение",
+    "полином": "Регрессия и классификация",
+    "параболой": "Регрессия и классификация",
+    "аналитическим методом": "Оптимизация и обучение",
+    "мало данных": "Метрики и валидация",
+    "ограниченным доступом к данным": "Обработка и подготовка данных",
+    "метаданными": "Инфраструктура и инструменты",
+    "версии данных": "Инфраструктура и инструменты",
+    "интерпретации сложных моделей": "Метрики и валидация",
+    "калибровки": "Метрики и валидация",
+    "калибровка": "Метрики и валидация",
+    "евклидова и косинусная": "Статистика и математика",
+    "меры расстояния": "Статистика и математика",
+    "разворота списка": "Инфраструктура и инструменты",
+    "полином с большими степенями": "Регуляризация и переобучение",
+    "может выдать на тесте предикт": "Регрессия и классификация",
+    "таргет имел значения": "Регрессия и классификация",
+    "значения таргета больше 0": "Регрессия и классификация",
+    "может предсказать отрицательное": "Регрессия и классификация",
+    "глубина деревьев": "Ансамбли и деревья",
+    "что будет если сделать bagging": "Ансамбли и деревья",
+    "bias, variance": "Метрики и валидация",
+    "что уменьшается а что растет": "Метрики и валидация",
+    "больше склонно к переобучению": "Регуляризация и переобучение",
+    "склонно к переобучению": "Регуляризация и переобучение",
+    "град бустинг или случайный лес": "Ансамбли и деревья",
+    "где градиент в град бустинге": "Ансамбли и деревья",
+    "целевая переменная у n дерева": "Ансамбли и деревья",
+    "подмножество фичей выбираем": "Ансамбли и деревья",
+    "вершинах дерева": "Ансамбли и деревья",
+    "реализации град бустингов": "Ансамбли и деревья",
+    "особенности и отличия": "Ансамбли и деревья",
+    "почему в проде используют": "MLOps и продакшен",
+    "в проде используют": "MLOps и продакшен",
+    "микросервисов": "Инфраструктура и инструменты",
+    "монолита и микросервисов": "Инфраструктура и инструменты",
+    "взаимодействия микросервисов": "Инфраструктура и инструменты",
+    "спроектировать сервис": "Специальные задачи",
+    "рекомендации мест": "Специальные задачи",
+    "классического cv": "Метрики и валидация",
+    "методы классического cv": "Метрики и валидация",
+    "разметку и построение модели": "Регрессия и классификация",
+    "разметку и построение": "Регрессия и классификация",
+    "классификации запросов": "Регрессия и классификация",
+    "описать как будем размечать": "Регрессия и классификация",
+}
+
+# Общие правила, если не найдено ни одного ключевого слова: срабатывает первая группа по порядку
+FALLBACK_RULES = [
+    (["python", "питон", "dict", "список", "args", "kwargs", "разворота"], "Инфраструктура и инструменты"),
+    (["модель", "алгоритм", "обучить"], "Регрессия и классификация"),
+    (["данные", "датасет"], "Обработка и подготовка данных"),
+]
+
+DEFAULT_TOPIC = "Специальные задачи"
+
+
+def _trie_pattern(node):
+    """Регулярное выражение по префиксному дереву: в каждой позиции находит самый длинный ключ"""
+    alternatives = [re.escape(char) + _trie_pattern(child) for char, child in sorted(node.items()) if char]
+    if not alternatives:
+        return ''
+    body = alternatives[0] if len(alternatives) == 1 else '(?:' + '|'.join(alternatives) + ')'
+    # Конец ключа: жадный "?" сначала пробует продолжение, затем останавливается на этом ключе
+    return '(?:' + body + ')?' if '' in node else body
+
+
+def _compile_matcher():
+    """
+    Собирает одно регулярное выражение по всем ключевым словам TOPICS, SPECIAL_RULES и FALLBACK_RULES.
+
+    Поиск с опережающей проверкой (?=(...)) в каждой позиции текста находит самый длинный ключ,
+    начинающийся в ней. Остальные ключи, начинающиеся в той же позиции, — его префиксы,
+    поэтому для каждого ключа заранее посчитано замыкание по префиксам.
+    """
+    special_rank = {}
+    for rank, key in enumerate(SPECIAL_RULES):
+        special_rank[key] = (rank, SPECIAL_RULES[key])
+
+    topic_index = {topic: index for index, topic in enumerate(TOPICS)}
+    topic_hits = {}
+    for topic, keywords in TOPICS.items():
+        for keyword in keywords:
+            # Повтор ключевого слова в списке темы засчитывается столько раз, сколько он встречается
+            topic_hits.setdefault(keyword.lower(), Counter())[topic_index[topic]] += 1
+
+    fallback_rank = {}
+    for rank, (words, _) in enumerate(FALLBACK_RULES):
+        for word in words:
+            fallback_rank.setdefault(word, rank)
+
+    keys = set(special_rank) | set(topic_hits) | set(fallback_rank)
+    trie = {}
+    for key in keys:
+        node = trie
+        for char in key:
+            node = node.setdefault(char, {})
+        node[''] = {}
+
+    closure = {key: [prefix for prefix in (key[:end] for end in range(1, len(key) + 1)) if prefix in keys]
+               for key in keys}
+    pattern = re.compile('(?=(' + _trie_pattern(trie) + '))')
+    return pattern, closure, special_rank, topic_hits, fallback_rank
+
+
+_PATTERN, _CLOSURE, _SPECIAL_RANK, _TOPIC_HITS, _FALLBACK_RANK = _compile_matcher()
+_TOPIC_NAMES = list(TOPICS)
+
+
+def find_keywords(question_lower):
+    """Все ключи (в нижнем регистре), которые входят в текст, — за один проход по тексту"""
+    found = set()
+    for match in _PATTERN.finditer(question_lower):
+        found.update(_CLOSURE[match.group(1)])
+    return found
+
+
+def _topic_scores(found):
+    counts = Counter()
+    for key in found:
+        hits = _TOPIC_HITS.get(key)
+        if hits:
+            counts.update(hits)
+    # Порядок тем как в TOPICS — от него зависит выбор при равенстве очков
+    return {_TOPIC_NAMES[index]: counts[index] for index in sorted(counts)}
+
+
+def topic_scores(question_text):
+    """Количество совпадений ключевых слов по темам (только темы с совпадениями)"""
+    return _topic_scores(find_keywords(question_text.lower()))
+
+
+def _keyword_topic(found):
+    """Тема по специальным правилам и ключевым словам TOPICS; None, если ничего не найдено"""
     # Проверяем специальные правила
-    for key, topic in special_rules.items():
-        if key in question_lower:
-            return topic
-    
+    special = [_SPECIAL_RANK[key] for key in found if key in _SPECIAL_RANK]
+    if special:
+        return min(special)[1]
+
     # Подсчет совпадений для каждой темы
-    scores = {}
-    for topic, keywords in TOPICS.items():
-        score = sum(1 for keyword in keywords if keyword.lower() in question_lower)
-        if score > 0:
-            scores[topic] = score
-    
+    scores = _topic_scores(found)
     if not scores:
-        # Если не найдено совпадений, пробуем более общие правила
-        if any(word in question_lower for word in ["python", "питон", "dict", "список", "args", "kwargs", "разворота"]):
-            return "Инфраструктура и инструменты"
-        elif any(word in question_lower for word in ["модель", "алгоритм", "обучить"]):
-            return "Регрессия и классификация"
-        elif any(word in question_lower for word in ["данные", "датасет"]):
-            return "Обработка и подготовка данных"
-        else:
-            return "Специальные задачи"
-    
-    # Возвращаем тему с наибольшим количеством совпадений
+        return None
+
+    # Возвращаем тему с наибольшим количеством совпадений (при равенстве — первую в TOPICS)
     return max(scores.items(), key=lambda x: x[1])[0]
 
-def update_topics_in_json():
+
+def keyword_topic(question_text):
+    """Тема по ключевым словам без общих правил; None, если ни одно ключевое слово не найдено"""
+    return _keyword_topic(find_keywords(question_text.lower()))
+
+
+def classify_question(question_text):
+    """Классифицирует вопрос по теме на основе ключевых слов"""
+    found = find_keywords(question_text.lower())
+    topic = _keyword_topic(found)
+    if topic is not None:
+        return topic
+
+    # Если не найдено совпадений, пробуем более общие правила
+    fallback = [_FALLBACK_RANK[key] for key in found if key in _FALLBACK_RANK]
+    if fallback:
+        return FALLBACK_RULES[min(fallback)][1]
+    return DEFAULT_TOPIC
+
+
+BACKENDS = ('keywords', 'model', 'hybrid')
+
+# Бэкенд классификации текущего процесса (в пуле задается инициализатором каждого процесса)
+_backend = 'keywords'
+_model = None
+
+
+def _init_backend(backend, model_path=None):
+    global _backend, _model
+    _backend = backend
+    if backend != 'keywords':
+        # numpy нужен только для модели
+        from topic_model import TopicModel
+        _model = TopicModel.load(model_path)
+
+
+def _classify_texts(questions):
+    """Задача процесса пула: получает только тексты вопросов, а не элементы целиком"""
+    if _backend == 'keywords':
+        return [classify_question(question) for question in questions]
+    if _backend == 'model':
+        return _model.predict(questions)
+    # hybrid: модель — только для вопросов, где не нашлось ключевых слов
+    topics = [keyword_topic(question) for question in questions]
+    unknown = [index for index, topic in enumerate(topics) if topic is None]
+    if unknown:
+        for index, topic in zip(unknown, _model.predict([questions[index] for index in unknown])):
+            topics[index] = topic
+    return topics
+
+
+def _chunks(items, chunk_size):
+    chunk = []
+    for item in items:
+        chunk.append(item)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _ordered_map(pool, func, tasks, max_pending):
+    """
+    Как pool.imap, но с ограничением числа задач в работе: Pool.imap вычитывает вход целиком,
+    а здесь следующий блок читается, только когда освободилось место. Результаты — в порядке входа.
+    """
+    pending = deque()
+    for task in tasks:
+        pending.append(pool.apply_async(func, (task,)))
+        if len(pending) >= max_pending:
+            yield pending.popleft().get()
+    while pending:
+        yield pending.popleft().get()
+
+
+def output_format_for(input_path, output_path=None, input_format=None, output_format=None):
+    """
+    Формат выхода: заданный, иначе формат входа при перезаписи входа, иначе по расширению выхода.
+    ValueError, если в этот формат ItemWriter не пишет (например, CSV без -o)
+    """
+    output_path = output_path or input_path
+    fmt = output_format or (input_format if output_path == input_path else None) or detect_format(output_path)
+    if fmt not in FORMATS:
+        raise ValueError(f"Запись в формате {fmt} не поддерживается, выберите один из: {', '.join(FORMATS)} "
+                         f"(задайте -o или --output-format)")
+    return fmt
+
+
+def classify_stream(input_path, output_path=None, input_format=None, output_format=None,
+                    workers=None, chunk_size=1000, reclassify=False, progress_interval=5.0,
+                    backend='keywords', model_path=None, cache_path=None):
+    """
+    Потоково классифицирует выгрузку: читает элементы по одному, классифицирует блоками
+    по chunk_size в пуле из workers процессов и пишет результат в порядке входа.
+    Для бэкендов model/hybrid предсказания запоминаются по хешу текста в cache_path,
+    и при повторном запуске неизмененные вопросы не классифицируются заново.
+    Возвращает (всего элементов, классифицировано).
+    """
+    # Формат выхода проверяется до чтения входа и запуска пула
+    output_format = output_format_for(input_path, output_path, input_format, output_format)
+    output_path = output_path or input_path
+    workers = workers or os.cpu_count() or 1
+    items = iter_items(input_path, input_format)
+
+    cache = None
+    if backend != 'keywords':
+        from topic_model import TopicModel, PredictionCache
+        cache = PredictionCache(cache_path, TopicModel.load(model_path).fingerprint)
+
+    def tasks():
+        # Блок элементов уходит в pending, а в процесс пула — только тексты вопросов, которые нужно классифицировать
+        for chunk in _chunks(items, chunk_size):
+            targets = []
+            for item in chunk:
+                if not reclassify and item.get('topic'):
+                    continue
+                topic = cache.get(item['question']) if cache else None
+                if topic is None:
+                    targets.append(item)
+                else:
+                    item['topic'] = topic
+            pending_chunks.append((chunk, targets))
+            yield [item['question'] for item in targets]
+
+    total = 0
+    classified = 0
+    pending_chunks = deque()
+    started = time.perf_counter()
+    last_report = started
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_backend, initargs=(backend, model_path))
+    else:
+        _init_backend(backend, model_path)
+    try:
+        results = (
+            _ordered_map(pool, _classify_texts, tasks(), max_pending=workers * 2) if pool
+            else map(_classify_texts, tasks())
+        )
+        with ItemWriter(output_path, output_format) as writer:
+            for topics in results:
+                chunk, targets = pending_chunks.popleft()
+                for item, topic in zip(targets, topics):
+                    item['topic'] = topic
+                    if cache:
+                        cache.put(item['question'], topic)
+                for item in chunk:
+                    writer.write(item)
+                total += len(chunk)
+                classified += len(targets)
+                now = time.perf_counter()
+                if progress_interval and now - last_report >= progress_interval:
+                    last_report = now
+                    print(f"Обработано {total} элементов, {total / (now - started):,.0f} элементов/s", flush=True)
+    finally:
+        if pool:
+            pool.terminate()
+            pool.join()
+        if cache:
+            cache.save()
+
+    elapsed = time.perf_counter() - started
+    print(f"Обработано {total} элементов за {elapsed:.2f} s "
+          f"({total / elapsed if elapsed else 0:,.0f} элементов/s), классифицировано {classified}"
+          + (f", из кэша {cache.hits}" if cache else ""))
+    return total, classified
+
+
+def update_topics_in_json(path='raw.json'):
     """Читает JSON, классифицирует вопросы и обновляет поле topic"""
-    with open('raw.json', 'r', encoding='utf-8') as f:
-        data = json.load(f)
-    
-    for item in data:
-        if not item.get('topic') or item['topic'] == '':
-            topic = classify_question(item['question'])
-            item['topic'] = topic
-            print(f"ID {item['id']}: {topic}")
-    
-    with open('raw.json', 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=2)
-    
-    print(f"\nОбновлено {len(data)} вопросов")
+    total, classified = classify_stream(path, workers=1)
+    print(f"\nОбновлено {classified} из {total} вопросов")
 
-if __name__ == "__main__":
-    update_topics_in_json()
 
+def main():
+    parser = argparse.ArgumentParser(description="Классификация вопросов выгрузки по темам")
+    parser.add_argument('input', nargs='?', default='raw.json', help='JSON-массив, JSONL или CSV, можно сжатые .gz/.zst (по умолчанию raw.json)')
+    parser.add_argument('-o', '--output', help='куда записать результат (по умолчанию — перезаписать вход)')
+    parser.add_argument('--input-format', choices=sorted(READERS), help='формат входа (по умолчанию по расширению)')
+    parser.add_argument('--output-format', choices=FORMATS, help='формат выхода (по умолчанию по расширению)')
+    parser.add_argument('-j', '--workers', type=int, default=None, help='процессов (по умолчанию по числу ядер)')
+    parser.add_argument('--chunk-size', type=int, default=1000, help='элементов в блоке для одного процесса')
+    parser.add_argument('--all', action='store_true', help='переклассифицировать и элементы с уже заданной темой')
+    parser.add_argument('--backend', choices=BACKENDS, default='keywords',
+                        help='keywords — ключевые слова; model — модель topic_model.py; '
+                             'hybrid — модель для вопросов без ключевых слов')
+    parser.add_argument('--model', default='topic_model.npz', help='файл модели для model/hybrid')
+    parser.add_argument('--cache', help='файл кэша предсказаний модели по хешу текста вопроса')
+    args = parser.parse_args()
+
+    try:
+        output_format_for(args.input, args.output, args.input_format, args.output_format)
+    except ValueError as e:
+        parser.error(str(e))
+
+    classify_stream(
+        args.input, args.output, input_format=args.input_format, output_format=args.output_format,
+        workers=args.workers, chunk_size=args.chunk_size, reclassify=args.all,
+        backend=args.backend, model_path=args.model, cache_path=args.cache,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Потоковое чтение и запись выгрузок вопросов: JSON-массив, JSONL (один объект на строку)
+или CSV с заголовком, в том числе сжатые gzip (.gz) или zstd (.zst, нужен пакет zstandard).
+Файл не загружается в память целиком — элементы читаются и пишутся по одному.
+"""
+import csv
+import gzip
+import io
+import json
+import os
+
+READ_CHUNK_SIZE = 1 << 20  # Символов за одно чтение файла
+
+FORMATS = ('json', 'jsonl')  # Форматы, в которые пишет ItemWriter
+COMPRESSIONS = ('none', 'gzip', 'zstd')
+
+COMPRESSION_SUFFIXES = {'.gz': 'gzip', '.zst': 'zstd'}
+
+
+def detect_compression(path):
+    """Сжатие по расширению файла: .gz — gzip, .zst — zstd, иначе none"""
+    return COMPRESSION_SUFFIXES.get(os.path.splitext(path)[1], 'none')
+
+
+def detect_format(path):
+    """Формат по расширению файла без суффикса сжатия: .jsonl/.ndjson — JSONL, .csv — CSV, иначе JSON-массив"""
+    if detect_compression(path) != 'none':
+        path = os.path.splitext(path)[0]
+    if path.endswith(('.jsonl', '.ndjson')):
+        return 'jsonl'
+    if path.endswith('.csv'):
+        return 'csv'
+    return 'json'
+
+
+def _zstandard():
+    try:
+        import zstandard
+    except ImportError:
+        raise RuntimeError("Для файлов .zst нужен пакет zstandard: pip install zstandard") from None
+    return zstandard
+
+
+def open_text(path, mode='r', compression=None):
+    """
+    Открывает файл как текст в UTF-8 для чтения ('r') или записи ('w'),
+    прозрачно распаковывая или сжимая его. compression=None — по расширению.
+    При чтении отбрасывается BOM, с которого начинают файлы Excel и Блокнот Windows.
+    """
+    compression = compression or detect_compression(path)
+    encoding = 'utf-8-sig' if mode == 'r' else 'utf-8'
+    if compression == 'gzip':
+        return gzip.open(path, mode + 't', encoding=encoding, newline='')
+    if compression == 'zstd':
+        zstandard = _zstandard()
+        raw = open(path, mode + 'b')
+        if mode == 'r':
+            stream = zstandard.ZstdDecompressor().stream_reader(raw, closefd=True)
+        else:
+            stream = zstandard.ZstdCompressor().stream_writer(raw, closefd=True)
+        return io.TextIOWrapper(stream, encoding=encoding, newline='')
+    if compression != 'none':
+        raise ValueError(f"Неизвестное сжатие: {compression}")
+    return open(path, mode, encoding=encoding, newline='')
+
+
+def iter_jsonl(f):
+    """Элементы из JSONL; пустые строки пропускаются"""
+    for line_number, line in enumerate(f, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError as e:
+            raise ValueError(f"Некорректный JSON в строке {line_number}: {e}") from e
+
+
+def iter_json_array(f, chunk_size=READ_CHUNK_SIZE):
+    """Элементы JSON-массива верхнего уровня, прочитанные по частям через raw_decode"""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    position = 0
+    started = False
+    eof = False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+        buffer = buffer[position:] + chunk
+        position = 0
+
+    def skip_whitespace():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n':
+                position += 1
+            if position < len(buffer) or eof:
+                return
+            fill()
+
+    fill()
+    skip_whitespace()
+    if buffer[position:position + 1] != '[':
+        raise ValueError("Ожидался JSON-массив")
+    position += 1
+
+    while True:
+        skip_whitespace()
+        if position >= len(buffer):
+            raise ValueError("Неожиданный конец файла внутри JSON-массива")
+        char = buffer[position]
+        if char == ']':
+            return
+        if started:
+            if char != ',':
+                raise ValueError(f"Ожидалась запятая между элементами, найдено {char!r}")
+            position += 1
+            skip_whitespace()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except ValueError:
+                # Элемент не поместился в прочитанную часть — дочитываем файл
+                if eof:
+                    raise
+                fill()
+                continue
+            if end == len(buffer) and not eof:
+                # Число на границе чтения могло быть обрезано
+                fill()
+                continue
+            break
+        position = end
+        started = True
+        yield item
+
+
+def iter_csv(f):
+    """Строки CSV с заголовком как словари {колонка: значение}; значения — строки"""
+    yield from csv.DictReader(f)
+
+
+# Читатели по формату: функция получает открытый текстовый файл и лениво отдает элементы.
+# Новый формат добавляется записью в этот словарь.
+READERS = {
+    'json': iter_json_array,
+    'jsonl': iter_jsonl,
+    'csv': iter_csv,
+}
+
+
+def iter_items(path, fmt=None, compression=None):
+    """Потоково читает элементы выгрузки; формат и сжатие по умолчанию определяются по расширению"""
+    fmt = fmt or detect_format(path)
+    if fmt not in READERS:
+        raise ValueError(f"Неизвестный формат выгрузки: {fmt}")
+    with open_text(path, 'r', compression) as f:
+        yield from READERS[fmt](f)
+
+
+class ItemWriter:
+    """
+    Потоково пишет элементы в JSON-массив (в том же виде, что json.dump(..., indent=2))
+    или в JSONL, сжимая их по расширению файла. Запись идет во временный файл, который
+    заменяет целевой при закрытии — поэтому можно читать и перезаписывать один и тот же файл.
+    """
+
+    def __init__(self, path, fmt=None, compression=None):
+        self.path = path
+        self.fmt = fmt or detect_format(path)
+        if self.fmt not in FORMATS:
+            raise ValueError(f"Запись в формате {self.fmt} не поддерживается, выберите один из: {', '.join(FORMATS)}")
+        self.count = 0
+        self._tmp_path = f"{path}.tmp"
+        self._file = open_text(self._tmp_path, 'w', compression or detect_compression(path))
+        if self.fmt == 'json':
+            self._file.write('[')
+
+    def write(self, item):
+        if self.fmt == 'jsonl':
+            self._file.write(json.dumps(item, ensure_ascii=False))
+            self._file.write('\n')
+        else:
+            self._file.write(',\n  ' if self.count else '\n  ')
+            self._file.write(json.dumps(item, ensure_ascii=False, indent=2).replace('\n', '\n  '))
+        self.count += 1
+
+    def close(self):
+        """Дописывает файл и атомарно заменяет им целевой"""
+        if self.fmt == 'json':
+            self._file.write('\n]' if self.count else ']')
+        self._file.close()
+        os.replace(self._tmp_path, self.path)
+
+    def abort(self):
+        """Удаляет недописанный временный файл"""
+        self._file.close()
+        if os.path.exists(self._tmp_path):
+            os.remove(self._tmp_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
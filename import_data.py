@@ -1,15 +1,37 @@
 #!/usr/bin/env python3
 """
 Скрипт для импорта данных из raw.json в PostgreSQL базу данных
+
+По умолчанию импорт инкрементальный: файл за один проход сравнивается с хешами
+questions.content_hash (миграция 008), и в БД отправляются только новые и изменившиеся
+вопросы. Неизменившиеся строки не переписываются, триггеры каталога не срабатывают, если
+менять нечего. Вопросы, которых нет в файле, только печатаются: их удаление каскадом удаляет
+и прогресс пользователей (learned_questions, review_schedule, user_logs), поэтому оно
+выполняется лишь с --delete-missing.
+
+    python import_data.py                      # инкрементальный импорт raw.json
+    python import_data.py dump.jsonl --dry-run # только показать, что изменится
+    python import_data.py dump.jsonl --delete-missing  # и удалить вопросы, которых нет в файле
+    python import_data.py --full               # прежний полный upsert всех строк
+    python import_data.py dump.jsonl --bulk    # миллионы строк: COPY во временную таблицу и один MERGE
+    python import_data.py dump.csv.zst --bulk  # CSV с колонками id,question,topic,answer, сжатый zstd
+
+Файл всегда читается потоком, но инкрементальный импорт держит в памяти хеши всех вопросов
+БД и id всех вопросов файла (сотни МБ на миллионах строк). Постоянную память дает только --bulk:
+записи потоком уходят через COPY FROM STDIN во временную таблицу и сливаются с questions
+одним запросом; память процесса не зависит ни от размера выгрузки, ни от размера каталога.
 """
 
-import json
+import argparse
+import hashlib
 import psycopg2
 from psycopg2.extras import execute_values
 import sys
 import os
 from dotenv import load_dotenv
 
+from data_io import COMPRESSIONS, READERS, iter_items
+
 # Загружаем переменные окружения из .env файла
 load_dotenv()
 
@@ -23,6 +45,18 @@ DB_CONFIG = {
     'sslmode': 'disable'  # Отключаем SSL для подключения внутри Docker сети
 }
 
+BATCH_SIZE = 5000  # Изменений в одном INSERT/UPDATE/DELETE
+FETCH_SIZE = 50000  # Строк за один запрос при чтении хешей из БД
+COPY_READ_SIZE = 1 << 16  # Символов, которые COPY забирает из потока за одно чтение
+MISSING_REPORT_LIMIT = 50  # id отсутствующих в файле вопросов, которые печатаются без --delete-missing
+
+HASH_SEPARATOR = '\x1f'
+
+# Метки в словаре хешей: вопроса нет в БД / вопрос уже встретился в файле
+_MISSING = object()
+_SEEN = object()
+
+
 def create_table(cursor):
     """Создает таблицу questions если её нет"""
     cursor.execute("""
@@ -35,16 +69,302 @@ def create_table(cursor):
     """)
     print("Таблица questions создана или уже существует")
 
-def import_data(json_file='raw.json'):
-    """Импортирует данные из JSON файла в БД"""
+
+def to_record(item):
+    """Кортеж (id, question, topic, answer) из элемента выгрузки"""
+    return (int(item['id']), item['question'], item.get('topic', ''), item.get('answer', ''))
+
+
+def content_hash(question, topic, answer):
+    """md5 содержимого вопроса — та же формула, что у колонки questions.content_hash"""
+    text = HASH_SEPARATOR.join((question, topic or '', answer or ''))
+    return hashlib.md5(text.encode('utf-8')).digest()
+
+
+def plan_changes(items, existing):
+    """
+    Сравнивает элементы выгрузки с хешами из БД за один проход.
+    existing — словарь {id: content_hash}, изменяется на месте: каждый id из файла остается
+    в нем меткой, поэтому память растет с размером каталога и выгрузки (постоянная — у bulk_import).
+    Генерирует ('insert', record), ('update', record), ('unchanged', id) и ('duplicate', id)
+    по ходу чтения, а в конце ('delete', id) для вопросов, которых нет в файле.
+    """
+    for item in items:
+        record = to_record(item)
+        question_id = record[0]
+        stored = existing.get(question_id, _MISSING)
+        if stored is _SEEN:
+            # Повтор id в файле: учитывается только первая запись
+            yield 'duplicate', question_id
+            continue
+        existing[question_id] = _SEEN
+        if stored is _MISSING:
+            yield 'insert', record
+        elif stored != content_hash(*record[1:]):
+            yield 'update', record
+        else:
+            yield 'unchanged', question_id
+
+    for question_id, stored in existing.items():
+        if stored is not _SEEN:
+            yield 'delete', question_id
+
+
+def load_hashes(conn):
+    """Словарь {id: content_hash} всех вопросов, прочитанный серверным курсором"""
+    hashes = {}
+    with conn.cursor(name='import_hashes') as cursor:
+        cursor.itersize = FETCH_SIZE
+        cursor.execute("SELECT id, content_hash FROM questions")
+        for question_id, stored in cursor:
+            hashes[question_id] = bytes(stored)
+    return hashes
+
+
+def has_content_hash(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT 1 FROM information_schema.columns
+            WHERE table_name = 'questions' AND column_name = 'content_hash'
+        """)
+        return cursor.fetchone() is not None
+
+
+def apply_batch(cursor, action, batch):
+    """Отправляет в БД пачку однотипных изменений"""
+    if action == 'insert':
+        execute_values(cursor, """
+            INSERT INTO questions (id, question, topic, answer)
+            VALUES %s
+        """, batch, page_size=len(batch))
+    elif action == 'update':
+        execute_values(cursor, """
+            UPDATE questions q
+            SET question = v.question, topic = v.topic, answer = v.answer
+            FROM (VALUES %s) AS v(id, question, topic, answer)
+            WHERE q.id = v.id
+        """, batch, page_size=len(batch))
+    else:
+        cursor.execute("DELETE FROM questions WHERE id = ANY(%s)", (batch,))
+
+
+def report_missing(question_ids, total):
+    """Печатает вопросы, которых нет в файле и которые удалил бы --delete-missing"""
+    shown = ', '.join(str(question_id) for question_id in question_ids[:MISSING_REPORT_LIMIT])
+    more = f" и еще {total - MISSING_REPORT_LIMIT}" if total > MISSING_REPORT_LIMIT else ""
+    print(f"В файле нет {total} вопросов из БД (не удалены, для удаления нужен --delete-missing): {shown}{more}")
+
+
+def incremental_import(json_file='raw.json', dry_run=False, delete_missing=False, batch_size=BATCH_SIZE,
+                       fmt=None, compression=None):
+    """
+    Инкрементально импортирует вопросы: вставляет новые, обновляет изменившиеся и
+    удаляет отсутствующие в файле (только если delete_missing, иначе печатает их id).
+    Все изменения — в одной транзакции. Возвращает счетчики по видам изменений.
+    """
+    counts = {'insert': 0, 'update': 0, 'delete': 0, 'unchanged': 0, 'duplicate': 0}
+
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        if not has_content_hash(conn):
+            raise RuntimeError("В таблице questions нет content_hash — примените миграции (run_migrations.py)")
+
+        existing = load_hashes(conn)
+        print(f"В БД {len(existing)} вопросов")
+
+        batches = {'insert': [], 'update': [], 'delete': []}
+        kept = []
+        with conn.cursor() as cursor:
+            for action, value in plan_changes(iter_items(json_file, fmt, compression), existing):
+                counts[action] += 1
+                if action == 'duplicate':
+                    print(f"Предупреждение: повторный id {value} в файле, запись пропущена")
+                    continue
+                if action == 'delete' and not delete_missing:
+                    kept.append(value)
+                    continue
+                if action == 'unchanged':
+                    continue
+                batch = batches[action]
+                batch.append(value)
+                if len(batch) >= batch_size and not dry_run:
+                    apply_batch(cursor, action, batch)
+                    batch.clear()
+
+            if not dry_run:
+                for action, batch in batches.items():
+                    if batch:
+                        apply_batch(cursor, action, batch)
+
+        if kept:
+            report_missing(sorted(kept), len(kept))
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    finally:
+        conn.close()
+
+    return counts
+
+
+def _copy_escape(value):
+    # str.replace заметно быстрее str.translate на кириллице
+    return value.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+
+
+def format_copy_row(record):
+    """Строка в текстовом формате COPY: поля через табуляцию, спецсимволы экранированы, None — \\N"""
+    return '\t'.join('\\N' if value is None else _copy_escape(str(value)) for value in record) + '\n'
+
+
+class CopyStream:
+    """
+    Файлоподобный объект для cursor.copy_expert: строки COPY формируются из записей по мере
+    чтения, поэтому в памяти одновременно находится не больше одного блока данных.
+    """
+
+    def __init__(self, records):
+        self._records = iter(records)
+        self._pending = ''
+        self.rows = 0
+
+    def read(self, size=-1):
+        parts = [self._pending]
+        length = len(self._pending)
+        while size < 0 or length < size:
+            record = next(self._records, None)
+            if record is None:
+                break
+            line = format_copy_row(record)
+            parts.append(line)
+            length += len(line)
+            self.rows += 1
+        data = ''.join(parts)
+        if 0 <= size < len(data):
+            data, self._pending = data[:size], data[size:]
+        else:
+            self._pending = ''
+        return data
+
+
+STAGING_TABLE = """
+    CREATE TEMP TABLE questions_staging (
+        ord BIGSERIAL,
+        id INTEGER NOT NULL,
+        question TEXT NOT NULL,
+        topic TEXT,
+        answer TEXT
+    ) ON COMMIT DROP
+"""
+
+# Вопросы, которых нет в выгрузке
+MISSING_CONDITION = "NOT EXISTS (SELECT 1 FROM questions_staging s WHERE s.id = q.id)"
+
+# Есть ли в выгрузке новые или изменившиеся вопросы (останавливается на первом найденном)
+CHANGES_QUERY = """
+    SELECT EXISTS (
+        SELECT 1
+        FROM questions_staging s
+        LEFT JOIN questions q ON q.id = s.id
+        WHERE q.id IS NULL
+           OR (q.question, q.topic, q.answer) IS DISTINCT FROM (s.question, s.topic, s.answer)
+    )
+"""
+
+# Один запрос: вставка новых и обновление изменившихся вопросов. При повторе id в выгрузке
+# берется первая запись, неизменившиеся строки не переписываются.
+MERGE_QUERY = """
+    WITH source AS (
+        SELECT DISTINCT ON (id) id, question, topic, answer
+        FROM questions_staging
+        ORDER BY id, ord
+    ),
+    upserted AS (
+        INSERT INTO questions (id, question, topic, answer)
+        SELECT id, question, topic, answer FROM source
+        ON CONFLICT (id) DO UPDATE SET
+            question = EXCLUDED.question,
+            topic = EXCLUDED.topic,
+            answer = EXCLUDED.answer
+        WHERE (questions.question, questions.topic, questions.answer)
+            IS DISTINCT FROM (EXCLUDED.question, EXCLUDED.topic, EXCLUDED.answer)
+        RETURNING xmax = 0 AS inserted
+    )
+    SELECT
+        (SELECT count(*) FROM source),
+        count(*) FILTER (WHERE inserted),
+        count(*) FILTER (WHERE NOT inserted)
+    FROM upserted
+"""
+
+
+def bulk_import(json_file='raw.json', dry_run=False, delete_missing=False, fmt=None, compression=None):
+    """
+    Загружает выгрузку через COPY FROM STDIN во временную таблицу и сливает ее с questions
+    одним запросом; удаление отсутствующих в файле вопросов — отдельным и только если
+    delete_missing (иначе печатаются их id). Все в одной транзакции.
+    Возвращает те же счетчики, что incremental_import.
+    """
+    conn = psycopg2.connect(**DB_CONFIG)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(STAGING_TABLE)
+            stream = CopyStream(to_record(item) for item in iter_items(json_file, fmt, compression))
+            cursor.copy_expert(
+                "COPY questions_staging (id, question, topic, answer) FROM STDIN",
+                stream, size=COPY_READ_SIZE
+            )
+            print(f"Во временную таблицу загружено {stream.rows} записей")
+            cursor.execute("ANALYZE questions_staging")
+
+            cursor.execute(f"SELECT count(*) FROM questions q WHERE {MISSING_CONDITION}")
+            missing = cursor.fetchone()[0]
+            # Пустые DELETE и INSERT тоже сработали бы триггером версии каталога,
+            # поэтому без изменений запросы на запись не выполняются
+            if missing and delete_missing:
+                cursor.execute(f"DELETE FROM questions q WHERE {MISSING_CONDITION}")
+            elif missing:
+                cursor.execute(
+                    f"SELECT q.id FROM questions q WHERE {MISSING_CONDITION} ORDER BY q.id LIMIT %s",
+                    (MISSING_REPORT_LIMIT,)
+                )
+                report_missing([row[0] for row in cursor.fetchall()], missing)
+
+            cursor.execute(CHANGES_QUERY)
+            if cursor.fetchone()[0]:
+                cursor.execute(MERGE_QUERY)
+                distinct, inserted, updated = cursor.fetchone()
+            else:
+                cursor.execute("SELECT count(DISTINCT id) FROM questions_staging")
+                distinct, inserted, updated = cursor.fetchone()[0], 0, 0
+
+        if dry_run:
+            conn.rollback()
+        else:
+            conn.commit()
+    finally:
+        conn.close()
+
+    return {
+        'insert': inserted,
+        'update': updated,
+        'delete': missing,
+        'unchanged': distinct - inserted - updated,
+        'duplicate': stream.rows - distinct,
+    }
+
+
+def import_data(json_file='raw.json', fmt=None, compression=None):
+    """Импортирует все данные из JSON файла в БД (полный upsert каждой строки)"""
     
     # Читаем JSON файл
     if not os.path.exists(json_file):
         print(f"Ошибка: файл {json_file} не найден")
         sys.exit(1)
     
-    with open(json_file, 'r', encoding='utf-8') as f:
-        data = json.load(f)
+    data = list(iter_items(json_file, fmt, compression))
     
     print(f"Загружено {len(data)} записей из {json_file}")
     print(f"Подключение к БД: host={DB_CONFIG['host']}, database={DB_CONFIG['database']}, user={DB_CONFIG['user']}")
@@ -61,8 +381,7 @@ def import_data(json_file='raw.json'):
         conn.commit()
         
         # Подготавливаем данные для вставки
-        records = [(item['id'], item['question'], item.get('topic', ''), item.get('answer', '')) 
-                   for item in data]
+        records = [to_record(item) for item in data]
         
         # Вставляем данные (используем ON CONFLICT для обновления существующих записей)
         insert_query = """
@@ -95,6 +414,48 @@ def import_data(json_file='raw.json'):
             conn.close()
         print("Соединение с БД закрыто")
 
-if __name__ == '__main__':
-    import_data()
 
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('json_file', nargs='?', default='raw.json', help='выгрузка вопросов: JSON-массив, JSONL или CSV, можно сжатые .gz/.zst')
+    parser.add_argument('--format', choices=sorted(READERS), help='формат выгрузки (по умолчанию по расширению)')
+    parser.add_argument('--compression', choices=COMPRESSIONS, help='сжатие выгрузки (по умолчанию по расширению)')
+    parser.add_argument('--dry-run', action='store_true', help='только посчитать изменения, ничего не записывая')
+    parser.add_argument('--delete-missing', action='store_true',
+                        help='удалить вопросы, которых нет в файле, вместе с прогрессом пользователей по ним')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--full', action='store_true', help='полный upsert всех строк без сравнения хешей')
+    mode.add_argument('--bulk', action='store_true', help='COPY во временную таблицу и слияние одним запросом; '
+                           'единственный режим с памятью, не зависящей от размера файла')
+    args = parser.parse_args()
+
+    if args.full:
+        import_data(args.json_file, args.format, args.compression)
+        return
+
+    if not os.path.exists(args.json_file):
+        print(f"Ошибка: файл {args.json_file} не найден")
+        sys.exit(1)
+
+    print(f"Подключение к БД: host={DB_CONFIG['host']}, database={DB_CONFIG['database']}, user={DB_CONFIG['user']}")
+    try:
+        load = bulk_import if args.bulk else incremental_import
+        counts = load(
+            args.json_file, dry_run=args.dry_run, delete_missing=args.delete_missing,
+            fmt=args.format, compression=args.compression
+        )
+    except (psycopg2.Error, RuntimeError, ValueError, KeyError) as e:
+        print(f"Ошибка импорта: {e}")
+        sys.exit(1)
+
+    deleted = (f"удалено {counts['delete']}" if args.delete_missing
+               else f"нет в файле {counts['delete']} (не удалены)")
+    print(
+        f"{'Пробный прогон, изменения не записаны' if args.dry_run else 'Импорт завершен'}: "
+        f"добавлено {counts['insert']}, обновлено {counts['update']}, {deleted}, "
+        f"без изменений {counts['unchanged']}, повторов id {counts['duplicate']}"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+"""
+Обслуживание месячных секций user_logs (миграция 012)
+
+Создает секции на --months-ahead месяцев вперед и, если задан --retention-months, отсоединяет
+секции месяцев старше срока хранения и удаляет их целиком (DROP TABLE вместо DELETE по истории).
+Текущий месяц всегда сохраняется; срок считается в полных месяцах до него (UTC).
+
+    python maintain_user_logs.py                            # только создать будущие секции
+    python maintain_user_logs.py --retention-months 12      # и удалить логи старше года
+    python maintain_user_logs.py --retention-months 12 --detach-only  # отсоединить, но оставить таблицы
+    python maintain_user_logs.py --retention-months 12 --dry-run      # только показать, что будет сделано
+
+Отсоединенная секция остается обычной таблицей user_logs_YYYY_MM: ее можно выгрузить (pg_dump -t)
+и удалить позже. DETACH ненадолго берет эксклюзивную блокировку user_logs; чтобы не вставать в
+очередь за долгими запросами, ожидание ограничено --lock-timeout.
+"""
+
+import argparse
+import os
+import re
+import sys
+from datetime import date, datetime, timezone
+
+import psycopg2
+from dotenv import load_dotenv
+
+# Загружаем переменные окружения из .env файла
+load_dotenv()
+
+# Параметры подключения к БД из переменных окружения
+DB_CONFIG = {
+    'host': os.getenv('POSTGRES_HOST', 'localhost'),
+    'port': int(os.getenv('POSTGRES_PORT', '5432')),
+    'database': os.getenv('POSTGRES_DB'),
+    'user': os.getenv('POSTGRES_USER'),
+    'password': os.getenv('POSTGRES_PASSWORD'),
+    'sslmode': 'disable'
+}
+
+PARTITION_NAME = re.compile(r'^user_logs_(\d{4})_(\d{2})$')
+DEFAULT_PARTITION = 'user_logs_default'
+
+
+def add_months(month: date, months: int) -> date:
+    """Первое число месяца, отстоящего от month на months (может быть отрицательным)"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_month(name: str):
+    """Месяц секции по имени user_logs_YYYY_MM (None для прочих таблиц)"""
+    match = PARTITION_NAME.match(name)
+    if not match:
+        return None
+    year, month = int(match.group(1)), int(match.group(2))
+    if not 1 <= month <= 12:
+        return None
+    return date(year, month, 1)
+
+
+def retention_cutoff(today: date, retention_months: int) -> date:
+    """Логи до этой даты устарели: хранятся retention_months полных месяцев до текущего"""
+    return add_months(today.replace(day=1), -retention_months)
+
+
+def expired_partitions(names, today: date, retention_months: int) -> list:
+    """Секции, все строки которых старше срока хранения, от старых к новым"""
+    cutoff = retention_cutoff(today, retention_months)
+    months = {name: partition_month(name) for name in names}
+    return sorted((name for name, month in months.items() if month is not None and month < cutoff),
+                  key=months.get)
+
+
+def list_partitions(conn) -> list:
+    """Имена секций user_logs"""
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            SELECT c.relname
+            FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            WHERE i.inhparent = 'user_logs'::regclass
+            ORDER BY c.relname
+            """
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def ensure_partitions(conn, today: date, months_ahead: int, dry_run: bool) -> list:
+    """Создает недостающие секции с текущего месяца на months_ahead вперед, возвращает созданные"""
+    existing = set(list_partitions(conn))
+    missing = [add_months(today.replace(day=1), offset) for offset in range(months_ahead + 1)]
+    missing = [month for month in missing if f"user_logs_{month:%Y_%m}" not in existing]
+    if dry_run:
+        return [f"user_logs_{month:%Y_%m}" for month in missing]
+
+    created = []
+    for month in missing:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT create_user_logs_partition(%s)", (month,))
+            created.append(cursor.fetchone()[0])
+        conn.commit()
+    return created
+
+
+def apply_retention(conn, today: date, retention_months: int, detach_only: bool, dry_run: bool) -> dict:
+    """Отсоединяет (и удаляет) устаревшие секции и чистит устаревшие строки секции по умолчанию"""
+    cutoff = retention_cutoff(today, retention_months)
+    expired = expired_partitions(list_partitions(conn), today, retention_months)
+    result = {'detached': [], 'dropped': [], 'default_deleted': 0}
+    if dry_run:
+        result['detached'] = expired
+        result['dropped'] = [] if detach_only else expired
+        return result
+
+    for name in expired:
+        with conn.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE user_logs DETACH PARTITION "{name}"')
+            result['detached'].append(name)
+            if not detach_only:
+                cursor.execute(f'DROP TABLE "{name}"')
+                result['dropped'].append(name)
+        conn.commit()
+
+    if not detach_only:
+        with conn.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < %s", (cutoff,))
+            result['default_deleted'] = cursor.rowcount
+        conn.commit()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--months-ahead', type=int, default=2, help='сколько месяцев вперед держать секции (по умолчанию 2)')
+    parser.add_argument('--retention-months', type=int, help='хранить логи за столько полных месяцев до текущего')
+    parser.add_argument('--detach-only', action='store_true', help='отсоединять устаревшие секции, не удаляя их')
+    parser.add_argument('--dry-run', action='store_true', help='только показать, что будет сделано')
+    parser.add_argument('--lock-timeout', default='5s', help='ожидание блокировки user_logs (по умолчанию 5s)')
+    args = parser.parse_args()
+
+    if args.months_ahead < 0:
+        parser.error('--months-ahead не может быть отрицательным')
+    if args.retention_months is not None and args.retention_months < 1:
+        parser.error('--retention-months должен быть не меньше 1')
+    if args.detach_only and args.retention_months is None:
+        parser.error('--detach-only имеет смысл только вместе с --retention-months')
+
+    today = datetime.now(timezone.utc).date()
+    print(f"Подключение к БД: host={DB_CONFIG['host']}, database={DB_CONFIG['database']}, user={DB_CONFIG['user']}")
+    try:
+        conn = psycopg2.connect(**DB_CONFIG)
+    except psycopg2.Error as e:
+        print(f"Ошибка подключения к БД: {e}")
+        sys.exit(1)
+
+    prefix = 'Пробный прогон: ' if args.dry_run else ''
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT set_config('lock_timeout', %s, false)", (args.lock_timeout,))
+        conn.commit()
+
+        created = ensure_partitions(conn, today, args.months_ahead, args.dry_run)
+        print(f"{prefix}создано секций: {len(created)} {created if created else ''}".rstrip())
+
+        if args.retention_months is not None:
+            result = apply_retention(conn, today, args.retention_months, args.detach_only, args.dry_run)
+            print(f"{prefix}хранятся логи с {retention_cutoff(today, args.retention_months)}; "
+                  f"отсоединено секций: {len(result['detached'])} {result['detached']}, "
+                  f"удалено: {len(result['dropped'])}, "
+                  f"удалено строк из {DEFAULT_PARTITION}: {result['default_deleted']}")
+
+        with conn.cursor() as cursor:
+            cursor.execute(f"SELECT COUNT(*) FROM {DEFAULT_PARTITION}")
+            default_rows = cursor.fetchone()[0]
+        conn.rollback()
+        if default_rows:
+            print(f"Внимание: в {DEFAULT_PARTITION} {default_rows} строк — для их месяцев нет секций")
+    except psycopg2.Error as e:
+        conn.rollback()
+        print(f"Ошибка обслуживания user_logs: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+-- Миграция 004: Плотный порядковый номер вопроса для быстрого случайного выбора
+-- Добавляет колонку questions.seq, которая всегда заполнена значениями 1..N без пропусков.
+-- Случайный вопрос выбирается по случайному seq через уникальный индекс,
+-- без COUNT и OFFSET по всему каталогу.
+
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS seq INTEGER;
+
+-- Заполняем seq для уже существующих вопросов в порядке id
+UPDATE questions q
+SET seq = numbered.rn
+FROM (
+    SELECT id, row_number() OVER (ORDER BY id) AS rn
+    FROM questions
+) numbered
+WHERE numbered.id = q.id
+  AND q.seq IS DISTINCT FROM numbered.rn;
+
+-- Новый вопрос получает следующий номер после максимального
+CREATE OR REPLACE FUNCTION questions_assign_seq() RETURNS trigger AS $$
+BEGIN
+    NEW.seq := COALESCE((SELECT max(seq) FROM questions), 0) + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- После удаления вопроса на его место переносится вопрос с максимальным seq,
+-- чтобы номера оставались плотными
+CREATE OR REPLACE FUNCTION questions_fill_seq_gap() RETURNS trigger AS $$
+BEGIN
+    UPDATE questions
+    SET seq = OLD.seq
+    WHERE seq = (SELECT max(seq) FROM questions)
+      AND seq > OLD.seq;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_questions_assign_seq ON questions;
+CREATE TRIGGER trg_questions_assign_seq
+    BEFORE INSERT ON questions
+    FOR EACH ROW EXECUTE FUNCTION questions_assign_seq();
+
+DROP TRIGGER IF EXISTS trg_questions_fill_seq_gap ON questions;
+CREATE TRIGGER trg_questions_fill_seq_gap
+    AFTER DELETE ON questions
+    FOR EACH ROW EXECUTE FUNCTION questions_fill_seq_gap();
+
+ALTER TABLE questions ALTER COLUMN seq SET NOT NULL;
+
+-- Уникальный индекс для поиска вопроса по seq и получения max(seq)
+CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_seq ON questions(seq);
+
+COMMENT ON COLUMN questions.seq IS 'Плотный порядковый номер 1..N для равномерного случайного выбора';
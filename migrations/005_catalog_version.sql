@@ -0,0 +1,32 @@
+-- Миграция 005: Версия каталога вопросов для инвалидации кэшей бота
+-- Любое изменение таблицы questions увеличивает версию и отправляет NOTIFY catalog_changed,
+-- чтобы бот сбросил кэш вопросов без перезапуска.
+
+CREATE TABLE IF NOT EXISTS catalog_version (
+    id BOOLEAN PRIMARY KEY DEFAULT TRUE CHECK (id),
+    version BIGINT NOT NULL DEFAULT 1,
+    updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+);
+
+INSERT INTO catalog_version (id, version) VALUES (TRUE, 1)
+ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION catalog_bump_version() RETURNS trigger AS $$
+DECLARE
+    new_version BIGINT;
+BEGIN
+    UPDATE catalog_version
+    SET version = version + 1, updated_at = NOW()
+    WHERE id
+    RETURNING version INTO new_version;
+
+    PERFORM pg_notify('catalog_changed', new_version::text);
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+-- Срабатывает один раз на оператор, а не на каждую строку импорта
+DROP TRIGGER IF EXISTS trg_questions_catalog_version ON questions;
+CREATE TRIGGER trg_questions_catalog_version
+    AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON questions
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
@@ -0,0 +1,27 @@
+-- Миграция 006: Уведомления об изменении выученных вопросов
+-- Каждая вставка или удаление в learned_questions отправляет NOTIFY learned_changed
+-- с полезной нагрузкой "<операция>:<user_id>:<question_id>", чтобы все реплики бота
+-- обновили кэш невыученных вопросов пользователя. TRUNCATE отправляет "T" (сбросить все).
+
+CREATE OR REPLACE FUNCTION learned_questions_notify() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        PERFORM pg_notify('learned_changed', 'T');
+    ELSIF TG_OP = 'INSERT' THEN
+        PERFORM pg_notify('learned_changed', 'I:' || NEW.user_id || ':' || NEW.question_id);
+    ELSE
+        PERFORM pg_notify('learned_changed', 'D:' || OLD.user_id || ':' || OLD.question_id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_learned_questions_notify ON learned_questions;
+CREATE TRIGGER trg_learned_questions_notify
+    AFTER INSERT OR DELETE ON learned_questions
+    FOR EACH ROW EXECUTE FUNCTION learned_questions_notify();
+
+DROP TRIGGER IF EXISTS trg_learned_questions_notify_truncate ON learned_questions;
+CREATE TRIGGER trg_learned_questions_notify_truncate
+    AFTER TRUNCATE ON learned_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION learned_questions_notify();
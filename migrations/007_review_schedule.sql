@@ -0,0 +1,21 @@
+-- Миграция 007: Расписание интервальных повторений (SM-2)
+-- Для каждой пары пользователь/вопрос хранит состояние алгоритма и время следующего показа.
+-- Следующая карточка пользователя выбирается одним поиском по индексу (user_id, due_at).
+
+CREATE TABLE IF NOT EXISTS review_schedule (
+    user_id BIGINT NOT NULL,
+    question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+    ease REAL NOT NULL DEFAULT 2.5,
+    interval_days REAL NOT NULL DEFAULT 0,
+    repetitions INTEGER NOT NULL DEFAULT 0,
+    lapses INTEGER NOT NULL DEFAULT 0,
+    due_at TIMESTAMP WITH TIME ZONE NOT NULL,
+    last_reviewed_at TIMESTAMP WITH TIME ZONE,
+    PRIMARY KEY (user_id, question_id)
+);
+
+-- Индекс для выбора ближайшей карточки к повторению
+CREATE INDEX IF NOT EXISTS idx_review_schedule_user_due ON review_schedule(user_id, due_at);
+
+-- Индекс для каскадного удаления при удалении вопроса
+CREATE INDEX IF NOT EXISTS idx_review_schedule_question_id ON review_schedule(question_id);
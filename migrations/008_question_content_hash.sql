@@ -0,0 +1,12 @@
+-- Миграция 008: Хеш содержимого вопроса для инкрементального импорта
+-- questions.content_hash вычисляется самой БД из question, topic и answer, поэтому всегда
+-- соответствует строке. import_data.py сравнивает его с хешем записи из выгрузки и
+-- отправляет в БД только новые, изменившиеся и удаленные вопросы.
+-- Формула должна совпадать с import_data.content_hash: md5 от полей, разделенных символом \x1f.
+
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS content_hash BYTEA
+    GENERATED ALWAYS AS (
+        decode(md5(question || E'\x1f' || COALESCE(topic, '') || E'\x1f' || COALESCE(answer, '')), 'hex')
+    ) STORED;
+
+COMMENT ON COLUMN questions.content_hash IS 'md5 от question, topic и answer для инкрементального импорта';
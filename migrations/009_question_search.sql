@@ -0,0 +1,15 @@
+-- Миграция 009: Полнотекстовый поиск по вопросам
+-- questions.search_vector вычисляется самой БД из question (вес A) и answer (вес B).
+-- Конфигурация russian разбирает кириллические слова стеммером russian_stem, а латинские —
+-- english_stem (и отбрасывает стоп-слова обоих языков), поэтому одной конфигурации хватает
+-- для смешанных русско-английских вопросов. GIN-индекс используется командой /search.
+
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS search_vector TSVECTOR
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('russian', question), 'A') ||
+        setweight(to_tsvector('russian', COALESCE(answer, '')), 'B')
+    ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_questions_search_vector ON questions USING GIN (search_vector);
+
+COMMENT ON COLUMN questions.search_vector IS 'Лексемы question (A) и answer (B) в конфигурации russian для /search';
@@ -0,0 +1,113 @@
+-- Миграция 010: Справочник тем и выбор вопросов по темам
+-- Добавляет таблицу topics и ссылку questions.topic_id вместо сравнения текста темы,
+-- плотный номер вопроса внутри темы questions.topic_seq (1..N без пропусков, как seq
+-- из миграции 004) и таблицу выбранных пользователями тем user_topic_preferences.
+-- Случайный вопрос из выбранных тем выбирается по случайному topic_seq через индекс
+-- (topic_id, topic_seq), а количество вопросов темы равно max(topic_seq).
+
+CREATE TABLE IF NOT EXISTS topics (
+    id SERIAL PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS topic_id INTEGER REFERENCES topics(id);
+ALTER TABLE questions ADD COLUMN IF NOT EXISTS topic_seq INTEGER;
+
+-- Заполняем справочник и ссылки для уже существующих вопросов
+INSERT INTO topics (name)
+SELECT DISTINCT topic FROM questions WHERE topic IS NOT NULL
+ON CONFLICT (name) DO NOTHING;
+
+UPDATE questions q
+SET topic_id = numbered.topic_id,
+    topic_seq = numbered.rn
+FROM (
+    SELECT q.id, t.id AS topic_id, row_number() OVER (PARTITION BY t.id ORDER BY q.id) AS rn
+    FROM questions q
+    JOIN topics t ON t.name = q.topic
+) numbered
+WHERE numbered.id = q.id
+  AND (q.topic_id, q.topic_seq) IS DISTINCT FROM (numbered.topic_id, numbered.rn);
+
+-- Новый вопрос (или вопрос, сменивший тему) получает id темы и следующий номер в ней.
+-- Тема, которой еще нет в справочнике, добавляется в него
+CREATE OR REPLACE FUNCTION questions_assign_topic() RETURNS trigger AS $$
+DECLARE
+    new_topic_id INTEGER;
+BEGIN
+    IF NEW.topic IS NULL THEN
+        NEW.topic_id := NULL;
+        NEW.topic_seq := NULL;
+        RETURN NEW;
+    END IF;
+
+    SELECT id INTO new_topic_id FROM topics WHERE name = NEW.topic;
+    IF new_topic_id IS NULL THEN
+        INSERT INTO topics (name) VALUES (NEW.topic)
+        ON CONFLICT (name) DO NOTHING
+        RETURNING id INTO new_topic_id;
+        IF new_topic_id IS NULL THEN
+            SELECT id INTO new_topic_id FROM topics WHERE name = NEW.topic;
+        END IF;
+    END IF;
+
+    NEW.topic_id := new_topic_id;
+    NEW.topic_seq := COALESCE((SELECT max(topic_seq) FROM questions WHERE topic_id = new_topic_id), 0) + 1;
+    RETURN NEW;
+END;
+$$ LANGUAGE plpgsql;
+
+-- После удаления вопроса или смены его темы на освободившийся номер в прежней теме
+-- переносится вопрос с максимальным topic_seq, чтобы номера оставались плотными
+CREATE OR REPLACE FUNCTION questions_fill_topic_seq_gap() RETURNS trigger AS $$
+BEGIN
+    IF OLD.topic_id IS NULL THEN
+        RETURN NULL;
+    END IF;
+    UPDATE questions
+    SET topic_seq = OLD.topic_seq
+    WHERE topic_id = OLD.topic_id
+      AND topic_seq = (SELECT max(topic_seq) FROM questions WHERE topic_id = OLD.topic_id)
+      AND topic_seq > OLD.topic_seq;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_questions_assign_topic ON questions;
+CREATE TRIGGER trg_questions_assign_topic
+    BEFORE INSERT ON questions
+    FOR EACH ROW EXECUTE FUNCTION questions_assign_topic();
+
+-- Upsert импорта перезаписывает topic тем же значением — номер меняется только при смене темы
+DROP TRIGGER IF EXISTS trg_questions_reassign_topic ON questions;
+CREATE TRIGGER trg_questions_reassign_topic
+    BEFORE UPDATE OF topic ON questions
+    FOR EACH ROW
+    WHEN (OLD.topic IS DISTINCT FROM NEW.topic)
+    EXECUTE FUNCTION questions_assign_topic();
+
+DROP TRIGGER IF EXISTS trg_questions_fill_topic_seq_gap ON questions;
+CREATE TRIGGER trg_questions_fill_topic_seq_gap
+    AFTER DELETE ON questions
+    FOR EACH ROW EXECUTE FUNCTION questions_fill_topic_seq_gap();
+
+DROP TRIGGER IF EXISTS trg_questions_fill_topic_seq_gap_on_update ON questions;
+CREATE TRIGGER trg_questions_fill_topic_seq_gap_on_update
+    AFTER UPDATE OF topic ON questions
+    FOR EACH ROW
+    WHEN (OLD.topic_id IS DISTINCT FROM NEW.topic_id)
+    EXECUTE FUNCTION questions_fill_topic_seq_gap();
+
+-- Поиск вопроса по (теме, номеру) и max(topic_seq) темы
+CREATE UNIQUE INDEX IF NOT EXISTS idx_questions_topic_seq ON questions(topic_id, topic_seq);
+
+-- Выбранные пользователем темы; нет строк — вопросы из всех тем
+CREATE TABLE IF NOT EXISTS user_topic_preferences (
+    user_id BIGINT NOT NULL,
+    topic_id INTEGER NOT NULL REFERENCES topics(id) ON DELETE CASCADE,
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    PRIMARY KEY (user_id, topic_id)
+);
+
+COMMENT ON COLUMN questions.topic_id IS 'Тема вопроса из справочника topics (заполняется триггером по questions.topic)';
+COMMENT ON COLUMN questions.topic_seq IS 'Плотный порядковый номер 1..N внутри темы для случайного выбора по темам';
@@ -0,0 +1,193 @@
+-- Миграция 011: Агрегированная статистика пользователей
+-- Счетчики обновляются инкрементально в тех же транзакциях, что и исходные данные,
+-- поэтому статистика читается за O(число тем), без сканирования истории пользователя:
+--   user_topic_stats     - выучено вопросов по темам (триггеры на learned_questions и questions)
+--   user_daily_activity  - открыто ответов и выучено вопросов за день
+--   user_stats           - всего выучено, текущая и рекордная серия дней с активностью
+-- Выученные вопросы учитываются триггером, открытые ответы — пачкой вместе с записью user_logs
+-- (AsyncDatabase.insert_user_logs). Дни считаются по UTC (функция activity_day).
+
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id BIGINT PRIMARY KEY,
+    learned INTEGER NOT NULL DEFAULT 0,
+    current_streak INTEGER NOT NULL DEFAULT 0,
+    longest_streak INTEGER NOT NULL DEFAULT 0,
+    last_active_day DATE
+);
+
+CREATE TABLE IF NOT EXISTS user_topic_stats (
+    user_id BIGINT NOT NULL,
+    topic_id INTEGER NOT NULL REFERENCES topics(id) ON DELETE CASCADE,
+    learned INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, topic_id)
+);
+
+CREATE TABLE IF NOT EXISTS user_daily_activity (
+    user_id BIGINT NOT NULL,
+    day DATE NOT NULL,
+    revealed INTEGER NOT NULL DEFAULT 0,
+    learned INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day)
+);
+
+CREATE OR REPLACE FUNCTION activity_day(ts TIMESTAMPTZ) RETURNS DATE AS $$
+    SELECT (ts AT TIME ZONE 'UTC')::date
+$$ LANGUAGE sql IMMUTABLE;
+
+-- Учитывает активность пользователя за день и продлевает серию дней подряд.
+-- День раньше последнего активного (запоздавшая пачка логов) серию не меняет
+CREATE OR REPLACE FUNCTION record_user_activity(
+    p_user_id BIGINT, p_day DATE, p_revealed INTEGER, p_learned INTEGER
+) RETURNS void AS $$
+BEGIN
+    INSERT INTO user_daily_activity (user_id, day, revealed, learned)
+    VALUES (p_user_id, p_day, p_revealed, p_learned)
+    ON CONFLICT (user_id, day) DO UPDATE SET
+        revealed = user_daily_activity.revealed + EXCLUDED.revealed,
+        learned = user_daily_activity.learned + EXCLUDED.learned;
+
+    INSERT INTO user_stats AS s (user_id, current_streak, longest_streak, last_active_day)
+    VALUES (p_user_id, 1, 1, p_day)
+    ON CONFLICT (user_id) DO UPDATE SET
+        current_streak = CASE
+            WHEN s.last_active_day >= p_day THEN s.current_streak
+            WHEN s.last_active_day = p_day - 1 THEN s.current_streak + 1
+            ELSE 1
+        END,
+        longest_streak = GREATEST(s.longest_streak, CASE
+            WHEN s.last_active_day >= p_day THEN s.current_streak
+            WHEN s.last_active_day = p_day - 1 THEN s.current_streak + 1
+            ELSE 1
+        END),
+        last_active_day = GREATEST(s.last_active_day, p_day);
+END;
+$$ LANGUAGE plpgsql;
+
+-- Заполняем агрегаты по уже выученным вопросам. Открытые ответы восстановить нельзя:
+-- в user_logs нет user_id
+INSERT INTO user_topic_stats (user_id, topic_id, learned)
+SELECT l.user_id, q.topic_id, COUNT(*)
+FROM learned_questions l
+JOIN questions q ON q.id = l.question_id
+WHERE q.topic_id IS NOT NULL
+GROUP BY l.user_id, q.topic_id
+ON CONFLICT (user_id, topic_id) DO UPDATE SET learned = EXCLUDED.learned;
+
+INSERT INTO user_daily_activity (user_id, day, learned)
+SELECT user_id, activity_day(created_at), COUNT(*)
+FROM learned_questions
+WHERE created_at IS NOT NULL
+GROUP BY user_id, activity_day(created_at)
+ON CONFLICT (user_id, day) DO UPDATE SET learned = EXCLUDED.learned;
+
+-- Серии — отрезки подряд идущих дней: у дней одного отрезка day - номер дня одинаков
+INSERT INTO user_stats (user_id, learned, current_streak, longest_streak, last_active_day)
+SELECT totals.user_id, totals.learned,
+       COALESCE(streaks.current_streak, 0), COALESCE(streaks.longest_streak, 0), streaks.last_active_day
+FROM (
+    SELECT user_id, COUNT(*) AS learned FROM learned_questions GROUP BY user_id
+) totals
+LEFT JOIN (
+    SELECT user_id,
+           (array_agg(length ORDER BY last_day DESC))[1] AS current_streak,
+           max(length) AS longest_streak,
+           max(last_day) AS last_active_day
+    FROM (
+        SELECT user_id, COUNT(*) AS length, max(day) AS last_day
+        FROM (
+            SELECT user_id, day, day - row_number() OVER (PARTITION BY user_id ORDER BY day)::int AS island
+            FROM user_daily_activity
+        ) days
+        GROUP BY user_id, island
+    ) islands
+    GROUP BY user_id
+) streaks ON streaks.user_id = totals.user_id
+ON CONFLICT (user_id) DO UPDATE SET
+    learned = EXCLUDED.learned,
+    current_streak = EXCLUDED.current_streak,
+    longest_streak = EXCLUDED.longest_streak,
+    last_active_day = EXCLUDED.last_active_day;
+
+CREATE OR REPLACE FUNCTION learned_questions_update_stats() RETURNS trigger AS $$
+DECLARE
+    question_topic_id INTEGER;
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        DELETE FROM user_topic_stats;
+        UPDATE user_stats SET learned = 0 WHERE learned <> 0;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'INSERT' THEN
+        SELECT topic_id INTO question_topic_id FROM questions WHERE id = NEW.question_id;
+        PERFORM record_user_activity(NEW.user_id, activity_day(COALESCE(NEW.created_at, now())), 0, 1);
+        UPDATE user_stats SET learned = learned + 1 WHERE user_id = NEW.user_id;
+        IF question_topic_id IS NOT NULL THEN
+            INSERT INTO user_topic_stats (user_id, topic_id, learned)
+            VALUES (NEW.user_id, question_topic_id, 1)
+            ON CONFLICT (user_id, topic_id) DO UPDATE SET learned = user_topic_stats.learned + 1;
+        END IF;
+        RETURN NULL;
+    END IF;
+
+    -- Удаление каскадом вместе с вопросом уже учтено триггером trg_questions_learned_stats_on_delete
+    SELECT topic_id INTO question_topic_id FROM questions WHERE id = OLD.question_id;
+    IF NOT FOUND THEN
+        RETURN NULL;
+    END IF;
+    UPDATE user_stats SET learned = learned - 1 WHERE user_id = OLD.user_id;
+    IF question_topic_id IS NOT NULL THEN
+        UPDATE user_topic_stats SET learned = learned - 1
+        WHERE user_id = OLD.user_id AND topic_id = question_topic_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_learned_questions_stats ON learned_questions;
+CREATE TRIGGER trg_learned_questions_stats
+    AFTER INSERT OR DELETE ON learned_questions
+    FOR EACH ROW EXECUTE FUNCTION learned_questions_update_stats();
+
+DROP TRIGGER IF EXISTS trg_learned_questions_stats_truncate ON learned_questions;
+CREATE TRIGGER trg_learned_questions_stats_truncate
+    AFTER TRUNCATE ON learned_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION learned_questions_update_stats();
+
+-- Вопрос удаляется или меняет тему: счетчики всех, кто его выучил, переносятся.
+-- При удалении это делается до каскадного удаления learned_questions, пока строки еще есть
+CREATE OR REPLACE FUNCTION questions_update_learned_stats() RETURNS trigger AS $$
+BEGIN
+    IF OLD.topic_id IS NOT NULL THEN
+        UPDATE user_topic_stats s SET learned = s.learned - 1
+        FROM learned_questions l
+        WHERE l.question_id = OLD.id AND s.user_id = l.user_id AND s.topic_id = OLD.topic_id;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        UPDATE user_stats s SET learned = s.learned - 1
+        FROM learned_questions l
+        WHERE l.question_id = OLD.id AND s.user_id = l.user_id;
+        RETURN OLD;
+    END IF;
+
+    IF NEW.topic_id IS NOT NULL THEN
+        INSERT INTO user_topic_stats (user_id, topic_id, learned)
+        SELECT l.user_id, NEW.topic_id, 1 FROM learned_questions l WHERE l.question_id = NEW.id
+        ON CONFLICT (user_id, topic_id) DO UPDATE SET learned = user_topic_stats.learned + 1;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_questions_learned_stats_on_delete ON questions;
+CREATE TRIGGER trg_questions_learned_stats_on_delete
+    BEFORE DELETE ON questions
+    FOR EACH ROW EXECUTE FUNCTION questions_update_learned_stats();
+
+DROP TRIGGER IF EXISTS trg_questions_learned_stats_on_topic_change ON questions;
+CREATE TRIGGER trg_questions_learned_stats_on_topic_change
+    AFTER UPDATE OF topic ON questions
+    FOR EACH ROW
+    WHEN (OLD.topic_id IS DISTINCT FROM NEW.topic_id)
+    EXECUTE FUNCTION questions_update_learned_stats();
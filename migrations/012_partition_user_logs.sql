@@ -0,0 +1,91 @@
+-- Миграция 012: Секционирование user_logs по месяцам
+-- user_logs становится таблицей, секционированной по диапазону timestamp: по секции
+-- user_logs_YYYY_MM на календарный месяц (UTC, как и пишет бот). Вставка обновляет индексы
+-- только текущей секции, поэтому ее стоимость и размер индексов не растут вместе с историей,
+-- а старые месяцы удаляются целиком (DETACH + DROP в maintain_user_logs.py) вместо DELETE.
+--
+-- Секции на месяцы вперед создает бот (AsyncDatabase.ensure_user_logs_partitions) и
+-- maintain_user_logs.py. Строки, для месяца которых секции еще нет, попадают в user_logs_default
+-- и переносятся в секцию своего месяца при ее создании.
+--
+-- B-tree по timestamp заменен на BRIN: логи пишутся по возрастанию времени, и BRIN отбирает
+-- диапазон так же, а при вставке почти не обновляется.
+-- Существующие логи копируются в новую таблицу; на больших историях миграция идет долго.
+
+-- Создает секцию месяца p_month, если ее нет, и возвращает ее имя
+CREATE OR REPLACE FUNCTION create_user_logs_partition(p_month DATE) RETURNS TEXT AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_month::timestamp)::date;
+    month_end DATE := (date_trunc('month', p_month::timestamp) + INTERVAL '1 month')::date;
+    partition_name TEXT := 'user_logs_' || to_char(p_month, 'YYYY_MM');
+BEGIN
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+    -- Секции могут создавать одновременно несколько реплик бота
+    PERFORM pg_advisory_xact_lock(hashtext('user_logs_partitions'));
+    IF to_regclass(partition_name) IS NOT NULL THEN
+        RETURN partition_name;
+    END IF;
+
+    EXECUTE format('CREATE TABLE %I (LIKE user_logs INCLUDING DEFAULTS INCLUDING CONSTRAINTS)', partition_name);
+    -- ATTACH не пройдет, пока в секции по умолчанию есть строки этого месяца
+    EXECUTE format(
+        'WITH moved AS (DELETE FROM user_logs_default WHERE timestamp >= %L AND timestamp < %L RETURNING *) '
+        'INSERT INTO %I SELECT * FROM moved',
+        month_start, month_end, partition_name
+    );
+    EXECUTE format(
+        'ALTER TABLE user_logs ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+        partition_name, month_start, month_end
+    );
+    RETURN partition_name;
+END;
+$$ LANGUAGE plpgsql;
+
+DO $$
+DECLARE
+    month DATE;
+BEGIN
+    IF (SELECT relkind FROM pg_class WHERE oid = 'user_logs'::regclass) = 'p' THEN
+        RETURN;
+    END IF;
+
+    ALTER TABLE user_logs RENAME TO user_logs_unpartitioned;
+    ALTER INDEX user_logs_pkey RENAME TO user_logs_unpartitioned_pkey;
+    ALTER SEQUENCE user_logs_id_seq OWNED BY NONE;
+
+    -- Первичный ключ секционированной таблицы обязан включать ключ секционирования
+    CREATE TABLE user_logs (
+        id INTEGER NOT NULL DEFAULT nextval('user_logs_id_seq'),
+        timestamp TIMESTAMP NOT NULL DEFAULT NOW(),
+        username TEXT NOT NULL,
+        question_id INTEGER NOT NULL REFERENCES questions(id) ON DELETE CASCADE,
+        PRIMARY KEY (id, timestamp)
+    ) PARTITION BY RANGE (timestamp);
+    ALTER SEQUENCE user_logs_id_seq OWNED BY user_logs.id;
+
+    CREATE TABLE user_logs_default PARTITION OF user_logs DEFAULT;
+
+    FOR month IN
+        SELECT generate_series(
+            date_trunc('month', COALESCE(min(timestamp), now() AT TIME ZONE 'UTC')),
+            date_trunc('month', now() AT TIME ZONE 'UTC') + INTERVAL '2 months',
+            INTERVAL '1 month'
+        )::date
+        FROM user_logs_unpartitioned
+    LOOP
+        PERFORM create_user_logs_partition(month);
+    END LOOP;
+
+    INSERT INTO user_logs (id, timestamp, username, question_id)
+    SELECT id, COALESCE(timestamp, now() AT TIME ZONE 'UTC'), username, question_id
+    FROM user_logs_unpartitioned;
+
+    DROP TABLE user_logs_unpartitioned;
+END $$;
+
+-- Индексы создаются после копирования: на секционированной таблице они создаются во всех секциях
+CREATE INDEX IF NOT EXISTS idx_user_logs_question_id ON user_logs(question_id);
+CREATE INDEX IF NOT EXISTS idx_user_logs_username ON user_logs(username);
+CREATE INDEX IF NOT EXISTS idx_user_logs_timestamp ON user_logs USING BRIN (timestamp);
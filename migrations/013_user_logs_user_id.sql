@@ -0,0 +1,74 @@
+-- Миграция 013: user_id и тип действия в user_logs, справочник пользователей users
+-- Логи привязываются к постоянному Telegram user_id (BIGINT) вместо отображаемого имени, которое
+-- меняется при переименовании и не уникально (first_name). Имя хранится один раз в users и
+-- обновляется, только когда меняется. Тип действия — перечисление user_action.
+--
+-- Новые строки пишутся с user_id и action, username в них пустой (он есть в users); username
+-- остается только у строк без user_id. Индекс по TEXT username заменен на
+-- (user_id, timestamp) без строк с пустым user_id. Внешнего ключа на users нет:
+-- справочник пополняется той же пачкой логов, а проверка на каждую вставку не нужна.
+--
+-- Миграция меняет только схему и выполняется быстро. Старые строки заполняет
+-- backfill_user_logs.py: пачками по диапазонам id, каждая в своей транзакции. Он же строит
+-- индекс (user_id, timestamp) на непустых секциях через CREATE INDEX CONCURRENTLY.
+-- Тип действия старых строк неизвестен и остается пустым.
+
+DO $$
+BEGIN
+    IF NOT EXISTS (SELECT 1 FROM pg_type WHERE typname = 'user_action') THEN
+        CREATE TYPE user_action AS ENUM ('reveal', 'learned', 'repeat');
+    END IF;
+END $$;
+
+-- Справочник пользователей: имя, под которым пользователь последний раз писал в user_logs
+CREATE TABLE IF NOT EXISTS users (
+    user_id BIGINT PRIMARY KEY,
+    username TEXT,
+    first_seen_at TIMESTAMP NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+);
+
+-- Нужен для сопоставления старых логов с пользователями
+CREATE INDEX IF NOT EXISTS idx_users_username ON users(username);
+
+-- Имена известны по learned_questions (последнее по времени отметки)
+INSERT INTO users (user_id, username, first_seen_at)
+SELECT DISTINCT ON (user_id)
+    user_id, username, COALESCE((min(created_at) OVER (PARTITION BY user_id)) AT TIME ZONE 'UTC', NOW())
+FROM learned_questions
+WHERE username IS NOT NULL
+ORDER BY user_id, created_at DESC NULLS LAST
+ON CONFLICT (user_id) DO NOTHING;
+
+-- Добавление колонок без значения по умолчанию меняет только каталог и не переписывает таблицу
+ALTER TABLE user_logs ADD COLUMN IF NOT EXISTS user_id BIGINT;
+ALTER TABLE user_logs ADD COLUMN IF NOT EXISTS action user_action;
+ALTER TABLE user_logs ALTER COLUMN username DROP NOT NULL;
+
+DROP INDEX IF EXISTS idx_user_logs_username;
+
+-- user_id старой строки лога: пользователь с таким именем, если он единственный, иначе
+-- запасное имя обработчиков user_<id>. NULL, если определить нельзя
+CREATE OR REPLACE FUNCTION legacy_log_user_id(p_username TEXT) RETURNS BIGINT AS $$
+    SELECT COALESCE(
+        (SELECT min(user_id) FROM users WHERE username = p_username HAVING count(*) = 1),
+        substring(p_username FROM '^user_([0-9]{1,18})$')::bigint
+    )
+$$ LANGUAGE sql STABLE;
+
+-- На непустой таблице построение индекса заблокировало бы запись в user_logs на время
+-- сканирования всех секций. Поэтому создается только индекс родителя (ON ONLY), а индексы
+-- секций строит и присоединяет backfill_user_logs.py. Новые секции получают индекс сразу
+DO $$
+BEGIN
+    IF to_regclass('idx_user_logs_user_id_timestamp') IS NOT NULL THEN
+        RETURN;
+    END IF;
+    IF EXISTS (SELECT 1 FROM user_logs) THEN
+        CREATE INDEX idx_user_logs_user_id_timestamp ON ONLY user_logs (user_id, timestamp)
+            WHERE user_id IS NOT NULL;
+    ELSE
+        CREATE INDEX idx_user_logs_user_id_timestamp ON user_logs (user_id, timestamp)
+            WHERE user_id IS NOT NULL;
+    END IF;
+END $$;
@@ -0,0 +1,97 @@
+-- Миграция 014: Перенумерация seq и topic_seq одним запросом на оператор удаления
+-- Раньше пропуски номеров после удаления заполнялись построчными триггерами (миграции 004 и 010):
+-- удаление N вопросов выполняло N отдельных UPDATE questions, и каждый из них снова срабатывал
+-- триггером версии каталога (миграция 005) — N увеличений версии и N уведомлений catalog_changed,
+-- после каждого из которых боты перезагружали кэши.
+--
+-- Теперь пропуски заполняет один триггер на оператор по таблице переходов удаленных строк:
+-- вопросы с номерами за новым концом диапазона переносятся на освободившиеся номера одним
+-- UPDATE ... FROM. Версия каталога не меняется от UPDATE, который трогает только seq и
+-- topic_seq: номера не видны кэшам бота, а сам оператор, вызвавший перенумерацию, уже
+-- увеличил версию.
+
+-- Номера после удаления: новый конец диапазона равен прежнему максимуму минус число удаленных,
+-- освободившиеся номера до него по порядку занимают оставшиеся вопросы за ним
+CREATE OR REPLACE FUNCTION questions_fill_seq_gaps() RETURNS trigger AS $$
+DECLARE
+    new_total INTEGER;
+BEGIN
+    SELECT GREATEST(
+               (SELECT max(seq) FROM deleted_questions),
+               COALESCE((SELECT max(seq) FROM questions), 0)
+           ) - (SELECT count(*) FROM deleted_questions)
+    INTO new_total;
+
+    IF new_total IS NOT NULL THEN
+        WITH holes AS (
+            SELECT seq, row_number() OVER (ORDER BY seq) AS rn
+            FROM deleted_questions
+            WHERE seq <= new_total
+        ),
+        movers AS (
+            SELECT id, row_number() OVER (ORDER BY seq) AS rn
+            FROM questions
+            WHERE seq > new_total
+        )
+        UPDATE questions q
+        SET seq = holes.seq
+        FROM movers
+        JOIN holes ON holes.rn = movers.rn
+        WHERE q.id = movers.id;
+    END IF;
+
+    WITH affected AS (
+        SELECT topic_id, count(*) AS removed, max(topic_seq) AS max_removed
+        FROM deleted_questions
+        WHERE topic_id IS NOT NULL
+        GROUP BY topic_id
+    ),
+    bounds AS (
+        SELECT a.topic_id,
+               GREATEST(a.max_removed,
+                        COALESCE((SELECT max(q.topic_seq) FROM questions q WHERE q.topic_id = a.topic_id), 0)
+               ) - a.removed AS new_total
+        FROM affected a
+    ),
+    holes AS (
+        SELECT d.topic_id, d.topic_seq,
+               row_number() OVER (PARTITION BY d.topic_id ORDER BY d.topic_seq) AS rn
+        FROM deleted_questions d
+        JOIN bounds b ON b.topic_id = d.topic_id
+        WHERE d.topic_seq <= b.new_total
+    ),
+    movers AS (
+        SELECT q.id, q.topic_id,
+               row_number() OVER (PARTITION BY q.topic_id ORDER BY q.topic_seq) AS rn
+        FROM bounds b
+        JOIN questions q ON q.topic_id = b.topic_id AND q.topic_seq > b.new_total
+    )
+    UPDATE questions q
+    SET topic_seq = holes.topic_seq
+    FROM movers
+    JOIN holes ON holes.topic_id = movers.topic_id AND holes.rn = movers.rn
+    WHERE q.id = movers.id;
+
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS trg_questions_fill_seq_gap ON questions;
+DROP TRIGGER IF EXISTS trg_questions_fill_topic_seq_gap ON questions;
+DROP TRIGGER IF EXISTS trg_questions_fill_seq_gaps ON questions;
+CREATE TRIGGER trg_questions_fill_seq_gaps
+    AFTER DELETE ON questions
+    REFERENCING OLD TABLE AS deleted_questions
+    FOR EACH STATEMENT EXECUTE FUNCTION questions_fill_seq_gaps();
+
+DROP FUNCTION IF EXISTS questions_fill_seq_gap();
+
+-- Смена темы по-прежнему освобождает номер в прежней теме построчным триггером
+-- trg_questions_fill_topic_seq_gap_on_update (миграция 010); его UPDATE topic_seq, как и
+-- перенумерация выше, версию каталога не меняет.
+-- Столбцы перечислены явно: UPDATE только номеров seq и topic_seq триггер не вызывает.
+-- content_hash и search_vector — генерируемые, их меняет UPDATE исходных столбцов
+DROP TRIGGER IF EXISTS trg_questions_catalog_version ON questions;
+CREATE TRIGGER trg_questions_catalog_version
+    AFTER INSERT OR UPDATE OF id, question, topic, answer, topic_id OR DELETE OR TRUNCATE ON questions
+    FOR EACH STATEMENT EXECUTE FUNCTION catalog_bump_version();
@@ -0,0 +1,44 @@
+import os
+import uuid
+
+import psycopg2
+import pytest
+from psycopg2.extensions import parse_dsn
+
+# Сервер PostgreSQL для интеграционных тестов, например "host=/tmp/pgdata user=app_user dbname=postgres"
+TEST_POSTGRES_DSN = os.getenv("TEST_POSTGRES_DSN")
+
+
+@pytest.fixture
+def database_config():
+    """Параметры подключения к одноразовой пустой базе; база удаляется после теста"""
+    if not TEST_POSTGRES_DSN:
+        pytest.skip("TEST_POSTGRES_DSN не задан")
+    name = f"test_{uuid.uuid4().hex[:8]}"
+    admin = psycopg2.connect(TEST_POSTGRES_DSN)
+    admin.autocommit = True
+    with admin.cursor() as cursor:
+        cursor.execute(f'CREATE DATABASE "{name}"')
+    config = parse_dsn(TEST_POSTGRES_DSN)
+    config.pop("dbname", None)
+    config["database"] = name
+    try:
+        yield config
+    finally:
+        with admin.cursor() as cursor:
+            cursor.execute(f'DROP DATABASE IF EXISTS "{name}" WITH (FORCE)')
+        admin.close()
+
+
+@pytest.fixture
+def conn(database_config):
+    """
+    Соединение с одноразовой базой в autocommit: открытая читающая транзакция не должна
+    блокировать миграции, которые тест применяет через другое соединение
+    """
+    connection = psycopg2.connect(**database_config)
+    connection.autocommit = True
+    try:
+        yield connection
+    finally:
+        connection.close()
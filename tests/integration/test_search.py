@@ -0,0 +1,60 @@
+import psycopg2
+import pytest
+
+from app.database import Database, SEARCH_MAX_CANDIDATES
+from benchmarks.common import apply_migrations
+
+pytestmark = pytest.mark.integration
+
+
+@pytest.fixture
+def db(database_config):
+    apply_migrations(database_config)
+    database = Database(pool_config={"min_size": 1, "max_size": 1, "timeout": 30, "max_idle": 0,
+                                     "max_lifetime": 0, "healthcheck_interval": 0})
+    database.config = database_config
+    try:
+        yield database
+    finally:
+        database.close()
+
+
+def test_search_ranks_matches_before_limiting_candidates(db):
+    conn = psycopg2.connect(**db.config)
+    with conn, conn.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO questions (id, question, topic, answer)
+            SELECT g, 'Вопрос номер ' || g || ' про бустинг', 'ML', 'Ответ про деревья и ансамбли'
+            FROM generate_series(1, %s) AS g
+            """,
+            (SEARCH_MAX_CANDIDATES * 2,)
+        )
+        cursor.execute(
+            """
+            INSERT INTO questions (id, question, topic, answer)
+            VALUES (100000, 'Градиентный бустинг: как работает бустинг?', 'ML', 'Бустинг строит деревья по очереди')
+            """
+        )
+    conn.close()
+
+    ids = db.search_question_ids("бустинг")
+
+    assert len(ids) == SEARCH_MAX_CANDIDATES
+    assert ids[:5] == [100000, 1, 2, 3, 4]
+
+
+def test_search_ranks_bounded_sample_of_frequent_words(db):
+    conn = psycopg2.connect(**db.config)
+    with conn, conn.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO questions (id, question, topic, answer)
+            SELECT g, 'Вопрос про модель ' || g, 'ML', 'Ответ'
+            FROM generate_series(1, 50) AS g
+            """
+        )
+    conn.close()
+
+    assert len(db.search_question_ids("модель", max_candidates=10, max_ranked=20)) == 10
+    assert db.search_question_ids("квазар") == []
@@ -0,0 +1,75 @@
+import pytest
+
+import backfill_user_logs
+from benchmarks.common import apply_migrations
+
+pytestmark = pytest.mark.integration
+
+
+def _parent_index_valid(conn):
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT indisvalid FROM pg_index WHERE indexrelid = %s::regclass",
+                       (backfill_user_logs.PARENT_INDEX,))
+        return cursor.fetchone()[0]
+
+
+def _seed_legacy_logs(database_config, conn):
+    """База до миграции 013 с логами по именам пользователей"""
+    apply_migrations(database_config, last=12)
+    with conn.cursor() as cursor:
+        cursor.execute("INSERT INTO questions (id, question, topic, answer) VALUES (1, 'Вопрос', 'ML', 'Ответ')")
+        cursor.execute(
+            """
+            INSERT INTO learned_questions (user_id, username, question_id) VALUES
+                (42, 'alice', 1), (43, 'twin', 1), (44, 'twin', 1)
+            """
+        )
+        cursor.execute("SELECT create_user_logs_partition('2024-01-01')")
+        cursor.execute(
+            """
+            INSERT INTO user_logs (timestamp, username, question_id) VALUES
+                ('2024-01-05', 'alice', 1),
+                ('2024-01-06', 'user_77', 1),
+                ('2024-01-07', 'twin', 1),
+                (now() AT TIME ZONE 'UTC', 'alice', 1)
+            """
+        )
+
+
+def test_migration_013_on_filled_table_creates_only_parent_index(database_config, conn):
+    _seed_legacy_logs(database_config, conn)
+
+    apply_migrations(database_config, first=13)
+
+    assert _parent_index_valid(conn) is False
+    assert 'user_logs_2024_01' in backfill_user_logs.partitions_without_index(conn)
+
+
+def test_migration_013_on_empty_table_indexes_all_partitions(database_config, conn):
+    apply_migrations(database_config)
+
+    assert _parent_index_valid(conn) is True
+    assert backfill_user_logs.partitions_without_index(conn) == []
+
+
+def test_backfill_fills_user_ids_and_attaches_partition_indexes(database_config, conn):
+    _seed_legacy_logs(database_config, conn)
+    apply_migrations(database_config, first=13)
+    conn.autocommit = False
+
+    updated = backfill_user_logs.backfill(conn, batch_size=2, pause=0)
+
+    assert updated == 3
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT username, user_id FROM user_logs ORDER BY id")
+        assert cursor.fetchall() == [('alice', 42), ('user_77', 77), ('twin', None), ('alice', 42)]
+    conn.commit()
+
+    conn.autocommit = True
+    built = backfill_user_logs.build_indexes(conn)
+
+    assert 'user_logs_2024_01_user_id_timestamp_idx' in built
+    assert backfill_user_logs.partitions_without_index(conn) == []
+    assert _parent_index_valid(conn) is True
+    assert backfill_user_logs.build_indexes(conn) == []
+    assert backfill_user_logs.backfill(conn, batch_size=2, pause=0) == 0
@@ -0,0 +1,117 @@
+from datetime import date, datetime
+
+import pytest
+
+import maintain_user_logs
+from benchmarks.common import apply_migrations
+
+pytestmark = pytest.mark.integration
+
+
+def _partitions(conn):
+    return maintain_user_logs.list_partitions(conn)
+
+
+def _rows(conn, table):
+    with conn.cursor() as cursor:
+        cursor.execute(f'SELECT id, timestamp, username, question_id FROM "{table}" ORDER BY id')
+        return cursor.fetchall()
+
+
+def _insert_question(conn, question_id=1):
+    with conn.cursor() as cursor:
+        cursor.execute(
+            "INSERT INTO questions (id, question, topic, answer) VALUES (%s, 'Вопрос', 'ML', 'Ответ')",
+            (question_id,)
+        )
+    conn.commit()
+
+
+def test_migration_012_moves_existing_logs_into_monthly_partitions(database_config, conn):
+    apply_migrations(database_config, last=11)
+    _insert_question(conn)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO user_logs (timestamp, username, question_id) VALUES
+                ('2024-01-15 10:00', 'alice', 1),
+                ('2024-01-31 23:59', 'bob', 1),
+                ('2024-03-01 00:00', 'alice', 1)
+            """
+        )
+    conn.commit()
+    before = _rows(conn, 'user_logs')
+
+    apply_migrations(database_config, first=12)
+
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT relkind FROM pg_class WHERE oid = 'user_logs'::regclass")
+        assert cursor.fetchone()[0] == 'p'
+        cursor.execute("INSERT INTO user_logs (username, question_id) VALUES ('carol', 1) RETURNING id")
+        new_id = cursor.fetchone()[0]
+    conn.commit()
+    assert _rows(conn, 'user_logs')[:3] == before
+    assert new_id > before[-1][0]
+    assert {'user_logs_2024_01', 'user_logs_2024_02', 'user_logs_2024_03'} <= set(_partitions(conn))
+    assert [row[0] for row in _rows(conn, 'user_logs_2024_01')] == [before[0][0], before[1][0]]
+    assert _rows(conn, maintain_user_logs.DEFAULT_PARTITION) == []
+
+
+def test_create_partition_moves_rows_out_of_default_partition(database_config, conn):
+    apply_migrations(database_config)
+    _insert_question(conn)
+    with conn.cursor() as cursor:
+        cursor.execute(
+            """
+            INSERT INTO user_logs (timestamp, username, question_id) VALUES
+                ('2099-05-10 12:00', 'alice', 1),
+                ('2099-06-01 00:00', 'alice', 1)
+            """
+        )
+        cursor.execute("SELECT create_user_logs_partition('2099-05-20')")
+        assert cursor.fetchone()[0] == 'user_logs_2099_05'
+    conn.commit()
+
+    assert [row[1] for row in _rows(conn, 'user_logs_2099_05')] == [datetime(2099, 5, 10, 12, 0)]
+    assert [row[1] for row in _rows(conn, maintain_user_logs.DEFAULT_PARTITION)] == [datetime(2099, 6, 1)]
+
+
+def test_retention_drops_or_detaches_expired_partitions(database_config, conn):
+    apply_migrations(database_config)
+    _insert_question(conn)
+    with conn.cursor() as cursor:
+        for month in ('2023-01-01', '2023-02-01', '2024-01-01'):
+            cursor.execute("SELECT create_user_logs_partition(%s)", (month,))
+        cursor.execute(
+            """
+            INSERT INTO user_logs (timestamp, username, question_id) VALUES
+                ('2023-01-05', 'alice', 1), ('2023-02-05', 'alice', 1), ('2024-01-05', 'alice', 1)
+            """
+        )
+    conn.commit()
+    today = date(2024, 2, 10)
+
+    dry_run = maintain_user_logs.apply_retention(conn, today, 12, detach_only=False, dry_run=True)
+    assert dry_run['dropped'] == ['user_logs_2023_01']
+    assert 'user_logs_2023_01' in _partitions(conn)
+
+    detached = maintain_user_logs.apply_retention(conn, today, 12, detach_only=True, dry_run=False)
+    assert detached['detached'] == ['user_logs_2023_01'] and detached['dropped'] == []
+    assert 'user_logs_2023_01' not in _partitions(conn)
+    assert len(_rows(conn, 'user_logs_2023_01')) == 1
+
+    dropped = maintain_user_logs.apply_retention(conn, today, 11, detach_only=False, dry_run=False)
+    assert dropped['dropped'] == ['user_logs_2023_02']
+    with conn.cursor() as cursor:
+        cursor.execute("SELECT to_regclass('user_logs_2023_02')")
+        assert cursor.fetchone()[0] is None
+    assert [row[1] for row in _rows(conn, 'user_logs')] == [datetime(2024, 1, 5)]
+
+
+def test_ensure_partitions_creates_missing_months_ahead(database_config, conn):
+    apply_migrations(database_config)
+
+    created = maintain_user_logs.ensure_partitions(conn, date(2099, 11, 3), 2, dry_run=False)
+
+    assert created == ['user_logs_2099_11', 'user_logs_2099_12', 'user_logs_2100_01']
+    assert maintain_user_logs.ensure_partitions(conn, date(2099, 11, 3), 2, dry_run=False) == []
@@ -0,0 +1,3 @@
+def make_question(question_id, answer="4"):
+    """Вопрос каталога в виде словаря, как его возвращают слой БД и кэш вопросов"""
+    return {"id": question_id, "question": f"Question {question_id}", "topic": "Math", "answer": answer}
@@ -0,0 +1,188 @@
+from datetime import date, datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
+
+import asyncpg
+import pytest
+
+from app.async_database import AsyncDatabase
+from app.audit_log import UserLogEvent, ACTION_REVEAL, ACTION_LEARNED
+
+pytestmark = pytest.mark.unit
+
+
+def _make_pool(mock_conn):
+    acquire_ctx = MagicMock()
+    acquire_ctx.__aenter__ = AsyncMock(return_value=mock_conn)
+    acquire_ctx.__aexit__ = AsyncMock(return_value=False)
+    mock_pool = MagicMock()
+    mock_pool.acquire.return_value = acquire_ctx
+    mock_pool.fetchval = AsyncMock()
+    mock_pool.fetchrow = AsyncMock()
+    mock_pool.execute = AsyncMock()
+    return mock_pool
+
+
+def _make_db(mock_pool):
+    db = AsyncDatabase()
+    db._pool = mock_pool
+    return db
+
+
+@pytest.mark.asyncio
+async def test_get_random_question_returns_probed_question():
+    mock_conn = MagicMock()
+    mock_conn.fetchrow = AsyncMock(
+        return_value={"id": 2, "question": "What is 2+2?", "topic": "Math", "answer": "4"}
+    )
+    db = _make_db(_make_pool(mock_conn))
+
+    question = await db.get_random_question(user_id=123)
+
+    assert question["id"] == 2
+    assert mock_conn.fetchrow.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_get_random_question_when_all_learned_returns_none(monkeypatch):
+    mock_conn = MagicMock()
+    mock_conn.fetchrow = AsyncMock(side_effect=[None, None, {"total": 2, "learned": 2}])
+    db = _make_db(_make_pool(mock_conn))
+    randint_mock = MagicMock()
+    monkeypatch.setattr("app.async_database.random.randint", randint_mock)
+
+    question = await db.get_random_question(user_id=123)
+
+    assert question is None
+    randint_mock.assert_not_called()
+    assert mock_conn.fetchrow.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_get_random_question_falls_back_to_exact_pick(monkeypatch):
+    mock_conn = MagicMock()
+    mock_conn.fetchrow = AsyncMock(side_effect=[
+        None,
+        None,
+        {"total": 10, "learned": 7},
+        {"id": 9, "question": "What is 2+2?", "topic": "Math", "answer": "4"},
+    ])
+    db = _make_db(_make_pool(mock_conn))
+    monkeypatch.setattr("app.async_database.random.randint", MagicMock(return_value=3))
+
+    question = await db.get_random_question(user_id=123)
+
+    assert question["id"] == 9
+    assert mock_conn.fetchrow.await_args.args[1:] == (123, 3, 3)
+
+
+@pytest.mark.asyncio
+async def test_get_random_question_by_topics_falls_back_to_exact_pick(monkeypatch):
+    mock_conn = MagicMock()
+    mock_conn.fetchrow = AsyncMock(side_effect=[
+        None,
+        None,
+        {"total": 6, "learned": 4},
+        {"id": 9, "question": "What is 2+2?", "topic": "Math", "answer": "4"},
+    ])
+    db = _make_db(_make_pool(mock_conn))
+    monkeypatch.setattr("app.async_database.random.randint", MagicMock(return_value=2))
+
+    question = await db.get_random_question(user_id=123, topic_ids=(5, 2, 5))
+
+    assert question["id"] == 9
+    queries = [call.args[0] for call in mock_conn.fetchrow.await_args_list]
+    assert all("topic_seq" in query for query in queries)
+    assert mock_conn.fetchrow.await_args_list[0].args[1:] == ([2, 5], 16, 123)
+    assert mock_conn.fetchrow.await_args.args[1:] == ([2, 5], 123, 2, 2)
+
+
+@pytest.mark.asyncio
+async def test_mark_question_learned_parses_command_status():
+    mock_pool = _make_pool(MagicMock())
+    db = _make_db(mock_pool)
+
+    mock_pool.execute.return_value = "INSERT 0 1"
+    assert await db.mark_question_learned(user_id=1, username="user", question_id=10) is True
+
+    mock_pool.execute.return_value = "INSERT 0 0"
+    assert await db.mark_question_learned(user_id=1, username="user", question_id=10) is False
+
+
+@pytest.mark.asyncio
+async def test_mark_question_learned_returns_none_on_db_error():
+    mock_pool = _make_pool(MagicMock())
+    mock_pool.execute.side_effect = asyncpg.PostgresConnectionError("connection lost")
+    db = _make_db(mock_pool)
+
+    assert await db.mark_question_learned(user_id=1, username="user", question_id=10) is None
+
+
+@pytest.mark.asyncio
+async def test_get_question_by_id_returns_none_on_db_error():
+    mock_pool = _make_pool(MagicMock())
+    mock_pool.fetchrow.side_effect = asyncpg.PostgresConnectionError("connection lost")
+    db = _make_db(mock_pool)
+
+    assert await db.get_question_by_id(5) is None
+
+
+@pytest.mark.asyncio
+async def test_insert_user_logs_writes_user_ids_and_counts_reveals_in_same_transaction():
+    mock_conn = MagicMock()
+    mock_conn.transaction.return_value.__aenter__ = AsyncMock()
+    mock_conn.transaction.return_value.__aexit__ = AsyncMock(return_value=False)
+    mock_conn.copy_records_to_table = AsyncMock()
+    mock_conn.execute = AsyncMock()
+    db = _make_db(_make_pool(mock_conn))
+    day = datetime(2024, 5, 1, 10, 0)
+    due = datetime(2024, 5, 1, 11, 0, tzinfo=timezone.utc)
+    events = [
+        UserLogEvent(day, "bob", 1, 7, ACTION_REVEAL, due),
+        UserLogEvent(day, "bob", 2, 7, ACTION_REVEAL),
+        UserLogEvent(day, "bob", 2, 7, ACTION_LEARNED),
+        UserLogEvent(day, "amy", 3, 5, ACTION_REVEAL),
+        UserLogEvent(day, "old", 4),
+    ]
+
+    assert await db.insert_user_logs(events) is True
+
+    copied = mock_conn.copy_records_to_table.await_args.kwargs["records"]
+    assert copied[0] == (day, 7, ACTION_REVEAL, None, 1)
+    assert copied[-1] == (day, None, None, "old", 4)
+    users_args = mock_conn.execute.await_args_list[0].args
+    assert "INSERT INTO users" in users_args[0]
+    assert users_args[1:] == ([5, 7], ["amy", "bob"])
+    args = mock_conn.execute.await_args_list[1].args
+    assert "record_user_activity" in args[0]
+    assert args[1:] == ([5, 7], [day.date(), day.date()], [1, 2])
+    args = mock_conn.execute.await_args_list[2].args
+    assert "INSERT INTO review_schedule" in args[0]
+    assert args[1:] == ([7], [1], [due])
+
+
+@pytest.mark.asyncio
+async def test_ensure_user_logs_partitions_returns_names_or_none_without_migration():
+    mock_pool = _make_pool(MagicMock())
+    mock_pool.fetch = AsyncMock(return_value=[{"name": "user_logs_2024_05"}, {"name": "user_logs_2024_06"}])
+    db = _make_db(mock_pool)
+
+    assert await db.ensure_user_logs_partitions(1) == ["user_logs_2024_05", "user_logs_2024_06"]
+    assert mock_pool.fetch.await_args.args[1] == 1
+
+    mock_pool.fetch.side_effect = asyncpg.UndefinedFunctionError("function does not exist")
+    assert await db.ensure_user_logs_partitions(1) is None
+
+
+@pytest.mark.asyncio
+async def test_get_user_stats_maps_topic_counters():
+    mock_pool = _make_pool(MagicMock())
+    mock_pool.fetchrow.return_value = {
+        "learned": 5, "current_streak": 2, "longest_streak": 4, "last_active_day": None,
+        "revealed_today": 3, "learned_today": 1, "topics": [[1, 3], [4, 2]],
+    }
+    db = _make_db(mock_pool)
+
+    stats = await db.get_user_stats(7, date(2024, 5, 1))
+
+    assert stats["topics"] == {1: 3, 4: 2}
+    assert mock_pool.fetchrow.await_args.args[1:] == (7, date(2024, 5, 1))
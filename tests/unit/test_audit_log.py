@@ -0,0 +1,169 @@
+import asyncio
+import types
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.audit_log import UserLogWriter, ACTION_REVEAL
+
+pytestmark = pytest.mark.unit
+
+
+def _make_db(result=True):
+    return types.SimpleNamespace(
+        insert_user_logs=AsyncMock(return_value=result),
+        ensure_user_logs_partitions=AsyncMock(return_value=[]),
+    )
+
+
+@pytest.mark.asyncio
+async def test_flush_writes_in_batches():
+    db = _make_db()
+    writer = UserLogWriter(db, batch_size=2, flush_interval=60, max_queue=100)
+
+    for question_id in range(5):
+        assert writer.log("user", question_id) is True
+    await writer.flush()
+
+    sizes = [len(call.args[0]) for call in db.insert_user_logs.await_args_list]
+    assert sizes == [2, 2, 1]
+    assert writer.written == 5
+    assert writer.queue_depth == 0
+
+
+def test_log_drops_events_when_queue_is_full():
+    writer = UserLogWriter(_make_db(), batch_size=10, flush_interval=60, max_queue=2)
+
+    assert writer.log("user", 1) is True
+    assert writer.log("user", 2) is True
+    assert writer.log("user", 3) is False
+
+    assert writer.stats()["dropped"] == 1
+    assert writer.queue_depth == 2
+
+
+@pytest.mark.asyncio
+async def test_failed_batch_is_kept_for_retry():
+    db = _make_db(result=False)
+    writer = UserLogWriter(db, batch_size=10, flush_interval=60, max_queue=100)
+    writer.log("user", 1)
+    writer.log("user", 2)
+
+    await writer.flush()
+
+    assert writer.failed_flushes == 1
+    assert [event.question_id for event in writer._buffer] == [1, 2]
+
+    db.insert_user_logs.return_value = True
+    await writer.flush()
+    assert writer.written == 2
+
+
+@pytest.mark.asyncio
+async def test_background_task_flushes_full_batch_and_stop_flushes_rest():
+    db = _make_db()
+    writer = UserLogWriter(db, batch_size=2, flush_interval=60, max_queue=100)
+    await writer.start()
+
+    writer.log("user", 1)
+    writer.log("user", 2)
+    await asyncio.sleep(0.01)
+    assert db.insert_user_logs.await_count == 1
+
+    writer.log("user", 3)
+    await writer.stop()
+
+    assert writer.written == 3
+    assert writer.queue_depth == 0
+
+
+def test_log_keeps_user_and_action_for_stats():
+    writer = UserLogWriter(_make_db(), batch_size=10, flush_interval=60, max_queue=10)
+
+    writer.log("user", 1, user_id=7, action=ACTION_REVEAL)
+    writer.log("user", 2)
+
+    first, second = writer._buffer
+    assert (first.user_id, first.action) == (7, ACTION_REVEAL)
+    assert (second.user_id, second.action) == (None, None)
+
+
+@pytest.mark.asyncio
+async def test_background_task_creates_partitions_on_start_and_then_by_interval():
+    db = _make_db()
+    writer = UserLogWriter(db, batch_size=10, flush_interval=0.01, max_queue=10,
+                           partitions_ahead=3, partition_check_interval=3600)
+    await writer.start()
+    await asyncio.sleep(0.05)
+    await writer.stop()
+
+    db.ensure_user_logs_partitions.assert_awaited_once_with(3)
+
+
+@pytest.mark.asyncio
+async def test_partition_check_can_be_disabled():
+    db = _make_db()
+    writer = UserLogWriter(db, batch_size=10, flush_interval=0.01, max_queue=10, partition_check_interval=0)
+    await writer.start()
+    await asyncio.sleep(0.03)
+    await writer.stop()
+
+    db.ensure_user_logs_partitions.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_stop_waits_for_batch_being_written():
+    db = _make_db()
+    release = asyncio.Event()
+
+    async def slow_insert(batch):
+        await release.wait()
+        return True
+
+    db.insert_user_logs.side_effect = slow_insert
+    writer = UserLogWriter(db, batch_size=2, flush_interval=60, max_queue=100, partition_check_interval=0)
+    await writer.start()
+    writer.log("user", 1)
+    writer.log("user", 2)
+    await asyncio.sleep(0.01)
+    assert writer.queue_depth == 0  # пачка уже взята из буфера и пишется
+
+    stopping = asyncio.create_task(writer.stop())
+    await asyncio.sleep(0.01)
+    release.set()
+    await stopping
+
+    assert writer.written == 2
+
+
+@pytest.mark.asyncio
+async def test_cancelled_flush_returns_batch_to_buffer():
+    db = _make_db()
+    db.insert_user_logs.side_effect = asyncio.CancelledError
+    writer = UserLogWriter(db, batch_size=10, flush_interval=60, max_queue=100)
+    writer.log("user", 1)
+    writer.log("user", 2)
+
+    with pytest.raises(asyncio.CancelledError):
+        await writer.flush()
+
+    assert [event.question_id for event in writer._buffer] == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_batch_is_dropped_after_max_retries():
+    db = _make_db(result=False)
+    writer = UserLogWriter(db, batch_size=2, flush_interval=60, max_queue=100, max_retries=3)
+    for question_id in range(3):
+        writer.log("user", question_id)
+
+    for _ in range(3):
+        await writer.flush()
+
+    assert writer.failed_flushes == 3
+    assert writer.dropped == 2
+    assert [event.question_id for event in writer._buffer] == [2]
+
+    db.insert_user_logs.return_value = True
+    await writer.flush()
+    assert writer.written == 1
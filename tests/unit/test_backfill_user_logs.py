@@ -0,0 +1,17 @@
+import pytest
+
+from backfill_user_logs import id_batches, partition_index_name
+
+pytestmark = pytest.mark.unit
+
+
+def test_id_batches_cover_range_with_half_open_intervals():
+    assert list(id_batches(1, 25, 10)) == [(1, 11), (11, 21), (21, 26)]
+    assert list(id_batches(5, 5, 10)) == [(5, 6)]
+
+
+def test_partition_index_name_fits_postgres_identifier_limit():
+    name = partition_index_name("user_logs_2024_05")
+
+    assert name == "user_logs_2024_05_user_id_timestamp_idx"
+    assert len(partition_index_name("user_logs_default")) < 64
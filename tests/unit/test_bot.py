@@ -0,0 +1,55 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from app import bot
+
+pytestmark = pytest.mark.unit
+
+
+def test_build_application_uses_custom_bot_api():
+    application = bot.build_application(base_url="http://127.0.0.1:8081/")
+
+    assert application.bot.base_url.startswith("http://127.0.0.1:8081/bot")
+
+
+def test_run_webhook_passes_secret_and_public_url(monkeypatch):
+    monkeypatch.setitem(bot.WEBHOOK_CONFIG, "url", "https://bot.example.com/")
+    monkeypatch.setitem(bot.WEBHOOK_CONFIG, "url_path", "/telegram")
+    monkeypatch.setitem(bot.WEBHOOK_CONFIG, "secret_token", "s3cret")
+    application = MagicMock()
+
+    bot.run_webhook(application)
+
+    kwargs = application.run_webhook.call_args.kwargs
+    assert kwargs["url_path"] == "telegram"
+    assert kwargs["webhook_url"] == "https://bot.example.com/telegram"
+    assert kwargs["secret_token"] == "s3cret"
+
+
+def test_webhook_mode_requires_secret_token(monkeypatch):
+    monkeypatch.setattr(bot, "BOT_MODE", "webhook")
+    monkeypatch.setitem(bot.WEBHOOK_CONFIG, "url", "https://bot.example.com")
+    monkeypatch.setitem(bot.WEBHOOK_CONFIG, "secret_token", "")
+    build = MagicMock()
+    monkeypatch.setattr(bot, "build_application", build)
+
+    bot.main()
+
+    build.assert_not_called()
+
+
+def test_instrumented_request_records_api_method_and_status(monkeypatch):
+    async def do_request(self, url, method, *args, **kwargs):
+        return 200, b"{}"
+
+    monkeypatch.setattr(bot.HTTPXRequest, "do_request", do_request)
+    request = bot.InstrumentedHTTPXRequest(connection_pool_size=4)
+    before = bot.TELEGRAM_REQUESTS.value("sendMessage", "200")
+
+    result = asyncio.run(request.do_request("https://api.telegram.org/bot123:abc/sendMessage", "POST"))
+
+    assert result == (200, b"{}")
+    assert bot.TELEGRAM_REQUESTS.value("sendMessage", "200") == before + 1
+    assert request.in_flight == 0
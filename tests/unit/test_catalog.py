@@ -0,0 +1,108 @@
+import types
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.catalog import QuestionCache, CatalogStats, CatalogWatcher
+from tests.unit.conftest import make_question
+
+pytestmark = pytest.mark.unit
+
+
+def _make_db(**methods):
+    return types.SimpleNamespace(**methods)
+
+
+@pytest.mark.asyncio
+async def test_question_cache_reads_through_once():
+    db = _make_db(get_question_by_id=AsyncMock(side_effect=lambda question_id: make_question(question_id)))
+    cache = QuestionCache(db, max_entries=10, max_bytes=10 ** 6)
+
+    first = await cache.get(1)
+    second = await cache.get(1)
+
+    assert first is second
+    db.get_question_by_id.assert_awaited_once_with(1)
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.asyncio
+async def test_question_cache_evicts_least_recently_used():
+    db = _make_db(get_question_by_id=AsyncMock(side_effect=lambda question_id: make_question(question_id)))
+    cache = QuestionCache(db, max_entries=2, max_bytes=10 ** 6)
+
+    await cache.get(1)
+    await cache.get(2)
+    await cache.get(1)
+    await cache.get(3)
+
+    assert len(cache) == 2
+    await cache.get(1)
+    assert db.get_question_by_id.await_count == 3
+
+
+@pytest.mark.asyncio
+async def test_question_cache_respects_memory_limit():
+    db = _make_db(get_question_by_id=AsyncMock(side_effect=lambda question_id: make_question(question_id, "x" * 1000)))
+    cache = QuestionCache(db, max_entries=100, max_bytes=3000)
+
+    for question_id in range(10):
+        await cache.get(question_id)
+
+    assert 0 < len(cache) < 10
+    assert cache.size_bytes <= 3000
+
+
+@pytest.mark.asyncio
+async def test_question_cache_skips_result_fetched_before_invalidation():
+    cache = None
+
+    async def fetch(question_id):
+        cache.invalidate()
+        return make_question(question_id)
+
+    cache = QuestionCache(_make_db(get_question_by_id=fetch), max_entries=10, max_bytes=10 ** 6)
+
+    assert (await cache.get(1))["id"] == 1
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_question_cache_reloads_on_catalog_change():
+    db = _make_db(get_questions=AsyncMock(return_value=[make_question(1), make_question(2)]))
+    cache = QuestionCache(db, max_entries=10, max_bytes=10 ** 6)
+    cache._put(make_question(3))
+
+    await cache.on_catalog_changed(version=2)
+
+    assert sorted(cache._entries) == [1, 2]
+
+
+@pytest.mark.asyncio
+async def test_catalog_stats_refresh_counts_topics():
+    db = _make_db(get_topic_counts=AsyncMock(side_effect=[{"Math": 3, "ML": 2}, None]))
+    stats = CatalogStats(db)
+
+    await stats.refresh()
+    assert stats.total == 5
+    assert stats.by_topic == {"Math": 3, "ML": 2}
+
+    # При ошибке БД остается последняя известная статистика
+    await stats.on_catalog_changed(version=3)
+    assert stats.total == 5
+
+
+@pytest.mark.asyncio
+async def test_catalog_watcher_notifies_subscribers_on_version_change():
+    db = _make_db(get_catalog_version=AsyncMock(side_effect=[5, 5, 6]))
+    watcher = CatalogWatcher(db, poll_interval=60)
+    watcher.version = await db.get_catalog_version()
+    subscriber = AsyncMock()
+    watcher.subscribe(subscriber)
+
+    await watcher.check()
+    subscriber.assert_not_awaited()
+
+    await watcher.check()
+    subscriber.assert_awaited_once_with(6)
+    assert watcher.version == 6
@@ -0,0 +1,120 @@
+import json
+import random
+from pathlib import Path
+
+import pytest
+
+import classify_topics
+from benchmarks.classify_reference import classify_question_naive, topic_scores_naive
+from classify_topics import (
+    TOPICS, SPECIAL_RULES, FALLBACK_RULES, DEFAULT_TOPIC,
+    classify_question, topic_scores, find_keywords,
+)
+
+pytestmark = pytest.mark.unit
+
+RAW_JSON = Path(__file__).resolve().parents[2] / "raw.json"
+
+VOCABULARY = (
+    [keyword for keywords in TOPICS.values() for keyword in keywords]
+    + list(SPECIAL_RULES)
+    + [word for words, _ in FALLBACK_RULES for word in words]
+)
+FILLER = ["как", "почему", "модели", "данных", "в", "и", "что", "Python", "?", ",", "ТЕСТ", ""]
+
+
+def _random_text(rng):
+    parts = []
+    for _ in range(rng.randint(0, 8)):
+        word = rng.choice(VOCABULARY) if rng.random() < 0.5 else rng.choice(FILLER)
+        if rng.random() < 0.2:
+            word = word.upper()
+        elif rng.random() < 0.2 and len(word) > 3:
+            # Обрезанное слово дает частичные совпадения с ключами
+            word = word[:rng.randint(1, len(word) - 1)]
+        parts.append(word)
+    separator = "" if rng.random() < 0.2 else " "
+    return separator.join(parts)
+
+
+def test_matches_naive_implementation_on_random_texts():
+    rng = random.Random(42)
+    for _ in range(5000):
+        text = _random_text(rng)
+        assert topic_scores(text) == topic_scores_naive(text), text
+        assert classify_question(text) == classify_question_naive(text), text
+
+
+def test_matches_naive_implementation_on_raw_json():
+    data = json.loads(RAW_JSON.read_text(encoding="utf-8"))
+    for item in data:
+        assert classify_question(item["question"]) == classify_question_naive(item["question"])
+
+
+def test_overlapping_keywords_at_same_position_are_all_found():
+    found = find_keywords("полином с большими степенями")
+
+    assert {"полином", "полином с большими степенями"} <= found
+
+
+def test_duplicate_keyword_in_topic_counts_twice():
+    assert TOPICS["Специальные задачи"].count("метрики счастья") == 2
+    assert topic_scores("метрики счастья")["Специальные задачи"] == 2
+
+
+def test_special_rule_order_wins():
+    # "выбросы" идет в правилах раньше, чем "рекомендации"
+    assert classify_question("рекомендации и выбросы") == "Обработка и подготовка данных"
+
+
+def test_fallback_rules_and_default():
+    assert classify_question("Как работает dict?") == "Инфраструктура и инструменты"
+    assert classify_question("Что такое датасет?") == "Обработка и подготовка данных"
+    assert classify_question("Расскажите о себе") == DEFAULT_TOPIC
+
+
+def test_tie_breaks_by_topics_order():
+    scores = topic_scores("svm и pandas")
+    assert list(scores) == ["Регрессия и классификация", "Инфраструктура и инструменты"]
+    assert classify_question("svm и pandas") == classify_question_naive("svm и pandas")
+    assert classify_topics.classify_question("svm и pandas") == "Регрессия и классификация"
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_classify_stream_keeps_order_and_existing_topics(tmp_path, workers):
+    items = [{"id": i, "question": "Что такое random forest?", "topic": "" if i % 2 else "Своя тема"}
+             for i in range(25)]
+    source = tmp_path / "items.json"
+    source.write_text(json.dumps(items, ensure_ascii=False), encoding="utf-8")
+    target = tmp_path / "out.jsonl"
+
+    total, classified = classify_topics.classify_stream(str(source), str(target), workers=workers, chunk_size=4)
+
+    result = [json.loads(line) for line in target.read_text(encoding="utf-8").splitlines()]
+    assert (total, classified) == (25, 12)
+    assert [item["id"] for item in result] == list(range(25))
+    assert [item["topic"] for item in result[:2]] == ["Своя тема", "Ансамбли и деревья"]
+
+
+@pytest.mark.parametrize("argv", [["items.csv"], ["items.csv", "-o", "items.csv"], ["items.json", "--output-format", "csv"]])
+def test_unsupported_output_format_is_rejected_before_reading(tmp_path, monkeypatch, argv):
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr("sys.argv", ["classify_topics.py", *argv])
+    monkeypatch.setattr(classify_topics.multiprocessing, "Pool", pytest.fail)
+
+    with pytest.raises(SystemExit) as exc_info:
+        classify_topics.main()
+
+    assert exc_info.value.code == 2
+
+
+def test_classify_stream_rejects_csv_output_before_starting_pool(tmp_path, monkeypatch):
+    source = tmp_path / "items.csv"
+    source.write_text("id,question,topic\n1,Что такое random forest?,\n", encoding="utf-8")
+    monkeypatch.setattr(classify_topics.multiprocessing, "Pool", pytest.fail)
+
+    with pytest.raises(ValueError, match="csv"):
+        classify_topics.classify_stream(str(source), workers=2)
+
+    assert source.read_text(encoding="utf-8").startswith("id,question,topic")
+    assert not (tmp_path / "items.csv.tmp").exists()
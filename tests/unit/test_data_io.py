@@ -0,0 +1,128 @@
+import io
+import json
+
+import pytest
+
+from data_io import ItemWriter, detect_compression, detect_format, iter_items, iter_json_array
+
+pytestmark = pytest.mark.unit
+
+ITEMS = [
+    {"id": 1, "question": "Что такое \"bias\"?\nОбъясните", "topic": "", "answer": "ответ, с запятой ]"},
+    {"id": 2, "question": "Вопрос [2]", "topic": "Тема", "score": 12345.5, "tags": [1, 2, {"a": None}]},
+    {"id": 3, "question": "", "topic": None},
+]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 3, 7, 64, 1 << 20])
+def test_json_array_is_read_incrementally(chunk_size):
+    text = json.dumps(ITEMS, ensure_ascii=False, indent=2)
+
+    assert list(iter_json_array(io.StringIO(text), chunk_size=chunk_size)) == ITEMS
+
+
+def test_json_array_edge_cases():
+    assert list(iter_json_array(io.StringIO("  [ ]  "))) == []
+    assert list(iter_json_array(io.StringIO("[1,2 , 3]"), chunk_size=1)) == [1, 2, 3]
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('{"id": 1}')))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"id": 1} {"id": 2}]')))
+    with pytest.raises(ValueError):
+        list(iter_json_array(io.StringIO('[{"id": 1},')))
+
+
+def test_json_writer_matches_json_dump(tmp_path):
+    path = str(tmp_path / "out.json")
+
+    with ItemWriter(path) as writer:
+        for item in ITEMS:
+            writer.write(item)
+
+    with open(path, encoding="utf-8") as f:
+        assert f.read() == json.dumps(ITEMS, ensure_ascii=False, indent=2)
+
+
+def test_jsonl_round_trip_and_in_place_rewrite(tmp_path):
+    path = str(tmp_path / "items.jsonl")
+    assert detect_format(path) == "jsonl"
+    with ItemWriter(path) as writer:
+        for item in ITEMS:
+            writer.write(item)
+
+    # Чтение и перезапись одного файла
+    with ItemWriter(path) as writer:
+        for item in iter_items(path):
+            writer.write({**item, "topic": "X"})
+
+    assert [item["topic"] for item in iter_items(path)] == ["X", "X", "X"]
+    assert not (tmp_path / "items.jsonl.tmp").exists()
+
+
+def test_writer_error_keeps_original_file(tmp_path):
+    path = tmp_path / "items.json"
+    path.write_text("[]", encoding="utf-8")
+
+    with pytest.raises(RuntimeError):
+        with ItemWriter(str(path)) as writer:
+            writer.write(ITEMS[0])
+            raise RuntimeError("boom")
+
+    assert path.read_text(encoding="utf-8") == "[]"
+    assert not (tmp_path / "items.json.tmp").exists()
+
+
+@pytest.mark.parametrize("name, fmt, compression", [
+    ("dump.json", "json", "none"),
+    ("dump.ndjson", "jsonl", "none"),
+    ("dump.csv", "csv", "none"),
+    ("dump.jsonl.gz", "jsonl", "gzip"),
+    ("dump.csv.zst", "csv", "zstd"),
+    ("dump.gz", "json", "gzip"),
+])
+def test_format_and_compression_are_detected_by_suffix(name, fmt, compression):
+    assert detect_format(name) == fmt
+    assert detect_compression(name) == compression
+
+
+def test_csv_rows_are_read_as_dicts(tmp_path):
+    path = tmp_path / "items.csv"
+    path.write_text('id,question,topic,answer\n1,"Что такое ""bias""?\nОбъясните",,"a, b"\n', encoding="utf-8")
+
+    assert list(iter_items(str(path))) == [
+        {"id": "1", "question": "Что такое \"bias\"?\nОбъясните", "topic": "", "answer": "a, b"},
+    ]
+
+
+
+@pytest.mark.parametrize("name, text", [
+    ("items.csv", "id,question\n1,Вопрос\n"),
+    ("items.jsonl", '{"id": 1, "question": "Вопрос"}\n'),
+    ("items.json", '[{"id": 1, "question": "Вопрос"}]'),
+])
+def test_utf8_bom_is_skipped(tmp_path, name, text):
+    path = tmp_path / name
+    path.write_text(text, encoding="utf-8-sig")
+
+    items = list(iter_items(str(path)))
+
+    assert [(str(item["id"]), item["question"]) for item in items] == [("1", "Вопрос")]
+
+@pytest.mark.parametrize("suffix", [".gz", ".zst"])
+def test_compressed_round_trip(tmp_path, suffix):
+    if suffix == ".zst":
+        pytest.importorskip("zstandard")
+    path = str(tmp_path / f"items.jsonl{suffix}")
+
+    with ItemWriter(path) as writer:
+        for item in ITEMS:
+            writer.write(item)
+
+    with open(path, "rb") as f:
+        assert not f.read(2).startswith(b"{")
+    assert list(iter_items(path)) == ITEMS
+
+
+def test_writer_rejects_unsupported_format(tmp_path):
+    with pytest.raises(ValueError):
+        ItemWriter(str(tmp_path / "items.csv"))
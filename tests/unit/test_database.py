@@ -2,7 +2,8 @@ from unittest.mock import MagicMock
 
 import pytest
 
-from app.database import Database
+from app import async_database
+from app.database import Database, asyncpg_query
 
 pytestmark = pytest.mark.unit
 
@@ -10,37 +11,56 @@ pytestmark = pytest.mark.unit
 def _make_connection(mock_cursor):
     mock_conn = MagicMock()
     mock_conn.__enter__.return_value = mock_conn
+    mock_conn.closed = 0
+    mock_conn.get_transaction_status.return_value = 0
     mock_cursor.__enter__.return_value = mock_cursor
     mock_conn.cursor.return_value = mock_cursor
     return mock_conn
 
 
-def test_get_random_question_returns_question(monkeypatch):
+def test_get_random_question_returns_probed_question(monkeypatch):
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.return_value = {"id": 2, "question": "What is 2+2?", "topic": "Math", "answer": "4"}
+    mock_conn = _make_connection(mock_cursor)
+
+    monkeypatch.setattr("app.database.psycopg2.connect", lambda **kwargs: mock_conn)
+
+    db = Database()
+    question = db.get_random_question(user_id=123)
+
+    assert question is not None
+    assert question["id"] == 2
+    assert mock_cursor.execute.call_count == 1
+
+
+def test_get_random_question_falls_back_to_exact_pick(monkeypatch):
     mock_cursor = MagicMock()
     mock_cursor.fetchone.side_effect = [
-        {"count": 3},
-        {"id": 2, "question": "What is 2+2?", "topic": "Math", "answer": "4"},
+        None,
+        None,
+        {"total": 5, "learned": 3},
+        {"id": 40, "question": "What is 2+2?", "topic": "Math", "answer": "4"},
     ]
     mock_conn = _make_connection(mock_cursor)
 
     monkeypatch.setattr("app.database.psycopg2.connect", lambda **kwargs: mock_conn)
-    randint_mock = MagicMock(return_value=1)
+    randint_mock = MagicMock(return_value=2)
     monkeypatch.setattr("app.database.random.randint", randint_mock)
 
     db = Database()
     question = db.get_random_question(user_id=123)
 
-    assert question is not None
-    assert question["id"] == 2
-    randint_mock.assert_called_once_with(0, 2)
-    assert mock_cursor.execute.call_count == 2
+    assert question["id"] == 40
+    randint_mock.assert_called_once_with(1, 2)
+    assert mock_cursor.execute.call_args.args[1] == (123, 2, 2)
 
 
 def test_get_random_question_when_all_learned_returns_none(monkeypatch):
     mock_cursor = MagicMock()
     mock_cursor.fetchone.side_effect = [
-        {"count": 0},
-        {"count": 5},
+        None,
+        None,
+        {"total": 3, "learned": 3},
     ]
     mock_conn = _make_connection(mock_cursor)
 
@@ -53,7 +73,20 @@ def test_get_random_question_when_all_learned_returns_none(monkeypatch):
 
     assert question is None
     randint_mock.assert_not_called()
-    assert mock_cursor.execute.call_count == 2
+    assert mock_cursor.execute.call_count == 3
+
+
+def test_get_random_question_empty_catalog_returns_none(monkeypatch):
+    mock_cursor = MagicMock()
+    mock_cursor.fetchone.side_effect = [None, None, {"total": 0, "learned": 0}]
+    mock_conn = _make_connection(mock_cursor)
+
+    monkeypatch.setattr("app.database.psycopg2.connect", lambda **kwargs: mock_conn)
+
+    db = Database()
+
+    assert db.get_random_question(user_id=123) is None
+    assert mock_cursor.execute.call_count == 3
 
 
 def test_mark_question_learned_returns_true_when_inserted(monkeypatch):
@@ -69,3 +102,13 @@ def test_mark_question_learned_returns_true_when_inserted(monkeypatch):
     assert result is True
     mock_conn.commit.assert_called_once()
     assert mock_cursor.execute.call_count == 1
+
+
+def test_asyncpg_query_numbers_placeholders_in_order():
+    assert asyncpg_query("SELECT %s::int + %s WHERE a LIKE 'x%%'") == "SELECT $1::int + $2 WHERE a LIKE 'x%'"
+
+
+def test_async_queries_have_no_psycopg2_placeholders():
+    queries = [value for name, value in vars(async_database).items() if name.endswith("_QUERY")]
+    assert queries
+    assert all("%s" not in query for query in queries)
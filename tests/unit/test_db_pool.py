@@ -0,0 +1,94 @@
+from unittest.mock import MagicMock
+
+import psycopg2
+import pytest
+
+from app.db_pool import ConnectionPool, PoolTimeoutError
+
+pytestmark = pytest.mark.unit
+
+
+def _make_connection():
+    conn = MagicMock()
+    conn.closed = 0
+    conn.get_transaction_status.return_value = 0
+    conn.cursor.return_value.__enter__.return_value = MagicMock()
+    return conn
+
+
+@pytest.fixture
+def connect_mock(monkeypatch):
+    connect = MagicMock(side_effect=lambda **kwargs: _make_connection())
+    monkeypatch.setattr("app.db_pool.psycopg2.connect", connect)
+    return connect
+
+
+def test_pool_reuses_connection(connect_mock):
+    pool = ConnectionPool({}, min_size=0, max_size=2)
+
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert connect_mock.call_count == 1
+
+
+def test_pool_discards_broken_connection(connect_mock):
+    pool = ConnectionPool({}, min_size=0, max_size=2)
+
+    with pytest.raises(psycopg2.OperationalError):
+        with pool.connection() as broken:
+            raise psycopg2.OperationalError("server closed the connection")
+
+    broken.close.assert_called_once()
+    with pool.connection() as fresh:
+        assert fresh is not broken
+    assert connect_mock.call_count == 2
+
+
+def test_pool_replaces_connection_failing_healthcheck(connect_mock):
+    pool = ConnectionPool({}, min_size=0, max_size=2, healthcheck_interval=0.0001)
+
+    with pool.connection() as stale:
+        pass
+    stale.cursor.return_value.__enter__.return_value.execute.side_effect = psycopg2.OperationalError("gone")
+    pool._idle[0].last_used_at -= 1
+
+    with pool.connection() as fresh:
+        assert fresh is not stale
+    stale.close.assert_called_once()
+
+
+def test_pool_recycles_idle_connections_above_min_size(connect_mock):
+    pool = ConnectionPool({}, min_size=1, max_size=3, max_idle=10)
+    first = pool.getconn()
+    second = pool.getconn()
+    pool.putconn(first)
+    pool.putconn(second)
+    for pooled in pool._idle:
+        pooled.last_used_at -= 60
+
+    pool.putconn(pool.getconn())
+
+    assert pool.size == 1
+
+
+def test_pool_times_out_when_exhausted(connect_mock):
+    pool = ConnectionPool({}, min_size=0, max_size=1, timeout=0.01)
+    pool.getconn()
+
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn()
+
+
+def test_pool_rolls_back_unfinished_transaction(connect_mock):
+    pool = ConnectionPool({}, min_size=0, max_size=1)
+    conn = pool.getconn()
+    conn.get_transaction_status.return_value = 2
+
+    pool.putconn(conn)
+
+    conn.rollback.assert_called_once()
+    assert pool.idle_count == 1
@@ -1,16 +1,25 @@
 import types
-from unittest.mock import AsyncMock
+from datetime import datetime, timezone
+from unittest.mock import AsyncMock, MagicMock
 
 import pytest
 
 from app import handlers
-from app.messages import INVALID_REQUEST, NO_QUESTIONS, ALL_QUESTIONS_LEARNED
+from app.audit_log import ACTION_REVEAL
+from app.messages import (
+    INVALID_REQUEST, NO_QUESTIONS, ALL_QUESTIONS_LEARNED, SEARCH_USAGE, SEARCH_EXPIRED,
+    TOPIC_QUESTIONS_LEARNED, ERROR_MESSAGE
+)
 
 pytestmark = pytest.mark.unit
 
 
-async def _fake_to_thread(func, *args, **kwargs):
-    return func(*args, **kwargs)
+@pytest.fixture(autouse=True)
+def no_topic_preferences(monkeypatch):
+    """По умолчанию у пользователя не выбраны темы"""
+    preferences = types.SimpleNamespace(get=AsyncMock(return_value=()))
+    monkeypatch.setattr(handlers, "topic_preferences", preferences)
+    return preferences
 
 
 def test_question_text_with_answer_includes_fields():
@@ -74,14 +83,14 @@ async def test_handle_callback_query_valid_data_calls_handler():
 
 @pytest.mark.asyncio
 async def test_send_random_question_no_questions(monkeypatch):
-    db_stub = types.SimpleNamespace(
-        get_total_questions_count=lambda: 0,
-        get_random_question=lambda user_id: None,
+    picker_stub = types.SimpleNamespace(
+        next_question=AsyncMock(return_value=None),
     )
+    stats_stub = types.SimpleNamespace(is_loaded=True, total=0, refresh=AsyncMock())
     chat = types.SimpleNamespace(reply_text=AsyncMock())
 
-    monkeypatch.setattr(handlers, "db", db_stub)
-    monkeypatch.setattr(handlers.asyncio, "to_thread", _fake_to_thread)
+    monkeypatch.setattr(handlers, "prefetcher", picker_stub)
+    monkeypatch.setattr(handlers, "catalog_stats", stats_stub)
 
     await handlers.send_random_question(chat, user_id=123)
 
@@ -93,14 +102,14 @@ async def test_send_random_question_no_questions(monkeypatch):
 
 @pytest.mark.asyncio
 async def test_send_random_question_all_learned(monkeypatch):
-    db_stub = types.SimpleNamespace(
-        get_total_questions_count=lambda: 10,
-        get_random_question=lambda user_id: None,
+    picker_stub = types.SimpleNamespace(
+        next_question=AsyncMock(return_value=None),
     )
+    stats_stub = types.SimpleNamespace(is_loaded=True, total=10, refresh=AsyncMock())
     chat = types.SimpleNamespace(reply_text=AsyncMock())
 
-    monkeypatch.setattr(handlers, "db", db_stub)
-    monkeypatch.setattr(handlers.asyncio, "to_thread", _fake_to_thread)
+    monkeypatch.setattr(handlers, "prefetcher", picker_stub)
+    monkeypatch.setattr(handlers, "catalog_stats", stats_stub)
 
     await handlers.send_random_question(chat, user_id=123)
 
@@ -118,14 +127,13 @@ async def test_send_random_question_success(monkeypatch):
         "topic": "Math",
         "answer": "4",
     }
-    db_stub = types.SimpleNamespace(
-        get_total_questions_count=lambda: 10,
-        get_random_question=lambda user_id: question,
+    picker_stub = types.SimpleNamespace(
+        next_question=AsyncMock(return_value=question),
+        schedule=MagicMock(),
     )
     chat = types.SimpleNamespace(reply_text=AsyncMock())
 
-    monkeypatch.setattr(handlers, "db", db_stub)
-    monkeypatch.setattr(handlers.asyncio, "to_thread", _fake_to_thread)
+    monkeypatch.setattr(handlers, "prefetcher", picker_stub)
 
     await handlers.send_random_question(chat, user_id=123)
 
@@ -136,3 +144,221 @@ async def test_send_random_question_success(monkeypatch):
     assert kwargs["parse_mode"] == "HTML"
     markup = kwargs["reply_markup"]
     assert markup.inline_keyboard[0][0].callback_data == f"show_answer:{question['id']}"
+    picker_stub.schedule.assert_called_once_with(123, (), question["id"])
+
+
+def _stub_question_cache(monkeypatch, missing=()):
+    async def get(question_id):
+        if question_id in missing:
+            return None
+        return {"id": question_id, "question": f"Вопрос <{question_id}>", "topic": "ML", "answer": "Ответ"}
+
+    monkeypatch.setattr(handlers.question_cache, "get", AsyncMock(side_effect=get))
+
+
+@pytest.mark.asyncio
+async def test_search_command_without_text_shows_usage(monkeypatch):
+    search = AsyncMock()
+    monkeypatch.setattr(handlers.db, "search_question_ids", search)
+    message = types.SimpleNamespace(reply_text=AsyncMock())
+    update = types.SimpleNamespace(message=message)
+    context = types.SimpleNamespace(args=[], user_data={})
+
+    await handlers.search_command(update, context)
+
+    search.assert_not_awaited()
+    assert message.reply_text.await_args.args[0] == SEARCH_USAGE
+
+
+@pytest.mark.asyncio
+async def test_search_command_replies_with_first_page(monkeypatch):
+    ids = [3, 1, 2, 5, 4, 6, 7, 8, 9, 10, 11, 12]
+    search = AsyncMock(return_value=ids)
+    monkeypatch.setattr(handlers.db, "search_question_ids", search)
+    _stub_question_cache(monkeypatch)
+    message = types.SimpleNamespace(reply_text=AsyncMock())
+    update = types.SimpleNamespace(message=message)
+    context = types.SimpleNamespace(args=["градиентный", "бустинг"], user_data={})
+
+    await handlers.search_command(update, context)
+
+    assert search.await_args.args[:2] == ("градиентный бустинг", 200)
+    assert context.user_data["search"] == {"query": "градиентный бустинг", "ids": ids}
+    args, kwargs = message.reply_text.await_args
+    assert "найдено 12, показаны 1–5" in args[0]
+    assert "Вопрос &lt;3&gt;" in args[0]
+    keyboard = kwargs["reply_markup"].inline_keyboard
+    assert [button.callback_data for button in keyboard[0]] == [f"search_open:{i}" for i in (3, 1, 2, 5, 4)]
+    assert [button.callback_data for button in keyboard[1]] == ["search_page:1"]
+
+
+@pytest.mark.asyncio
+async def test_search_command_reports_database_error(monkeypatch):
+    monkeypatch.setattr(handlers.db, "search_question_ids", AsyncMock(return_value=None))
+    message = types.SimpleNamespace(reply_text=AsyncMock())
+    update = types.SimpleNamespace(message=message)
+    context = types.SimpleNamespace(args=["модель"], user_data={})
+
+    await handlers.search_command(update, context)
+
+    assert message.reply_text.await_args.args[0] == ERROR_MESSAGE
+    assert "search" not in context.user_data
+
+
+@pytest.mark.asyncio
+async def test_search_page_callback_pages_saved_results_without_searching_again(monkeypatch):
+    search = AsyncMock()
+    monkeypatch.setattr(handlers.db, "search_question_ids", search)
+    _stub_question_cache(monkeypatch, missing={12})
+    query = types.SimpleNamespace(data="search_page:2", answer=AsyncMock(), edit_message_text=AsyncMock())
+    update = types.SimpleNamespace(callback_query=query)
+    context = types.SimpleNamespace(user_data={"search": {"query": "бустинг", "ids": list(range(1, 14))}})
+
+    await handlers.search_page_callback(update, context)
+
+    search.assert_not_awaited()
+    args, kwargs = query.edit_message_text.await_args
+    assert "найдено 13, показаны 11–12" in args[0]
+    assert [button.callback_data for button in kwargs["reply_markup"].inline_keyboard[0]] == [
+        "search_open:11", "search_open:13"
+    ]
+    assert [button.callback_data for button in kwargs["reply_markup"].inline_keyboard[1]] == ["search_page:1"]
+
+
+@pytest.mark.asyncio
+async def test_search_page_callback_without_saved_query(monkeypatch):
+    query = types.SimpleNamespace(data="search_page:1", answer=AsyncMock(), edit_message_text=AsyncMock())
+    update = types.SimpleNamespace(callback_query=query)
+    context = types.SimpleNamespace(user_data={})
+
+    await handlers.search_page_callback(update, context)
+
+    query.edit_message_text.assert_awaited_once_with(SEARCH_EXPIRED)
+
+
+@pytest.mark.asyncio
+async def test_send_random_question_uses_selected_topics(monkeypatch, no_topic_preferences):
+    no_topic_preferences.get.return_value = (2, 5)
+    picker_stub = types.SimpleNamespace(next_question=AsyncMock(return_value=None))
+    chat = types.SimpleNamespace(reply_text=AsyncMock())
+    monkeypatch.setattr(handlers, "prefetcher", picker_stub)
+
+    await handlers.send_random_question(chat, user_id=123)
+
+    picker_stub.next_question.assert_awaited_once_with(123, (2, 5))
+    assert chat.reply_text.await_args.args[0] == TOPIC_QUESTIONS_LEARNED
+
+
+_TOPICS = [{"id": 1, "name": "SQL", "count": 10}, {"id": 3, "name": "ML <базовый>", "count": 4}]
+
+
+@pytest.mark.asyncio
+async def test_topic_toggle_callback_redraws_keyboard(monkeypatch):
+    preferences = types.SimpleNamespace(
+        toggle=AsyncMock(return_value=(3,)),
+        get_topics=AsyncMock(return_value=_TOPICS),
+    )
+    monkeypatch.setattr(handlers, "topic_preferences", preferences)
+    query = types.SimpleNamespace(
+        data="topic:3", answer=AsyncMock(), edit_message_text=AsyncMock(),
+        from_user=types.SimpleNamespace(id=7),
+    )
+    update = types.SimpleNamespace(callback_query=query)
+
+    await handlers.topic_toggle_callback(update, types.SimpleNamespace())
+
+    preferences.toggle.assert_awaited_once_with(7, 3)
+    args, kwargs = query.edit_message_text.await_args
+    assert "ML &lt;базовый&gt;" in args[0]
+    buttons = [row[0] for row in kwargs["reply_markup"].inline_keyboard]
+    assert [button.callback_data for button in buttons] == ["topic:1", "topic:3", "topic:0"]
+    assert [button.text.startswith("✅") for button in buttons] == [False, True, False]
+
+
+@pytest.mark.asyncio
+async def test_topic_toggle_callback_reports_save_error(monkeypatch):
+    preferences = types.SimpleNamespace(toggle=AsyncMock(return_value=None), get_topics=AsyncMock())
+    monkeypatch.setattr(handlers, "topic_preferences", preferences)
+    query = types.SimpleNamespace(
+        data="topic:0", answer=AsyncMock(), edit_message_text=AsyncMock(),
+        from_user=types.SimpleNamespace(id=7),
+    )
+
+    await handlers.topic_toggle_callback(types.SimpleNamespace(callback_query=query), types.SimpleNamespace())
+
+    query.edit_message_text.assert_awaited_once_with(ERROR_MESSAGE)
+
+
+@pytest.mark.asyncio
+async def test_stats_text_uses_aggregates_and_topic_totals(monkeypatch, no_topic_preferences):
+    today = handlers.datetime.now(handlers.timezone.utc).date()
+    stats = {
+        "learned": 7, "current_streak": 3, "longest_streak": 5, "last_active_day": today,
+        "revealed_today": 4, "learned_today": 2, "topics": {1: 5},
+    }
+    monkeypatch.setattr(handlers.db, "get_user_stats", AsyncMock(return_value=stats))
+    monkeypatch.setattr(handlers, "catalog_stats", types.SimpleNamespace(is_loaded=True, total=14))
+    no_topic_preferences.get_topics = AsyncMock(return_value=_TOPICS)
+
+    text = await handlers._stats_text(7)
+
+    assert "7 из 14" in text
+    assert "открыто ответов: 4, выучено: 2" in text
+    assert "Дней подряд: 3 (рекорд: 5)" in text
+    assert "• SQL: 5/10" in text
+    assert "• ML &lt;базовый&gt;: 0/4" in text
+
+
+@pytest.mark.asyncio
+async def test_stats_text_resets_broken_streak(monkeypatch, no_topic_preferences):
+    stale_day = handlers.datetime.now(handlers.timezone.utc).date() - handlers.timedelta(days=2)
+    stats = {
+        "learned": 1, "current_streak": 3, "longest_streak": 3, "last_active_day": stale_day,
+        "revealed_today": 0, "learned_today": 0, "topics": {},
+    }
+    monkeypatch.setattr(handlers.db, "get_user_stats", AsyncMock(return_value=stats))
+    monkeypatch.setattr(handlers, "catalog_stats", types.SimpleNamespace(is_loaded=True, total=1))
+    no_topic_preferences.get_topics = AsyncMock(return_value=[])
+
+    assert "Дней подряд: 0 (рекорд: 3)" in await handlers._stats_text(7)
+
+
+@pytest.mark.asyncio
+async def test_show_answer_schedules_review_through_log_batch(monkeypatch):
+    _stub_question_cache(monkeypatch)
+    due_at = datetime(2024, 5, 1, 11, 0, tzinfo=timezone.utc)
+    writer = types.SimpleNamespace(log=MagicMock(return_value=True))
+    monkeypatch.setattr(handlers, "log_writer", writer)
+    monkeypatch.setattr(handlers, "scheduler", types.SimpleNamespace(reveal_due_at=lambda: due_at))
+    user = types.SimpleNamespace(id=7, username="bob", first_name="Bob")
+    query = types.SimpleNamespace(data="show_answer:42", answer=AsyncMock(), edit_message_text=AsyncMock(),
+                                  from_user=user)
+    update = types.SimpleNamespace(callback_query=query)
+
+    await handlers.show_answer_callback(update, types.SimpleNamespace())
+
+    writer.log.assert_called_once_with("bob", 42, 7, ACTION_REVEAL, review_due_at=due_at)
+    query.edit_message_text.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_mark_learned_keeps_caches_when_db_write_fails(monkeypatch):
+    _stub_question_cache(monkeypatch)
+    monkeypatch.setattr(handlers.db, "mark_question_learned", AsyncMock(return_value=None))
+    unlearned = types.SimpleNamespace(discard=MagicMock())
+    prefetch = types.SimpleNamespace(discard=MagicMock())
+    writer = types.SimpleNamespace(log=MagicMock(return_value=True))
+    monkeypatch.setattr(handlers, "unlearned_cache", unlearned)
+    monkeypatch.setattr(handlers, "prefetcher", prefetch)
+    monkeypatch.setattr(handlers, "log_writer", writer)
+    user = types.SimpleNamespace(id=7, username="bob", first_name="Bob")
+    query = types.SimpleNamespace(data="learned:42", answer=AsyncMock(), edit_message_text=AsyncMock(),
+                                  from_user=user)
+    update = types.SimpleNamespace(callback_query=query)
+
+    await handlers.mark_learned_callback(update, types.SimpleNamespace())
+
+    unlearned.discard.assert_not_called()
+    prefetch.discard.assert_not_called()
+    writer.log.assert_not_called()
+    query.edit_message_text.assert_awaited_once_with(ERROR_MESSAGE)
@@ -0,0 +1,84 @@
+import pytest
+
+from import_data import CopyStream, content_hash, format_copy_row, plan_changes, report_missing, to_record
+
+pytestmark = pytest.mark.unit
+
+
+def item(question_id, question='Вопрос?', topic='ML', answer='Ответ'):
+    return {'id': question_id, 'question': question, 'topic': topic, 'answer': answer}
+
+
+def stored(question_id, **kwargs):
+    return content_hash(*to_record(item(question_id, **kwargs))[1:])
+
+
+def test_content_hash_treats_missing_topic_and_answer_as_empty():
+    assert content_hash('Вопрос?', None, None) == content_hash('Вопрос?', '', '')
+    assert content_hash('a', 'b', '') != content_hash('a', '', 'b')
+
+
+def test_plan_changes_diffs_file_against_stored_hashes():
+    existing = {1: stored(1), 2: stored(2), 3: stored(3)}
+    items = [item(1), item(2, answer='Новый ответ'), item(4)]
+
+    changes = list(plan_changes(items, existing))
+
+    assert changes == [
+        ('unchanged', 1),
+        ('update', (2, 'Вопрос?', 'ML', 'Новый ответ')),
+        ('insert', (4, 'Вопрос?', 'ML', 'Ответ')),
+        ('delete', 3),
+    ]
+
+
+def test_plan_changes_skips_repeated_ids():
+    changes = list(plan_changes([item(1), item(1, answer='Другой'), item(5), item(5)], {1: stored(1)}))
+
+    assert changes == [
+        ('unchanged', 1),
+        ('duplicate', 1),
+        ('insert', (5, 'Вопрос?', 'ML', 'Ответ')),
+        ('duplicate', 5),
+    ]
+
+
+def test_plan_changes_reads_items_lazily():
+    def items():
+        yield item(1)
+        raise AssertionError("генератор прочитан дальше, чем нужно")
+
+    changes = plan_changes(items(), {})
+
+    assert next(changes) == ('insert', (1, 'Вопрос?', 'ML', 'Ответ'))
+
+
+def test_copy_rows_escape_special_characters():
+    assert format_copy_row((1, 'a\\b\tc', None, 'x\ny\r')) == '1\ta\\\\b\\tc\t\\N\tx\\ny\\r\n'
+
+
+@pytest.mark.parametrize("size", [1, 5, 1 << 16])
+def test_copy_stream_returns_all_rows_in_chunks(size):
+    records = [(i, f'Вопрос {i}', None, 'Ответ') for i in range(50)]
+    stream = CopyStream(records)
+
+    chunks = []
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            break
+        assert len(chunk) <= size
+        chunks.append(chunk)
+
+    assert ''.join(chunks) == ''.join(format_copy_row(record) for record in records)
+    assert stream.rows == 50
+
+
+def test_report_missing_lists_ids_and_points_to_delete_flag(capsys):
+    report_missing(list(range(1, 61)), 75)
+
+    out = capsys.readouterr().out
+    assert "нет 75 вопросов" in out
+    assert "--delete-missing" in out
+    assert "50 и еще 25" in out
+    assert "51" not in out.split("и еще")[0].split(", ")
@@ -0,0 +1,27 @@
+from datetime import date
+
+import pytest
+
+from maintain_user_logs import add_months, expired_partitions, partition_month, retention_cutoff
+
+pytestmark = pytest.mark.unit
+
+
+def test_add_months_crosses_year_boundaries():
+    assert add_months(date(2024, 11, 1), 2) == date(2025, 1, 1)
+    assert add_months(date(2024, 1, 1), -13) == date(2022, 12, 1)
+
+
+def test_partition_month_parses_only_monthly_partitions():
+    assert partition_month("user_logs_2024_05") == date(2024, 5, 1)
+    assert partition_month("user_logs_default") is None
+    assert partition_month("user_logs_2024_13") is None
+
+
+def test_expired_partitions_keep_current_month_and_retention_window():
+    names = ["user_logs_default", "user_logs_2024_04", "user_logs_2023_05", "user_logs_2024_05",
+             "user_logs_2023_04", "user_logs_2024_06"]
+
+    assert retention_cutoff(date(2024, 5, 20), 12) == date(2023, 5, 1)
+    assert expired_partitions(names, date(2024, 5, 20), 12) == ["user_logs_2023_04"]
+    assert expired_partitions(names, date(2024, 5, 20), 1) == ["user_logs_2023_04", "user_logs_2023_05"]
@@ -0,0 +1,155 @@
+import asyncio
+import logging
+
+import pytest
+
+from app.metrics import MetricsRegistry, MetricsServer, ErrorLogCounter, timed, instrument_methods
+
+pytestmark = pytest.mark.unit
+
+
+def _registry():
+    registry = MetricsRegistry(enabled=True)
+    seconds = registry.histogram("test_duration_seconds", "Duration", ("method",), buckets=(0.1, 1.0))
+    errors = registry.counter("test_errors_total", "Errors", ("method",))
+    return registry, seconds, errors
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry, seconds, _ = _registry()
+
+    seconds.observe(0.05, "get")
+    seconds.observe(0.1, "get")
+    seconds.observe(5, "get")
+
+    text = registry.render()
+    assert "# TYPE test_duration_seconds histogram" in text
+    assert 'test_duration_seconds_bucket{method="get",le="0.1"} 2' in text
+    assert 'test_duration_seconds_bucket{method="get",le="1"} 2' in text
+    assert 'test_duration_seconds_bucket{method="get",le="+Inf"} 3' in text
+    assert 'test_duration_seconds_count{method="get"} 3' in text
+    assert 'test_duration_seconds_sum{method="get"} 5.15' in text
+
+
+def test_counter_escapes_labels_and_gauge_uses_callback():
+    registry, _, errors = _registry()
+    registry.gauge("test_pool", "Pool", ("state",), callback=lambda: {("busy",): 2, ("idle",): 3})
+    registry.gauge("test_queue", "Queue", callback=lambda: 7)
+
+    errors.inc('say "hi"')
+
+    text = registry.render()
+    assert 'test_errors_total{method="say \\"hi\\""} 1' in text
+    assert 'test_pool{state="busy"} 2' in text
+    assert 'test_pool{state="idle"} 3' in text
+    assert "test_queue 7" in text
+
+
+def test_counter_rejects_wrong_labels():
+    _, _, errors = _registry()
+
+    with pytest.raises(ValueError):
+        errors.inc("a", "b")
+
+
+def test_timed_returns_function_unchanged_when_disabled():
+    registry = MetricsRegistry(enabled=False)
+    seconds = registry.histogram("test_seconds", "Duration", ("method",))
+
+    def handler():
+        return 1
+
+    assert timed(seconds, "handler")(handler) is handler
+
+
+def test_timed_measures_async_function_and_counts_exceptions():
+    _, seconds, errors = _registry()
+
+    @timed(seconds, "ok", errors)
+    async def ok():
+        return 42
+
+    @timed(seconds, "fail", errors)
+    async def fail():
+        raise RuntimeError("boom")
+
+    assert asyncio.run(ok()) == 42
+    with pytest.raises(RuntimeError):
+        asyncio.run(fail())
+
+    assert seconds.count("ok") == 1
+    assert seconds.count("fail") == 1
+    assert errors.value("ok") == 0
+    assert errors.value("fail") == 1
+
+
+def test_instrument_methods_wraps_public_methods_only():
+    _, seconds, errors = _registry()
+
+    @instrument_methods(seconds, errors, exclude=("close",))
+    class Db:
+        def get(self):
+            return "row"
+
+        async def fetch(self):
+            return "rows"
+
+        def close(self):
+            pass
+
+        def _private(self):
+            pass
+
+    db = Db()
+    db.get()
+    asyncio.run(db.fetch())
+    db.close()
+    db._private()
+
+    assert seconds.count("get") == 1
+    assert seconds.count("fetch") == 1
+    assert seconds.count("close") == 0
+    assert seconds.count("_private") == 0
+
+
+def test_error_log_counter_counts_error_records_by_logger():
+    registry, _, _ = _registry()
+    counter = registry.counter("test_log_errors_total", "Log errors", ("logger",))
+    log = logging.getLogger("test_metrics.errors")
+    handler = ErrorLogCounter(counter)
+    log.addHandler(handler)
+    try:
+        log.warning("not counted")
+        log.error("counted")
+    finally:
+        log.removeHandler(handler)
+
+    assert counter.value("test_metrics.errors") == 1
+
+
+def test_metrics_server_serves_metrics_and_404():
+    registry, _, errors = _registry()
+    errors.inc("get")
+
+    async def request(port, path):
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        return response.decode()
+
+    async def scenario():
+        server = MetricsServer(registry, listen="127.0.0.1", port=0)
+        await server.start()
+        try:
+            port = server.sockets[0].getsockname()[1]
+            return await request(port, "/metrics"), await request(port, "/")
+        finally:
+            await server.stop()
+
+    metrics, not_found = asyncio.run(scenario())
+
+    assert metrics.startswith("HTTP/1.1 200 OK")
+    assert 'test_errors_total{method="get"} 1' in metrics
+    assert not_found.startswith("HTTP/1.1 404")
@@ -0,0 +1,111 @@
+import asyncio
+import types
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.prefetch import QuestionPrefetcher
+from tests.unit.conftest import make_question
+
+pytestmark = pytest.mark.unit
+
+
+class _Feed:
+    def __init__(self, is_active=True):
+        self.is_active = is_active
+        self.callbacks = []
+
+    def subscribe(self, callback):
+        self.callbacks.append(callback)
+
+
+def _make_prefetcher(ids=(10, 11, 12), feed_active=True, learned=False, **kwargs):
+    picks = iter(ids)
+    scheduler = types.SimpleNamespace(
+        next_question=AsyncMock(side_effect=lambda *args: make_question(next(picks)))
+    )
+    db = types.SimpleNamespace(is_question_learned=AsyncMock(return_value=learned))
+    feed = _Feed(feed_active)
+    prefetcher = QuestionPrefetcher(scheduler, db, feed, enabled=True,
+                                    ttl=kwargs.get("ttl", 60), max_users=kwargs.get("max_users", 10))
+    return prefetcher, scheduler, db, feed
+
+
+@pytest.mark.asyncio
+async def test_prefetched_question_is_served_without_scheduler_call():
+    prefetcher, scheduler, db, _ = _make_prefetcher()
+
+    prefetcher.schedule(1, (), shown_question_id=5)
+    await asyncio.sleep(0)
+    question = await prefetcher.next_question(1)
+
+    assert question["id"] == 10
+    scheduler.next_question.assert_awaited_once_with(1, (), 5)
+    db.is_question_learned.assert_not_awaited()
+    assert (prefetcher.hits, prefetcher.misses) == (1, 0)
+
+
+@pytest.mark.asyncio
+async def test_tap_waits_for_prefetch_in_flight():
+    prefetcher, scheduler, _, _ = _make_prefetcher()
+
+    prefetcher.schedule(1, (), shown_question_id=5)
+    question = await prefetcher.next_question(1)
+
+    assert question["id"] == 10
+    assert scheduler.next_question.await_count == 1
+
+
+@pytest.mark.asyncio
+async def test_learned_or_changed_topics_fall_back_to_fresh_pick():
+    prefetcher, scheduler, _, feed = _make_prefetcher(ids=(10, 11, 12, 13))
+
+    prefetcher.schedule(1, (), shown_question_id=5)
+    await asyncio.sleep(0)
+    # Уведомление с другой реплики: вопрос 10 выучен
+    feed.callbacks[0](1, 10)
+    assert (await prefetcher.next_question(1))["id"] == 11
+
+    prefetcher.schedule(1, (), shown_question_id=11)
+    await asyncio.sleep(0)
+    assert (await prefetcher.next_question(1, topic_ids=(3,)))["id"] == 13
+    assert prefetcher.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_same_question_as_shown_is_not_prefetched():
+    prefetcher, _, _, _ = _make_prefetcher(ids=(5, 6))
+
+    prefetcher.schedule(1, (), shown_question_id=5)
+    await asyncio.sleep(0)
+
+    assert (await prefetcher.next_question(1))["id"] == 6
+    assert prefetcher.misses == 1
+
+
+@pytest.mark.asyncio
+async def test_rechecks_learned_state_without_notifications():
+    prefetcher, _, db, _ = _make_prefetcher(feed_active=False, learned=True)
+
+    prefetcher.schedule(1, (), shown_question_id=5)
+    await asyncio.sleep(0)
+
+    assert (await prefetcher.next_question(1))["id"] == 11
+    db.is_question_learned.assert_awaited_once_with(1, 10)
+    assert prefetcher.rechecks == 1
+
+
+@pytest.mark.asyncio
+async def test_expired_and_catalog_changes_drop_prefetch():
+    prefetcher, _, _, _ = _make_prefetcher(ids=(10, 11, 12, 13), ttl=0)
+
+    prefetcher.schedule(1, (), shown_question_id=5)
+    await asyncio.sleep(0.01)
+    assert (await prefetcher.next_question(1))["id"] == 11
+
+    prefetcher.ttl = 60
+    prefetcher.schedule(1, (), shown_question_id=11)
+    await asyncio.sleep(0)
+    await prefetcher.on_catalog_changed(version=2)
+    assert len(prefetcher) == 0
+    assert (await prefetcher.next_question(1))["id"] == 13
@@ -0,0 +1,108 @@
+import types
+from datetime import datetime, timedelta, timezone
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.scheduler import ReviewScheduler, sm2_step, QUALITY_LEARNED, QUALITY_REPEAT, MIN_EASE
+from tests.unit.conftest import make_question
+
+pytestmark = pytest.mark.unit
+
+NOW = datetime(2024, 1, 1, tzinfo=timezone.utc)
+RELEARN = timedelta(minutes=10)
+
+
+def _make_scheduler(due_id=None, enabled=True):
+    db = types.SimpleNamespace(
+        get_due_question_id=AsyncMock(return_value=due_id),
+        update_review_state=AsyncMock(),
+    )
+    question_cache = types.SimpleNamespace(get=AsyncMock(side_effect=make_question))
+    picker = types.SimpleNamespace(get_random_question=AsyncMock(return_value=make_question(99)))
+    scheduler = ReviewScheduler(db, question_cache, picker, enabled=enabled,
+                                relearn_interval=600, reveal_recheck_interval=3600)
+    return scheduler, db, picker
+
+
+def test_sm2_intervals_grow_with_successful_reviews():
+    state = sm2_step(None, QUALITY_LEARNED, NOW, RELEARN)
+    assert state["interval_days"] == 1.0
+    assert state["due_at"] == NOW + timedelta(days=1)
+
+    state = sm2_step(state, QUALITY_LEARNED, NOW, RELEARN)
+    assert state["interval_days"] == 6.0
+
+    ease = state["ease"]
+    state = sm2_step(state, QUALITY_LEARNED, NOW, RELEARN)
+    assert state["interval_days"] == pytest.approx(6.0 * ease)
+    assert state["repetitions"] == 3
+
+
+def test_sm2_lapse_resets_repetitions_and_lowers_ease():
+    state = sm2_step(None, QUALITY_LEARNED, NOW, RELEARN)
+    state = sm2_step(state, QUALITY_REPEAT, NOW, RELEARN)
+
+    assert state["repetitions"] == 0
+    assert state["lapses"] == 1
+    assert state["due_at"] == NOW + RELEARN
+
+    for _ in range(10):
+        state = sm2_step(state, QUALITY_REPEAT, NOW, RELEARN)
+    assert state["ease"] == MIN_EASE
+
+
+@pytest.mark.asyncio
+async def test_due_card_is_shown_before_new_ones():
+    scheduler, db, picker = _make_scheduler(due_id=5)
+
+    question = await scheduler.next_question(user_id=1)
+
+    assert question["id"] == 5
+    db.get_due_question_id.assert_awaited_once_with(1, None)
+    picker.get_random_question.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_random_question_without_due_cards():
+    scheduler, _, picker = _make_scheduler(due_id=None)
+
+    question = await scheduler.next_question(user_id=1)
+
+    assert question["id"] == 99
+    picker.get_random_question.assert_awaited_once_with(1, None)
+
+
+@pytest.mark.asyncio
+async def test_record_answer_applies_sm2_to_stored_state():
+    scheduler, db, _ = _make_scheduler()
+
+    await scheduler.record_answer(1, 5, QUALITY_REPEAT)
+
+    user_id, question_id, update = db.update_review_state.await_args.args
+    assert (user_id, question_id) == (1, 5)
+    state = update({"ease": 2.5, "interval_days": 6.0, "repetitions": 2, "lapses": 0})
+    assert state["lapses"] == 1
+    assert state["repetitions"] == 0
+
+
+@pytest.mark.asyncio
+async def test_disabled_scheduler_only_picks_random_questions():
+    scheduler, db, picker = _make_scheduler(due_id=5, enabled=False)
+
+    question = await scheduler.next_question(user_id=1)
+    await scheduler.record_answer(1, 5, QUALITY_LEARNED)
+
+    assert question["id"] == 99
+    db.get_due_question_id.assert_not_awaited()
+    assert scheduler.reveal_due_at() is None
+    db.update_review_state.assert_not_awaited()
+
+
+def test_reveal_due_at_is_recheck_interval_from_now():
+    scheduler, _, _ = _make_scheduler()
+
+    before = datetime.now(timezone.utc)
+    due_at = scheduler.reveal_due_at()
+
+    assert before + timedelta(hours=1) <= due_at <= datetime.now(timezone.utc) + timedelta(hours=1)
@@ -0,0 +1,80 @@
+import json
+import zlib
+from collections import Counter
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+import classify_topics
+from topic_model import HashedFeatures, PredictionCache, TopicModel, tokenize
+
+pytestmark = pytest.mark.unit
+
+TEXTS = [
+    "Как работает сверточная нейросеть?", "Что такое слой свертки в нейросети?",
+    "Зачем нужен пулинг в нейросетях?", "Как считать p-значение теста?",
+    "Что такое доверительный интервал?", "Как проверить статистическую гипотезу?",
+]
+LABELS = ["DL", "DL", "DL", "Stats", "Stats", "Stats"]
+
+
+def test_hashed_features_match_tokens():
+    features = HashedFeatures.from_texts(TEXTS[:2], 1 << 12)
+
+    for row, text in enumerate(TEXTS[:2]):
+        expected = Counter(zlib.crc32(token.encode("utf-8")) % (1 << 12) for token in tokenize(text))
+        start, end = features.indptr[row], features.indptr[row + 1]
+        assert dict(zip(features.indices[start:end].tolist(), features.data[start:end].tolist())) == expected
+
+
+def test_model_learns_and_survives_save_load(tmp_path):
+    model = TopicModel.train(TEXTS, LABELS, n_features=1 << 12, epochs=100)
+
+    assert model.predict(["Что делает слой пулинга в нейросети?", "Как интерпретировать доверительный интервал?"]) \
+        == ["DL", "Stats"]
+
+    path = tmp_path / "model.npz"
+    model.save(path)
+    loaded = TopicModel.load(path)
+
+    assert loaded.classes == model.classes
+    assert loaded.predict(TEXTS) == model.predict(TEXTS)
+    assert np.allclose(loaded.predict_proba(TEXTS), model.predict_proba(TEXTS), atol=1e-2)
+
+
+def test_prediction_cache_is_bound_to_model(tmp_path):
+    path = str(tmp_path / "cache.json")
+    cache = PredictionCache(path, "model-a")
+    cache.put("вопрос", "DL")
+    cache.save()
+
+    assert PredictionCache(path, "model-a").get("вопрос") == "DL"
+    assert PredictionCache(path, "model-b").get("вопрос") is None
+
+
+def test_classify_stream_memoizes_model_predictions(tmp_path, monkeypatch):
+    model_path = str(tmp_path / "model.npz")
+    TopicModel.train(TEXTS, LABELS, n_features=1 << 12, epochs=50).save(model_path)
+    source = tmp_path / "items.jsonl"
+    source.write_text("\n".join(json.dumps({"id": i, "question": text, "topic": ""}, ensure_ascii=False)
+                                for i, text in enumerate(TEXTS)), encoding="utf-8")
+    cache_path = str(tmp_path / "cache.json")
+
+    kwargs = dict(workers=1, reclassify=True, backend="model", model_path=model_path, cache_path=cache_path)
+    assert classify_topics.classify_stream(str(source), str(tmp_path / "out1.jsonl"), **kwargs) == (6, 6)
+    # Повторный запуск берет предсказания из кэша
+    assert classify_topics.classify_stream(str(source), str(tmp_path / "out2.jsonl"), **kwargs) == (6, 0)
+    assert (tmp_path / "out1.jsonl").read_text(encoding="utf-8") == (tmp_path / "out2.jsonl").read_text(encoding="utf-8")
+
+
+def test_hybrid_backend_keeps_keyword_topics(tmp_path):
+    model_path = str(tmp_path / "model.npz")
+    TopicModel.train(TEXTS, LABELS, n_features=1 << 12, epochs=50).save(model_path)
+    classify_topics._init_backend("hybrid", model_path)
+    try:
+        topics = classify_topics._classify_texts(["Что такое random forest?", "Зачем нужен пулинг в нейросетях?"])
+    finally:
+        classify_topics._init_backend("keywords")
+
+    assert topics == ["Ансамбли и деревья", "DL"]
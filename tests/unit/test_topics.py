@@ -0,0 +1,77 @@
+import types
+from unittest.mock import AsyncMock
+
+import pytest
+
+from app.topics import TopicPreferences, ALL_TOPICS
+
+pytestmark = pytest.mark.unit
+
+
+def _make_preferences(stored=(), saved=True, **kwargs):
+    db = types.SimpleNamespace(
+        get_topics=AsyncMock(return_value=[{"id": 1, "name": "SQL", "count": 3}]),
+        get_topic_preferences=AsyncMock(return_value=list(stored)),
+        set_topic_preferences=AsyncMock(return_value=saved),
+    )
+    return TopicPreferences(db, max_users=kwargs.get("max_users", 10), ttl=kwargs.get("ttl", 300)), db
+
+
+@pytest.mark.asyncio
+async def test_get_reads_preferences_once():
+    preferences, db = _make_preferences(stored=[2, 4])
+
+    assert await preferences.get(1) == (2, 4)
+    assert await preferences.get(1) == (2, 4)
+    db.get_topic_preferences.assert_awaited_once_with(1)
+
+
+@pytest.mark.asyncio
+async def test_get_does_not_cache_database_errors():
+    preferences, db = _make_preferences()
+    db.get_topic_preferences.side_effect = [None, [3]]
+
+    assert await preferences.get(1) == ()
+    assert await preferences.get(1) == (3,)
+
+
+@pytest.mark.asyncio
+async def test_toggle_adds_removes_and_resets_topics():
+    preferences, db = _make_preferences(stored=[2])
+
+    assert await preferences.toggle(1, 5) == (2, 5)
+    assert await preferences.toggle(1, 2) == (5,)
+    assert await preferences.toggle(1, ALL_TOPICS) == ()
+    assert [call.args for call in db.set_topic_preferences.await_args_list] == [(1, (2, 5)), (1, (5,)), (1, ())]
+    assert await preferences.get(1) == ()
+    db.get_topic_preferences.assert_awaited_once()
+
+
+@pytest.mark.asyncio
+async def test_toggle_keeps_previous_choice_when_save_fails():
+    preferences, _ = _make_preferences(stored=[2], saved=False)
+
+    assert await preferences.toggle(1, 5) is None
+    assert await preferences.get(1) == (2,)
+
+
+@pytest.mark.asyncio
+async def test_cache_is_bounded_by_users():
+    preferences, db = _make_preferences(stored=[1], max_users=2)
+
+    for user_id in (1, 2, 3):
+        await preferences.get(user_id)
+    await preferences.get(1)
+
+    assert db.get_topic_preferences.await_count == 4
+
+
+@pytest.mark.asyncio
+async def test_topics_are_reloaded_on_catalog_change():
+    preferences, db = _make_preferences()
+
+    assert await preferences.get_topics() == [{"id": 1, "name": "SQL", "count": 3}]
+    await preferences.get_topics()
+    await preferences.on_catalog_changed(version=2)
+
+    assert db.get_topics.await_count == 2
@@ -0,0 +1,123 @@
+import types
+from array import array
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+from app.unlearned_cache import UnlearnedCache, _UserEntry
+from tests.unit.conftest import make_question
+
+pytestmark = pytest.mark.unit
+
+
+def _make_cache(ids=(1, 2, 3), **kwargs):
+    listener = MagicMock()
+    listener.is_closed.return_value = False
+    db = types.SimpleNamespace(
+        get_unlearned_question_ids=AsyncMock(side_effect=lambda user_id: array("i", ids)),
+        get_random_question=AsyncMock(return_value=make_question(99)),
+    )
+    question_cache = types.SimpleNamespace(get=AsyncMock(side_effect=make_question))
+    cache = UnlearnedCache(db, question_cache, enabled=True, max_ids=kwargs.get("max_ids", 100),
+                           ttl=kwargs.get("ttl", 600), listener_check_interval=60)
+    cache._listener = listener
+    return cache, db
+
+
+@pytest.mark.asyncio
+async def test_warm_user_is_served_from_memory():
+    cache, db = _make_cache()
+
+    first = await cache.get_random_question(user_id=1)
+    second = await cache.get_random_question(user_id=1)
+
+    assert first["id"] in (1, 2, 3)
+    assert second["id"] in (1, 2, 3)
+    db.get_unlearned_question_ids.assert_awaited_once_with(1)
+    db.get_random_question.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_discard_removes_learned_question():
+    cache, _ = _make_cache(ids=(1, 2))
+    await cache.get_random_question(user_id=1)
+
+    cache.discard(1, 1)
+    picks = {(await cache.get_random_question(user_id=1))["id"] for _ in range(20)}
+
+    assert picks == {2}
+    assert cache.total_ids == 1
+
+    cache.discard(1, 2)
+    assert await cache.get_random_question(user_id=1) is None
+
+
+def test_entry_discard_keeps_position_index_consistent():
+    entry = _UserEntry(array("i", range(1, 11)))
+
+    for question_id in (1, 10, 5, 42, 5, 2):
+        entry.discard(question_id)
+
+    assert sorted(entry.ids) == [3, 4, 6, 7, 8, 9]
+    assert entry.positions == {question_id: index for index, question_id in enumerate(entry.ids)}
+
+
+@pytest.mark.asyncio
+async def test_notification_from_other_replica_updates_entry():
+    cache, _ = _make_cache(ids=(1, 2))
+    await cache.get_random_question(user_id=7)
+
+    cache._on_notification(None, 0, "learned_changed", "I:7:2")
+    assert list(cache._entries[7].ids) == [1]
+
+    cache._on_notification(None, 0, "learned_changed", "D:7:2")
+    assert 7 not in cache._entries
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_keeps_total_ids_under_cap():
+    cache, _ = _make_cache(ids=(1, 2, 3), max_ids=6)
+
+    for user_id in (1, 2, 3):
+        await cache.get_random_question(user_id=user_id)
+
+    assert list(cache._entries) == [2, 3]
+    assert cache.total_ids == 6
+
+
+@pytest.mark.asyncio
+async def test_falls_back_to_database_without_subscription():
+    cache, db = _make_cache()
+    cache._listener.is_closed.return_value = True
+
+    question = await cache.get_random_question(user_id=1)
+
+    assert question["id"] == 99
+    db.get_unlearned_question_ids.assert_not_awaited()
+
+
+@pytest.mark.asyncio
+async def test_change_during_load_is_not_cached():
+    cache, db = _make_cache()
+
+    async def load(user_id):
+        cache.discard(user_id, 1)
+        return array("i", (1, 2, 3))
+
+    db.get_unlearned_question_ids.side_effect = load
+
+    question = await cache.get_random_question(user_id=1)
+
+    assert question["id"] == 99
+    assert len(cache) == 0
+
+
+@pytest.mark.asyncio
+async def test_topic_filter_is_served_by_database():
+    cache, db = _make_cache()
+
+    question = await cache.get_random_question(user_id=1, topic_ids=(4,))
+
+    assert question["id"] == 99
+    db.get_random_question.assert_awaited_once_with(1, (4,))
+    db.get_unlearned_question_ids.assert_not_awaited()
@@ -0,0 +1,84 @@
+import asyncio
+
+import pytest
+from telegram import Update, User, Message, Chat
+
+from app.update_processor import PerUserUpdateProcessor
+
+pytestmark = pytest.mark.unit
+
+
+def _update(update_id, user_id):
+    user = User(id=user_id, is_bot=False, first_name="Test")
+    chat = Chat(id=user_id, type="private")
+    message = Message(message_id=update_id, date=None, chat=chat, from_user=user, text="hi")
+    return Update(update_id=update_id, message=message)
+
+
+@pytest.mark.asyncio
+async def test_updates_of_one_user_are_serialized_in_order():
+    processor = PerUserUpdateProcessor(concurrent_updates=8, max_pending=100, stats_interval=0)
+    events = []
+
+    async def handle(name, delay):
+        events.append(("start", name))
+        await asyncio.sleep(delay)
+        events.append(("end", name))
+
+    await asyncio.gather(
+        processor.process_update(_update(1, 7), handle("learned", 0.02)),
+        processor.process_update(_update(2, 7), handle("repeat", 0)),
+    )
+
+    assert events == [("start", "learned"), ("end", "learned"), ("start", "repeat"), ("end", "repeat")]
+    assert processor._locks == {}
+
+
+@pytest.mark.asyncio
+async def test_different_users_run_in_parallel_up_to_bound():
+    processor = PerUserUpdateProcessor(concurrent_updates=2, max_pending=100, stats_interval=0)
+    running = 0
+    peak = 0
+
+    async def handle():
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await asyncio.gather(*(processor.process_update(_update(i, i), handle()) for i in range(6)))
+
+    assert peak == 2
+    stats = processor.stats()
+    assert stats["processed"] == 6
+    assert stats["pending"] == 0
+    assert stats["max_pending_seen"] == 6
+
+
+@pytest.mark.asyncio
+async def test_waiting_user_does_not_hold_processing_slot():
+    processor = PerUserUpdateProcessor(concurrent_updates=2, max_pending=100, stats_interval=0)
+    release = asyncio.Event()
+    order = []
+
+    async def slow():
+        await release.wait()
+        order.append("slow")
+
+    async def fast(name):
+        order.append(name)
+
+    first = asyncio.create_task(processor.process_update(_update(1, 1), slow()))
+    same_user = asyncio.create_task(processor.process_update(_update(2, 1), fast("same user")))
+    other_user = asyncio.create_task(processor.process_update(_update(3, 2), fast("other user")))
+    await asyncio.wait_for(other_user, timeout=1)
+    release.set()
+    await asyncio.gather(first, same_user)
+
+    assert order == ["other user", "slow", "same user"]
+
+
+def test_update_without_user_or_chat_is_not_ordered():
+    assert PerUserUpdateProcessor.update_key(object()) is None
+    assert PerUserUpdateProcessor.update_key(_update(1, 5)) == ("user", 5)
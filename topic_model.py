@@ -0,0 +1,327 @@
+#!/usr/bin/env python3
+"""
+Классификатор тем на основе модели: TF-IDF по хешированным признакам и многоклассовая
+логистическая регрессия (softmax), обученная на уже размеченных вопросах из raw.json.
+
+Требует numpy (есть в requirements.txt).
+
+    python topic_model.py train raw.json -o topic_model.npz
+    python topic_model.py evaluate raw.json
+    python classify_topics.py dump.jsonl --backend model --model topic_model.npz --cache topic_cache.json
+
+Бэкенд hybrid оставляет тему по ключевым словам, а модель спрашивает только для вопросов,
+в которых не нашлось ни одного ключевого слова.
+"""
+import argparse
+import hashlib
+import json
+import os
+import random
+import re
+import time
+import zlib
+from functools import lru_cache
+
+import numpy as np
+
+from data_io import iter_items
+
+DEFAULT_FEATURES = 1 << 18
+CHAR_NGRAM = 3
+
+_WORD_RE = re.compile(r'\w+')
+
+
+def tokenize(text):
+    """Слова, пары соседних слов и символьные триграммы слов (устойчивы к окончаниям)"""
+    words = _WORD_RE.findall(text.lower())
+    tokens = ['w:' + word for word in words]
+    tokens.extend(f"b:{first} {second}" for first, second in zip(words, words[1:]))
+    for word in words:
+        padded = f"<{word}>"
+        tokens.extend('c:' + padded[i:i + CHAR_NGRAM] for i in range(len(padded) - CHAR_NGRAM + 1))
+    return tokens
+
+
+def _feature_index(token, n_features):
+    return zlib.crc32(token.encode('utf-8')) % n_features
+
+
+@lru_cache(maxsize=1 << 17)
+def _word_feature_indices(word, n_features):
+    """Признаки слова и его символьных триграмм (слова в вопросах повторяются — считаем один раз)"""
+    padded = f"<{word}>"
+    tokens = ['w:' + word] + ['c:' + padded[i:i + CHAR_NGRAM] for i in range(len(padded) - CHAR_NGRAM + 1)]
+    return tuple(_feature_index(token, n_features) for token in tokens)
+
+
+def text_key(text):
+    """Ключ кэша предсказаний: хеш текста вопроса"""
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+class HashedFeatures:
+    """
+    Разреженная матрица признаков в формате CSR (indptr, indices, data).
+    Номер признака — crc32 токена по модулю n_features, поэтому словарь не хранится.
+    """
+
+    def __init__(self, indptr, indices, data, n_features):
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.n_features = n_features
+
+    @classmethod
+    def from_texts(cls, texts, n_features):
+        """Признаки токенов tokenize(); одинаковые признаки строки суммируются"""
+        indices = []
+        lengths = []
+        for text in texts:
+            words = _WORD_RE.findall(text.lower())
+            start = len(indices)
+            for word in words:
+                indices.extend(_word_feature_indices(word, n_features))
+            indices.extend(_feature_index(f"b:{first} {second}", n_features) for first, second in zip(words, words[1:]))
+            lengths.append(len(indices) - start)
+
+        rows = np.repeat(np.arange(len(lengths), dtype=np.int64), lengths)
+        keys, counts = np.unique(rows * n_features + np.asarray(indices, dtype=np.int64), return_counts=True)
+        indptr = np.zeros(len(lengths) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys // n_features, minlength=len(lengths)), out=indptr[1:])
+        return cls(indptr, keys % n_features, counts.astype(np.float32), n_features)
+
+    @property
+    def n_rows(self):
+        return len(self.indptr) - 1
+
+    @property
+    def row_ids(self):
+        """Номер строки для каждого ненулевого элемента"""
+        return np.repeat(np.arange(self.n_rows), np.diff(self.indptr))
+
+    def tfidf(self, idf):
+        """Сублинейный TF, умноженный на IDF, с L2-нормировкой строк"""
+        data = (1.0 + np.log(self.data)) * idf[self.indices]
+        rows = self.row_ids
+        norms = np.sqrt(np.bincount(rows, weights=data * data, minlength=self.n_rows))
+        norms[norms == 0] = 1.0
+        return HashedFeatures(self.indptr, self.indices, (data / norms[rows]).astype(np.float32), self.n_features)
+
+    def dot(self, weights):
+        """X @ weights для плотной матрицы весов (n_features × k)"""
+        products = weights[self.indices] * self.data[:, None]
+        result = np.zeros((self.n_rows, weights.shape[1]), dtype=np.float32)
+        np.add.at(result, self.row_ids, products)
+        return result
+
+    def transpose_dot(self, matrix):
+        """X.T @ matrix, результат только по затронутым признакам: (уникальные индексы, строки)"""
+        unique, inverse = np.unique(self.indices, return_inverse=True)
+        result = np.zeros((len(unique), matrix.shape[1]), dtype=np.float32)
+        np.add.at(result, inverse, matrix[self.row_ids] * self.data[:, None])
+        return unique, result
+
+
+def _softmax(logits):
+    logits = logits - logits.max(axis=1, keepdims=True)
+    exp = np.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+class TopicModel:
+    """Обученная модель: IDF, веса softmax-регрессии и список тем"""
+
+    def __init__(self, classes, idf, weights, bias):
+        self.classes = list(classes)
+        self.idf = idf
+        self.weights = weights
+        self.bias = bias
+
+    @property
+    def n_features(self):
+        return len(self.idf)
+
+    @property
+    def fingerprint(self):
+        """Отпечаток модели: кэш предсказаний другой модели не используется"""
+        digest = hashlib.sha1()
+        for array in (self.idf, self.weights, self.bias):
+            digest.update(np.ascontiguousarray(array).tobytes())
+        digest.update('\n'.join(self.classes).encode('utf-8'))
+        return digest.hexdigest()
+
+    @classmethod
+    def train(cls, texts, labels, n_features=DEFAULT_FEATURES, epochs=300, learning_rate=10.0,
+              l2=1e-5, batch_size=4096, seed=0):
+        """Обучает модель мини-батчевым градиентным спуском по кросс-энтропии"""
+        classes = sorted(set(labels))
+        class_index = {label: index for index, label in enumerate(classes)}
+        y = np.asarray([class_index[label] for label in labels], dtype=np.int64)
+
+        counts = HashedFeatures.from_texts(texts, n_features)
+        document_frequency = np.bincount(counts.indices, minlength=n_features)
+        idf = (np.log((1 + counts.n_rows) / (1 + document_frequency)) + 1).astype(np.float32)
+        features = counts.tfidf(idf)
+
+        weights = np.zeros((n_features, len(classes)), dtype=np.float32)
+        bias = np.zeros(len(classes), dtype=np.float32)
+        rng = np.random.default_rng(seed)
+        for _ in range(epochs):
+            order = rng.permutation(features.n_rows)
+            for start in range(0, len(order), batch_size):
+                rows = order[start:start + batch_size]
+                batch = _take_rows(features, rows)
+                probabilities = _softmax(batch.dot(weights) + bias)
+                probabilities[np.arange(len(rows)), y[rows]] -= 1.0
+                probabilities /= len(rows)
+                touched, gradient = batch.transpose_dot(probabilities)
+                weights[touched] -= learning_rate * (gradient + l2 * weights[touched])
+                bias -= learning_rate * probabilities.sum(axis=0)
+        return cls(classes, idf, weights, bias)
+
+    def predict_proba(self, texts, batch_size=1024):
+        """Вероятности тем по батчам текстов"""
+        texts = list(texts)
+        result = np.zeros((len(texts), len(self.classes)), dtype=np.float32)
+        for start in range(0, len(texts), batch_size):
+            batch = HashedFeatures.from_texts(texts[start:start + batch_size], self.n_features).tfidf(self.idf)
+            result[start:start + batch.n_rows] = _softmax(batch.dot(self.weights) + self.bias)
+        return result
+
+    def predict(self, texts, batch_size=1024):
+        """Наиболее вероятная тема для каждого текста"""
+        probabilities = self.predict_proba(texts, batch_size)
+        return [self.classes[index] for index in probabilities.argmax(axis=1)]
+
+    def save(self, path):
+        """
+        Сохраняет модель в .npz. Хранятся только строки весов ненулевых признаков
+        (float16), поэтому файл небольшой и загружается за миллисекунды.
+        """
+        rows = np.flatnonzero(np.any(self.weights != 0, axis=1))
+        np.savez(
+            path,
+            classes=np.asarray(self.classes),
+            idf=self.idf.astype(np.float16),
+            rows=rows.astype(np.int32),
+            weights=self.weights[rows].astype(np.float16),
+            bias=self.bias,
+        )
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            idf = data['idf'].astype(np.float32)
+            weights = np.zeros((len(idf), len(data['classes'])), dtype=np.float32)
+            weights[data['rows']] = data['weights']
+            return cls([str(label) for label in data['classes']], idf, weights, data['bias'])
+
+
+class PredictionCache:
+    """
+    Запомненные предсказания по хешу текста вопроса (JSON-файл).
+    Кэш привязан к отпечатку модели: после переобучения он начинается заново.
+    """
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        if path and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get('model') == fingerprint:
+                self.entries = stored.get('predictions', {})
+
+    def get(self, text):
+        topic = self.entries.get(text_key(text))
+        if topic is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return topic
+
+    def put(self, text, topic):
+        self.entries[text_key(text)] = topic
+
+    def save(self):
+        if not self.path:
+            return
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'model': self.fingerprint, 'predictions': self.entries}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
+
+
+def labelled_items(path):
+    """Вопросы с уже проставленной темой: (тексты, темы)"""
+    texts, labels = [], []
+    for item in iter_items(path):
+        if item.get('topic') and item.get('question'):
+            texts.append(item['question'])
+            labels.append(item['topic'])
+    return texts, labels
+
+
+def _take_rows(features, rows):
+    """Подматрица из выбранных строк"""
+    starts = features.indptr[rows]
+    ends = features.indptr[rows + 1]
+    lengths = ends - starts
+    positions = np.concatenate([np.arange(start, end) for start, end in zip(starts, ends)]) if len(rows) else \
+        np.zeros(0, dtype=np.int64)
+    indptr = np.concatenate([[0], np.cumsum(lengths)])
+    return HashedFeatures(indptr, features.indices[positions], features.data[positions], features.n_features)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+
+    train_parser = subparsers.add_parser('train', help='обучить модель на размеченных вопросах')
+    train_parser.add_argument('input', nargs='?', default='raw.json')
+    train_parser.add_argument('-o', '--output', default='topic_model.npz')
+    train_parser.add_argument('--features', type=int, default=DEFAULT_FEATURES, help='размер хеш-пространства')
+    train_parser.add_argument('--epochs', type=int, default=300)
+
+    evaluate_parser = subparsers.add_parser('evaluate', help='точность на отложенной части размеченных вопросов')
+    evaluate_parser.add_argument('input', nargs='?', default='raw.json')
+    evaluate_parser.add_argument('--test-fraction', type=float, default=0.2)
+    evaluate_parser.add_argument('--features', type=int, default=DEFAULT_FEATURES)
+    evaluate_parser.add_argument('--epochs', type=int, default=300)
+    args = parser.parse_args()
+
+    texts, labels = labelled_items(args.input)
+    print(f"Размеченных вопросов: {len(texts)}, тем: {len(set(labels))}")
+
+    if args.command == 'train':
+        started = time.perf_counter()
+        model = TopicModel.train(texts, labels, n_features=args.features, epochs=args.epochs)
+        print(f"Обучение: {time.perf_counter() - started:.2f} s")
+        model.save(args.output)
+        started = time.perf_counter()
+        TopicModel.load(args.output)
+        print(f"Модель сохранена в {args.output} ({os.path.getsize(args.output) / 1024:.0f} KB), "
+              f"загрузка {(time.perf_counter() - started) * 1000:.1f} ms")
+        return
+
+    from classify_topics import classify_question
+
+    indices = list(range(len(texts)))
+    random.Random(0).shuffle(indices)
+    split = int(len(indices) * (1 - args.test_fraction))
+    train_idx, test_idx = indices[:split], indices[split:]
+    model = TopicModel.train([texts[i] for i in train_idx], [labels[i] for i in train_idx],
+                             n_features=args.features, epochs=args.epochs)
+    predicted = model.predict([texts[i] for i in test_idx])
+    model_accuracy = np.mean([p == labels[i] for p, i in zip(predicted, test_idx)])
+    keyword_accuracy = np.mean([classify_question(texts[i]) == labels[i] for i in test_idx])
+    print(f"Точность на {len(test_idx)} отложенных вопросах: модель {model_accuracy:.3f}, "
+          f"ключевые слова {keyword_accuracy:.3f}")
+
+
+if __name__ == '__main__':
+    main()